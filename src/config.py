@@ -221,6 +221,14 @@ class LogConfig:
         
         return config
 
+# HTML parsing
+class ParserConfig:
+    """HTML parser backends, see src/utils/html_utils.py."""
+    # BeautifulSoup tree builder for documents: "html.parser" or "lxml"
+    BACKEND = os.environ.get("ZHLAW_HTML_PARSER", "html.parser")
+    # Backend for read-only scans: "auto", "selectolax", "lxml" or "html.parser"
+    SCAN_BACKEND = os.environ.get("ZHLAW_SCAN_PARSER", "auto")
+
 # Command-line tools
 class Tools:
     """External command-line tools."""
@@ -244,6 +244,11 @@ class HTTPStatus:
 DEFAULT_ENCODING: Final = "utf-8"
 
 
+# Manifest of the frontmatter of all files of the markdown dataset, written
+# next to the .md files (one JSON object per line)
+FRONTMATTER_MANIFEST_FILENAME: Final = "frontmatter.jsonl"
+
+
 # Size limits (in bytes)
 class SizeLimits:
     """File and content size limits."""
@@ -16,6 +16,8 @@ Usage:
 Options:
     --folder: Choose folder to process (zhlex_files or test_files)
     --mode: Processing mode (concurrent or sequential)
+    --keep-intermediates: Write the intermediate files of every stage
+    --debug: Draw the rectangles checked for link colour into -debug.pdf copies
 
 License:
     https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
@@ -34,6 +36,9 @@ from src.modules.law_pdf_module import (
 from src.config import DataPaths, LogConfig, FilePatterns, ProcessingSteps, DateFormats
 from src.constants import Messages
 
+# Import HTML utilities
+from src.utils.html_utils import write_html
+
 # Import logging utilities
 from src.utils.logging_decorators import configure_logging
 from src.utils.logging_utils import get_module_logger
@@ -91,7 +96,154 @@ def write_metadata(metadata_file: str, metadata: dict) -> None:
         json.dump(metadata, f, indent=4, ensure_ascii=False)
 
 
-def process_pdf_file(pdf_file: str) -> bool:
+def read_json(json_file: str) -> dict:
+    """Reads and returns UTF-8 encoded JSON data (e.g. Adobe Extract output)."""
+    with open(json_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(json_file: str, data: dict) -> None:
+    """Writes UTF-8 encoded JSON data."""
+    with open(json_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+
+
+def run_stages_on_disk(paths: dict, metadata: dict, debug: bool = False) -> None:
+    """
+    Run all stages with every intermediate result written to and re-read from disk.
+    With debug, extend_metadata writes -debug.pdf copies of the modified PDFs.
+    """
+    pdf_file = paths["original_pdf_path"]
+
+    logger.info(f"Extracting color for law: {pdf_file}")
+    extend_metadata.main(
+        paths["original_pdf_path"],
+        paths["modified_pdf_path"],
+        paths["json_file_law"],
+        paths["json_file_law_updated"],
+        debug=debug,
+    )
+    logger.info(f"Finished extracting color for law: {pdf_file}")
+
+    logger.info(f"Extracting color for marginalia: {pdf_file}")
+    extend_metadata.main(
+        paths["original_pdf_path"],
+        paths["modified_pdf_path_marginalia"],
+        paths["json_file_marginalia"],
+        paths["json_file_marginalia_updated"],
+        debug=debug,
+    )
+    logger.info(f"Finished extracting color for marginalia: {pdf_file}")
+
+    logger.info(f"Converting law JSON to HTML: {pdf_file}")
+    json_to_html.main(
+        paths["json_file_law_updated"],
+        metadata,
+        paths["html_file_law"],
+        marginalia=False,
+    )
+    logger.info(f"Finished converting law JSON to HTML: {pdf_file}")
+
+    logger.info(f"Converting marginalia JSON to HTML: {pdf_file}")
+    json_to_html.main(
+        paths["json_file_marginalia_updated"],
+        metadata,
+        paths["html_file_marginalia"],
+        marginalia=True,
+    )
+    logger.info(f"Finished converting marginalia JSON to HTML: {pdf_file}")
+
+    logger.info(f"Merging marginalia: {pdf_file}")
+    merge_marginalia.main(paths["html_file_marginalia"])
+    logger.info(f"Finished merging marginalia: {pdf_file}")
+
+    logger.info(f"Matching marginalia: {pdf_file}")
+    match_marginalia.main(
+        paths["html_file_law"],
+        paths["html_file_marginalia"],
+        paths["merged_html_law"],
+    )
+    logger.info(f"Finished matching marginalia: {pdf_file}")
+
+    logger.info(f"Creating hyperlinks: {pdf_file}")
+    create_hyperlinks.main(paths["merged_html_law"], paths["json_file_law_updated"])
+    logger.info(f"Finished creating hyperlinks: {pdf_file}")
+
+    logger.info(f"Cleaning HTML: {pdf_file}")
+    clean_html.main(paths["merged_html_law"])
+    logger.info(f"Finished cleaning HTML: {pdf_file}")
+
+
+def run_stages_in_memory(paths: dict, metadata: dict, debug: bool = False) -> None:
+    """
+    Run all stages passing the element lists and soups directly from one stage
+    to the next. Only the updated law JSON (needed by the table review) and the
+    final merged HTML are written to disk. The stages do not depend on the
+    document having been written and parsed again, so the soup is serialized
+    only once, for the final write. debug is passed to extend_metadata as in
+    run_stages_on_disk.
+    """
+    pdf_file = paths["original_pdf_path"]
+
+    logger.info(f"Extracting color for law: {pdf_file}")
+    law_json = extend_metadata.extend_json_data(
+        paths["original_pdf_path"],
+        paths["modified_pdf_path"],
+        read_json(paths["json_file_law"]),
+        debug=debug,
+    )
+    write_json(paths["json_file_law_updated"], law_json)
+    logger.info(f"Finished extracting color for law: {pdf_file}")
+
+    logger.info(f"Extracting color for marginalia: {pdf_file}")
+    marginalia_json = extend_metadata.extend_json_data(
+        paths["original_pdf_path"],
+        paths["modified_pdf_path_marginalia"],
+        read_json(paths["json_file_marginalia"]),
+        debug=debug,
+    )
+    logger.info(f"Finished extracting color for marginalia: {pdf_file}")
+
+    logger.info(f"Converting law JSON to HTML: {pdf_file}")
+    soup_law = json_to_html.build_html(
+        law_json, metadata, paths["json_file_law_updated"], marginalia=False
+    )
+    logger.info(f"Finished converting law JSON to HTML: {pdf_file}")
+
+    logger.info(f"Converting marginalia JSON to HTML: {pdf_file}")
+    soup_marginalia = json_to_html.build_html(
+        marginalia_json,
+        metadata,
+        paths["json_file_marginalia_updated"],
+        marginalia=True,
+    )
+    logger.info(f"Finished converting marginalia JSON to HTML: {pdf_file}")
+
+    logger.info(f"Merging marginalia: {pdf_file}")
+    soup_marginalia = merge_marginalia.merge_paragraphs(soup_marginalia)
+    logger.info(f"Finished merging marginalia: {pdf_file}")
+
+    logger.info(f"Matching marginalia: {pdf_file}")
+    soup = match_marginalia.merge_soups(soup_law, soup_marginalia)
+    soup = match_marginalia.clean_html(soup)
+    logger.info(f"Finished matching marginalia: {pdf_file}")
+
+    logger.info(f"Creating hyperlinks: {pdf_file}")
+    soup = create_hyperlinks.process_soup(soup, law_json)
+    logger.info(f"Finished creating hyperlinks: {pdf_file}")
+
+    logger.info(f"Cleaning HTML: {pdf_file}")
+    soup = clean_html.process_soup(soup)
+    logger.info(f"Finished cleaning HTML: {pdf_file}")
+
+    write_html(
+        soup, paths["merged_html_law"], encoding="utf-8", add_doctype=False, minify=True
+    )
+
+
+def process_pdf_file(
+    pdf_file: str, keep_intermediates: bool = False, debug: bool = False
+) -> bool:
     """
     Process a single PDF file by:
       - Extending metadata (extracting color) for law and marginalia PDFs.
@@ -99,67 +251,19 @@ def process_pdf_file(pdf_file: str) -> bool:
       - Merging marginalia, matching them with the law,
         creating hyperlinks, and cleaning the final HTML.
       - Updating metadata with a processing timestamp.
+    By default the stages are chained in memory; with keep_intermediates every
+    stage writes its output to disk as before. With debug, the rectangles
+    checked for link colour are drawn into -debug.pdf copies of the PDFs.
     Returns True if processing succeeded; otherwise, False.
     """
     paths = generate_file_paths(pdf_file)
     try:
         metadata = read_metadata(paths["metadata_file"])
 
-        logger.info(f"Extracting color for law: {pdf_file}")
-        extend_metadata.main(
-            paths["original_pdf_path"],
-            paths["modified_pdf_path"],
-            paths["json_file_law"],
-            paths["json_file_law_updated"],
-        )
-        logger.info(f"Finished extracting color for law: {pdf_file}")
-
-        logger.info(f"Extracting color for marginalia: {pdf_file}")
-        extend_metadata.main(
-            paths["original_pdf_path"],
-            paths["modified_pdf_path_marginalia"],
-            paths["json_file_marginalia"],
-            paths["json_file_marginalia_updated"],
-        )
-        logger.info(f"Finished extracting color for marginalia: {pdf_file}")
-
-        logger.info(f"Converting law JSON to HTML: {pdf_file}")
-        json_to_html.main(
-            paths["json_file_law_updated"],
-            metadata,
-            paths["html_file_law"],
-            marginalia=False,
-        )
-        logger.info(f"Finished converting law JSON to HTML: {pdf_file}")
-
-        logger.info(f"Converting marginalia JSON to HTML: {pdf_file}")
-        json_to_html.main(
-            paths["json_file_marginalia_updated"],
-            metadata,
-            paths["html_file_marginalia"],
-            marginalia=True,
-        )
-        logger.info(f"Finished converting marginalia JSON to HTML: {pdf_file}")
-
-        logger.info(f"Merging marginalia: {pdf_file}")
-        merge_marginalia.main(paths["html_file_marginalia"])
-        logger.info(f"Finished merging marginalia: {pdf_file}")
-
-        logger.info(f"Matching marginalia: {pdf_file}")
-        match_marginalia.main(
-            paths["html_file_law"],
-            paths["html_file_marginalia"],
-            paths["merged_html_law"],
-        )
-        logger.info(f"Finished matching marginalia: {pdf_file}")
-
-        logger.info(f"Creating hyperlinks: {pdf_file}")
-        create_hyperlinks.main(paths["merged_html_law"], paths["json_file_law_updated"])
-        logger.info(f"Finished creating hyperlinks: {pdf_file}")
-
-        logger.info(f"Cleaning HTML: {pdf_file}")
-        clean_html.main(paths["merged_html_law"])
-        logger.info(f"Finished cleaning HTML: {pdf_file}")
+        if keep_intermediates:
+            run_stages_on_disk(paths, metadata, debug)
+        else:
+            run_stages_in_memory(paths, metadata, debug)
 
         # Add processing timestamp to metadata
         timestamp = arrow.now().format("YYYYMMDD-HHmmss")
@@ -172,12 +276,15 @@ def process_pdf_file(pdf_file: str) -> bool:
         return False
 
 
-def process_files_concurrently(pdf_files):
+def process_files_concurrently(pdf_files, keep_intermediates=False, debug=False):
     """Process files in parallel using ProcessPoolExecutor"""
     error_counter = 0
     with concurrent.futures.ProcessPoolExecutor() as executor:
         # Submit all tasks
-        futures = [executor.submit(process_pdf_file, pdf_file) for pdf_file in pdf_files]
+        futures = [
+            executor.submit(process_pdf_file, pdf_file, keep_intermediates, debug)
+            for pdf_file in pdf_files
+        ]
         
         # Track progress with enlighten-compatible progress bar
         results = []
@@ -192,7 +299,7 @@ def process_files_concurrently(pdf_files):
     return error_counter
 
 
-def process_files_sequentially(pdf_files):
+def process_files_sequentially(pdf_files, keep_intermediates=False, debug=False):
     """Process files sequentially for easier debugging"""
     error_counter = 0
     
@@ -204,7 +311,7 @@ def process_files_sequentially(pdf_files):
         )
         
         for pdf_file in pdf_files:
-            success = process_pdf_file(pdf_file)
+            success = process_pdf_file(pdf_file, keep_intermediates, debug)
             if not success:
                 error_counter += 1
             counter.update()
@@ -213,7 +320,13 @@ def process_files_sequentially(pdf_files):
 
 
 @configure_logging()
-def main(folder: str, concurrent_mode: bool, new_only: bool = False) -> None:
+def main(
+    folder: str,
+    concurrent_mode: bool,
+    new_only: bool = False,
+    keep_intermediates: bool = False,
+    debug: bool = False,
+) -> None:
     """
     Process all PDF files in the specified folder.
 
@@ -221,6 +334,9 @@ def main(folder: str, concurrent_mode: bool, new_only: bool = False) -> None:
         folder: The folder to process (zhlex_files or zhlex_files_test)
         concurrent_mode: If True, process files in parallel; otherwise, sequentially
         new_only: If True, only process files that haven't been processed yet
+        keep_intermediates: If True, write the intermediate HTML/JSON of every stage
+        debug: If True, draw the rectangles checked for link colour into
+            -debug.pdf copies of the PDFs
     """
     logger.info("Loading laws index")
     pdf_files = glob.glob(f"data/zhlex/{folder}/**/**/*-original.pdf", recursive=True)
@@ -259,9 +375,13 @@ def main(folder: str, concurrent_mode: bool, new_only: bool = False) -> None:
     )
 
     if concurrent_mode:
-        error_counter = process_files_concurrently(pdf_files)
+        error_counter = process_files_concurrently(
+            pdf_files, keep_intermediates, debug
+        )
     else:
-        error_counter = process_files_sequentially(pdf_files)
+        error_counter = process_files_sequentially(
+            pdf_files, keep_intermediates, debug
+        )
 
     logger.info(f"Finished processing HTML with {error_counter} errors")
 
@@ -283,7 +403,7 @@ Examples:
         """
     )
     
-    # Standardized arguments (4 total)
+    # Standardized arguments (6 total)
     parser.add_argument(
         "--target",
         choices=["zhlex_files", "zhlex_files_test"],
@@ -304,6 +424,18 @@ Examples:
         help="Only process files that haven't been processed yet (based on metadata)"
     )
     
+    parser.add_argument(
+        "--keep-intermediates",
+        action="store_true",
+        help="Write the intermediate HTML/JSON files of every stage (for debugging)"
+    )
+
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="Draw the rectangles checked for link colour into -debug.pdf copies of the PDFs"
+    )
+
     parser.add_argument(
         "--log-level",
         choices=["debug", "info", "warning", "error"],
@@ -324,4 +456,10 @@ Examples:
     logging.basicConfig(level=log_level_map[args.log_level])
 
     concurrent_mode = args.mode == "concurrent"
-    main(args.target, concurrent_mode, args.filter_new_only)
+    main(
+        args.target,
+        concurrent_mode,
+        args.filter_new_only,
+        args.keep_intermediates,
+        args.debug,
+    )
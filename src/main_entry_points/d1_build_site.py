@@ -5,11 +5,12 @@ Static Site Generation Pipeline - Main Entry Point
 This module generates the static website from processed law data:
 1. Generates index pages for law collections
 2. Processes HTML files from ZH-Lex and/or FedLex collections
-3. Creates placeholder pages for missing documents
+3. Creates placeholder pages for missing documents (in the same worker pool)
 4. Builds markdown dataset for processed collections
 5. Generates anchor maps for cross-referencing
-6. Creates sitemaps for SEO
-7. Copies static assets and deploys search functionality
+6. Writes a build manifest of all pages and creates sitemaps from it for SEO
+7. Copies static assets and builds the search index (incrementally, from a
+   fragment store in data/search_index)
 
 Usage:
     python -m src.cmd.d1_build_site_main [options]
@@ -20,6 +21,12 @@ Options:
     --placeholders: Create placeholder pages (yes/no)
     --mode: Processing mode (concurrent or sequential)
     --workers: Number of worker processes for concurrent mode
+    --incremental: Reuse unchanged pages from the build cache (data/build_cache)
+                   and only convert changed laws for the markdown dataset
+    --dataset-tar-zst: Also write the markdown datasets as col-zh-md.tar.zst
+                     and col-ch-md.tar.zst
+    --diffs: Generate diff pages between consecutive versions of each law
+    --precompress: Write .br and .gz variants of the HTML, JSON, CSS and JS output
 
 License:
     https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
@@ -29,13 +36,13 @@ import glob
 import json
 
 # from tqdm import tqdm  # Replaced with progress_utils
-from src.utils.progress_utils import progress_manager, track_concurrent_futures
+from src.utils.progress_utils import progress_manager
 import shutil
 import os
-from bs4 import BeautifulSoup
 import subprocess
 import argparse
 import concurrent.futures
+from collections import Counter
 
 # Local imports
 from src.modules.site_generator_module import build_zhlaw
@@ -43,9 +50,24 @@ from src.modules.site_generator_module import process_old_html
 from src.modules.site_generator_module import create_placeholders
 from src.modules.site_generator_module import generate_index
 from src.modules.site_generator_module.create_sitemap import SitemapGenerator
+from src.modules.site_generator_module import build_manifest
+from src.modules.site_generator_module import search_index
 from src.modules.dataset_generator_module import build_markdown
 from src.modules.site_generator_module import html_diff
 from src.modules.site_generator_module import generate_anchor_maps
+from src.modules.site_generator_module.build_cache import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_TEST_CACHE_DIR,
+    BuildCache,
+)
+from src.modules.site_generator_module.build_correction_applier import (
+    BuildCorrectionApplier,
+    extract_law_id_version_from_path,
+    folder_from_path,
+)
+from src.utils.file_utils import TrackedMetadata
+from src.utils.html_utils import parse_html_file
+from src.utils.compression_utils import compress_tree, write_compressed_variants
 from src.modules.general_module.asset_versioning import (
     AssetVersionManager,
     create_htaccess_rules,
@@ -63,6 +85,50 @@ STATIC_PATH = None
 COLLECTION_PATH_ZH = None
 COLLECTION_PATH_CH = None
 
+# Per-process build state - set by init_build_worker()
+_CORRECTION_INDEX = None
+_CORRECTION_APPLIERS = {}
+_PRECOMPRESS = False
+
+
+# -------------------------------------------------------------------------
+# Worker Setup
+# -------------------------------------------------------------------------
+def build_correction_index():
+    """
+    Collect the paths of all existing table-corrections files, so workers do
+    not have to probe the file system for every law version.
+    """
+    index = set()
+    for base_path in ["data/zhlex", "data/fedlex"]:
+        for path in glob.glob(
+            f"{base_path}/**/*-table-corrections.json", recursive=True
+        ):
+            index.add(os.path.normpath(path))
+    return frozenset(index)
+
+
+def init_build_worker(static_path, version_map, correction_index, precompress=False):
+    """
+    Set up the state shared by all pages a process builds. Used as initializer
+    of the process pool and called once before sequential processing.
+    """
+    global STATIC_PATH, _CORRECTION_INDEX, _PRECOMPRESS
+
+    STATIC_PATH = static_path
+    _PRECOMPRESS = precompress
+    build_zhlaw.set_version_map(version_map)
+    build_zhlaw.preload_svg_icons()
+    _CORRECTION_INDEX = correction_index
+    _CORRECTION_APPLIERS.clear()
+
+
+def get_correction_applier(base_path):
+    """Return the correction applier of a collection, created once per process."""
+    if base_path not in _CORRECTION_APPLIERS:
+        _CORRECTION_APPLIERS[base_path] = BuildCorrectionApplier(base_path=base_path)
+    return _CORRECTION_APPLIERS[base_path]
+
 
 # -------------------------------------------------------------------------
 # File Processing Functions
@@ -71,12 +137,25 @@ def process_html_file(args):
     """
     Process a single HTML file and return success/error status.
     This function is designed to be callable by both sequential and parallel processors.
+
+    Returns a tuple (success, metadata_modified, anchor_summary, cache_key).
+    Metadata is read-only input and only written back if rendering actually
+    changed a field. anchor_summary is (file name, summary) for law pages, see
+    generate_anchor_maps.summarize_soup(), and None otherwise. cache_key is
+    the build cache key of the page, or None without a build cache.
     """
-    html_file, collection_data_path, collection_path, law_origin, minify_output = args
+    (
+        html_file,
+        collection_data_path,
+        collection_path,
+        law_origin,
+        minify_output,
+        build_cache,
+    ) = args
 
     # Skip diff files
     if "-diff-" in html_file:
-        return True  # Return success without processing
+        return True, False, None, None  # Return success without processing
 
     # Identify what type of file we have
     if html_file.endswith("-original.html"):
@@ -93,141 +172,416 @@ def process_html_file(args):
         metadata_file = None
 
     try:
+        # Derive the output path
+        if file_type in ["old_html", "new_html"]:
+            # Derive new filename (remove "-original" or "-merged" suffix)
+            _, tail = os.path.split(html_file)
+            new_tail = tail.replace(sfx, "")
+            new_file_path = os.path.join(collection_path, new_tail)
+        else:
+            # For site elements, store in STATIC_PATH
+            new_file_path = os.path.join(STATIC_PATH, os.path.basename(html_file))
+
+        # Locate manual table corrections
+        law_id = version = folder = None
+        corrections_file = None
         if file_type in ["old_html", "new_html"]:
-            # Load metadata
-            with open(metadata_file, "r", encoding="utf-8") as file:
-                metadata = json.load(file)
+            law_id, version = extract_law_id_version_from_path(html_file)
+            if law_id and version:
+                folder = folder_from_path(html_file)
+                # Select base path based on law origin
+                base_path = "data/zhlex" if law_origin == "zh" else "data/fedlex"
+                correction_applier = get_correction_applier(base_path)
+                corrections_file = (
+                    correction_applier.correction_manager.get_correction_file_path(
+                        law_id, version, folder
+                    )
+                )
+                # Skip laws without corrections file
+                if (
+                    _CORRECTION_INDEX is not None
+                    and os.path.normpath(corrections_file) not in _CORRECTION_INDEX
+                ):
+                    corrections_file = None
 
+        if file_type in ["old_html", "new_html"]:
+            # Load metadata, keeping a snapshot to detect modifications
+            metadata = TrackedMetadata.load(metadata_file)
+        else:
+            metadata = TrackedMetadata({})
+
+        # Reuse the page from an earlier build if none of its inputs changed
+        cache_key = None
+        if build_cache is not None:
+            cache_key = build_cache.page_key(
+                html_file, file_type, law_origin, metadata.data, corrections_file
+            )
+            if build_cache.restore(cache_key, new_file_path):
+                logger.debug(f"Restored {new_file_path} from build cache")
+                if _PRECOMPRESS and not build_cache.restore_variants(
+                    cache_key, new_file_path
+                ):
+                    write_compressed_variants(new_file_path)
+                    build_cache.store_variants(cache_key, new_file_path)
+                anchor_summary = None
+                if file_type in ["old_html", "new_html"]:
+                    summary = build_cache.restore_summary(cache_key)
+                    if summary is not None:
+                        anchor_summary = (os.path.basename(new_file_path), summary)
+                return True, False, anchor_summary, cache_key
+
+        if file_type in ["old_html", "new_html"]:
             # Load HTML
             if file_type == "old_html":
                 # Older HTML might be iso-8859-1 encoded
-                with open(html_file, "r", encoding="iso-8859-1") as file:
-                    soup = BeautifulSoup(file, "html.parser")
+                soup = parse_html_file(html_file, encoding="iso-8859-1")
                 soup = process_old_html.main(soup)
             else:
                 # Merged HTML is usually UTF-8
-                with open(html_file, "r", encoding="utf-8") as file:
-                    soup = BeautifulSoup(file, "html.parser")
+                soup = parse_html_file(html_file)
 
         else:
             # For site elements
-            metadata = {}
-            with open(html_file, "r", encoding="utf-8") as file:
-                soup = BeautifulSoup(file, "html.parser")
+            soup = parse_html_file(html_file)
 
         # Apply manual table corrections BEFORE marginalia processing (NEW)
-        if file_type in ["old_html", "new_html"]:
-            from src.modules.site_generator_module.build_correction_applier import (
-                BuildCorrectionApplier, 
-                extract_law_id_version_from_path, 
-                folder_from_path
+        if corrections_file is not None:
+            soup = correction_applier.apply_corrections_to_html(
+                soup, law_id, version, folder
             )
-            
-            law_id, version = extract_law_id_version_from_path(html_file)
-            if law_id and version:
-                folder = folder_from_path(html_file)
-                # Select base path based on law origin
-                base_path = "data/zhlex" if law_origin == "zh" else "data/fedlex"
-                correction_applier = BuildCorrectionApplier(base_path=base_path) 
-                soup = correction_applier.apply_corrections_to_html(
-                    soup, law_id, version, folder
-                )
-                logger.info(f"Applied manual table corrections for {law_id} v{version}")
+            logger.info(f"Applied manual table corrections for {law_id} v{version}")
 
         # Insert InfoBox and other final touches
-        doc_info = metadata.get("doc_info", {})
+        doc_info = metadata.data.get("doc_info", {})
         soup = build_zhlaw.main(
             soup, html_file, doc_info, file_type, law_origin=law_origin
         )
 
+        # Collect the anchors while the tree is at hand, so anchor maps do not
+        # need to parse the written page again
+        summary = None
+        anchor_summary = None
+        if file_type in ["old_html", "new_html"]:
+            summary = generate_anchor_maps.summarize_soup(soup)
+            anchor_summary = (os.path.basename(new_file_path), summary)
+
         # Create output folders if needed
         if not os.path.exists(collection_path):
             os.makedirs(collection_path, exist_ok=True)
 
-        # Update metadata file if relevant
+        # Update metadata file only if rendering changed it
+        metadata_modified = False
         if file_type in ["old_html", "new_html"]:
-            with open(metadata_file, "w", encoding="utf-8") as file:
-                json.dump(metadata, file, indent=4, ensure_ascii=False)
-
-            # Derive new filename (remove "-original" or "-merged" suffix)
-            _, tail = os.path.split(html_file)
-            new_tail = tail.replace(sfx, "")
-            new_file_path = os.path.join(collection_path, new_tail)
-        else:
-            # For site elements, store in STATIC_PATH
-            if not os.path.exists(STATIC_PATH):
-                os.makedirs(STATIC_PATH)
-            new_file_path = os.path.join(STATIC_PATH, os.path.basename(html_file))
+            metadata_modified = metadata.save_if_changed(metadata_file)
+        elif not os.path.exists(STATIC_PATH):
+            os.makedirs(STATIC_PATH)
 
         # Write final HTML with optional minification
         from src.utils.html_utils import write_html
-        write_html(soup, new_file_path, encoding="utf-8", add_doctype=True, minify=minify_output)
+        write_html(
+            soup,
+            new_file_path,
+            encoding="utf-8",
+            add_doctype=True,
+            minify=minify_output,
+            compress=_PRECOMPRESS,
+        )
 
-        return True
+        if cache_key is not None:
+            build_cache.store(cache_key, new_file_path, summary)
+            build_cache.store_variants(cache_key, new_file_path)
+
+        return True, metadata_modified, anchor_summary, cache_key
     except Exception as e:
         logger.error(
             f"Error processing {html_file}: {e}",
             exc_info=True,
         )
-        return False
+        return False, False, None, None
+
+
+def process_placeholder_page(args):
+    """
+    Render a placeholder page for a law version without text, see
+    create_placeholders. Returns the same tuple as process_html_file.
+    """
+    placeholder_page, collection_path, minify_output, build_cache = args
+    new_file_path = os.path.join(collection_path, placeholder_page["filename"])
+    try:
+        os.makedirs(collection_path, exist_ok=True)
+
+        # Reuse the page from an earlier build if its version data did not change
+        cache_key = None
+        if build_cache is not None:
+            cache_key = build_cache.placeholder_key(placeholder_page)
+            if build_cache.restore(cache_key, new_file_path):
+                if _PRECOMPRESS and not build_cache.restore_variants(
+                    cache_key, new_file_path
+                ):
+                    write_compressed_variants(new_file_path)
+                    build_cache.store_variants(cache_key, new_file_path)
+                summary = build_cache.restore_summary(cache_key)
+                anchor_summary = None
+                if summary is not None:
+                    anchor_summary = (placeholder_page["filename"], summary)
+                return True, False, anchor_summary, cache_key
+
+        soup = create_placeholders.render_placeholder(placeholder_page)
+        summary = generate_anchor_maps.summarize_soup(soup)
+
+        from src.utils.html_utils import write_html
+        write_html(
+            soup,
+            new_file_path,
+            encoding="utf-8",
+            add_doctype=True,
+            minify=minify_output,
+            compress=_PRECOMPRESS,
+        )
+
+        if cache_key is not None:
+            build_cache.store(cache_key, new_file_path, summary)
+            build_cache.store_variants(cache_key, new_file_path)
+
+        return True, False, (placeholder_page["filename"], summary), cache_key
+    except Exception as e:
+        logger.error(
+            f"Error creating placeholder {new_file_path}: {e}",
+            exc_info=True,
+        )
+        return False, False, None, None
+
+
+def run_page_task(task):
+    """Run a (page function, arguments) task, so one pool can build all page types."""
+    page_function, args = task
+    return page_function(args)
+
+
+def build_page_tasks(
+    html_files,
+    collection_data_path,
+    collection_path,
+    law_origin,
+    minify_output,
+    build_cache,
+    placeholder_pages=None,
+):
+    """
+    Create the page tasks of a collection: its HTML files and placeholders.
+    """
+    tasks = [
+        (
+            process_html_file,
+            (
+                html_file,
+                collection_data_path,
+                collection_path,
+                law_origin,
+                minify_output,
+                build_cache,
+            ),
+        )
+        for html_file in html_files
+    ]
+    tasks += [
+        (
+            process_placeholder_page,
+            (placeholder_page, collection_path, minify_output, build_cache),
+        )
+        for placeholder_page in placeholder_pages or []
+    ]
+    return tasks
+
+
+def failed_page_filename(task):
+    """Return the file name of the law page a failed task should have written."""
+    page_function, args = task
+    if page_function is process_html_file:
+        return law_page_filename(args[0])
+    return None
+
+
+def law_page_filename(html_file):
+    """
+    Return the file name process_html_file writes a law page to, or None if
+    the file is not a law page.
+    """
+    tail = os.path.basename(html_file)
+    if "-diff-" in tail:
+        return None
+    for sfx in ("-original", "-merged"):
+        if tail.endswith(f"{sfx}.html"):
+            return tail.replace(sfx, "")
+    return None
 
 
 def process_html_files_sequentially(
-    html_files, collection_data_path, collection_path, law_origin, minify_output=True
+    html_files,
+    collection_data_path,
+    collection_path,
+    law_origin,
+    minify_output=True,
+    build_cache=None,
+    worker_init_args=None,
+    placeholder_pages=None,
 ):
     """
-    Process HTML files sequentially for easier debugging.
+    Process HTML files (and placeholder pages) sequentially for easier debugging.
+    Returns the number of errors, the number of modified metadata files, the
+    anchor summaries of the rendered law pages by file name and the file
+    names of the law pages that failed to render. The cache keys of the
+    pages are added to build_cache.used_keys.
     """
     error_counter = 0
+    metadata_modified_counter = 0
+    anchor_summaries = {}
+    failed_pages = []
+    tasks = build_page_tasks(
+        html_files,
+        collection_data_path,
+        collection_path,
+        law_origin,
+        minify_output,
+        build_cache,
+        placeholder_pages,
+    )
+
+    if worker_init_args is not None:
+        init_build_worker(*worker_init_args)
 
     with progress_manager() as pm:
         counter = pm.create_counter(
-            total=len(html_files),
-            desc=f"Processing {len(html_files)} {law_origin} files sequentially",
+            total=len(tasks),
+            desc=f"Processing {len(tasks)} {law_origin} files sequentially",
             unit="files",
         )
 
-        for html_file in html_files:
-            success = process_html_file(
-                (html_file, collection_data_path, collection_path, law_origin, minify_output)
-            )
+        for task in tasks:
+            success, metadata_modified, anchor_summary, cache_key = run_page_task(task)
             if not success:
                 error_counter += 1
+                failed_pages.append(failed_page_filename(task))
+            if metadata_modified:
+                metadata_modified_counter += 1
+            if anchor_summary is not None:
+                anchor_summaries[anchor_summary[0]] = anchor_summary[1]
+            if cache_key is not None:
+                build_cache.used_keys.add(cache_key)
             counter.update()
 
-    return error_counter
+    failed_pages = [filename for filename in failed_pages if filename is not None]
+    return error_counter, metadata_modified_counter, anchor_summaries, failed_pages
 
 
 def process_html_files_concurrently(
-    html_files, collection_data_path, collection_path, law_origin, max_workers=None, minify_output=True
+    html_files,
+    collection_data_path,
+    collection_path,
+    law_origin,
+    max_workers=None,
+    minify_output=True,
+    build_cache=None,
+    worker_init_args=None,
+    placeholder_pages=None,
 ):
     """
-    Process HTML files in parallel using ProcessPoolExecutor.
+    Process HTML files (and placeholder pages) in parallel using ProcessPoolExecutor.
+    Returns the number of errors, the number of modified metadata files, the
+    anchor summaries of the rendered law pages by file name and the file
+    names of the law pages that failed to render. The cache keys of the
+    pages are added to build_cache.used_keys.
+
+    Every worker is set up once with worker_init_args (see init_build_worker)
+    and receives the files in chunks to keep the per-task overhead low.
     """
     error_counter = 0
-    # Create a list of argument tuples for the process_html_file function
-    process_args = [
-        (html_file, collection_data_path, collection_path, law_origin, minify_output)
-        for html_file in html_files
-    ]
+    metadata_modified_counter = 0
+    anchor_summaries = {}
+    failed_pages = []
+    # Create the page tasks for the worker processes
+    process_args = build_page_tasks(
+        html_files,
+        collection_data_path,
+        collection_path,
+        law_origin,
+        minify_output,
+        build_cache,
+        placeholder_pages,
+    )
 
-    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks
-        futures = [executor.submit(process_html_file, args) for args in process_args]
+    # Aim for a few chunks per worker, so slow files still balance out
+    worker_count = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(process_args) // (worker_count * 4))
 
-        # Track progress with enlighten-compatible progress bar
-        results = []
-        for future in track_concurrent_futures(
-            futures,
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=init_build_worker if worker_init_args is not None else None,
+        initargs=worker_init_args or (),
+    ) as executor, progress_manager() as pm:
+        counter = pm.create_counter(
+            total=len(process_args),
             desc=f"Processing {len(process_args)} {law_origin} files concurrently",
             unit="files",
+        )
+
+        results = executor.map(run_page_task, process_args, chunksize=chunksize)
+        for task, (success, metadata_modified, anchor_summary, cache_key) in zip(
+            process_args, results
         ):
-            results.append(future.result())
+            if not success:
+                error_counter += 1
+                failed_pages.append(failed_page_filename(task))
+            if metadata_modified:
+                metadata_modified_counter += 1
+            if anchor_summary is not None:
+                anchor_summaries[anchor_summary[0]] = anchor_summary[1]
+            if cache_key is not None:
+                build_cache.used_keys.add(cache_key)
+            counter.update()
 
-        # Count the number of failures
-        error_counter = results.count(False)
+    failed_pages = [filename for filename in failed_pages if filename is not None]
+    return error_counter, metadata_modified_counter, anchor_summaries, failed_pages
 
-    return error_counter
+
+def process_html_files(
+    processing_mode,
+    html_files,
+    collection_data_path,
+    collection_path,
+    law_origin,
+    max_workers=None,
+    minify_output=True,
+    build_cache=None,
+    worker_init_args=None,
+    placeholder_pages=None,
+):
+    """
+    Process HTML files (and placeholder pages) in the chosen processing mode,
+    see process_html_files_concurrently and process_html_files_sequentially.
+    """
+    if processing_mode == "concurrent":
+        return process_html_files_concurrently(
+            html_files,
+            collection_data_path,
+            collection_path,
+            law_origin=law_origin,
+            max_workers=max_workers,
+            minify_output=minify_output,
+            build_cache=build_cache,
+            worker_init_args=worker_init_args,
+            placeholder_pages=placeholder_pages,
+        )
+    return process_html_files_sequentially(
+        html_files,
+        collection_data_path,
+        collection_path,
+        law_origin=law_origin,
+        minify_output=minify_output,
+        build_cache=build_cache,
+        worker_init_args=worker_init_args,
+        placeholder_pages=placeholder_pages,
+    )
 
 
 @configure_logging()
@@ -238,6 +592,10 @@ def main(
     processing_mode,
     max_workers=None,
     minify_output=True,
+    incremental=False,
+    dataset_tar_zst=False,
+    generate_diffs=False,
+    precompress=False,
 ):
     """
     Depending on `folder_choice`:
@@ -247,6 +605,13 @@ def main(
      - "all_main_files": process all files in both fedlex_files and zhlex_files
      - "zhlex_main_files": process all files in zhlex_files
      - "fedlex_main_files": process all files in fedlex_files
+
+    With `incremental`, pages whose inputs did not change since an earlier
+    build are restored from the build cache instead of being re-rendered.
+    With `dataset_tar_zst`, the markdown dataset is also written as a
+    zstd-compressed tar file. With `generate_diffs`, diff pages are created
+    for all consecutive versions of each law. With `precompress`, brotli and
+    gzip variants are written next to the HTML, JSON, CSS and JS output.
     """
     global STATIC_PATH, COLLECTION_PATH_ZH, COLLECTION_PATH_CH
 
@@ -256,7 +621,6 @@ def main(
     # Define the collection data paths
     COLLECTION_DATA_ZH = "data/zhlex/zhlex_data/zhlex_data_processed.json"
     COLLECTION_DATA_CH = "data/fedlex/fedlex_data/fedlex_data_processed.json"
-    PLACEHOLDER_DIR_ZH = "data/zhlex/placeholders"  # Used only for ZH-Lex
 
     # Set the output directory based on folder_choice
     test_folders = ["all_test_files", "fedlex_test_files", "zhlex_test_files"]
@@ -271,14 +635,13 @@ def main(
         COLLECTION_PATH_CH = f"{STATIC_PATH}col-ch/"
         logger.info(f"Using standard output directory: {STATIC_PATH}")
 
-    # Remove existing public folder to ensure a clean build
+    # Remove existing public folder to ensure a clean build. Incremental
+    # builds still copy every page back from the build cache; hard links
+    # would save the copy, but pages are written in place later on (e.g.
+    # their compressed variants), which would change the cache entries too
     if os.path.exists(STATIC_PATH):
         shutil.rmtree(STATIC_PATH)
 
-    # Remove ZH placeholders if exist
-    if os.path.exists(PLACEHOLDER_DIR_ZH):
-        shutil.rmtree(PLACEHOLDER_DIR_ZH)
-
     # Decide whether to process ZH and/or CH based on the folder choice
     process_zh = False
     process_ch = False
@@ -331,12 +694,26 @@ def main(
     build_zhlaw.set_version_map(version_map)
 
     # Create .htaccess with caching rules
-    create_htaccess_rules(STATIC_PATH, version_map, non_versionable)
+    create_htaccess_rules(
+        STATIC_PATH, version_map, non_versionable, precompressed=precompress
+    )
 
     logger.info(
         f"Processed {len(version_map)} versioned assets and {len(non_versionable)} non-versioned assets"
     )
 
+    # State every build process sets up once before rendering pages
+    worker_init_args = (STATIC_PATH, version_map, build_correction_index(), precompress)
+
+    # Pages are keyed on the version map, so the cache is set up afterwards
+    build_cache = None
+    if incremental:
+        cache_dir = (
+            DEFAULT_TEST_CACHE_DIR if folder_choice in test_folders else DEFAULT_CACHE_DIR
+        )
+        build_cache = BuildCache(version_map, minify_output, cache_dir=cache_dir)
+        logger.info(f"Incremental build using cache at {build_cache.cache_dir}")
+
     # -------------------------------------------------------------------------
     # 2) Process markdown content to HTML
     # -------------------------------------------------------------------------
@@ -376,6 +753,10 @@ def main(
         )
         logger.info("Finished generating minimal index")
 
+    # Anchor summaries of the rendered law pages, used for the anchor maps
+    anchor_summaries_zh = {}
+    anchor_summaries_ch = {}
+
     # -------------------------------------------------------------------------
     # 4) Process ZH-Lex HTML files (if requested)
     # -------------------------------------------------------------------------
@@ -400,29 +781,86 @@ def main(
             set(html_files_zh_merged + html_files_zh_orig + html_site_elements)
         )
 
-        if not html_files_zh:
+        # Placeholders for versions without a page are rendered in the same
+        # pass; public/ starts empty, so the pages are known in advance
+        placeholder_pages_zh = []
+        zhlex_data_filtered = None
+        if placeholders_trigger.lower() == "yes":
+            with open(COLLECTION_DATA_ZH, "r", encoding="utf-8") as file:
+                zhlex_data_processed = json.load(file)
+
+            # Filter out versions that meet the filtering criteria to prevent placeholder generation
+            zhlex_data_filtered = build_zhlaw.filter_law_versions(zhlex_data_processed)
+            logger.info(f"Filtered ZH data for placeholders: {len(zhlex_data_processed)} -> {len(zhlex_data_filtered)} laws")
+
+            placeholder_pages_zh = create_placeholders.find_placeholder_pages(
+                zhlex_data_filtered,
+                filter(None, (law_page_filename(f) for f in html_files_zh)),
+            )
+            logger.info(f"ZH-Lex: {len(placeholder_pages_zh)} placeholder pages to create")
+
+        if not html_files_zh and not placeholder_pages_zh:
             logger.info("No ZH-Lex files found. Proceeding anyway...")
         else:
-            # Process files in chosen mode
-            if processing_mode == "concurrent":
-                error_counter_zh = process_html_files_concurrently(
-                    html_files_zh,
-                    COLLECTION_DATA_ZH,
-                    COLLECTION_PATH_ZH,
-                    law_origin="zh",
-                    max_workers=max_workers,
-                    minify_output=minify_output,
+            (
+                error_counter_zh,
+                metadata_modified_zh,
+                anchor_summaries_zh,
+                failed_pages_zh,
+            ) = process_html_files(
+                processing_mode,
+                html_files_zh,
+                COLLECTION_DATA_ZH,
+                COLLECTION_PATH_ZH,
+                law_origin="zh",
+                max_workers=max_workers,
+                minify_output=minify_output,
+                build_cache=build_cache,
+                worker_init_args=worker_init_args,
+                placeholder_pages=placeholder_pages_zh,
+            )
+
+            # Law pages that failed to render get a placeholder instead of a 404
+            if zhlex_data_filtered is not None and failed_pages_zh:
+                # A page is missing if all source files writing it failed
+                page_sources = Counter(filter(None, map(law_page_filename, html_files_zh)))
+                failed_pages = {
+                    filename
+                    for filename, count in Counter(failed_pages_zh).items()
+                    if count >= page_sources[filename]
+                }
+                written_pages = (
+                    filename for filename in page_sources if filename not in failed_pages
                 )
-            else:
-                error_counter_zh = process_html_files_sequentially(
-                    html_files_zh,
-                    COLLECTION_DATA_ZH,
-                    COLLECTION_PATH_ZH,
-                    law_origin="zh",
-                    minify_output=minify_output,
+                fallback_pages_zh = [
+                    page
+                    for page in create_placeholders.find_placeholder_pages(
+                        zhlex_data_filtered, written_pages
+                    )
+                    if page["filename"] in failed_pages
+                ]
+                logger.info(
+                    f"ZH-Lex: creating {len(fallback_pages_zh)} placeholders "
+                    f"for pages that failed to render"
                 )
+                if fallback_pages_zh:
+                    fallback_errors, _, fallback_summaries, _ = process_html_files(
+                        processing_mode,
+                        [],
+                        COLLECTION_DATA_ZH,
+                        COLLECTION_PATH_ZH,
+                        law_origin="zh",
+                        max_workers=max_workers,
+                        minify_output=minify_output,
+                        build_cache=build_cache,
+                        worker_init_args=worker_init_args,
+                        placeholder_pages=fallback_pages_zh,
+                    )
+                    error_counter_zh += fallback_errors
+                    anchor_summaries_zh.update(fallback_summaries)
 
             logger.info(f"ZH-Lex: encountered {error_counter_zh} errors.")
+            logger.info(f"ZH-Lex: modified {metadata_modified_zh} metadata files.")
 
     # -------------------------------------------------------------------------
     # 5) Process FedLex HTML files (if requested)
@@ -453,26 +891,31 @@ def main(
         if not html_files_ch:
             logger.info("No FedLex files found. Proceeding anyway...")
         else:
-            # Process files in chosen mode
-            if processing_mode == "concurrent":
-                error_counter_ch = process_html_files_concurrently(
+            error_counter_ch, metadata_modified_ch, anchor_summaries_ch, _ = (
+                process_html_files(
+                    processing_mode,
                     html_files_ch,
                     COLLECTION_DATA_CH,
                     COLLECTION_PATH_CH,
                     law_origin="ch",
                     max_workers=max_workers,
                     minify_output=minify_output,
+                    build_cache=build_cache,
+                    worker_init_args=worker_init_args,
                 )
-            else:
-                error_counter_ch = process_html_files_sequentially(
-                    html_files_ch,
-                    COLLECTION_DATA_CH,
-                    COLLECTION_PATH_CH,
-                    law_origin="ch",
-                    minify_output=minify_output,
-                )
+            )
 
             logger.info(f"FedLex: encountered {error_counter_ch} errors.")
+            logger.info(f"FedLex: modified {metadata_modified_ch} metadata files.")
+
+    # Drop cached pages this build did not use, e.g. after code changes. A
+    # build of one collection does not know the pages of the other
+    if build_cache is not None and process_zh and process_ch:
+        removed = build_cache.prune(build_cache.used_keys)
+        logger.info(
+            f"Build cache: {len(build_cache.used_keys)} pages used, "
+            f"{removed} stale files removed"
+        )
 
     # -------------------------------------------------------------------------
     # 6) Build MD datasets if requested (for whichever we processed)
@@ -485,6 +928,9 @@ def main(
                 processing_mode=processing_mode,
                 max_workers=max_workers,
                 output_dir=STATIC_PATH,
+                incremental=incremental,
+                tar_zst=dataset_tar_zst,
+                collection="zh",
             )
             logger.info("Finished building dataset for ZH-Lex")
 
@@ -495,71 +941,43 @@ def main(
                 processing_mode=processing_mode,
                 max_workers=max_workers,
                 output_dir=STATIC_PATH,
+                incremental=incremental,
+                tar_zst=dataset_tar_zst,
+                collection="ch",
             )
             logger.info("Finished building dataset for FedLex")
 
     # -------------------------------------------------------------------------
-    # 7) Create placeholders for ZH-Lex only if requested
+    # 5.5) Generate diffs for ZH-Lex and FedLex (if requested)
+    # Only provisions that changed are diffed, and their diffs are cached in
+    # data/diff_cache/<collection> across builds. The diff pages are not
+    # linked from the law pages yet (see insert_header in build_zhlaw)
     # -------------------------------------------------------------------------
-    if placeholders_trigger.lower() == "yes" and process_zh:
-        # Load ZH data
-        with open(COLLECTION_DATA_ZH, "r", encoding="utf-8") as file:
-            zhlex_data_processed = json.load(file)
-
-        # Filter out versions that meet the filtering criteria to prevent placeholder generation
-        zhlex_data_filtered = build_zhlaw.filter_law_versions(zhlex_data_processed)
-        logger.info(f"Filtered ZH data for placeholders: {len(zhlex_data_processed)} -> {len(zhlex_data_filtered)} laws")
-
-        # Collect all ZH public HTML files
-        public_html_files_zh = glob.glob(
-            os.path.join(COLLECTION_PATH_ZH, "*.html"),
-            recursive=True,
+    if generate_diffs and process_zh:
+        logger.info("Generating diffs for ZH-Lex")
+        zh_diff_path = os.path.join(STATIC_PATH, "col-zh/diff")
+        zh_diff_count = html_diff.main(
+            COLLECTION_DATA_ZH,
+            COLLECTION_PATH_ZH,
+            zh_diff_path,
+            law_origin="zh",
+            processing_mode=processing_mode,
+            max_workers=max_workers,
         )
+        logger.info(f"Generated {zh_diff_count} diffs for ZH-Lex")
 
-        logger.info("Creating placeholders for ZH-Lex")
-        create_placeholders.main(
-            zhlex_data_filtered, public_html_files_zh, PLACEHOLDER_DIR_ZH
+    if generate_diffs and process_ch:
+        logger.info("Generating diffs for FedLex")
+        ch_diff_path = os.path.join(STATIC_PATH, "col-ch/diff")
+        ch_diff_count = html_diff.main(
+            COLLECTION_DATA_CH,
+            COLLECTION_PATH_CH,
+            ch_diff_path,
+            law_origin="ch",
+            processing_mode=processing_mode,
+            max_workers=max_workers,
         )
-        logger.info("Finished creating placeholders for ZH-Lex")
-
-        # Copy placeholder files into the ZH collection
-        if os.path.exists(PLACEHOLDER_DIR_ZH):
-            shutil.copytree(
-                PLACEHOLDER_DIR_ZH,
-                COLLECTION_PATH_ZH,
-                dirs_exist_ok=True,
-            )
-
-    # -------------------------------------------------------------------------
-    # 5.5) Generate diffs for ZH-Lex and FedLex
-    # TODO: Uncomment if diffs are needed (slow performance dramatically and uses more JS)
-    # Dont forget to include version_comparison.js in build_zhlaw.py
-    # -------------------------------------------------------------------------
-    # if process_zh:
-    #     logger.info("Generating diffs for ZH-Lex")
-    #     zh_diff_path = os.path.join(STATIC_PATH, "col-zh/diff")
-    #     zh_diff_count = html_diff.main(
-    #         COLLECTION_DATA_ZH,
-    #         COLLECTION_PATH_ZH,
-    #         zh_diff_path,
-    #         law_origin="zh",
-    #         processing_mode=processing_mode,
-    #         max_workers=max_workers,
-    #     )
-    #     logger.info(f"Generated {zh_diff_count} diffs for ZH-Lex")
-
-    # if process_ch:
-    #     logger.info("Generating diffs for FedLex")
-    #     ch_diff_path = os.path.join(STATIC_PATH, "col-ch/diff")
-    #     ch_diff_count = html_diff.main(
-    #         COLLECTION_DATA_CH,
-    #         COLLECTION_PATH_CH,
-    #         ch_diff_path,
-    #         law_origin="ch",
-    #         processing_mode=processing_mode,
-    #         max_workers=max_workers,
-    #     )
-    #     logger.info(f"Generated {ch_diff_count} diffs for FedLex")
+        logger.info(f"Generated {ch_diff_count} diffs for FedLex")
 
     # -------------------------------------------------------------------------
     # 8) Copy server scripts for local development
@@ -595,17 +1013,21 @@ def main(
     # -------------------------------------------------------------------------
     # 9) Generate anchor maps for processed collections
     # -------------------------------------------------------------------------
+    # Maps are built from the anchor summaries collected while rendering;
+    # only pages without one (e.g. placeholders) are read from disk
+    anchor_index_entries = []
     if process_zh:
         logger.info("Generating anchor maps for ZH collection")
         # Load ZH collection data for anchor map generation
         with open(COLLECTION_DATA_ZH, "r", encoding="utf-8") as file:
             zh_collection_data = json.load(file)
-        generate_anchor_maps.generate_anchor_maps_for_collection(
+        anchor_index_entries += generate_anchor_maps.generate_anchor_maps_for_collection(
             STATIC_PATH,
             "col-zh",
             zh_collection_data,
             concurrent=(processing_mode == "concurrent"),
             max_workers=max_workers,
+            anchor_summaries=anchor_summaries_zh,
         )
         logger.info("Finished generating anchor maps for ZH collection")
 
@@ -614,39 +1036,60 @@ def main(
         # Load CH collection data for anchor map generation
         with open(COLLECTION_DATA_CH, "r", encoding="utf-8") as file:
             ch_collection_data = json.load(file)
-        generate_anchor_maps.generate_anchor_maps_for_collection(
+        anchor_index_entries += generate_anchor_maps.generate_anchor_maps_for_collection(
             STATIC_PATH,
             "col-ch",
             ch_collection_data,
             concurrent=(processing_mode == "concurrent"),
             max_workers=max_workers,
+            anchor_summaries=anchor_summaries_ch,
         )
         logger.info("Finished generating anchor maps for CH collection")
 
     # Generate anchor maps index for quick select
     logger.info("Generating anchor maps index")
-    generate_anchor_maps.generate_anchor_maps_index(STATIC_PATH)
+    generate_anchor_maps.generate_anchor_maps_index(STATIC_PATH, anchor_index_entries)
     logger.info("Finished generating anchor maps index")
 
     # -------------------------------------------------------------------------
-    # 10) Generate a sitemap (covering everything under public/)
+    # 10) Write the build manifest and generate sitemaps from it
     # -------------------------------------------------------------------------
+    logger.info("Writing build manifest")
+    collection_data = build_manifest.load_collection_data()
+    manifest = build_manifest.write_build_manifest(
+        STATIC_PATH, build_manifest.collect_page_records(STATIC_PATH, collection_data)
+    )
+
     logger.info("Generating sitemap")
     site_url = "https://zhlaw.ch"
     test_folders = ["all_test_files", "fedlex_test_files", "zhlex_test_files"]
     if folder_choice in test_folders:
         site_url = "https://test.zhlaw.ch"  # Use a different URL for test site
-    generator = SitemapGenerator(site_url, STATIC_PATH)
+    generator = SitemapGenerator(
+        site_url, STATIC_PATH, manifest=manifest, collection_data=collection_data
+    )
     generator.save_sitemap(f"{STATIC_PATH}sitemap.xml")
     logger.info("Finished generating sitemap")
 
     # -------------------------------------------------------------------------
     # 11) Build Pagefind search index (covering everything in public/)
+    # Only pages that changed since the last build are parsed again, see
+    # search_index
     # -------------------------------------------------------------------------
     logger.info("Building search index")
-    subprocess.run(["npx", "pagefind", "--site", STATIC_PATH])
+    search_index.main(STATIC_PATH, processing_mode=processing_mode, max_workers=max_workers)
     logger.info("Finished building search index")
 
+    # -------------------------------------------------------------------------
+    # 11.5) Precompress the remaining output (if requested)
+    # Pages already got their variants in the build workers, this covers
+    # assets, anchor maps, the search index and pages written elsewhere
+    # -------------------------------------------------------------------------
+    if precompress:
+        logger.info("Precompressing remaining output")
+        compress_tree(STATIC_PATH, processing_mode=processing_mode, max_workers=max_workers)
+        logger.info("Finished precompressing output")
+
     # -------------------------------------------------------------------------
     # 12) Start PHP development server
     # -------------------------------------------------------------------------
@@ -731,6 +1174,33 @@ if __name__ == "__main__":
         help="Disable minification for debugging (pretty-print HTML and CSS)"
     )
     
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Reuse unchanged pages from the build cache instead of re-rendering them "
+            "and only convert changed laws for the markdown dataset"
+        )
+    )
+    
+    parser.add_argument(
+        "--dataset-tar-zst",
+        action="store_true",
+        help="Also write the markdown dataset as a zstd-compressed tar file (requires zstandard)"
+    )
+    
+    parser.add_argument(
+        "--diffs",
+        action="store_true",
+        help="Generate diff pages between consecutive versions of each law"
+    )
+    
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="Write brotli (.br) and gzip (.gz) variants of HTML, JSON, CSS and JS output"
+    )
+    
     parser.add_argument(
         "--log-level",
         choices=["debug", "info", "warning", "error"],
@@ -765,4 +1235,15 @@ if __name__ == "__main__":
     logging.basicConfig(level=log_level_map[args.log_level])
 
     logger.info(f"Script arguments: {args}")
-    main(target_map[args.target], db_build, placeholders, args.mode, args.workers, minify_output)
+    main(
+        target_map[args.target],
+        db_build,
+        placeholders,
+        args.mode,
+        args.workers,
+        minify_output,
+        incremental=args.incremental,
+        dataset_tar_zst=args.dataset_tar_zst,
+        generate_diffs=args.diffs,
+        precompress=args.precompress,
+    )
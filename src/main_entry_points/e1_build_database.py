@@ -13,6 +13,10 @@ Options:
     --collections: Which collections to process (zh, ch, all - default: all)
     --mode: Processing mode (concurrent, sequential - default: concurrent)
     --workers: Number of worker processes (default: auto-detect)
+    --incremental: Only apply new, changed and removed markdown files to an
+        existing database instead of rebuilding it
+    --full-text-index: Create FTS5 full-text tables for searching provisions
+        and law versions
 
 Examples:
     # Build database from all collections
@@ -24,6 +28,12 @@ Examples:
     # Build only ZH collection with sequential processing
     python -m src.main_entry_points.e1_build_database --collections zh --mode sequential
 
+    # Update an existing database with the files that changed since the last run
+    python -m src.main_entry_points.e1_build_database --incremental
+
+    # Build with a full-text index for provision search
+    python -m src.main_entry_points.e1_build_database --full-text-index
+
 License:
     https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
 """
@@ -55,6 +65,8 @@ Examples:
   %(prog)s --input-dir public_test/
   %(prog)s --target zh --mode sequential  
   %(prog)s --output-file custom_laws.db
+  %(prog)s --incremental
+  %(prog)s --full-text-index
         """
     )
     
@@ -94,6 +106,18 @@ Examples:
         help="Logging level (default: info)"
     )
     
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Update the existing database with changed files only instead of rebuilding it"
+    )
+    
+    parser.add_argument(
+        "--full-text-index",
+        action="store_true",
+        help="Create FTS5 full-text tables over provision and version texts"
+    )
+    
     return parser.parse_args()
 
 
@@ -143,7 +167,9 @@ def validate_arguments(args):
         'output_file': output_path,
         'collections': collections,
         'processing_mode': args.mode,
-        'max_workers': None  # Auto-detect worker count
+        'max_workers': None,  # Auto-detect worker count
+        'incremental': args.incremental,
+        'full_text_index': args.full_text_index
     }
 
 
@@ -165,6 +191,8 @@ def main():
         logger.info(f"Collections: {validated_args['collections']}")
         logger.info(f"Processing mode: {validated_args['processing_mode']}")
         logger.info(f"Max workers: {validated_args['max_workers'] or 'auto-detect'}")
+        logger.info(f"Incremental: {validated_args['incremental']}")
+        logger.info(f"Full-text index: {validated_args['full_text_index']}")
         
         # Build database
         success = build_database(
@@ -172,7 +200,9 @@ def main():
             output_file=validated_args['output_file'],
             collections=validated_args['collections'],
             processing_mode=validated_args['processing_mode'],
-            max_workers=validated_args['max_workers']
+            max_workers=validated_args['max_workers'],
+            incremental=validated_args['incremental'],
+            full_text_index=validated_args['full_text_index']
         )
         
         if success:
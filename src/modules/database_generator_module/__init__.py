@@ -8,6 +8,7 @@ Modules:
     database_schema: SQL DDL definitions and schema management
     markdown_parser: Parse markdown files and extract structured data
     database_builder: Main database creation and population logic
+    database_search: Full-text search over the provisions and versions
     date_utils: Date conversion utilities for legal data formats
 
 License:
@@ -3,30 +3,64 @@
 This module orchestrates the database creation process by scanning markdown files,
 parsing them, and populating the SQLite database with laws, versions, and provisions.
 
+By default the database is bulk loaded: tables are created without indexes,
+rows are inserted with executemany in large transactions, and indexes and
+query planner statistics are created once all collections are loaded.
+
+In incremental mode an existing database is updated in place instead: the
+source_files table records the content hash of the markdown file each version
+was loaded from, and only new, changed and removed files are applied, all in
+a single transaction.
+
+Provision texts and the segments making up the full text of a version are
+stored once in content-addressed tables (provision_texts, text_segments) and
+shared by all versions containing them, since most of them don't change from
+one nachtragsnummer to the next. The provisions_with_text and version_texts
+views join them back together.
+
+Optionally FTS5 full-text tables over the provision and version texts are
+created (see database_search for querying them).
+
 Functions:
-    build_database(input_dir, output_file, collections, mode, max_workers): Main entry point
+    build_database(input_dir, output_file, collections, mode, max_workers, bulk_load, queue_depth, incremental, full_text_index): Main entry point
+    update_database(md_files_dir, output_file, collections, mode, max_workers, full_text_index): Incremental update
     process_collection(collection_path, collection_name, conn): Process a single collection
     insert_law_data(conn, law_data): Insert or update law record
     insert_version_data(conn, version_data): Insert version record
-    insert_provisions_data(conn, provisions, col_ordnungsnummer_nachtragsnummer): Insert provisions
+    insert_provisions_data(conn, provisions, col_ordnungsnummer_nachtragsnummer, version_link): Insert provisions
+    insert_version_segments(conn, full_text, col_ordnungsnummer_nachtragsnummer, version_link): Insert full text segments
 
 License:
     https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
 """
 
 import sqlite3
+import hashlib
 import os
+import time
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 import concurrent.futures
+import itertools
 # from tqdm import tqdm  # Replaced with progress_utils
-from src.utils.progress_utils import progress_manager, track_concurrent_futures
+from src.utils.progress_utils import progress_manager
 
-from .database_schema import create_database_schema, drop_all_tables, get_table_info
+from .database_schema import (
+    apply_bulk_load_pragmas,
+    create_database_schema,
+    create_full_text_index,
+    finalize_bulk_load,
+    get_table_info,
+    has_full_text_index,
+    is_schema_current,
+    VERSION_LINK_PLACEHOLDER,
+)
 from .markdown_parser import (
     parse_markdown_file, 
+    load_frontmatter_manifest,
     extract_law_data, 
     extract_version_data,
+    split_text_segments,
     MarkdownParseError
 )
 
@@ -34,6 +68,58 @@ from src.utils.logging_utils import get_module_logger
 
 logger = get_module_logger(__name__)
 
+# Number of files inserted per transaction when bulk loading
+BULK_BATCH_SIZE = 500
+
+# Number of files parsed ahead of the database writer in concurrent mode
+DEFAULT_QUEUE_DEPTH = 256
+
+INSERT_LAW_SQL = """
+    INSERT OR REPLACE INTO laws (
+        collection, ordnungsnummer, col_ordnungsnummer, erlasstitel, abkuerzung,
+        kurztitel, category_folder_id, category_folder_name, category_section_id,
+        category_section_name, category_subsection_id, category_subsection_name,
+        dynamic_source, zhlaw_url_dynamic
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_VERSION_SQL = """
+    INSERT OR REPLACE INTO versions (
+        collection, col_ordnungsnummer, nachtragsnummer, col_ordnungsnummer_nachtragsnummer,
+        numeric_nachtragsnummer, erlassdatum, in_force, inkraftsetzungsdatum,
+        aufhebungsdatum, law_page_url, law_text_redirect, law_text_url,
+        publikationsdatum
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_PROVISION_TEXT_SQL = """
+    INSERT OR IGNORE INTO provision_texts (text_hash, provision_markdown) VALUES (?, ?)
+"""
+
+INSERT_PROVISION_SQL = """
+    INSERT INTO provisions (
+        col_ordnungsnummer_nachtragsnummer, text_id, provision_sequence,
+        provision_number, provision_hyperlink_static, provision_hyperlink_dynamic
+    ) VALUES (?, (SELECT text_id FROM provision_texts WHERE text_hash = ?), ?, ?, ?, ?)
+"""
+
+INSERT_SEGMENT_SQL = """
+    INSERT OR IGNORE INTO text_segments (segment_hash, segment_markdown) VALUES (?, ?)
+"""
+
+INSERT_VERSION_SEGMENT_SQL = """
+    INSERT INTO version_segments (
+        col_ordnungsnummer_nachtragsnummer, segment_sequence, segment_id
+    ) VALUES (?, ?, (SELECT segment_id FROM text_segments WHERE segment_hash = ?))
+"""
+
+
+INSERT_SOURCE_FILE_SQL = """
+    INSERT OR REPLACE INTO source_files (
+        col_ordnungsnummer_nachtragsnummer, collection, file_name, content_hash
+    ) VALUES (?, ?, ?, ?)
+"""
+
 
 class DatabaseBuildError(Exception):
     """Custom exception for database build errors."""
@@ -45,7 +131,11 @@ def build_database(
     output_file: Path,
     collections: List[str] = None,
     processing_mode: str = "concurrent",
-    max_workers: Optional[int] = None
+    max_workers: Optional[int] = None,
+    bulk_load: bool = True,
+    queue_depth: int = DEFAULT_QUEUE_DEPTH,
+    incremental: bool = False,
+    full_text_index: bool = False
 ) -> bool:
     """Build the complete legal database from markdown files.
     
@@ -55,6 +145,15 @@ def build_database(
         collections: List of collections to process (e.g., ["zh", "ch"])
         processing_mode: "concurrent" or "sequential"
         max_workers: Number of worker processes for concurrent mode
+        bulk_load: Load with deferred indexes and batched inserts instead of
+            one transaction per file
+        queue_depth: Maximum number of parsed files held in memory at once
+            in concurrent mode
+        incremental: Update an existing database with the new, changed and
+            removed markdown files only (see update_database). Falls back to
+            a full build if output_file does not exist yet.
+        full_text_index: Create FTS5 full-text tables over the provision
+            and version texts
         
     Returns:
         True if database was built successfully, False otherwise
@@ -86,6 +185,14 @@ def build_database(
         
         logger.info(f"Processing collections: {collections}")
         
+        if incremental:
+            if output_file.exists() and _has_current_schema(output_file):
+                return update_database(
+                    md_files_dir, output_file, collections, processing_mode, max_workers,
+                    full_text_index
+                )
+            logger.info(f"No up-to-date database at {output_file}, running a full build")
+        
         # Remove existing database file
         if output_file.exists():
             output_file.unlink()
@@ -95,11 +202,15 @@ def build_database(
         conn = sqlite3.connect(str(output_file))
         
         try:
-            # Create database schema
-            if not create_database_schema(conn):
+            if bulk_load:
+                apply_bulk_load_pragmas(conn)
+            
+            # Create database schema, indexes are deferred when bulk loading
+            if not create_database_schema(conn, create_indexes=not bulk_load):
                 raise DatabaseBuildError("Failed to create database schema")
             
             # Process each collection
+            start_time = time.perf_counter()
             total_files = 0
             for collection in collections:
                 collection_path = md_files_dir / collection
@@ -112,17 +223,33 @@ def build_database(
                     collection, 
                     conn,
                     processing_mode,
-                    max_workers
+                    max_workers,
+                    bulk_load,
+                    queue_depth
                 )
                 total_files += files_processed
             
+            if full_text_index and not create_full_text_index(conn):
+                raise DatabaseBuildError("Failed to create full-text index")
+            if bulk_load and not finalize_bulk_load(conn):
+                raise DatabaseBuildError("Failed to create indexes after bulk load")
+            elapsed = time.perf_counter() - start_time
+            
             # Get final database statistics
             table_info = get_table_info(conn)
+            total_rows = sum(table_info.values())
             logger.info(f"Database build complete:")
             logger.info(f"  - Processed {total_files} markdown files")
             logger.info(f"  - Laws: {table_info.get('laws', 0)}")
             logger.info(f"  - Versions: {table_info.get('versions', 0)}")
             logger.info(f"  - Provisions: {table_info.get('provisions', 0)}")
+            logger.info(f"  - Distinct provision texts: {table_info.get('provision_texts', 0)}")
+            logger.info(f"  - Distinct text segments: {table_info.get('text_segments', 0)}")
+            logger.info(
+                f"  - Loaded {total_rows} rows in {elapsed:.1f}s "
+                f"({total_rows / elapsed if elapsed else 0:,.0f} rows/s, "
+                f"{'bulk load' if bulk_load else 'per-file transactions'})"
+            )
             
             return True
             
@@ -134,12 +261,225 @@ def build_database(
         return False
 
 
+def update_database(
+    md_files_dir: Path,
+    output_file: Path,
+    collections: List[str],
+    processing_mode: str = "concurrent",
+    max_workers: Optional[int] = None,
+    full_text_index: bool = False
+) -> bool:
+    """Update an existing database with the markdown files that changed.
+    
+    The content hash of every markdown file is compared with the hash stored
+    in the source_files table. New and changed files are re-parsed and their
+    versions replaced, versions whose files disappeared are deleted along with
+    laws that have no versions left. All changes are applied in a single
+    transaction, so a failed update leaves the database untouched. An existing
+    full-text index is kept in sync by its triggers.
+    
+    Args:
+        md_files_dir: Directory containing the collection subdirectories
+        output_file: Path to the existing SQLite database file
+        collections: Collections to update, others are left as they are
+        processing_mode: "concurrent" or "sequential"
+        max_workers: Number of worker processes for concurrent mode
+        full_text_index: Create the full-text index if the database has none
+        
+    Returns:
+        True if the database was updated successfully, False otherwise
+    """
+    logger.info(f"Updating existing database {output_file} incrementally")
+    conn = sqlite3.connect(str(output_file))
+    
+    try:
+        # Adds the source_files table to databases built before it existed.
+        # All their files then count as new and are replaced once.
+        if not create_database_schema(conn):
+            raise DatabaseBuildError("Failed to create database schema")
+        
+        start_time = time.perf_counter()
+        updated_count = 0
+        removed_count = 0
+        unchanged_count = 0
+        
+        try:
+            for collection in collections:
+                collection_path = md_files_dir / collection
+                if not collection_path.exists():
+                    logger.warning(f"Collection directory not found: {collection_path}")
+                    continue
+                
+                changed_files, removed_keys, unchanged = _diff_collection(
+                    collection_path, collection, conn
+                )
+                unchanged_count += unchanged
+                logger.info(
+                    f"{collection}: {len(changed_files)} new or changed, "
+                    f"{len(removed_keys)} removed, {unchanged} unchanged files"
+                )
+                
+                for col_ordnungsnummer_nachtragsnummer in removed_keys:
+                    _delete_version_rows(conn, col_ordnungsnummer_nachtragsnummer)
+                removed_count += len(removed_keys)
+                
+                parsed_files = _parse_files(
+                    list(changed_files), collection, processing_mode, max_workers,
+                    load_frontmatter_manifest(collection_path) if changed_files else {}
+                )
+                for md_file, parsed_data in parsed_files:
+                    if not parsed_data:
+                        # Keep the previous rows, the file is retried next run
+                        continue
+                    old_key = changed_files[md_file]
+                    if old_key:
+                        _delete_version_rows(conn, old_key)
+                    new_key = extract_version_data(
+                        parsed_data, collection
+                    )['col_ordnungsnummer_nachtragsnummer']
+                    _delete_version_rows(conn, new_key)
+                    _insert_file_rows(parsed_data, conn)
+                    updated_count += 1
+            
+            # Laws whose last version was removed or moved to another law,
+            # and texts no longer used by any version
+            conn.execute(
+                "DELETE FROM laws WHERE col_ordnungsnummer NOT IN "
+                "(SELECT col_ordnungsnummer FROM versions)"
+            )
+            conn.execute(
+                "DELETE FROM provision_texts WHERE text_id NOT IN "
+                "(SELECT text_id FROM provisions)"
+            )
+            conn.execute(
+                "DELETE FROM text_segments WHERE segment_id NOT IN "
+                "(SELECT segment_id FROM version_segments)"
+            )
+            conn.commit()
+            
+        except Exception:
+            conn.rollback()
+            raise
+        
+        if full_text_index and not has_full_text_index(conn):
+            if not create_full_text_index(conn):
+                raise DatabaseBuildError("Failed to create full-text index")
+        
+        elapsed = time.perf_counter() - start_time
+        table_info = get_table_info(conn)
+        logger.info(f"Database update complete in {elapsed:.1f}s:")
+        logger.info(f"  - Updated {updated_count} markdown files")
+        logger.info(f"  - Removed {removed_count} versions")
+        logger.info(f"  - Skipped {unchanged_count} unchanged files")
+        logger.info(f"  - Laws: {table_info.get('laws', 0)}")
+        logger.info(f"  - Versions: {table_info.get('versions', 0)}")
+        logger.info(f"  - Provisions: {table_info.get('provisions', 0)}")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error updating database: {e}")
+        return False
+        
+    finally:
+        conn.close()
+
+
+def _has_current_schema(db_file: Path) -> bool:
+    conn = sqlite3.connect(str(db_file))
+    try:
+        return is_schema_current(conn)
+    finally:
+        conn.close()
+
+
+def _diff_collection(
+    collection_path: Path,
+    collection_name: str,
+    conn: sqlite3.Connection
+) -> tuple:
+    """Compare the markdown files of a collection with the source_files table.
+    
+    Args:
+        collection_path: Path to collection directory (e.g., md-files/zh/)
+        collection_name: Name of collection (e.g., "zh")
+        conn: Database connection
+        
+    Returns:
+        Tuple of (changed_files, removed_keys, unchanged_count). changed_files
+        maps new and changed files to the col_ordnungsnummer_nachtragsnummer
+        they were last loaded as (None for new files), removed_keys lists the
+        versions whose files no longer exist.
+    """
+    stored = {
+        file_name: (col_ordnungsnummer_nachtragsnummer, content_hash)
+        for col_ordnungsnummer_nachtragsnummer, file_name, content_hash in conn.execute(
+            "SELECT col_ordnungsnummer_nachtragsnummer, file_name, content_hash "
+            "FROM source_files WHERE collection = ?",
+            (collection_name,)
+        )
+    }
+    
+    changed_files = {}
+    unchanged_count = 0
+    current_names = set()
+    for md_file in sorted(collection_path.glob("*.md")):
+        current_names.add(md_file.name)
+        old_key, old_hash = stored.get(md_file.name, (None, None))
+        if old_hash == hash_file(md_file):
+            unchanged_count += 1
+        else:
+            changed_files[md_file] = old_key
+    
+    removed_keys = [
+        col_ordnungsnummer_nachtragsnummer
+        for file_name, (col_ordnungsnummer_nachtragsnummer, _) in stored.items()
+        if file_name not in current_names
+    ]
+    return changed_files, removed_keys, unchanged_count
+
+
+def _parse_files(
+    md_files: List[Path],
+    collection_name: str,
+    processing_mode: str = "concurrent",
+    max_workers: Optional[int] = None,
+    frontmatter_manifest: Optional[Dict[str, Dict[str, Any]]] = None
+):
+    """Parse files and yield (md_file, parsed_data) pairs in input order.
+    
+    parsed_data is None for files that could not be parsed.
+    """
+    frontmatter_entries = [(frontmatter_manifest or {}).get(md_file.name) for md_file in md_files]
+    if processing_mode == "concurrent" and len(md_files) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            yield from zip(
+                md_files,
+                executor.map(
+                    _parse_file_worker, md_files, itertools.repeat(collection_name), frontmatter_entries
+                )
+            )
+    else:
+        for md_file, frontmatter_entry in zip(md_files, frontmatter_entries):
+            yield md_file, _parse_file_worker(md_file, collection_name, frontmatter_entry)
+
+
+def _delete_version_rows(conn: sqlite3.Connection, col_ordnungsnummer_nachtragsnummer: str) -> None:
+    """Delete a version with its provisions, segments and source file record."""
+    for table in ("provisions", "version_segments", "versions", "source_files"):
+        conn.execute(
+            f"DELETE FROM {table} WHERE col_ordnungsnummer_nachtragsnummer = ?",
+            (col_ordnungsnummer_nachtragsnummer,)
+        )
+
+
 def process_collection(
     collection_path: Path,
     collection_name: str,
     conn: sqlite3.Connection,
     processing_mode: str = "concurrent",
-    max_workers: Optional[int] = None
+    max_workers: Optional[int] = None,
+    bulk_load: bool = False,
+    queue_depth: int = DEFAULT_QUEUE_DEPTH
 ) -> int:
     """Process all markdown files in a collection directory.
     
@@ -149,6 +489,8 @@ def process_collection(
         conn: Database connection
         processing_mode: "concurrent" or "sequential"
         max_workers: Number of worker processes
+        bulk_load: Insert files in batches (see _bulk_insert_parsed_data)
+        queue_depth: Maximum number of files parsed ahead of the database writer
         
     Returns:
         Number of files processed successfully
@@ -164,11 +506,19 @@ def process_collection(
         
         logger.info(f"Found {len(md_files)} markdown files in {collection_name}")
         
+        # Metadata written by build_markdown, saves parsing the YAML frontmatter
+        frontmatter_manifest = load_frontmatter_manifest(collection_path)
+        
         # Process files
         if processing_mode == "concurrent" and len(md_files) > 1:
-            return _process_files_concurrent(md_files, collection_name, conn, max_workers)
+            return _process_files_concurrent(
+                md_files, collection_name, conn, max_workers, bulk_load, queue_depth,
+                frontmatter_manifest
+            )
         else:
-            return _process_files_sequential(md_files, collection_name, conn)
+            return _process_files_sequential(
+                md_files, collection_name, conn, bulk_load, frontmatter_manifest
+            )
             
     except Exception as e:
         logger.error(f"Error processing collection {collection_name}: {e}")
@@ -178,7 +528,9 @@ def process_collection(
 def _process_files_sequential(
     md_files: List[Path],
     collection_name: str,
-    conn: sqlite3.Connection
+    conn: sqlite3.Connection,
+    bulk_load: bool = False,
+    frontmatter_manifest: Optional[Dict[str, Dict[str, Any]]] = None
 ) -> int:
     """Process files sequentially.
     
@@ -186,11 +538,14 @@ def _process_files_sequential(
         md_files: List of markdown file paths
         collection_name: Collection identifier
         conn: Database connection
+        bulk_load: Insert files in batches instead of one transaction per file
+        frontmatter_manifest: Frontmatter manifest entries by file name
         
     Returns:
         Number of files processed successfully
     """
     successful_count = 0
+    batch = []
     
     with progress_manager() as pm:
         counter = pm.create_counter(
@@ -200,13 +555,24 @@ def _process_files_sequential(
         )
         
         for md_file in md_files:
+            frontmatter_entry = (frontmatter_manifest or {}).get(md_file.name)
             try:
-                if _process_single_file(md_file, collection_name, conn):
+                if bulk_load:
+                    parsed_data = _parse_file_worker(md_file, collection_name, frontmatter_entry)
+                    if parsed_data:
+                        batch.append(parsed_data)
+                    if len(batch) >= BULK_BATCH_SIZE:
+                        successful_count += _bulk_insert_parsed_data(batch, conn)
+                        batch = []
+                elif _process_single_file(md_file, collection_name, conn, frontmatter_entry):
                     successful_count += 1
             except Exception as e:
                 logger.error(f"Error processing file {md_file}: {e}")
             finally:
                 counter.update()
+        
+        if batch:
+            successful_count += _bulk_insert_parsed_data(batch, conn)
     
     logger.info(f"Sequential processing complete: {successful_count}/{len(md_files)} files")
     return successful_count
@@ -216,107 +582,168 @@ def _process_files_concurrent(
     md_files: List[Path],
     collection_name: str,
     conn: sqlite3.Connection,
-    max_workers: Optional[int] = None
+    max_workers: Optional[int] = None,
+    bulk_load: bool = False,
+    queue_depth: int = DEFAULT_QUEUE_DEPTH,
+    frontmatter_manifest: Optional[Dict[str, Dict[str, Any]]] = None
 ) -> int:
     """Process files concurrently.
     
+    Worker processes parse the files while this process inserts the parsed
+    results as they arrive (SQLite doesn't handle concurrent writes well, so
+    there is a single writer). At most queue_depth files are parsed ahead of
+    the writer, which bounds memory use independently of the collection size.
+    
     Args:
         md_files: List of markdown file paths
         collection_name: Collection identifier
         conn: Database connection
         max_workers: Number of worker processes
+        bulk_load: Insert files in batches instead of one transaction per file
+        queue_depth: Maximum number of files being parsed or waiting to be inserted
+        frontmatter_manifest: Frontmatter manifest entries by file name. Only
+            the entry of each file is sent to the worker parsing it.
         
     Returns:
         Number of files processed successfully
     """
     successful_count = 0
     effective_max_workers = max_workers or os.cpu_count()
+    # Keep every worker busy while the writer inserts a batch
+    queue_depth = max(queue_depth, 2 * effective_max_workers)
+    # Half the queue may wait for insertion, the other half keeps being parsed
+    batch_size = min(BULK_BATCH_SIZE, queue_depth // 2) if bulk_load else 1
     
-    logger.info(f"Processing {len(md_files)} files concurrently (max_workers={effective_max_workers})")
+    logger.info(
+        f"Processing {len(md_files)} files concurrently "
+        f"(max_workers={effective_max_workers}, queue_depth={queue_depth})"
+    )
     
-    # Parse files concurrently
-    parsed_data_list = []
-    with concurrent.futures.ProcessPoolExecutor(max_workers=effective_max_workers) as executor:
-        # Submit parsing tasks
-        future_to_file = {
-            executor.submit(_parse_file_worker, md_file, collection_name): md_file
-            for md_file in md_files
-        }
-        
-        # Convert to list of futures for tracking
-        futures = list(future_to_file.keys())
-        
-        # Collect results
-        for future in track_concurrent_futures(
-            futures,
-            desc=f"Parsing {len(md_files)} {collection_name} files",
-            unit="files"
-        ):
-            md_file = future_to_file[future]
-            try:
-                result = future.result()
-                if result:
-                    parsed_data_list.append(result)
-            except Exception as e:
-                logger.error(f"Error parsing file {md_file}: {e}")
-                continue
+    remaining_files = iter(md_files)
+    pending = {}  # future -> md_file
+    batch = []
     
-    # Insert parsed data into database sequentially (SQLite doesn't handle concurrent writes well)
-    logger.info(f"Inserting {len(parsed_data_list)} parsed files into database")
-    with progress_manager() as pm:
+    with concurrent.futures.ProcessPoolExecutor(max_workers=effective_max_workers) as executor, \
+            progress_manager() as pm:
         counter = pm.create_counter(
-            total=len(parsed_data_list),
-            desc=f"Inserting {len(parsed_data_list)} {collection_name} records",
-            unit="records"
+            total=len(md_files),
+            desc=f"Processing {len(md_files)} {collection_name} files",
+            unit="files"
         )
         
-        for parsed_data in parsed_data_list:
-            try:
-                if _insert_parsed_data(parsed_data, conn):
-                    successful_count += 1
-            except Exception as e:
-                logger.error(f"Error inserting data: {e}")
-            finally:
-                counter.update()
+        def fill_queue():
+            for md_file in itertools.islice(remaining_files, queue_depth - len(pending) - len(batch)):
+                frontmatter_entry = (frontmatter_manifest or {}).get(md_file.name)
+                pending[executor.submit(
+                    _parse_file_worker, md_file, collection_name, frontmatter_entry
+                )] = md_file
+        
+        fill_queue()
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                md_file = pending.pop(future)
+                try:
+                    result = future.result()
+                    if result:
+                        batch.append(result)
+                except Exception as e:
+                    logger.error(f"Error parsing file {md_file}: {e}")
+                finally:
+                    counter.update()
+            
+            # Hand out new files before inserting, so parsing continues meanwhile
+            fill_queue()
+            if len(batch) >= batch_size:
+                successful_count += _insert_batch(batch, conn, bulk_load)
+                batch = []
+        
+        if batch:
+            successful_count += _insert_batch(batch, conn, bulk_load)
     
     logger.info(f"Concurrent processing complete: {successful_count}/{len(md_files)} files")
     return successful_count
 
 
-def _parse_file_worker(file_path: Path, collection_name: str) -> Optional[Dict[str, Any]]:
+def _insert_batch(parsed_data_list: List[Dict[str, Any]], conn: sqlite3.Connection, bulk_load: bool) -> int:
+    """Insert parsed files in one transaction (bulk load) or one per file.
+    
+    Args:
+        parsed_data_list: Parsed markdown data of the files
+        conn: Database connection
+        bulk_load: Whether to insert the files in one transaction
+        
+    Returns:
+        Number of files inserted successfully
+    """
+    if bulk_load:
+        return _bulk_insert_parsed_data(parsed_data_list, conn)
+    
+    successful_count = 0
+    for parsed_data in parsed_data_list:
+        try:
+            if _insert_parsed_data(parsed_data, conn):
+                successful_count += 1
+        except Exception as e:
+            logger.error(f"Error inserting data: {e}")
+    return successful_count
+
+
+def hash_file(file_path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _parse_file_worker(
+    file_path: Path,
+    collection_name: str,
+    frontmatter_entry: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
     """Worker function for parsing files in concurrent mode.
     
     Args:
         file_path: Path to markdown file
         collection_name: Collection identifier
+        frontmatter_entry: Entry of the file in the frontmatter manifest
         
     Returns:
         Parsed data dictionary or None if parsing failed
     """
     try:
-        parsed_data = parse_markdown_file(file_path)
+        parsed_data = parse_markdown_file(file_path, frontmatter_entry)
         parsed_data['collection_name'] = collection_name
+        parsed_data['content_hash'] = hash_file(file_path)
         return parsed_data
     except Exception as e:
         logger.error(f"Worker error parsing {file_path}: {e}")
         return None
 
 
-def _process_single_file(file_path: Path, collection_name: str, conn: sqlite3.Connection) -> bool:
+def _process_single_file(
+    file_path: Path,
+    collection_name: str,
+    conn: sqlite3.Connection,
+    frontmatter_entry: Optional[Dict[str, Any]] = None
+) -> bool:
     """Process a single markdown file and insert data into database.
     
     Args:
         file_path: Path to markdown file
         collection_name: Collection identifier
         conn: Database connection
+        frontmatter_entry: Entry of the file in the frontmatter manifest
         
     Returns:
         True if processing was successful, False otherwise
     """
     try:
         # Parse the file
-        parsed_data = parse_markdown_file(file_path)
+        parsed_data = parse_markdown_file(file_path, frontmatter_entry)
         parsed_data['collection_name'] = collection_name
+        parsed_data['content_hash'] = hash_file(file_path)
         
         # Insert into database
         return _insert_parsed_data(parsed_data, conn)
@@ -340,21 +767,7 @@ def _insert_parsed_data(parsed_data: Dict[str, Any], conn: sqlite3.Connection) -
         True if insertion was successful, False otherwise
     """
     try:
-        collection_name = parsed_data['collection_name']
-        
-        # Extract and insert law data
-        law_data = extract_law_data(parsed_data, collection_name)
-        insert_law_data(conn, law_data)
-        
-        # Extract and insert version data
-        version_data = extract_version_data(parsed_data, collection_name)
-        insert_version_data(conn, version_data)
-        
-        # Insert provisions data
-        provisions = parsed_data.get('provisions', [])
-        col_ordnungsnummer_nachtragsnummer = version_data['col_ordnungsnummer_nachtragsnummer']
-        insert_provisions_data(conn, provisions, col_ordnungsnummer_nachtragsnummer)
-        
+        _insert_file_rows(parsed_data, conn)
         conn.commit()
         return True
         
@@ -368,24 +781,113 @@ def _insert_parsed_data(parsed_data: Dict[str, Any], conn: sqlite3.Connection) -
         return False
 
 
-def insert_law_data(conn: sqlite3.Connection, law_data: Dict[str, Any]) -> None:
-    """Insert or update law data in the laws table.
+def _insert_file_rows(parsed_data: Dict[str, Any], conn: sqlite3.Connection) -> str:
+    """Insert the rows of one parsed file without committing.
     
     Args:
+        parsed_data: Parsed markdown data
         conn: Database connection
-        law_data: Law data dictionary
+        
+    Returns:
+        The col_ordnungsnummer_nachtragsnummer of the inserted version
     """
-    # Use INSERT OR REPLACE to handle duplicates
-    sql = """
-        INSERT OR REPLACE INTO laws (
-            collection, ordnungsnummer, col_ordnungsnummer, erlasstitel, abkuerzung,
-            kurztitel, category_folder_id, category_folder_name, category_section_id,
-            category_section_name, category_subsection_id, category_subsection_name,
-            dynamic_source, zhlaw_url_dynamic
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    collection_name = parsed_data['collection_name']
+    
+    # Extract and insert law data
+    law_data = extract_law_data(parsed_data, collection_name)
+    insert_law_data(conn, law_data)
+    
+    # Extract and insert version data
+    version_data = extract_version_data(parsed_data, collection_name)
+    insert_version_data(conn, version_data)
+    
+    # Insert provisions and full text segments
+    provisions = parsed_data.get('provisions', [])
+    col_ordnungsnummer_nachtragsnummer = version_data['col_ordnungsnummer_nachtragsnummer']
+    version_link = _version_link(law_data, version_data)
+    insert_provisions_data(conn, provisions, col_ordnungsnummer_nachtragsnummer, version_link)
+    insert_version_segments(
+        conn, parsed_data.get('full_text', ''), col_ordnungsnummer_nachtragsnummer, version_link
+    )
+    
+    # Record the source file for incremental updates
+    conn.execute(
+        INSERT_SOURCE_FILE_SQL,
+        _source_file_params(parsed_data, col_ordnungsnummer_nachtragsnummer)
+    )
+    return col_ordnungsnummer_nachtragsnummer
+
+
+def _bulk_insert_parsed_data(parsed_data_list: List[Dict[str, Any]], conn: sqlite3.Connection) -> int:
+    """Insert a batch of parsed files in a single transaction.
+    
+    Rows are inserted with one executemany per table. Since every table has
+    its own row ids, this yields the same rows and ids as inserting the files
+    one by one in the same order. If the batch fails in the database, it is
+    rolled back and inserted file by file, so a bad file only loses itself.
+    
+    Args:
+        parsed_data_list: Parsed markdown data of the files
+        conn: Database connection
+        
+    Returns:
+        Number of files inserted successfully
     """
+    law_rows = []
+    version_rows = []
+    provision_text_rows = {}
+    provision_rows = []
+    segment_rows = {}
+    version_segment_rows = []
+    source_file_rows = []
     
-    params = (
+    for parsed_data in parsed_data_list:
+        try:
+            collection_name = parsed_data['collection_name']
+            law_data = extract_law_data(parsed_data, collection_name)
+            law_row = _law_params(law_data)
+            version_data = extract_version_data(parsed_data, collection_name)
+            version_row = _version_params(version_data)
+            col_ordnungsnummer_nachtragsnummer = version_data['col_ordnungsnummer_nachtragsnummer']
+            version_link = _version_link(law_data, version_data)
+            file_provision_texts, file_provision_rows = _provision_rows(
+                parsed_data.get('provisions', []), col_ordnungsnummer_nachtragsnummer, version_link
+            )
+            file_segments, file_version_segment_rows = _segment_rows(
+                parsed_data.get('full_text', ''), col_ordnungsnummer_nachtragsnummer, version_link
+            )
+            source_file_row = _source_file_params(parsed_data, col_ordnungsnummer_nachtragsnummer)
+        except Exception as e:
+            logger.error(f"Unexpected error inserting data: {e}")
+            continue
+        
+        law_rows.append(law_row)
+        version_rows.append(version_row)
+        provision_text_rows.update(file_provision_texts)
+        provision_rows.extend(file_provision_rows)
+        segment_rows.update(file_segments)
+        version_segment_rows.extend(file_version_segment_rows)
+        source_file_rows.append(source_file_row)
+    
+    try:
+        conn.executemany(INSERT_LAW_SQL, law_rows)
+        conn.executemany(INSERT_VERSION_SQL, version_rows)
+        conn.executemany(INSERT_PROVISION_TEXT_SQL, provision_text_rows.items())
+        conn.executemany(INSERT_PROVISION_SQL, provision_rows)
+        conn.executemany(INSERT_SEGMENT_SQL, segment_rows.items())
+        conn.executemany(INSERT_VERSION_SEGMENT_SQL, version_segment_rows)
+        conn.executemany(INSERT_SOURCE_FILE_SQL, source_file_rows)
+        conn.commit()
+        return len(law_rows)
+        
+    except sqlite3.Error as e:
+        logger.warning(f"Database error in bulk insert, inserting files one by one: {e}")
+        conn.rollback()
+        return sum(1 for parsed_data in parsed_data_list if _insert_parsed_data(parsed_data, conn))
+
+
+def _law_params(law_data: Dict[str, Any]) -> tuple:
+    return (
         law_data['collection'],
         law_data['ordnungsnummer'],
         law_data['col_ordnungsnummer'],
@@ -401,27 +903,10 @@ def insert_law_data(conn: sqlite3.Connection, law_data: Dict[str, Any]) -> None:
         law_data['dynamic_source'],
         law_data['zhlaw_url_dynamic']
     )
-    
-    conn.execute(sql, params)
 
 
-def insert_version_data(conn: sqlite3.Connection, version_data: Dict[str, Any]) -> None:
-    """Insert version data in the versions table.
-    
-    Args:
-        conn: Database connection
-        version_data: Version data dictionary
-    """
-    sql = """
-        INSERT OR REPLACE INTO versions (
-            collection, col_ordnungsnummer, nachtragsnummer, col_ordnungsnummer_nachtragsnummer,
-            numeric_nachtragsnummer, erlassdatum, in_force, inkraftsetzungsdatum,
-            aufhebungsdatum, law_page_url, law_text_redirect, law_text_url,
-            publikationsdatum, full_version_text_markdown
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """
-    
-    params = (
+def _version_params(version_data: Dict[str, Any]) -> tuple:
+    return (
         version_data['collection'],
         version_data['col_ordnungsnummer'],
         version_data['nachtragsnummer'],
@@ -434,43 +919,131 @@ def insert_version_data(conn: sqlite3.Connection, version_data: Dict[str, Any])
         version_data['law_page_url'],
         version_data['law_text_redirect'],
         version_data['law_text_url'],
-        version_data['publikationsdatum'],
-        version_data['full_version_text_markdown']
+        version_data['publikationsdatum']
     )
+
+
+def _version_link(law_data: Dict[str, Any], version_data: Dict[str, Any]) -> Optional[str]:
+    """Return the part of links pointing to the version itself that is
+    replaced with VERSION_LINK_PLACEHOLDER, or None if it is unknown."""
+    if not law_data['ordnungsnummer'] or not version_data['nachtragsnummer']:
+        return None
+    return f"/{law_data['ordnungsnummer']}-{version_data['nachtragsnummer']}.html"
+
+
+def _shared_text(text: str, version_link: Optional[str]) -> tuple:
+    """Return (hash, text) of a text as stored for sharing between versions."""
+    if version_link:
+        text = text.replace(version_link, f"/{VERSION_LINK_PLACEHOLDER}.html")
+    return hashlib.sha256(text.encode('utf-8')).hexdigest(), text
+
+
+def _provision_rows(
+    provisions: List[Dict[str, Any]],
+    col_ordnungsnummer_nachtragsnummer: str,
+    version_link: Optional[str]
+) -> tuple:
+    """Return the provision_texts rows (as hash -> text) and provisions rows
+    of a version's provisions."""
+    texts = {}
+    rows = []
+    for provision in provisions:
+        text_hash, text = _shared_text(provision.get('provision_markdown') or '', version_link)
+        texts[text_hash] = text
+        rows.append((
+            col_ordnungsnummer_nachtragsnummer,
+            text_hash,
+            provision.get('provision_sequence'),
+            provision.get('provision_number'),
+            provision.get('provision_hyperlink_static'),
+            provision.get('provision_hyperlink_dynamic')
+        ))
+    return texts, rows
+
+
+def _segment_rows(
+    full_text: str,
+    col_ordnungsnummer_nachtragsnummer: str,
+    version_link: Optional[str]
+) -> tuple:
+    """Return the text_segments rows (as hash -> text) and version_segments
+    rows of a version's full text."""
+    segments = {}
+    rows = []
+    for sequence, segment in enumerate(split_text_segments(full_text), 1):
+        segment_hash, segment = _shared_text(segment, version_link)
+        segments[segment_hash] = segment
+        rows.append((col_ordnungsnummer_nachtragsnummer, sequence, segment_hash))
+    return segments, rows
+
+
+def _source_file_params(parsed_data: Dict[str, Any], col_ordnungsnummer_nachtragsnummer: str) -> tuple:
+    return (
+        col_ordnungsnummer_nachtragsnummer,
+        parsed_data['collection_name'],
+        parsed_data['file_info']['filename'],
+        parsed_data['content_hash']
+    )
+
+
+def insert_law_data(conn: sqlite3.Connection, law_data: Dict[str, Any]) -> None:
+    """Insert or update law data in the laws table.
+    
+    Args:
+        conn: Database connection
+        law_data: Law data dictionary
+    """
+    # Use INSERT OR REPLACE to handle duplicates
+    conn.execute(INSERT_LAW_SQL, _law_params(law_data))
+
+
+def insert_version_data(conn: sqlite3.Connection, version_data: Dict[str, Any]) -> None:
+    """Insert version data in the versions table.
     
-    conn.execute(sql, params)
+    Args:
+        conn: Database connection
+        version_data: Version data dictionary
+    """
+    conn.execute(INSERT_VERSION_SQL, _version_params(version_data))
 
 
 def insert_provisions_data(
     conn: sqlite3.Connection,
     provisions: List[Dict[str, Any]],
-    col_ordnungsnummer_nachtragsnummer: str
+    col_ordnungsnummer_nachtragsnummer: str,
+    version_link: Optional[str] = None
 ) -> None:
-    """Insert provisions data in the provisions table.
+    """Insert provisions data in the provisions and provision_texts tables.
     
     Args:
         conn: Database connection
         provisions: List of provision dictionaries
         col_ordnungsnummer_nachtragsnummer: Foreign key reference
+        version_link: Link target of the version itself (see _version_link)
     """
     if not provisions:
         return
     
-    sql = """
-        INSERT INTO provisions (
-            col_ordnungsnummer_nachtragsnummer, provision_markdown, provision_sequence,
-            provision_number, provision_hyperlink_static, provision_hyperlink_dynamic
-        ) VALUES (?, ?, ?, ?, ?, ?)
-    """
+    texts, rows = _provision_rows(provisions, col_ordnungsnummer_nachtragsnummer, version_link)
+    conn.executemany(INSERT_PROVISION_TEXT_SQL, texts.items())
+    conn.executemany(INSERT_PROVISION_SQL, rows)
+
+
+def insert_version_segments(
+    conn: sqlite3.Connection,
+    full_text: str,
+    col_ordnungsnummer_nachtragsnummer: str,
+    version_link: Optional[str] = None
+) -> None:
+    """Insert the full text of a version as segments in the text_segments and
+    version_segments tables.
     
-    for provision in provisions:
-        params = (
-            col_ordnungsnummer_nachtragsnummer,
-            provision.get('provision_markdown'),
-            provision.get('provision_sequence'),
-            provision.get('provision_number'),
-            provision.get('provision_hyperlink_static'),
-            provision.get('provision_hyperlink_dynamic')
-        )
-        
-        conn.execute(sql, params)
\ No newline at end of file
+    Args:
+        conn: Database connection
+        full_text: Full markdown text of the version
+        col_ordnungsnummer_nachtragsnummer: Foreign key reference
+        version_link: Link target of the version itself (see _version_link)
+    """
+    segments, rows = _segment_rows(full_text, col_ordnungsnummer_nachtragsnummer, version_link)
+    conn.executemany(INSERT_SEGMENT_SQL, segments.items())
+    conn.executemany(INSERT_VERSION_SEGMENT_SQL, rows)
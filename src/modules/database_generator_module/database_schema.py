@@ -7,7 +7,14 @@ and federal law collections.
 Functions:
     get_create_tables_sql(): Returns SQL statements for table creation
     get_create_indexes_sql(): Returns SQL statements for index creation
-    create_database_schema(conn): Creates complete database schema
+    get_create_views_sql(): Returns SQL statements for view creation
+    create_database_schema(conn, create_indexes): Creates complete database schema
+    create_indexes(conn): Creates the indexes on a loaded database
+    apply_bulk_load_pragmas(conn): Configures a connection for bulk loading
+    finalize_bulk_load(conn): Creates indexes and statistics after bulk loading
+    create_full_text_index(conn): Creates and fills the FTS5 full-text tables
+    has_full_text_index(conn): Checks whether the FTS5 full-text tables exist
+    is_schema_current(conn): Checks whether a database uses the current schema
 
 License:
     https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
@@ -18,6 +25,41 @@ import sqlite3
 from src.utils.logging_utils import get_module_logger
 logger = get_module_logger(__name__)
 
+# Pragmas for loading a freshly created database in one go. The database is
+# rebuilt from scratch on every run, so a crash during the load only costs a
+# rerun and durability can be traded for speed. WAL (rather than no journal)
+# keeps rollbacks of failed batches working.
+BULK_LOAD_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -262144",  # 256 MiB
+    "PRAGMA temp_store = MEMORY",
+]
+
+# Provision and segment texts are shared by all versions of a law that contain
+# them. Links of a text to its own version (".../722.1-085.html#seq-0-prov-1")
+# would make every version's text unique, so they are stored with this
+# placeholder instead of "ordnungsnummer-nachtragsnummer" and restored on
+# reading. It contains no word characters, so the full-text index neither
+# indexes it nor cuts it in half in snippets.
+VERSION_LINK_PLACEHOLDER = "{{}}"
+
+# FTS5 tokenizer for German legal text. unicode61 folds case and, with
+# remove_diacritics 2, umlauts and accents ("Gebühr" matches "gebuhr"). There
+# is no German stemmer in SQLite, so the prefix indexes make prefix queries
+# ("gemeinde*" for Gemeinden, Gemeindeversammlung, ...) cheap instead.
+FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+FTS_PREFIX = "3 5"
+
+# Full-text tables: (fts table, content table, content rowid, indexed column).
+# They are external-content tables, so the text is only stored in the
+# content table and triggers keep the index in sync with it. Both index the
+# deduplicated texts, so a text shared by many versions is indexed once.
+FTS_TABLES = [
+    ("provisions_fts", "provision_texts", "text_id", "provision_markdown"),
+    ("segments_fts", "text_segments", "segment_id", "segment_markdown"),
+]
+
 
 def get_create_tables_sql():
     """Return SQL statements for creating all database tables."""
@@ -58,7 +100,6 @@ def get_create_tables_sql():
             law_text_redirect TEXT,
             law_text_url TEXT,
             publikationsdatum DATE,
-            full_version_text_markdown TEXT,
             last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (col_ordnungsnummer) REFERENCES laws(col_ordnungsnummer)
         )
@@ -67,13 +108,54 @@ def get_create_tables_sql():
         CREATE TABLE IF NOT EXISTS provisions (
             provision_id INTEGER PRIMARY KEY AUTOINCREMENT,
             col_ordnungsnummer_nachtragsnummer TEXT NOT NULL,
-            provision_markdown TEXT,
+            text_id INTEGER NOT NULL,
             provision_sequence INTEGER,
             provision_number TEXT,
             provision_hyperlink_static TEXT,
             provision_hyperlink_dynamic TEXT,
             last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (col_ordnungsnummer_nachtragsnummer) REFERENCES versions(col_ordnungsnummer_nachtragsnummer)
+            FOREIGN KEY (col_ordnungsnummer_nachtragsnummer) REFERENCES versions(col_ordnungsnummer_nachtragsnummer),
+            FOREIGN KEY (text_id) REFERENCES provision_texts(text_id)
+        )
+        """,
+        # Provision texts, stored once for all versions containing them
+        """
+        CREATE TABLE IF NOT EXISTS provision_texts (
+            text_id INTEGER PRIMARY KEY,
+            text_hash TEXT UNIQUE NOT NULL,
+            provision_markdown TEXT NOT NULL
+        )
+        """,
+        # The full markdown text of a version is the concatenation of its
+        # segments (split at headings and provisions), stored like provision
+        # texts. See the version_texts view.
+        """
+        CREATE TABLE IF NOT EXISTS text_segments (
+            segment_id INTEGER PRIMARY KEY,
+            segment_hash TEXT UNIQUE NOT NULL,
+            segment_markdown TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS version_segments (
+            col_ordnungsnummer_nachtragsnummer TEXT NOT NULL,
+            segment_sequence INTEGER NOT NULL,
+            segment_id INTEGER NOT NULL,
+            PRIMARY KEY (col_ordnungsnummer_nachtragsnummer, segment_sequence),
+            FOREIGN KEY (col_ordnungsnummer_nachtragsnummer) REFERENCES versions(col_ordnungsnummer_nachtragsnummer),
+            FOREIGN KEY (segment_id) REFERENCES text_segments(segment_id)
+        )
+        """,
+        # Bookkeeping for incremental builds: the markdown file each version
+        # was loaded from and the hash of its content at that time
+        """
+        CREATE TABLE IF NOT EXISTS source_files (
+            col_ordnungsnummer_nachtragsnummer TEXT PRIMARY KEY,
+            collection TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (collection, file_name)
         )
         """
     ]
@@ -86,15 +168,67 @@ def get_create_indexes_sql():
         "CREATE INDEX IF NOT EXISTS idx_in_force ON versions(in_force)",
         "CREATE INDEX IF NOT EXISTS idx_collection ON laws(collection)",
         "CREATE INDEX IF NOT EXISTS idx_versions_col_ordnungsnummer ON versions(col_ordnungsnummer)",
-        "CREATE INDEX IF NOT EXISTS idx_provisions_col_ordnungsnummer_nachtragsnummer ON provisions(col_ordnungsnummer_nachtragsnummer)"
+        "CREATE INDEX IF NOT EXISTS idx_provisions_col_ordnungsnummer_nachtragsnummer ON provisions(col_ordnungsnummer_nachtragsnummer)",
+        "CREATE INDEX IF NOT EXISTS idx_provisions_text_id ON provisions(text_id)",
+        "CREATE INDEX IF NOT EXISTS idx_version_segments_segment_id ON version_segments(segment_id)"
+    ]
+
+
+def restore_version_links_sql(column):
+    """SQL expression restoring the version links of a text column (see
+    VERSION_LINK_PLACEHOLDER) for the version aliased v."""
+    return (
+        f"replace({column}, '/{VERSION_LINK_PLACEHOLDER}.html', "
+        f"'/' || substr(v.col_ordnungsnummer, length(v.collection) + 2) "
+        f"|| '-' || v.nachtragsnummer || '.html')"
+    )
+
+
+def get_create_views_sql():
+    """Return SQL statements for creating the views that join the
+    deduplicated texts back to their provisions and versions."""
+    return [
+        f"""
+        CREATE VIEW IF NOT EXISTS provisions_with_text AS
+        SELECT
+            p.provision_id,
+            p.col_ordnungsnummer_nachtragsnummer,
+            {restore_version_links_sql('t.provision_markdown')} AS provision_markdown,
+            p.provision_sequence,
+            p.provision_number,
+            p.provision_hyperlink_static,
+            p.provision_hyperlink_dynamic
+        FROM provisions p
+        JOIN versions v ON v.col_ordnungsnummer_nachtragsnummer = p.col_ordnungsnummer_nachtragsnummer
+        JOIN provision_texts t ON t.text_id = p.text_id
+        """,
+        f"""
+        CREATE VIEW IF NOT EXISTS version_texts AS
+        SELECT
+            v.version_id,
+            v.col_ordnungsnummer_nachtragsnummer,
+            coalesce((
+                SELECT group_concat(segment_markdown, '')
+                FROM (
+                    SELECT {restore_version_links_sql('t.segment_markdown')} AS segment_markdown
+                    FROM version_segments s
+                    JOIN text_segments t ON t.segment_id = s.segment_id
+                    WHERE s.col_ordnungsnummer_nachtragsnummer = v.col_ordnungsnummer_nachtragsnummer
+                    ORDER BY s.segment_sequence
+                )
+            ), '') AS full_version_text_markdown
+        FROM versions v
+        """
     ]
 
 
-def create_database_schema(conn):
+def create_database_schema(conn, create_indexes=True):
     """Create the complete database schema including tables and indexes.
     
     Args:
         conn: SQLite database connection
+        create_indexes: Whether to create the indexes now. Bulk loads create
+            them after the data is loaded (see finalize_bulk_load).
         
     Returns:
         bool: True if schema creation was successful, False otherwise
@@ -105,10 +239,13 @@ def create_database_schema(conn):
             conn.execute(sql)
             logger.debug(f"Created table: {sql.split()[5]}")  # Extract table name
         
-        # Create indexes
-        for sql in get_create_indexes_sql():
+        for sql in get_create_views_sql():
             conn.execute(sql)
-            logger.debug(f"Created index: {sql.split()[5]}")  # Extract index name
+            logger.debug(f"Created view: {sql.split()[5]}")  # Extract view name
+        
+        # Create indexes
+        if create_indexes:
+            _create_indexes(conn)
         
         # Enable foreign key constraints
         conn.execute("PRAGMA foreign_keys = ON")
@@ -123,6 +260,169 @@ def create_database_schema(conn):
         return False
 
 
+def _create_indexes(conn):
+    for sql in get_create_indexes_sql():
+        conn.execute(sql)
+        logger.debug(f"Created index: {sql.split()[5]}")  # Extract index name
+
+
+def create_indexes(conn):
+    """Create all indexes on an already loaded database.
+    
+    Args:
+        conn: SQLite database connection
+        
+    Returns:
+        bool: True if index creation was successful, False otherwise
+    """
+    try:
+        _create_indexes(conn)
+        conn.commit()
+        return True
+        
+    except sqlite3.Error as e:
+        logger.error(f"Error creating indexes: {e}")
+        conn.rollback()
+        return False
+
+
+def apply_bulk_load_pragmas(conn):
+    """Configure a connection for loading a new database in bulk.
+    
+    Args:
+        conn: SQLite database connection
+    """
+    for sql in BULK_LOAD_PRAGMAS:
+        conn.execute(sql)
+        logger.debug(f"Applied {sql}")
+
+
+def finalize_bulk_load(conn):
+    """Finish a bulk load: create indexes, gather statistics for the query
+    planner and turn the database back into a self-contained file.
+    
+    Args:
+        conn: SQLite database connection
+        
+    Returns:
+        bool: True if finalization was successful, False otherwise
+    """
+    if not create_indexes(conn):
+        return False
+    
+    try:
+        conn.execute("ANALYZE")
+        conn.commit()
+        
+        # Fold the WAL back into the database file, so no -wal/-shm files
+        # need to be shipped along with it
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA journal_mode = DELETE")
+        logger.info("Created indexes and statistics after bulk load")
+        return True
+        
+    except sqlite3.Error as e:
+        logger.error(f"Error finalizing bulk load: {e}")
+        return False
+
+
+def get_create_fts_sql():
+    """Return SQL statements for creating the FTS5 tables and their triggers."""
+    statements = []
+    for fts_table, content_table, rowid, column in FTS_TABLES:
+        statements.append(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {column},
+            content='{content_table}',
+            content_rowid='{rowid}',
+            tokenize='{FTS_TOKENIZE}',
+            prefix='{FTS_PREFIX}'
+        )
+        """)
+        statements.extend([
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {content_table} BEGIN
+                INSERT INTO {fts_table}(rowid, {column}) VALUES (new.{rowid}, new.{column});
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {content_table} BEGIN
+                INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.{rowid}, old.{column});
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {content_table} BEGIN
+                INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.{rowid}, old.{column});
+                INSERT INTO {fts_table}(rowid, {column}) VALUES (new.{rowid}, new.{column});
+            END
+            """,
+        ])
+    return statements
+
+
+def create_full_text_index(conn):
+    """Create the FTS5 full-text tables and index the loaded content.
+    
+    The tables are filled in one pass with the FTS5 'rebuild' command, which
+    is much faster than indexing rows one by one while loading. Afterwards
+    triggers keep them in sync with later changes (incremental updates).
+    
+    Args:
+        conn: SQLite database connection
+        
+    Returns:
+        bool: True if the full-text index was created successfully, False otherwise
+    """
+    try:
+        for sql in get_create_fts_sql():
+            conn.execute(sql)
+        for fts_table, _, _, _ in FTS_TABLES:
+            conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+            conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('optimize')")
+            logger.debug(f"Built full-text table: {fts_table}")
+        conn.commit()
+        logger.info("Full-text index created successfully")
+        return True
+        
+    except sqlite3.Error as e:
+        logger.error(f"Error creating full-text index: {e}")
+        conn.rollback()
+        return False
+
+
+def has_full_text_index(conn):
+    """Check whether the database has the FTS5 full-text tables.
+    
+    Args:
+        conn: SQLite database connection
+        
+    Returns:
+        bool: True if all full-text tables exist
+    """
+    names = [fts_table for fts_table, _, _, _ in FTS_TABLES]
+    cursor = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' "
+        f"AND name IN ({', '.join('?' for _ in names)})",
+        names
+    )
+    return cursor.fetchone()[0] == len(names)
+
+
+def is_schema_current(conn):
+    """Check whether a database uses the current schema, i.e. can be updated
+    incrementally. Databases from before the text deduplication store the
+    provision texts in the provisions table.
+    
+    Args:
+        conn: SQLite database connection
+        
+    Returns:
+        bool: True if the database has the current tables and columns
+    """
+    provision_columns = {row[1] for row in conn.execute("PRAGMA table_info(provisions)")}
+    return "text_id" in provision_columns
+
+
 def drop_all_tables(conn):
     """Drop all tables from the database (for clean rebuild).
     
@@ -132,14 +432,22 @@ def drop_all_tables(conn):
     try:
         # Drop tables in reverse order to handle foreign key constraints
         drop_statements = [
+            "DROP VIEW IF EXISTS version_texts",
+            "DROP VIEW IF EXISTS provisions_with_text",
+            "DROP TABLE IF EXISTS provisions_fts",
+            "DROP TABLE IF EXISTS segments_fts",
+            "DROP TABLE IF EXISTS source_files",
+            "DROP TABLE IF EXISTS version_segments",
+            "DROP TABLE IF EXISTS text_segments",
             "DROP TABLE IF EXISTS provisions",
+            "DROP TABLE IF EXISTS provision_texts",
             "DROP TABLE IF EXISTS versions", 
             "DROP TABLE IF EXISTS laws"
         ]
         
         for sql in drop_statements:
             conn.execute(sql)
-            logger.debug(f"Dropped table: {sql.split()[4]}")
+            logger.debug(f"Dropped: {sql.split()[4]}")
         
         conn.commit()
         logger.info("All tables dropped successfully")
@@ -159,7 +467,7 @@ def get_table_info(conn):
         dict: Table information including row counts
     """
     try:
-        tables = ['laws', 'versions', 'provisions']
+        tables = ['laws', 'versions', 'provisions', 'provision_texts', 'text_segments', 'version_segments']
         info = {}
         
         for table in tables:
@@ -0,0 +1,304 @@
+"""Full-text search and text retrieval for the legal text database.
+
+This module queries the FTS5 tables created by e1_build_database with
+--full-text-index. Results are ranked with BM25 and can be filtered by
+collection and in_force status of the law version. It also reassembles the
+full text of versions from their deduplicated segments.
+
+Functions:
+    search_provisions(conn, query, collection, in_force, limit): Ranked provision search
+    search_versions(conn, query, collection, in_force, limit): Ranked law version search
+    get_version_text(conn, col_ordnungsnummer_nachtragsnummer): Full markdown text of a version
+    build_match_query(text): Turn user input into an FTS5 MATCH expression
+    benchmark_queries(conn, queries, repeat): Measure search latency
+
+Usage (benchmark):
+    python -m src.modules.database_generator_module.database_search zhlaw.db
+
+License:
+    https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
+"""
+
+import re
+import sqlite3
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from src.utils.logging_utils import get_module_logger
+
+from .database_schema import VERSION_LINK_PLACEHOLDER, restore_version_links_sql
+
+logger = get_module_logger(__name__)
+
+# Characters of user input that are FTS5 query syntax rather than words
+_FTS_SYNTAX_PATTERN = re.compile(r'["()^:{}+\-]')
+
+# Length of the highlighted text excerpts in search results (in tokens)
+SNIPPET_TOKENS = 16
+
+# Queries for benchmark_queries: single terms, prefixes and combinations of
+# terms, with and without filters
+BENCHMARK_QUERIES = [
+    {"query": "Gemeinde"},
+    {"query": "Gemeinde*"},
+    {"query": "Steuer*", "collection": "zh", "in_force": True},
+    {"query": "Datenschutz", "in_force": True},
+    {"query": "öffentliche Ordnung"},
+    {"query": "Baubewilligung Frist"},
+    {"query": "Kanton Bund", "collection": "ch"},
+    {"query": "Gebühren", "in_force": True},
+]
+
+
+def build_match_query(text: str) -> str:
+    """Turn user input into an FTS5 MATCH expression.
+
+    Every word becomes a quoted term, so characters like "-" or ":" in the
+    input can't cause syntax errors. A trailing "*" on a word is kept as a
+    prefix query, and terms are combined with AND.
+
+    Args:
+        text: Search text as entered by a user
+
+    Returns:
+        FTS5 MATCH expression, empty if the text contains no words
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = _FTS_SYNTAX_PATTERN.sub(" ", word.rstrip("*")).strip()
+        if not word:
+            continue
+        term = f'"{word}"'
+        terms.append(f"{term}*" if prefix else term)
+    return " AND ".join(terms)
+
+
+def search_provisions(
+    conn: sqlite3.Connection,
+    query: str,
+    collection: Optional[str] = None,
+    in_force: Optional[bool] = None,
+    limit: int = 20,
+    raw_query: bool = False
+) -> List[Dict[str, Any]]:
+    """Search provisions ranked by relevance.
+
+    Args:
+        conn: Database connection
+        query: Search text (see build_match_query)
+        collection: Only return provisions of this collection (e.g., "zh")
+        in_force: Only return provisions of versions in force (True) or not
+            in force (False)
+        limit: Maximum number of results
+        raw_query: Pass query to FTS5 unchanged, allowing its full syntax
+            (phrases, NEAR, OR, column filters)
+
+    Returns:
+        List of result dictionaries, best match first
+    """
+    match = query if raw_query else build_match_query(query)
+    if not match:
+        return []
+
+    sql = f"""
+        SELECT
+            p.provision_id,
+            p.col_ordnungsnummer_nachtragsnummer,
+            p.provision_number,
+            p.provision_hyperlink_static,
+            p.provision_hyperlink_dynamic,
+            v.collection,
+            v.in_force,
+            l.erlasstitel,
+            l.abkuerzung,
+            {restore_version_links_sql(f"snippet(provisions_fts, 0, '[', ']', '…', {SNIPPET_TOKENS})")} AS snippet,
+            bm25(provisions_fts) AS rank
+        FROM provisions_fts
+        JOIN provisions p ON p.text_id = provisions_fts.rowid
+        JOIN versions v ON v.col_ordnungsnummer_nachtragsnummer = p.col_ordnungsnummer_nachtragsnummer
+        LEFT JOIN laws l ON l.col_ordnungsnummer = v.col_ordnungsnummer
+        WHERE provisions_fts MATCH ?
+        {_filter_sql(collection, in_force)}
+        ORDER BY rank, p.provision_id
+        LIMIT ?
+    """
+    return _fetch_dicts(conn, sql, [match, *_filter_params(collection, in_force), limit])
+
+
+def search_versions(
+    conn: sqlite3.Connection,
+    query: str,
+    collection: Optional[str] = None,
+    in_force: Optional[bool] = None,
+    limit: int = 20,
+    raw_query: bool = False
+) -> List[Dict[str, Any]]:
+    """Search full law versions ranked by relevance.
+
+    The text of a version is indexed in segments (a heading or a provision
+    with the text up to the next one), so all terms of a query must occur
+    in the same segment. A version ranks by its best matching segment.
+
+    Args:
+        conn: Database connection
+        query: Search text (see build_match_query)
+        collection: Only return versions of this collection (e.g., "zh")
+        in_force: Only return versions in force (True) or not in force (False)
+        limit: Maximum number of results
+        raw_query: Pass query to FTS5 unchanged, allowing its full syntax
+
+    Returns:
+        List of result dictionaries, best match first
+    """
+    match = query if raw_query else build_match_query(query)
+    if not match:
+        return []
+
+    # The matches are materialized first, as snippet() and bm25() can't be
+    # evaluated inside the aggregate query. MIN(rank) makes SQLite take the
+    # snippet from the best matching segment of each version.
+    sql = f"""
+        WITH hits AS MATERIALIZED (
+            SELECT
+                rowid AS segment_id,
+                snippet(segments_fts, 0, '[', ']', '…', {SNIPPET_TOKENS}) AS snippet,
+                bm25(segments_fts) AS rank
+            FROM segments_fts
+            WHERE segments_fts MATCH ?
+        )
+        SELECT
+            v.version_id,
+            v.col_ordnungsnummer_nachtragsnummer,
+            v.nachtragsnummer,
+            v.collection,
+            v.in_force,
+            v.law_page_url,
+            l.erlasstitel,
+            l.abkuerzung,
+            {restore_version_links_sql('h.snippet')} AS snippet,
+            MIN(h.rank) AS rank
+        FROM hits h
+        JOIN version_segments s ON s.segment_id = h.segment_id
+        JOIN versions v ON v.col_ordnungsnummer_nachtragsnummer = s.col_ordnungsnummer_nachtragsnummer
+        {_filter_sql(collection, in_force)}
+        LEFT JOIN laws l ON l.col_ordnungsnummer = v.col_ordnungsnummer
+        GROUP BY v.version_id
+        ORDER BY rank, v.version_id
+        LIMIT ?
+    """
+    return _fetch_dicts(conn, sql, [match, *_filter_params(collection, in_force), limit])
+
+
+def get_version_text(conn: sqlite3.Connection, col_ordnungsnummer_nachtragsnummer: str) -> Optional[str]:
+    """Return the full markdown text of a version.
+
+    Same as full_version_text_markdown of the version_texts view, but
+    assembled here with a guaranteed segment order.
+
+    Args:
+        conn: Database connection
+        col_ordnungsnummer_nachtragsnummer: Version identifier (e.g., "zh_131.1_118")
+
+    Returns:
+        Markdown text of the version, or None if the version doesn't exist
+    """
+    version = conn.execute(
+        "SELECT collection, col_ordnungsnummer, nachtragsnummer FROM versions "
+        "WHERE col_ordnungsnummer_nachtragsnummer = ?",
+        (col_ordnungsnummer_nachtragsnummer,)
+    ).fetchone()
+    if version is None:
+        return None
+
+    collection, col_ordnungsnummer, nachtragsnummer = version
+    ordnungsnummer = col_ordnungsnummer[len(collection) + 1:]
+    segments = conn.execute(
+        "SELECT t.segment_markdown FROM version_segments s "
+        "JOIN text_segments t ON t.segment_id = s.segment_id "
+        "WHERE s.col_ordnungsnummer_nachtragsnummer = ? "
+        "ORDER BY s.segment_sequence",
+        (col_ordnungsnummer_nachtragsnummer,)
+    )
+    return "".join(segment for segment, in segments).replace(
+        f"/{VERSION_LINK_PLACEHOLDER}.html", f"/{ordnungsnummer}-{nachtragsnummer}.html"
+    )
+
+
+def _filter_sql(collection: Optional[str], in_force: Optional[bool]) -> str:
+    clauses = []
+    if collection is not None:
+        clauses.append("AND v.collection = ?")
+    if in_force is not None:
+        clauses.append("AND v.in_force = ?")
+    return "\n        ".join(clauses)
+
+
+def _filter_params(collection: Optional[str], in_force: Optional[bool]) -> list:
+    params = []
+    if collection is not None:
+        params.append(collection)
+    if in_force is not None:
+        params.append(int(in_force))
+    return params
+
+
+def _fetch_dicts(conn: sqlite3.Connection, sql: str, params: list) -> List[Dict[str, Any]]:
+    cursor = conn.execute(sql, params)
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def benchmark_queries(
+    conn: sqlite3.Connection,
+    queries: Optional[List[Dict[str, Any]]] = None,
+    repeat: int = 5
+) -> List[Dict[str, Any]]:
+    """Measure the latency of provision and version searches.
+
+    Args:
+        conn: Database connection
+        queries: Keyword arguments for the searches (default: BENCHMARK_QUERIES)
+        repeat: Number of runs per query, the first run warms the page cache
+
+    Returns:
+        List of dictionaries with the query, number of hits and the median
+        latency in milliseconds of both searches
+    """
+    results = []
+    for kwargs in queries or BENCHMARK_QUERIES:
+        row = dict(kwargs)
+        for name, search in (("provisions", search_provisions), ("versions", search_versions)):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                hits = search(conn, **kwargs)
+                timings.append((time.perf_counter() - start) * 1000)
+            row[f"{name}_hits"] = len(hits)
+            row[f"{name}_ms"] = statistics.median(timings)
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 2:
+        print("Usage: python -m src.modules.database_generator_module.database_search <database_file>")
+        sys.exit(1)
+
+    conn = sqlite3.connect(sys.argv[1])
+    try:
+        print(f"{'query':<45} {'provisions':>18} {'versions':>18}")
+        for row in benchmark_queries(conn):
+            filters = ", ".join(
+                f"{key}={row[key]}" for key in ("collection", "in_force") if key in row
+            )
+            label = row["query"] + (f" ({filters})" if filters else "")
+            print(
+                f"{label:<45} "
+                f"{row['provisions_hits']:>5} {row['provisions_ms']:>8.2f} ms "
+                f"{row['versions_hits']:>5} {row['versions_ms']:>8.2f} ms"
+            )
+    finally:
+        conn.close()
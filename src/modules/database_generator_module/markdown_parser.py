@@ -5,35 +5,71 @@ including metadata, full text, and individual provisions. It handles the specifi
 formatting used in Swiss legal texts.
 
 Functions:
-    parse_markdown_file(file_path): Parse a single markdown file
+    parse_markdown_file(file_path, frontmatter_entry): Parse a single markdown file
     extract_provisions(markdown_content): Extract individual provisions
-    parse_yaml_frontmatter(content): Parse YAML metadata
+    split_text_segments(markdown_content): Split text at headings and provisions
+    parse_yaml_frontmatter(content, frontmatter_entry): Parse YAML metadata
+    load_frontmatter_manifest(directory): Load the frontmatter manifest of a collection
     extract_hyperlinks(text): Extract provision hyperlinks
 
+Usage (micro-benchmark of provision extraction over the markdown corpus):
+    python -m src.modules.database_generator_module.markdown_parser [md_files_dir]
+
 License:
     https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
 """
 
+import hashlib
+import json
 import re
 import yaml
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional, Any
 from .date_utils import parse_date_safe, convert_boolean_safe, safe_float_conversion, safe_int_conversion
+from src.constants import FRONTMATTER_MANIFEST_FILENAME
 
 from src.utils.logging_utils import get_module_logger
 logger = get_module_logger(__name__)
 
+# The libyaml based loader is many times faster than the pure Python one
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Provision starts: [⟨§ X.⟩] where X can be '4', '4a', '4 a', etc., and
+# [⟨Art. X⟩] where X can be '1', '1a', etc.
+_SECTION_PATTERN = re.compile(r'\[⟨§\s*(\d+(?:\s*[a-z])*)\s*\.?⟩\]')
+_ARTICLE_PATTERN = re.compile(r'\[⟨Art\.\s*(\d+[a-z]*)⟩\]')
+_HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.+)$')
+
+# Provision links and the static URLs they point to
+_PROVISION_LINK_PATTERN = re.compile(r'\[⟨[^⟩]+⟩\]\(([^)]+)\)')
+_STATIC_URL_PATTERN = re.compile(r'(https://www\.zhlaw\.ch/col-zh/)([^-]+)-[^.]+\.html(#.+)?')
+
+# Line kinds of _classify_lines
+LINE_BLANK = "blank"
+LINE_PROVISION = "provision"
+LINE_HEADING_6 = "heading_6"
+LINE_HEADING = "heading"
+LINE_BODY = "body"
+
+# Start of a line holding a heading or the start of a provision
+_SEGMENT_START_PATTERN = re.compile(
+    r'^(?=[ \t]*#{1,6}[ \t]|.*\[⟨(?:§\s*\d|Art\.\s*\d))',
+    re.MULTILINE
+)
+
 
 class MarkdownParseError(Exception):
     """Custom exception for markdown parsing errors."""
     pass
 
 
-def parse_markdown_file(file_path: Path) -> Dict[str, Any]:
+def parse_markdown_file(file_path: Path, frontmatter_entry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Parse a markdown file and extract all structured data.
     
     Args:
         file_path: Path to the markdown file
+        frontmatter_entry: Entry of the file in the frontmatter manifest, if
+            any (see parse_yaml_frontmatter)
         
     Returns:
         Dictionary containing parsed data with keys:
@@ -53,7 +89,7 @@ def parse_markdown_file(file_path: Path) -> Dict[str, Any]:
             content = f.read()
         
         # Extract YAML frontmatter and markdown content
-        frontmatter, markdown_content = parse_yaml_frontmatter(content)
+        frontmatter, markdown_content = parse_yaml_frontmatter(content, frontmatter_entry)
         
         # Extract provisions from markdown content
         provisions = extract_provisions(markdown_content, file_path.stem)
@@ -78,11 +114,16 @@ def parse_markdown_file(file_path: Path) -> Dict[str, Any]:
         raise MarkdownParseError(f"Could not parse {file_path}: {e}")
 
 
-def parse_yaml_frontmatter(content: str) -> Tuple[Dict[str, Any], str]:
+def parse_yaml_frontmatter(content: str, frontmatter_entry: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], str]:
     """Parse YAML frontmatter from markdown content.
     
+    If the file's entry in the frontmatter manifest is given and was written
+    for the same frontmatter (same SHA-256 of the YAML text), its metadata is
+    used instead of parsing the YAML.
+    
     Args:
         content: Full markdown file content
+        frontmatter_entry: Entry of the file in the frontmatter manifest
         
     Returns:
         Tuple of (frontmatter_dict, remaining_markdown_content)
@@ -103,8 +144,13 @@ def parse_yaml_frontmatter(content: str) -> Tuple[Dict[str, Any], str]:
         yaml_content = parts[1].strip()
         markdown_content = parts[2].strip()
         
+        if frontmatter_entry and frontmatter_entry.get('frontmatter_sha256') == hashlib.sha256(
+            yaml_content.encode('utf-8')
+        ).hexdigest():
+            return frontmatter_entry['metadata'], markdown_content
+        
         # Parse YAML
-        frontmatter = yaml.safe_load(yaml_content)
+        frontmatter = yaml.load(yaml_content, Loader=_YAML_LOADER)
         if frontmatter is None:
             frontmatter = {}
         
@@ -119,6 +165,75 @@ def parse_yaml_frontmatter(content: str) -> Tuple[Dict[str, Any], str]:
         raise MarkdownParseError(f"Could not parse frontmatter: {e}")
 
 
+def load_frontmatter_manifest(directory: Path) -> Dict[str, Dict[str, Any]]:
+    """Load the frontmatter manifest written by build_markdown.
+    
+    Args:
+        directory: Collection directory containing the .md files
+        
+    Returns:
+        Dictionary mapping .md file names to their manifest entries (with
+        frontmatter_sha256 and metadata), empty if there is no usable manifest
+    """
+    manifest_file = directory / FRONTMATTER_MANIFEST_FILENAME
+    if not manifest_file.exists():
+        return {}
+    
+    try:
+        manifest = {}
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    manifest[entry['file']] = entry
+        logger.info(f"Loaded frontmatter manifest with {len(manifest)} entries from {manifest_file}")
+        return manifest
+        
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable frontmatter manifest {manifest_file}: {e}")
+        return {}
+
+
+def _classify_lines(lines: List[str]) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """Classify every line once as blank, provision start, heading or body.
+    
+    Args:
+        lines: Lines of the markdown content
+        
+    Returns:
+        One (kind, provision_type, provision_number) tuple per line. kind is
+        one of LINE_BLANK, LINE_PROVISION, LINE_HEADING_6, LINE_HEADING
+        (h1-h5) and LINE_BODY; the provision fields are only set for
+        LINE_PROVISION.
+    """
+    classified = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            classified.append((LINE_BLANK, None, None))
+            continue
+        
+        if '[⟨' in line:
+            section_match = _SECTION_PATTERN.search(line)
+            if section_match:
+                classified.append((LINE_PROVISION, "section", section_match.group(1).strip()))
+                continue
+            article_match = _ARTICLE_PATTERN.search(line)
+            if article_match:
+                classified.append((LINE_PROVISION, "article", article_match.group(1).strip()))
+                continue
+        
+        if line[0] == '#':
+            heading_match = _HEADING_PATTERN.match(line)
+            if heading_match:
+                kind = LINE_HEADING_6 if len(heading_match.group(1)) == 6 else LINE_HEADING
+                classified.append((kind, None, None))
+                continue
+        
+        classified.append((LINE_BODY, None, None))
+    return classified
+
+
 def extract_provisions(markdown_content: str, filename_stem: str) -> List[Dict[str, Any]]:
     """Extract individual provisions from markdown content.
     
@@ -129,6 +244,9 @@ def extract_provisions(markdown_content: str, filename_stem: str) -> List[Dict[s
     If marginalia (h6 headings) appear immediately before a provision,
     they are included as part of that provision.
     
+    The lines are classified once (see _classify_lines) and the provisions
+    built in a single sweep over them.
+    
     Args:
         markdown_content: Markdown text content
         filename_stem: Filename without extension for logging
@@ -144,46 +262,41 @@ def extract_provisions(markdown_content: str, filename_stem: str) -> List[Dict[s
     sequence = 1
     
     try:
-        # Split content into lines for processing
         lines = markdown_content.split('\n')
+        classified = _classify_lines(lines)
+        
+        # Whether the next non-blank line after each line starts a provision,
+        # which makes an h6 heading the marginalia of that provision
+        provision_follows = [False] * len(lines)
+        next_is_provision = False
+        for index in range(len(lines) - 1, -1, -1):
+            provision_follows[index] = next_is_provision
+            kind = classified[index][0]
+            if kind != LINE_BLANK:
+                next_is_provision = kind == LINE_PROVISION
+        
         current_provision = None
         current_content = []
         pending_marginalia = None  # Store marginalia that may belong to next provision
         
-        for line_num, line in enumerate(lines, 1):
-            original_line = line
-            line = line.strip()
-            
-            if not line:
+        for index, (kind, provision_type, provision_number) in enumerate(classified):
+            if kind == LINE_BLANK:
                 if current_content or pending_marginalia:
                     current_content.append("")  # Preserve blank lines within provisions
                 continue
             
-            # Check for provision patterns: [⟨§ number.⟩](URL) or [⟨Art. number⟩](URL)
-            # First check for sections: [⟨§ X.⟩] where X can be '4', '4a', '4 a', etc.
-            section_match = re.search(r'\[⟨§\s*(\d+(?:\s*[a-z])*)\s*\.?⟩\]', line)
-            # Then check for articles: [⟨Art. X⟩] where X can be '1', '1a', etc.
-            article_match = re.search(r'\[⟨Art\.\s*(\d+[a-z]*)⟩\]', line)
+            original_line = lines[index]
             
-            provision_match = section_match or article_match
-            if provision_match:
+            if kind == LINE_PROVISION:
                 # Save previous provision if exists
                 if current_provision:
                     provisions.append(_finalize_provision(current_provision, current_content, sequence - 1))
                 
-                # Extract provision number and type
-                if section_match:
-                    provision_number = section_match.group(1).strip()
-                    provision_type = "section"
-                else:  # article_match
-                    provision_number = article_match.group(1).strip()
-                    provision_type = "article"
-                
                 # Start new provision
                 current_provision = {
                     'provision_number': provision_number,
                     'provision_type': provision_type,
-                    'line_number': line_num
+                    'line_number': index + 1
                 }
                 
                 # Include pending marginalia if it exists
@@ -195,48 +308,21 @@ def extract_provisions(markdown_content: str, filename_stem: str) -> List[Dict[s
                 # Add the provision line itself
                 current_content.append(original_line)
                 sequence += 1
-                logger.debug(f"Found {provision_type} {provision_number} at line {line_num}")
                 continue
             
-            # Check for any heading (h1-h6)
-            heading_match = re.match(r'^#{1,6}\s+(.+)$', line)
-            if heading_match:
-                heading_level = len(re.match(r'^#+', line).group(0))
-                heading_text = heading_match.group(1)
-                marginalia_line = original_line
-                
-                # For h6 headings, check if this is marginalia for the next provision
-                if heading_level == 6:
-                    # Check if next non-empty line contains a provision
-                    next_provision_found = False
-                    for next_line_num in range(line_num + 1, len(lines) + 1):
-                        if next_line_num > len(lines):
-                            break
-                        next_line = lines[next_line_num - 1].strip()
-                        if not next_line:
-                            continue
-                        # Check if next line is a provision (section or article)
-                        if (re.search(r'\[⟨§\s*\d+(?:\s*[a-z])*\s*\.?⟩\]', next_line) or 
-                            re.search(r'\[⟨Art\.\s*\d+[a-z]*⟩\]', next_line)):
-                            next_provision_found = True
-                            break
-                        else:
-                            # If next non-empty line is not a provision, break
-                            break
-                    
-                    if next_provision_found:
-                        # This h6 is marginalia for the next provision
-                        # Save current provision if exists (marginalia marks end of previous provision)
-                        if current_provision:
-                            provisions.append(_finalize_provision(current_provision, current_content, sequence - 1))
-                            current_provision = None
-                            current_content = []
-                        
-                        # Store marginalia to be included with next provision
-                        pending_marginalia = marginalia_line
-                        logger.debug(f"Found marginalia for next provision at line {line_num}: {marginalia_line[:50]}...")
-                        continue
+            if kind == LINE_HEADING_6 and provision_follows[index]:
+                # This h6 is marginalia for the next provision, which ends
+                # the current provision
+                if current_provision:
+                    provisions.append(_finalize_provision(current_provision, current_content, sequence - 1))
+                    current_provision = None
+                    current_content = []
                 
+                # Store marginalia to be included with next provision
+                pending_marginalia = original_line
+                continue
+            
+            if kind != LINE_BODY:
                 # All other headings (h1-h5 and h6 that don't precede provisions) end the current provision
                 if current_provision:
                     provisions.append(_finalize_provision(current_provision, current_content, sequence - 1))
@@ -245,11 +331,10 @@ def extract_provisions(markdown_content: str, filename_stem: str) -> List[Dict[s
                 
                 # Clear pending marginalia as we hit a heading that ends provisions
                 pending_marginalia = None
-                logger.debug(f"Found heading (h{heading_level}) that ends provision at line {line_num}: {heading_text[:50]}...")
                 continue
             
             # Add line to current provision content
-            if current_provision and (current_content or line):
+            if current_provision:
                 current_content.append(original_line)
         
         # Don't forget the last provision
@@ -264,6 +349,24 @@ def extract_provisions(markdown_content: str, filename_stem: str) -> List[Dict[s
         return []
 
 
+def split_text_segments(markdown_content: str) -> List[str]:
+    """Split markdown content into segments starting at headings and provisions.
+    
+    The segments concatenate to exactly the original content. Consecutive
+    versions of a law mostly share the same segments, so they can be stored
+    once (see database_builder).
+    
+    Args:
+        markdown_content: Markdown text content
+        
+    Returns:
+        List of non-empty segments in document order
+    """
+    starts = sorted({0, *(match.start() for match in _SEGMENT_START_PATTERN.finditer(markdown_content))})
+    ends = starts[1:] + [len(markdown_content)]
+    return [markdown_content[start:end] for start, end in zip(starts, ends) if end > start]
+
+
 def _finalize_provision(provision_data: Dict[str, Any], content_lines: List[str], sequence: int) -> Dict[str, Any]:
     """Finalize a provision by combining content and extracting hyperlinks.
     
@@ -309,14 +412,14 @@ def extract_hyperlinks(text: str) -> tuple[Optional[str], Optional[str]]:
                 "https://www.zhlaw.ch/col-zh/722.1/latest#seq-0-prov-1")
     """
     try:
-        # Find markdown links [text](url) - looking specifically for provision links
-        provision_md_links = re.findall(r'\[⟨[^⟩]+⟩\]\(([^)]+)\)', text)
+        # Find markdown links [text](url) - looking specifically for provision links.
+        # Take the first provision link found (should typically be only one per provision)
+        provision_md_link = _PROVISION_LINK_PATTERN.search(text)
         
-        if not provision_md_links:
+        if not provision_md_link:
             return None, None
         
-        # Take the first provision link found (should typically be only one per provision)
-        static_url = provision_md_links[0]
+        static_url = provision_md_link.group(1)
         
         # Convert static URL to dynamic URL
         # Pattern: https://www.zhlaw.ch/col-zh/722.1-085.html#seq-0-prov-1
@@ -341,7 +444,7 @@ def _convert_to_dynamic_url(static_url: str) -> Optional[str]:
     """
     try:
         # Match pattern: https://www.zhlaw.ch/col-zh/ORDNUNGSNUMMER-NACHTRAGSNUMMER.html#anchor
-        match = re.match(r'(https://www\.zhlaw\.ch/col-zh/)([^-]+)-[^.]+\.html(#.+)?', static_url)
+        match = _STATIC_URL_PATTERN.match(static_url)
         
         if match:
             base_url = match.group(1)
@@ -458,4 +561,30 @@ def extract_version_data(parsed_data: Dict[str, Any], collection: str) -> Dict[s
         'law_text_url': metadata.get('law_text_url'),
         'publikationsdatum': parse_date_safe(metadata.get('publikationsdatum', ''), 'publikationsdatum'),
         'full_version_text_markdown': parsed_data.get('full_text', '')
-    }
\ No newline at end of file
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    
+    md_files_dir = Path(sys.argv[1] if len(sys.argv) > 1 else "datasets/md-files")
+    md_files = sorted(md_files_dir.rglob("*.md"))
+    if not md_files:
+        print(f"No markdown files found in {md_files_dir}")
+        sys.exit(1)
+    
+    # Read and split off the frontmatter up front, so only the extraction is timed
+    contents = []
+    for md_file in md_files:
+        _, markdown_content = parse_yaml_frontmatter(md_file.read_text(encoding="utf-8"))
+        contents.append((markdown_content, md_file.stem))
+    
+    logger.setLevel("WARNING")
+    start = time.perf_counter()
+    provision_count = sum(len(extract_provisions(content, stem)) for content, stem in contents)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Extracted {provision_count} provisions from {len(contents)} files in {elapsed:.2f}s "
+        f"({elapsed / len(contents) * 1000:.2f} ms/file)"
+    )
@@ -4,14 +4,36 @@ This module processes HTML law texts and converts them to clean Markdown format,
 suitable for machine learning datasets and text analysis. It handles special
 law formatting and creates structured output with YAML frontmatter.
 
-The generated markdown files are stored persistently in a 'md-files/zh' directory
-within the output directory. Files are regenerated completely on each run.
+The generated markdown files are stored persistently in a 'md-files/<collection>'
+directory (zh or ch) within the output directory. Files are regenerated completely on each run,
+unless main() is called with incremental=True: then only files whose source
+HTML, metadata or conversion code changed are converted again, outputs without
+a source are removed and unchanged members of the previous zip file are copied
+to the new one without recompressing them.
+
+The worker converting a file also deflates it for the zip file, so the main
+process only appends compressed members to the archive as results arrive.
+Optionally, the dataset is also written as a zstd-compressed tar file
+(requires the zstandard package).
+
+Next to the markdown files, a frontmatter manifest (frontmatter.jsonl) holds the
+frontmatter of every file as JSON, so the database builder can read it without
+parsing YAML. Each entry carries the SHA-256 of the file's YAML text, so an entry
+that no longer matches its file is ignored. Entries also record the hash of
+the sources of the file, which incremental runs compare against.
 
 Functions:
     read_file_with_fallback_encoding(file_path): Reads files with encoding detection
     sanitize_headings(text): Cleans up heading formatting
     flatten_dict(d, parent_key, sep): Flattens nested dictionaries
     convert_html_to_markdown(html_content, metadata): Main conversion function
+    compute_source_hash(html_file, metadata_file, code_fingerprint): Hash of the inputs of a file
+    frontmatter_manifest_entry(md_filename, md_content, metadata, source_sha256): Manifest entry of a file
+    read_frontmatter_manifest(markdown_dataset_dir): Reads the frontmatter manifest
+    write_frontmatter_manifest(markdown_dataset_dir, entries): Writes the frontmatter manifest
+    compress_zip_member(md_file, data): Deflates a markdown file for the zip file
+    DatasetZipWriter: Assembles the zip file from compressed members
+    write_dataset_tar_zst(tar_file_path, markdown_dataset_dir, filenames): Writes the tar.zst file
     build_markdown_dataset(input_dir, output_dir): Processes all law files
 
 License:
@@ -19,23 +41,56 @@ License:
 """
 
 import os
+import hashlib
 import json
 import re
+import tarfile
+import zlib
 from bs4 import BeautifulSoup, NavigableString, Tag
 from markdownify import markdownify as md
 import zipfile
 from pathlib import Path
 import yaml
 import concurrent.futures
+import itertools
 # from tqdm import tqdm  # Replaced with progress_utils
-from src.utils.progress_utils import progress_manager, track_concurrent_futures
+from src.utils.progress_utils import progress_manager
 from urllib.parse import urljoin
 import sys
 from src.utils.logging_utils import get_module_logger
+from src.utils.file_utils import fingerprint_sources
+from src.utils.html_utils import parse_html
+from src.utils.zip_utils import RawZipWriter, read_raw_member
+from src.constants import FRONTMATTER_MANIFEST_FILENAME
+
+try:
+    import zstandard
+
+    ZSTANDARD_AVAILABLE = True
+except ImportError:
+    ZSTANDARD_AVAILABLE = False
 
 # Set up logging
 logger = get_module_logger(__name__)
 
+# Bump to convert all files again on the next incremental run, e.g. after
+# changing the markdown output in a way the code fingerprint does not cover
+DATASET_BUILD_VERSION = "1"
+
+# Sources that influence the generated markdown
+FINGERPRINT_SOURCES = [
+    Path(__file__),
+    Path(__file__).parent.parent.parent / "utils" / "html_utils.py",
+]
+
+# Files converted ahead of the zip writer, in addition to one per worker
+CONVERSION_QUEUE_DEPTH = 64
+
+# zstd level of the tar file, favouring size as it is written once per build
+TAR_ZSTD_LEVEL = 19
+
+HTML_FILENAME_PATTERN = re.compile(r"([\d\.]+)-([\d]+)(?:-original|-merged)?\.html")
+
 
 
 
@@ -94,7 +149,7 @@ def flatten_dict(d, parent_key="", sep="_"):
 # --- [End of assumed helper functions] ---
 
 
-def convert_html_to_md(html_content, metadata, ordnungsnummer, nachtragsnummer):
+def convert_html_to_md(html_content, metadata, ordnungsnummer, nachtragsnummer, collection="zh"):
     """
     Convert HTML content to Markdown with specific transformations.
     """
@@ -104,11 +159,11 @@ def convert_html_to_md(html_content, metadata, ordnungsnummer, nachtragsnummer):
 
     try:
         # Parse HTML
-        soup = BeautifulSoup(html_content, "html.parser")
+        soup = parse_html(html_content)
 
         # Base URL for resolving relative links
         base_url = (
-            f"https://www.zhlaw.ch/col-zh/{ordnungsnummer}-{nachtragsnummer}.html"
+            f"https://www.zhlaw.ch/col-{collection}/{ordnungsnummer}-{nachtragsnummer}.html"
         )
 
         # 1. Sanitize headings to cap at h5
@@ -233,7 +288,7 @@ def convert_html_to_md(html_content, metadata, ordnungsnummer, nachtragsnummer):
             else:
                 marginalia.decompose()
 
-        soup = BeautifulSoup(str(soup), "html.parser")
+        soup = parse_html(str(soup))
 
         # 10. Generate markdown content using markdownify
         md_content = md(str(soup), heading_style="ATX", links="inline")
@@ -309,49 +364,401 @@ def convert_html_to_md(html_content, metadata, ordnungsnummer, nachtragsnummer):
         sys.setrecursionlimit(original_recursion_limit)
 
 
+def compute_code_fingerprint():
+    """
+    Hash the conversion code, so changing it invalidates all converted files.
+    """
+    hasher = hashlib.sha256(DATASET_BUILD_VERSION.encode("utf-8"))
+    hasher.update(fingerprint_sources(FINGERPRINT_SOURCES).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def compute_source_hash(html_file, metadata_file, code_fingerprint):
+    """
+    Hash all inputs of a markdown file: source HTML, metadata and conversion code.
+    """
+    hasher = hashlib.sha256(code_fingerprint.encode("utf-8"))
+    for path in (html_file, metadata_file):
+        with open(path, "rb") as f:
+            hasher.update(b"\0" + f.read())
+    return hasher.hexdigest()
+
+
+def find_metadata_file(root_path, ordnungsnummer, nachtragsnummer):
+    """
+    Locate the metadata file of a version next to its HTML file or one level up.
+    """
+    metadata_filename = f"{ordnungsnummer}-{nachtragsnummer}-metadata.json"
+    for metadata_file in (root_path / metadata_filename, root_path.parent / metadata_filename):
+        if metadata_file.exists():
+            return metadata_file
+    return None
+
+
+def frontmatter_manifest_entry(md_filename, md_content, metadata, source_sha256=None):
+    """
+    Build the frontmatter manifest entry of a generated markdown file.
+
+    The hash covers the YAML text as markdown_parser.parse_yaml_frontmatter
+    extracts it, so the parser can tell whether the entry matches the file.
+    """
+    yaml_content = md_content.split("---", 2)[1].strip()
+    frontmatter = {}
+    if "doc_info" in metadata:
+        frontmatter.update(flatten_dict(metadata["doc_info"]))
+    return {
+        "file": md_filename,
+        "source_sha256": source_sha256,
+        "frontmatter_sha256": hashlib.sha256(yaml_content.encode("utf-8")).hexdigest(),
+        "metadata": frontmatter,
+    }
+
+
+def read_frontmatter_manifest(markdown_dataset_dir):
+    """
+    Read the frontmatter manifest into a dictionary keyed on markdown filename.
+
+    Returns an empty dictionary if there is no readable manifest, which makes
+    an incremental run convert every file.
+    """
+    manifest_file = Path(markdown_dataset_dir) / FRONTMATTER_MANIFEST_FILENAME
+    if not manifest_file.exists():
+        return {}
+    try:
+        entries = {}
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry["file"]] = entry
+        return entries
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable frontmatter manifest {manifest_file}: {e}")
+        return {}
+
+
+def write_frontmatter_manifest(markdown_dataset_dir, entries):
+    """
+    Write the frontmatter manifest (one JSON object per line, sorted by file).
+    """
+    manifest_file = Path(markdown_dataset_dir) / FRONTMATTER_MANIFEST_FILENAME
+    tmp_file = manifest_file.with_suffix(".jsonl.tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for entry in sorted(entries, key=lambda entry: entry["file"]):
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    tmp_file.replace(manifest_file)
+    logger.info(f"Wrote frontmatter manifest with {len(entries)} entries: {manifest_file}")
+
+
+def compress_zip_member(md_file, data):
+    """
+    Deflate a markdown file for the dataset zip file.
+
+    The member gets the same header and compressed data as ZipFile.write
+    with ZIP_DEFLATED would give it, so this can run in a worker process.
+
+    Returns:
+        Tuple of (ZipInfo with CRC and sizes set, compressed data)
+    """
+    zinfo = zipfile.ZipInfo.from_file(md_file, Path(md_file).name)
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    zinfo.CRC = zlib.crc32(data)
+    zinfo.file_size = len(data)
+    zinfo.compress_size = len(compressed)
+    return zinfo, compressed
+
+
+class DatasetZipWriter:
+    """Assembles the dataset zip file from already compressed members.
+
+    Members are appended in the order they arrive; the central directory is
+    sorted by filename on close (see zip_utils.RawZipWriter). The archive is
+    written to a temporary file that replaces the zip file only once it is
+    complete and every member reads back with a matching CRC.
+    """
+
+    def __init__(self, zip_file_path, reuse_previous=False):
+        """
+        Args:
+            zip_file_path: Path of the zip file
+            reuse_previous: Allow copying members from the existing zip file
+        """
+        self.zip_file_path = Path(zip_file_path)
+        self.tmp_file_path = self.zip_file_path.with_suffix(".zip.tmp")
+        self.reused_count = 0
+        self.previous_zip = None
+        self.previous_fp = None
+        if reuse_previous and self.zip_file_path.exists():
+            try:
+                self.previous_zip = zipfile.ZipFile(self.zip_file_path, "r")
+                self.previous_fp = open(self.zip_file_path, "rb")
+            except (OSError, zipfile.BadZipFile) as e:
+                logger.warning(f"Not reusing {self.zip_file_path}: {e}")
+                self._close_sources()
+        self.tmp_file = open(self.tmp_file_path, "wb")
+        self.writer = RawZipWriter(self.tmp_file)
+
+    def add_compressed(self, zinfo, data):
+        """
+        Append a member compressed by compress_zip_member.
+        """
+        self.writer.add(zinfo, data)
+
+    def add_previous(self, filename):
+        """
+        Copy a member of the existing zip file as is, without decompressing it.
+
+        Returns:
+            True if the existing zip file has the member, False otherwise
+        """
+        if self.previous_zip is None:
+            return False
+        try:
+            info = self.previous_zip.getinfo(filename)
+            data = read_raw_member(self.previous_fp, info)
+        except KeyError:
+            return False
+        except zipfile.BadZipFile as e:
+            logger.warning(f"Not reusing {filename} from {self.zip_file_path}: {e}")
+            return False
+        self.add_compressed(info, data)
+        self.reused_count += 1
+        return True
+
+    def add_file(self, md_file, filename):
+        """
+        Compress and append a file in this process.
+        """
+        with open(md_file, "rb") as f:
+            zinfo, compressed = compress_zip_member(md_file, f.read())
+        zinfo.filename = filename
+        self.add_compressed(zinfo, compressed)
+
+    def close(self):
+        """
+        Finish the archive, verify it and move it into place.
+
+        Returns:
+            Number of members written. Without members, no zip file is left.
+
+        Raises:
+            zipfile.BadZipFile: If the archive does not read back intact. The
+                existing zip file is kept.
+        """
+        self._close_sources()
+        member_count = self.writer.close()
+        self.tmp_file.close()
+        if member_count:
+            self._verify(member_count)
+            self.tmp_file_path.replace(self.zip_file_path)
+        else:
+            self.tmp_file_path.unlink()
+            if self.zip_file_path.exists():
+                self.zip_file_path.unlink()  # Remove old/empty zip
+        return member_count
+
+    def abort(self):
+        """
+        Discard the archive, keeping the existing zip file.
+        """
+        self._close_sources()
+        self.tmp_file.close()
+        if self.tmp_file_path.exists():
+            self.tmp_file_path.unlink()
+
+    def _verify(self, member_count):
+        """
+        Read the temporary archive back, checking the CRC of every member.
+        """
+        try:
+            with zipfile.ZipFile(self.tmp_file_path, "r") as zipf:
+                bad_member = zipf.testzip()
+                read_count = len(zipf.infolist())
+        except zipfile.BadZipFile as e:
+            bad_member, read_count = f"central directory ({e})", member_count
+        if bad_member is not None or read_count != member_count:
+            self.tmp_file_path.unlink()
+            raise zipfile.BadZipFile(
+                f"Dataset zip file {self.zip_file_path} failed verification "
+                f"(first bad member: {bad_member}, "
+                f"{read_count} of {member_count} members read back)"
+            )
+
+    def _close_sources(self):
+        if self.previous_zip is not None:
+            self.previous_zip.close()
+            self.previous_zip = None
+        if self.previous_fp is not None:
+            self.previous_fp.close()
+            self.previous_fp = None
+
+
+def write_dataset_tar_zst(tar_file_path, markdown_dataset_dir, filenames):
+    """
+    Write the markdown files to a zstd-compressed tar file.
+
+    The whole archive is one zstd frame compressed with all CPU cores, which
+    compresses much better than the per-member deflate of the zip file.
+    """
+    tar_file_path = Path(tar_file_path)
+    tmp_file_path = tar_file_path.with_suffix(".zst.tmp")
+    compressor = zstandard.ZstdCompressor(level=TAR_ZSTD_LEVEL, threads=-1)
+    with open(tmp_file_path, "wb") as f, compressor.stream_writer(f) as stream:
+        with tarfile.open(fileobj=stream, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+            for filename in filenames:
+                md_file = Path(markdown_dataset_dir) / filename
+                tarinfo = tar.gettarinfo(md_file, arcname=filename)
+                tarinfo.uid = tarinfo.gid = 0
+                tarinfo.uname = tarinfo.gname = ""
+                with open(md_file, "rb") as md:
+                    tar.addfile(tarinfo, md)
+    tmp_file_path.replace(tar_file_path)
+
+
 # =====================================================
 #  process_single_html_file and main functions
 #  (Remain unchanged - they just call the updated convert_html_to_md)
 # =====================================================
 def process_single_html_file(args):
-    """Process a single HTML file and convert it to Markdown."""
-    file_path, root_path, html_file, markdown_dataset_dir = args
+    """Process a single HTML file and convert it to Markdown.
+
+    Returns:
+        Tuple of (success, markdown filename, frontmatter manifest entry,
+        compressed zip member as returned by compress_zip_member)
+    """
+    file_path, root_path, html_file, markdown_dataset_dir, code_fingerprint, collection = args
     try:
-        match = re.match(r"([\d\.]+)-([\d]+)(?:-original|-merged)?\.html", html_file)
+        match = HTML_FILENAME_PATTERN.match(html_file)
         if not match:
             logger.warning(f"Skipping {html_file}: Bad filename format.")
-            return False, None
+            return False, None, None, None
         ordnungsnummer, nachtragsnummer = match.groups()
         new_filename = f"{ordnungsnummer}-{nachtragsnummer}.md"
-        metadata_filename = f"{ordnungsnummer}-{nachtragsnummer}-metadata.json"
-        metadata_file = root_path / metadata_filename
-        if not metadata_file.exists():
-            parent_metadata_file = root_path.parent / metadata_filename
-            if parent_metadata_file.exists():
-                metadata_file = parent_metadata_file
-            else:
-                logger.warning(f"Metadata missing for {html_file}. Skipping.")
-                return False, None
+        metadata_file = find_metadata_file(root_path, ordnungsnummer, nachtragsnummer)
+        if metadata_file is None:
+            logger.warning(f"Metadata missing for {html_file}. Skipping.")
+            return False, None, None, None
+        source_sha256 = compute_source_hash(file_path, metadata_file, code_fingerprint)
         html_content, _ = read_file_with_fallback_encoding(file_path)
         with open(metadata_file, "r", encoding="utf-8") as f:
             metadata = json.load(f)
         md_content = convert_html_to_md(
-            html_content, metadata, ordnungsnummer, nachtragsnummer
+            html_content, metadata, ordnungsnummer, nachtragsnummer, collection
         )
         md_file = markdown_dataset_dir / new_filename
-        with open(md_file, "w", encoding="utf-8") as f:
-            f.write(md_content)
-        return True, new_filename
+        md_data = md_content.encode("utf-8")
+        with open(md_file, "wb") as f:
+            f.write(md_data)
+        return (
+            True,
+            new_filename,
+            frontmatter_manifest_entry(new_filename, md_content, metadata, source_sha256),
+            compress_zip_member(md_file, md_data),
+        )
     except Exception as e:
         logger.error(f"Error processing file {html_file}: {e}", exc_info=True)
-        return False, None
+        return False, None, None, None
 
 
-def main(source_path, processing_mode="sequential", max_workers=None, output_dir=None):
+def _split_unchanged_files(all_html_files_args, previous_entries, markdown_dataset_dir):
+    """
+    Separate the files whose sources are unchanged since the last run.
+
+    Returns:
+        Tuple of (arguments of the files to convert, manifest entries of the
+        unchanged files)
+    """
+    files_to_convert = []
+    unchanged_entries = []
+    for args in all_html_files_args:
+        file_path, root_path, html_file, _, code_fingerprint, _ = args
+        ordnungsnummer, nachtragsnummer = HTML_FILENAME_PATTERN.match(html_file).groups()
+        entry = previous_entries.get(f"{ordnungsnummer}-{nachtragsnummer}.md")
+        if entry is not None and (markdown_dataset_dir / entry["file"]).exists():
+            metadata_file = find_metadata_file(root_path, ordnungsnummer, nachtragsnummer)
+            source_sha256 = compute_source_hash(file_path, metadata_file, code_fingerprint)
+            if entry.get("source_sha256") == source_sha256:
+                unchanged_entries.append(entry)
+                continue
+        files_to_convert.append(args)
+    logger.info(
+        f"{len(unchanged_entries)} files unchanged, {len(files_to_convert)} files to convert"
+    )
+    return files_to_convert, unchanged_entries
+
+
+def _convert_files_concurrent(all_html_files_args, max_workers, handle_result):
+    """
+    Convert files in worker processes, passing each result on as it arrives.
+
+    At most CONVERSION_QUEUE_DEPTH files plus one per worker are converted
+    ahead of handle_result, which bounds the compressed data held in memory.
+    """
+    logger.info(
+        f"Processing {len(all_html_files_args)} files concurrently (max_workers={max_workers})..."
+    )
+    queue_depth = CONVERSION_QUEUE_DEPTH + max_workers
+    remaining_args = iter(all_html_files_args)
+    pending = {}  # future -> html filename
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor, \
+            progress_manager() as pm:
+        counter = pm.create_counter(
+            total=len(all_html_files_args),
+            desc=f"Converting {len(all_html_files_args)} HTML files",
+            unit="files"
+        )
+
+        def fill_queue():
+            for args in itertools.islice(remaining_args, queue_depth - len(pending)):
+                pending[executor.submit(process_single_html_file, args)] = args[2]
+
+        fill_queue()
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                html_filename = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    logger.error(f"Task for {html_filename} failed: {exc}", exc_info=True)
+                    result = (False, None, None, None)
+                handle_result(html_filename, result)
+                counter.update()
+            fill_queue()
+
+
+def _remove_orphaned_files(markdown_dataset_dir, current_filenames):
+    """
+    Delete markdown files that no longer have a (successfully converted) source.
+    """
+    removed_count = 0
+    for md_file in markdown_dataset_dir.glob("*.md"):
+        if md_file.name not in current_filenames:
+            md_file.unlink()
+            removed_count += 1
+    if removed_count:
+        logger.info(f"Removed {removed_count} markdown files without a source")
+
+
+def main(
+    source_path,
+    processing_mode="sequential",
+    max_workers=None,
+    output_dir=None,
+    incremental=False,
+    tar_zst=False,
+    collection="zh",
+):
     """Process HTML files to Markdown and create a zip file.
     
-    The markdown files are stored persistently in 'datasets/md-files/zh/'.
-    Existing files are cleared at the start of each run to ensure a clean build.
+    The markdown files are stored persistently in 'datasets/md-files/<collection>/'.
+    Existing files are cleared at the start of each run to ensure a clean build,
+    unless incremental is set.
     The zip file is created in the specified output directory (or 'datasets/' if not specified).
     
     Args:
@@ -359,13 +766,20 @@ def main(source_path, processing_mode="sequential", max_workers=None, output_dir
         processing_mode: 'sequential' or 'concurrent'
         max_workers: Number of workers for concurrent processing
         output_dir: Output directory for zip file (defaults to 'datasets')
+        incremental: Only convert files whose sources changed since the last
+            run (according to the frontmatter manifest), remove markdown files
+            without a source and reuse unchanged members of the existing zip file
+        tar_zst: Also write the dataset as a zstd-compressed tar file next to
+            the zip file (requires the zstandard package)
+        collection: Collection of the source files ('zh' or 'ch'), which names
+            the markdown directory, the archives and the links to the site
     """
     try:
         source_path = Path(source_path)
-        # Markdown files always go to datasets/md-files/zh
+        # Markdown files always go to datasets/md-files/<collection>
         datasets_dir = Path("datasets")
         datasets_dir.mkdir(parents=True, exist_ok=True)
-        markdown_dataset_dir = datasets_dir / "md-files" / "zh"
+        markdown_dataset_dir = datasets_dir / "md-files" / collection
         
         # Zip file goes to output_dir (or datasets if not specified)
         zip_output_dir = Path(output_dir) if output_dir else datasets_dir
@@ -374,12 +788,19 @@ def main(source_path, processing_mode="sequential", max_workers=None, output_dir
         logger.info(f"Source directory: {source_path.resolve()}")
         logger.info(f"Markdown files directory: {markdown_dataset_dir.resolve()}")
         logger.info(f"Zip output directory: {zip_output_dir.resolve()}")
-        if markdown_dataset_dir.exists():
+        previous_entries = {}
+        if incremental:
+            previous_entries = read_frontmatter_manifest(markdown_dataset_dir)
+            logger.info(
+                f"Incremental run, {len(previous_entries)} files in frontmatter manifest"
+            )
+        elif markdown_dataset_dir.exists():
             import shutil
 
             shutil.rmtree(markdown_dataset_dir)
         markdown_dataset_dir.mkdir(parents=True, exist_ok=True)
 
+        code_fingerprint = compute_code_fingerprint()
         all_html_files_args = []
         found_count, skipped_count = 0, 0
         target_suffixes = ("-original.html", "-merged.html")
@@ -387,19 +808,18 @@ def main(source_path, processing_mode="sequential", max_workers=None, output_dir
             root_path = Path(root)
             for filename in files:
                 if filename.endswith(target_suffixes):
-                    match = re.match(
-                        r"([\d\.]+)-([\d]+)(?:-original|-merged)?\.html", filename
-                    )
+                    match = HTML_FILENAME_PATTERN.match(filename)
                     if match:
-                        ordnungsnummer, nachtragsnummer = match.groups()
-                        metadata_filename = (
-                            f"{ordnungsnummer}-{nachtragsnummer}-metadata.json"
-                        )
-                        metadata_file = root_path / metadata_filename
-                        parent_metadata_file = root_path.parent / metadata_filename
-                        if metadata_file.exists() or parent_metadata_file.exists():
+                        if find_metadata_file(root_path, *match.groups()) is not None:
                             all_html_files_args.append(
-                                (root_path / filename, root_path, filename, markdown_dataset_dir)
+                                (
+                                    root_path / filename,
+                                    root_path,
+                                    filename,
+                                    markdown_dataset_dir,
+                                    code_fingerprint,
+                                    collection,
+                                )
                             )
                             found_count += 1
                         else:
@@ -410,7 +830,7 @@ def main(source_path, processing_mode="sequential", max_workers=None, output_dir
 
         if not all_html_files_args:
             logger.warning("No target HTML files with metadata found. Exiting.")
-            if markdown_dataset_dir.exists():
+            if markdown_dataset_dir.exists() and not any(markdown_dataset_dir.iterdir()):
                 markdown_dataset_dir.rmdir()  # Try removing if empty
             return
         logger.info(
@@ -419,62 +839,54 @@ def main(source_path, processing_mode="sequential", max_workers=None, output_dir
 
         processed_files_count = 0
         successful_filenames = []
+        manifest_entries = []
         failed_files = []
+        unchanged_entries = []
+        if incremental:
+            all_html_files_args, unchanged_entries = _split_unchanged_files(
+                all_html_files_args, previous_entries, markdown_dataset_dir
+            )
+            successful_filenames.extend(entry["file"] for entry in unchanged_entries)
+            manifest_entries.extend(unchanged_entries)
         effective_max_workers = os.cpu_count() if max_workers is None else max_workers
 
-        if processing_mode.lower() == "concurrent" and len(all_html_files_args) > 0:
-            logger.info(
-                f"Processing {len(all_html_files_args)} files concurrently (max_workers={effective_max_workers})..."
-            )
-            with concurrent.futures.ProcessPoolExecutor(
-                max_workers=effective_max_workers
-            ) as executor:
-                futures = {
-                    executor.submit(process_single_html_file, args): args
-                    for args in all_html_files_args
-                }
-                # Convert to list of futures for tracking
-                futures_list = list(futures.keys())
-                
-                results = {}
-                for future in track_concurrent_futures(
-                    futures_list,
-                    desc=f"Converting {len(all_html_files_args)} HTML files",
-                    unit="files"
-                ):
-                    args = futures[future]
-                    html_filename = args[2]
-                    try:
-                        results[html_filename] = future.result()
-                    except Exception as exc:
-                        logger.error(
-                            f"Task for {html_filename} failed: {exc}", exc_info=True
-                        )
-                        results[html_filename] = (False, None)
-                for html_filename, (success, md_filename) in results.items():
-                    if success and md_filename:
-                        processed_files_count += 1
-                        successful_filenames.append(md_filename)
-                    else:
-                        failed_files.append(html_filename)
-        else:
-            logger.info(f"Processing {len(all_html_files_args)} files sequentially...")
-            with progress_manager() as pm:
-                counter = pm.create_counter(
-                    total=len(all_html_files_args),
-                    desc=f"Converting {len(all_html_files_args)} HTML files",
-                    unit="files"
+        zip_file_path = zip_output_dir / f"col-{collection}-md.zip"
+        zip_writer = DatasetZipWriter(zip_file_path, reuse_previous=incremental)
+        try:
+            for entry in unchanged_entries:
+                if not zip_writer.add_previous(entry["file"]):
+                    zip_writer.add_file(markdown_dataset_dir / entry["file"], entry["file"])
+
+            def handle_result(html_filename, result):
+                nonlocal processed_files_count
+                success, md_filename, manifest_entry, zip_member = result
+                if success and md_filename:
+                    processed_files_count += 1
+                    successful_filenames.append(md_filename)
+                    manifest_entries.append(manifest_entry)
+                    zip_writer.add_compressed(*zip_member)
+                else:
+                    failed_files.append(html_filename)
+
+            if processing_mode.lower() == "concurrent" and len(all_html_files_args) > 0:
+                _convert_files_concurrent(
+                    all_html_files_args, effective_max_workers, handle_result
                 )
-                
-                for args in all_html_files_args:
-                    html_filename = args[2]
-                    success, md_filename = process_single_html_file(args)
-                    if success and md_filename:
-                        processed_files_count += 1
-                        successful_filenames.append(md_filename)
-                    else:
-                        failed_files.append(html_filename)
-                    counter.update()
+            elif all_html_files_args:
+                logger.info(f"Processing {len(all_html_files_args)} files sequentially...")
+                with progress_manager() as pm:
+                    counter = pm.create_counter(
+                        total=len(all_html_files_args),
+                        desc=f"Converting {len(all_html_files_args)} HTML files",
+                        unit="files"
+                    )
+
+                    for args in all_html_files_args:
+                        handle_result(args[2], process_single_html_file(args))
+                        counter.update()
+        except BaseException:
+            zip_writer.abort()
+            raise
 
         logger.info(
             f"Finished. Success: {processed_files_count}, Failed: {len(failed_files)}"
@@ -482,30 +894,29 @@ def main(source_path, processing_mode="sequential", max_workers=None, output_dir
         if failed_files:
             logger.warning(f"Failed files: {', '.join(failed_files)}")
 
-        zip_file_path = zip_output_dir / "col-zh-md.zip"
-        if successful_filenames:
-            logger.info(f"Creating zip file: {zip_file_path}")
-            successful_filenames.sort()
-            with zipfile.ZipFile(zip_file_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-                with progress_manager() as pm:
-                    counter = pm.create_counter(
-                        total=len(successful_filenames),
-                        desc=f"Zipping {len(successful_filenames)} files",
-                        unit="files"
-                    )
-                    
-                    for filename in successful_filenames:
-                        md_file = markdown_dataset_dir / filename
-                        if md_file.exists():
-                            zipf.write(md_file, filename)
-                        else:
-                            logger.warning(f"MD file {filename} not found for zipping.")
-                        counter.update()
-            logger.info(f"Zip file created with {len(successful_filenames)} files.")
+        if incremental:
+            _remove_orphaned_files(markdown_dataset_dir, set(successful_filenames))
+
+        write_frontmatter_manifest(markdown_dataset_dir, manifest_entries)
+
+        member_count = zip_writer.close()
+        if member_count:
+            logger.info(
+                f"Zip file {zip_file_path} created with {member_count} files "
+                f"({zip_writer.reused_count} reused from the previous zip file)."
+            )
         else:
             logger.warning("No successful files, zip not created.")
-            if zip_file_path.exists():
-                zip_file_path.unlink()  # Remove old/empty zip
+
+        if tar_zst and successful_filenames:
+            if ZSTANDARD_AVAILABLE:
+                tar_file_path = zip_output_dir / f"col-{collection}-md.tar.zst"
+                logger.info(f"Creating tar file: {tar_file_path}")
+                write_dataset_tar_zst(
+                    tar_file_path, markdown_dataset_dir, sorted(successful_filenames)
+                )
+            else:
+                logger.warning("zstandard is not installed, tar.zst file not created.")
 
         logger.info(f"Markdown files preserved in: {markdown_dataset_dir}")
         logger.info("Processing complete.")
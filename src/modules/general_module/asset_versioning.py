@@ -295,8 +295,58 @@ class AssetVersionManager:
         return f'"{hashlib.md5(etag_data.encode()).hexdigest()}"'
 
 
-def create_htaccess_rules(output_dir: str, version_map: Dict[str, str], non_versionable: List[str], source_dir: str = "src/static_files/markup"):
-    """Create .htaccess file with appropriate caching rules."""
+PRECOMPRESSED_RULES = """
+# Serve precompressed variants (.br, .gz) written at build time, also for
+# directory index requests. An encoding listed with q=0 is not accepted.
+<IfModule mod_rewrite.c>
+    RewriteEngine On
+
+    RewriteCond %{HTTP:Accept-Encoding} (^|,)\\s*br\\s*(,|$|;(?!\\s*q\\s*=\\s*0(\\.0*)?\\s*(,|$))) [NC]
+    RewriteCond %{REQUEST_FILENAME} -d
+    RewriteCond %{REQUEST_FILENAME}/index.html.br -f
+    RewriteRule ^(.*/)?$ $1index.html.br [L]
+
+    RewriteCond %{HTTP:Accept-Encoding} (^|,)\\s*br\\s*(,|$|;(?!\\s*q\\s*=\\s*0(\\.0*)?\\s*(,|$))) [NC]
+    RewriteCond %{REQUEST_FILENAME}\\.br -f
+    RewriteRule ^(.+)\\.(html|json|css|js)$ $1.$2.br [L]
+
+    RewriteCond %{HTTP:Accept-Encoding} (^|,)\\s*gzip\\s*(,|$|;(?!\\s*q\\s*=\\s*0(\\.0*)?\\s*(,|$))) [NC]
+    RewriteCond %{REQUEST_FILENAME} -d
+    RewriteCond %{REQUEST_FILENAME}/index.html.gz -f
+    RewriteRule ^(.*/)?$ $1index.html.gz [L]
+
+    RewriteCond %{HTTP:Accept-Encoding} (^|,)\\s*gzip\\s*(,|$|;(?!\\s*q\\s*=\\s*0(\\.0*)?\\s*(,|$))) [NC]
+    RewriteCond %{REQUEST_FILENAME}\\.gz -f
+    RewriteRule ^(.+)\\.(html|json|css|js)$ $1.$2.gz [L]
+
+    # Keep the content type of the original file and skip on-the-fly compression
+    RewriteRule \\.html\\.(br|gz)$ - [T=text/html,E=no-gzip:1,E=no-brotli:1]
+    RewriteRule \\.json\\.(br|gz)$ - [T=application/json,E=no-gzip:1,E=no-brotli:1]
+    RewriteRule \\.css\\.(br|gz)$ - [T=text/css,E=no-gzip:1,E=no-brotli:1]
+    RewriteRule \\.js\\.(br|gz)$ - [T=application/javascript,E=no-gzip:1,E=no-brotli:1]
+</IfModule>
+
+<IfModule mod_headers.c>
+    # The response depends on Accept-Encoding for the originals as well
+    <FilesMatch "\\.(html|json|css|js)(\\.br|\\.gz)?$">
+        Header merge Vary Accept-Encoding
+    </FilesMatch>
+    <FilesMatch "\\.(html|json|css|js)\\.br$">
+        Header set Content-Encoding br
+    </FilesMatch>
+    <FilesMatch "\\.(html|json|css|js)\\.gz$">
+        Header set Content-Encoding gzip
+    </FilesMatch>
+</IfModule>
+"""
+
+
+def create_htaccess_rules(output_dir: str, version_map: Dict[str, str], non_versionable: List[str], source_dir: str = "src/static_files/markup", precompressed: bool = False):
+    """
+    Create .htaccess file with appropriate caching rules.
+    With precompressed, requests are answered with the .br or .gz variant of
+    a file if the client accepts it (see src/utils/compression_utils.py).
+    """
     htaccess_content = """# Asset Caching Configuration for zhlaw
 # Generated automatically - do not modify manually
 
@@ -304,7 +354,7 @@ def create_htaccess_rules(output_dir: str, version_map: Dict[str, str], non_vers
     ExpiresActive On
     
     # Versioned assets (CSS, JS) - 1 year cache with immutable flag
-    <FilesMatch "\.v[a-f0-9]{8}\.(css|js)$">
+    <FilesMatch "\.v[a-f0-9]{8}\.(css|js)(\.br|\.gz)?$">
         ExpiresDefault "access plus 1 year"
         Header set Cache-Control "max-age=31536000, immutable"
         Header unset ETag
@@ -319,7 +369,7 @@ def create_htaccess_rules(output_dir: str, version_map: Dict[str, str], non_vers
     </FilesMatch>
     
     # HTML files - 5 minutes cache, private
-    <FilesMatch "\.html?$">
+    <FilesMatch "\.html?(\.br|\.gz)?$">
         ExpiresDefault "access plus 5 minutes"
         Header set Cache-Control "max-age=300, private"
         Header unset ETag
@@ -327,7 +377,7 @@ def create_htaccess_rules(output_dir: str, version_map: Dict[str, str], non_vers
     </FilesMatch>
     
     # JSON metadata files - 1 hour cache with revalidation
-    <FilesMatch "\.json$">
+    <FilesMatch "\.json(\.br|\.gz)?$">
         ExpiresDefault "access plus 1 hour"
         Header set Cache-Control "max-age=3600, stale-while-revalidate=600"
         FileETag MTime Size
@@ -359,6 +409,9 @@ def create_htaccess_rules(output_dir: str, version_map: Dict[str, str], non_vers
             content = f.read()
             existing_rules = "\n" + content
     
+    if precompressed:
+        htaccess_content += PRECOMPRESSED_RULES
+
     with open(htaccess_path, 'w') as f:
         f.write(htaccess_content + existing_rules)
     
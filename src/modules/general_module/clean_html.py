@@ -14,11 +14,19 @@ License:
 """
 
 from bs4 import BeautifulSoup, NavigableString, Tag
+import bisect
 import string
 import re
 from typing import List
 import sys
 
+from src.utils.html_utils import (
+    DocumentOrderIndex,
+    MergeNode,
+    ParagraphMergeEngine,
+    parse_html_file,
+)
+
 # -----------------------------------------------------------------------------
 # Module-Level Constants
 # -----------------------------------------------------------------------------
@@ -52,34 +60,32 @@ def merge_punctuation(soup: BeautifulSoup) -> BeautifulSoup:
     Merges consecutive paragraphs that contain only punctuation characters (excluding "...")
     with the previous paragraph.
     """
-    paragraphs: List[Tag] = soup.find_all("p")
-    i: int = 1
-    while i < len(paragraphs):
-        current_paragraph: Tag = paragraphs[i]
-        previous_paragraph: Tag = paragraphs[i - 1]
 
-        current_text: str = (
-            current_paragraph.get_text(strip=True) if current_paragraph else ""
-        )
+    def merge_punctuation_rule(engine: ParagraphMergeEngine, node: MergeNode):
+        if node.prev is None:
+            return None
+        current_paragraph: Tag = node.tag
+        previous_paragraph: Tag = node.prev.tag
 
-        if (
+        current_text: str = current_paragraph.get_text(strip=True)
+        if not (
             current_text
             and all(char in string.punctuation for char in current_text)
             and "..." not in current_text
         ):
-            preserved_content = current_paragraph.decode_contents()
-            # Check if the content appears to contain markup
-            if "<" in preserved_content and ">" in preserved_content:
-                new_content = BeautifulSoup(preserved_content, "html.parser")
-                previous_paragraph.append(new_content)
-            else:
-                previous_paragraph.append(NavigableString(preserved_content))
-            current_paragraph.decompose()
-            paragraphs = soup.find_all("p")
+            return None
+
+        preserved_content = current_paragraph.decode_contents()
+        # Check if the content appears to contain markup
+        if "<" in preserved_content and ">" in preserved_content:
+            new_content = BeautifulSoup(preserved_content, "html.parser")
+            previous_paragraph.append(new_content)
         else:
-            i += 1
+            previous_paragraph.append(NavigableString(preserved_content))
+        # Continue with the following paragraph against the merged one
+        return engine.remove(node) or engine.END
 
-    return soup
+    return ParagraphMergeEngine(soup).run([merge_punctuation_rule])
 
 
 def assign_enum_level(soup: BeautifulSoup) -> BeautifulSoup:
@@ -246,81 +252,73 @@ def remove_whitespace_around_subsup(soup: BeautifulSoup) -> BeautifulSoup:
 def merge_other_conditions(soup: BeautifulSoup) -> BeautifulSoup:
     """
     Merges consecutive paragraph (<p>) elements based on specific conditions.
-    Processes one merge at a time to handle complex chains correctly.
+    After a merge, the merged paragraph is compared with its new successor, so
+    chains of paragraphs are merged one at a time.
     """
     excluded_classes = {"marginalia", "provision", "subprovision"}
     barrier_tags = {"h1", "h2", "h3", "h4", "h5", "h6", "table"}
     merge_chars = ".,;()?:-"  # Added dash to the merge characters
 
-    changes_made = True
-    while changes_made:
-        # Reset the flag
-        changes_made = False
-
-        # Get fresh list of paragraphs after any DOM changes
-        paragraphs = soup.find_all("p")
-
-        # Examine consecutive paragraph pairs
-        for i in range(1, len(paragraphs)):
-            current_p = paragraphs[i]
-            prev_p = paragraphs[i - 1]
-
-            # Skip if classes prevent merging
-            if current_p.has_attr("class") or (
-                prev_p.has_attr("class")
-                and any(cls in excluded_classes for cls in prev_p["class"])
-            ):
-                continue
-
-            # Check for barriers between paragraphs
-            barrier_found = False
-            element = prev_p.find_next()
-            while element and element != current_p:
-                if element.name in barrier_tags:
-                    barrier_found = True
-                    break
-                element = element.find_next()
-
-            if barrier_found:
-                continue
+    # Merging never reorders paragraphs relative to barriers, so positions
+    # taken once remain valid for the barrier checks below.
+    order = DocumentOrderIndex(soup)
+    barrier_positions = [order.position(tag) for tag in soup.find_all(barrier_tags)]
+
+    def merge_other_conditions_rule(engine: ParagraphMergeEngine, node: MergeNode):
+        if node.prev is None:
+            return None
+        current_p: Tag = node.tag
+        prev_p: Tag = node.prev.tag
+
+        # Skip if classes prevent merging
+        if current_p.has_attr("class") or (
+            prev_p.has_attr("class")
+            and any(cls in excluded_classes for cls in prev_p["class"])
+        ):
+            return None
 
-            # Get text for character checks
-            current_text = current_p.get_text(strip=True)
-            prev_text = prev_p.get_text(strip=True)
+        # Check for barriers between paragraphs
+        next_barrier = bisect.bisect_right(barrier_positions, order.position(prev_p))
+        if (
+            next_barrier < len(barrier_positions)
+            and barrier_positions[next_barrier] < order.position(current_p)
+        ):
+            return None
 
-            if not current_text or not prev_text:
-                continue
+        # Get text for character checks
+        current_text = current_p.get_text(strip=True)
+        prev_text = prev_p.get_text(strip=True)
 
-            first_char = current_text[0]
-            last_char_prev = prev_text[-1]
+        if not current_text or not prev_text:
+            return None
 
-            # Check if paragraph starts with sup or sub tag
-            starts_with_sup_sub = False
-            if current_p.contents and current_p.contents[0].name in ["sup", "sub"]:
-                starts_with_sup_sub = True
+        first_char = current_text[0]
+        last_char_prev = prev_text[-1]
 
-            # Check merge conditions (added the sup/sub condition)
-            if (
-                first_char in merge_chars
-                or (first_char.islower() and last_char_prev.islower())
-                or starts_with_sup_sub
-            ):
+        # Check if paragraph starts with sup or sub tag
+        starts_with_sup_sub = False
+        if current_p.contents and current_p.contents[0].name in ["sup", "sub"]:
+            starts_with_sup_sub = True
 
-                # Add space before merging
-                prev_p.append(" ")
+        # Check merge conditions (added the sup/sub condition)
+        if not (
+            first_char in merge_chars
+            or (first_char.islower() and last_char_prev.islower())
+            or starts_with_sup_sub
+        ):
+            return None
 
-                # Move all content from current paragraph to previous paragraph
-                for element in list(current_p.contents):
-                    prev_p.append(element.extract())
+        # Add space before merging
+        prev_p.append(" ")
 
-                # Remove the now-empty paragraph
-                current_p.decompose()
+        # Move all content from current paragraph to previous paragraph
+        for element in list(current_p.contents):
+            prev_p.append(element.extract())
 
-                # Mark that we made a change and break to restart with fresh paragraphs
-                changes_made = True
-                break
+        # Remove the now-empty paragraph and compare the merged one with its new successor
+        return engine.remove(node) or engine.END
 
-    return soup
+    return ParagraphMergeEngine(soup).run([merge_other_conditions_rule])
 
 
 # -----------------------------------------------------------------------------
@@ -333,55 +331,51 @@ def merge_fractions(soup: BeautifulSoup) -> BeautifulSoup:
     either &frasl; entity or the Unicode fraction slash character ⁄, followed by
     paragraphs with <denominator> tags, and combines them into a single paragraph.
     """
-    # Find all paragraphs that contain numerator tags
-    paragraphs = soup.find_all("p")
-    i = 0
 
-    while i < len(paragraphs) - 2:  # Need at least 3 elements for a complete fraction
-        current_p = paragraphs[i]
+    def merge_fraction_rule(engine: ParagraphMergeEngine, node: MergeNode):
+        # Need at least 3 elements for a complete fraction
+        if node.next is None or node.next.next is None:
+            return None
+        current_p: Tag = node.tag
         numerator_tag = current_p.find("numerator")
+        if not numerator_tag:
+            return None
+
+        # Check if the next paragraph contains the fraction slash (either entity or Unicode char)
+        next_p = node.next.tag
+        next_p_text = next_p.get_text()
+        is_fraction_slash = (
+            "&frasl;" in str(next_p) or "⁄" in next_p_text or "/" in next_p_text
+        )
+        if not is_fraction_slash:
+            return None
 
-        if numerator_tag:
-            # Check if the next paragraph contains the fraction slash (either entity or Unicode char)
-            next_p = paragraphs[i + 1]
-            next_p_text = next_p.get_text()
-            is_fraction_slash = (
-                "&frasl;" in str(next_p) or "⁄" in next_p_text or "/" in next_p_text
-            )
-
-            if is_fraction_slash:
-                # Check if the next paragraph after that contains a denominator
-                next_next_p = paragraphs[i + 2]
-                denominator_tag = next_next_p.find("denominator")
-
-                if denominator_tag:
-                    # We found a complete fraction pattern, merge them
-
-                    # Extract the content from all three paragraphs
-                    numerator_content = str(numerator_tag)
-                    slash_content = "&frasl;"  # Always use the HTML entity in output
-                    denominator_content = str(denominator_tag)
+        # Check if the next paragraph after that contains a denominator
+        next_next_p = node.next.next.tag
+        denominator_tag = next_next_p.find("denominator")
+        if not denominator_tag:
+            return None
 
-                    # Create a new paragraph with the merged content
-                    merged_content = (
-                        f"{numerator_content}{slash_content}{denominator_content}"
-                    )
+        # We found a complete fraction pattern, merge them
 
-                    # Clear the current paragraph and add the merged content
-                    current_p.clear()
-                    current_p.append(BeautifulSoup(merged_content, "html.parser"))
+        # Extract the content from all three paragraphs
+        numerator_content = str(numerator_tag)
+        slash_content = "&frasl;"  # Always use the HTML entity in output
+        denominator_content = str(denominator_tag)
 
-                    # Remove the now-merged paragraphs
-                    next_p.decompose()
-                    next_next_p.decompose()
+        # Create a new paragraph with the merged content
+        merged_content = f"{numerator_content}{slash_content}{denominator_content}"
 
-                    # Update paragraph list since we've modified the DOM
-                    paragraphs = soup.find_all("p")
-                    continue
+        # Clear the current paragraph and add the merged content
+        current_p.clear()
+        current_p.append(BeautifulSoup(merged_content, "html.parser"))
 
-        i += 1
+        # Remove the now-merged paragraphs and check the merged one again
+        engine.remove(node.next)
+        engine.remove(node.next)
+        return node
 
-    return soup
+    return ParagraphMergeEngine(soup).run([merge_fraction_rule])
 
 
 def merge_isolated_elements(soup: BeautifulSoup) -> BeautifulSoup:
@@ -415,50 +409,61 @@ def merge_isolated_elements(soup: BeautifulSoup) -> BeautifulSoup:
     Returns:
         Modified BeautifulSoup object with merged paragraphs
     """
-    changes_made = True
-    while changes_made:
-        changes_made = False
-
-        # Get a fresh list of paragraphs after any DOM changes
-        paragraphs = soup.find_all("p")
-
-        for i in range(len(paragraphs)):
-            # Safety check in case list length changed
-            if i >= len(paragraphs):
-                break
 
-            p = paragraphs[i]
+    def merge_isolated_rule(engine: ParagraphMergeEngine, node: MergeNode):
+        p: Tag = node.tag
 
-            # Get all non-whitespace content nodes
-            content_nodes = []
-            for child in p.children:
-                if isinstance(child, NavigableString):
-                    if child.strip():  # If non-empty after stripping
-                        content_nodes.append(child)
-                else:
+        # Get all non-whitespace content nodes
+        content_nodes = []
+        for child in p.children:
+            if isinstance(child, NavigableString):
+                if child.strip():  # If non-empty after stripping
                     content_nodes.append(child)
+            else:
+                content_nodes.append(child)
 
-            # Case 1: Check for isolated sub/sup tags
-            if (
-                len(content_nodes) == 1
-                and content_nodes[0].name in ["sub", "sup"]
-                and not content_nodes[0].get("class")
-            ):
+        # Case 1: Check for isolated sub/sup tags
+        if (
+            len(content_nodes) == 1
+            and content_nodes[0].name in ["sub", "sup"]
+            and not content_nodes[0].get("class")
+        ):
+            isolated_element = content_nodes[0]
+            extract_children = True
 
-                isolated_element = content_nodes[0]
-                merge_with_adjacent_paragraphs(p, isolated_element, soup)
-                changes_made = True
-                break
+        # Case 2: Check for isolated fractions
+        elif is_isolated_fraction(content_nodes):
+            # For fractions, we want to extract the entire paragraph content
+            # to preserve the structure of numerator, slash, and denominator
+            isolated_element = p
+            extract_children = False
 
-            # Case 2: Check for isolated fractions
-            elif is_isolated_fraction(content_nodes):
-                # For fractions, we want to extract the entire paragraph content
-                # to preserve the structure of numerator, slash, and denominator
-                merge_with_adjacent_paragraphs(p, p, soup, extract_children=False)
-                changes_made = True
-                break
+        else:
+            return None
+
+        prev_node, next_node = node.prev, node.next
+        if prev_node is None and next_node is None:
+            # Nothing to merge with
+            return None
+
+        merge_with_adjacent_paragraphs(
+            p,
+            isolated_element,
+            prev_node.tag if prev_node else None,
+            next_node.tag if next_node else None,
+            extract_children=extract_children,
+        )
 
-    return soup
+        # Drop the merged-away paragraphs from the walk and re-check the
+        # paragraph that received the content
+        engine.unlink(node)
+        if prev_node is not None:
+            if next_node is not None:
+                engine.unlink(next_node)
+            return prev_node
+        return next_node
+
+    return ParagraphMergeEngine(soup).run([merge_isolated_rule])
 
 
 def merge_consecutive_h1_headings(soup: BeautifulSoup) -> BeautifulSoup:
@@ -578,23 +583,22 @@ def is_isolated_fraction(content_nodes):
     )
 
 
-def merge_with_adjacent_paragraphs(p, element_to_merge, soup, extract_children=True):
+def merge_with_adjacent_paragraphs(
+    p, element_to_merge, prev_p, next_p, extract_children=True
+):
     """
     Merges an element with its adjacent paragraphs.
 
     Args:
         p: The paragraph containing the element
         element_to_merge: The element to merge (either a tag or the whole paragraph)
-        soup: The BeautifulSoup object
+        prev_p: The paragraph preceding p in document order, or None
+        next_p: The paragraph following p in document order, or None
         extract_children: If True, extract children. If False, use the element as-is
 
     Returns:
         None (modifies the soup in-place)
     """
-    # Find adjacent paragraphs
-    prev_p = p.find_previous("p")
-    next_p = p.find_next("p")
-
     # Handle the three cases
     if prev_p and next_p:
         # We have both previous and next paragraphs
@@ -723,9 +727,15 @@ def remove_unwanted_attributes(soup: BeautifulSoup) -> BeautifulSoup:
 
 
 def main(html_file: str) -> None:
-    with open(html_file, "r", encoding="utf-8") as file:
-        soup: BeautifulSoup = BeautifulSoup(file, "html.parser")
+    soup: BeautifulSoup = parse_html_file(html_file)
+
+    soup = process_soup(soup)
+
+    from src.utils.html_utils import write_html
+    write_html(soup, html_file, encoding="utf-8", add_doctype=False, minify=True)
+
 
+def process_soup(soup: BeautifulSoup) -> BeautifulSoup:
     # Process the HTML with the various functions.
     soup = add_footnote_line_and_class(soup)
     soup = wrap_annex(soup)
@@ -739,9 +749,7 @@ def main(html_file: str) -> None:
     soup = merge_isolated_elements(soup)
     soup = reduce_whitespace(soup)
     soup = remove_whitespace_around_subsup(soup)
-
-    from src.utils.html_utils import write_html
-    write_html(soup, html_file, encoding="utf-8", add_doctype=False, minify=True)
+    return soup
 
 
 if __name__ == "__main__":
@@ -942,10 +942,15 @@ def assign_heading_level(font_variants, font_weight, font_size):
     return None
 
 
-def main(json_file_law_updated, metadata, html_file, marginalia):
+def build_html(json_data, metadata, json_file_law_updated, marginalia):
+    """
+    Converts already loaded JSON data to a BeautifulSoup document.
+
+    The path of the (updated) JSON file is only used to derive the law id,
+    version and folder for table hash attribution.
+    """
     reset_provision_sequences()
-    json_data = read_json(json_file_law_updated)
-    
+
     # Extract law_id and version from file path
     file_path = Path(json_file_law_updated)
     law_id = None
@@ -983,7 +988,12 @@ def main(json_file_law_updated, metadata, html_file, marginalia):
     
     # Get title from metadata doc_info
     erlasstitel = metadata["doc_info"]["erlasstitel"]
-    html_content = convert_to_html(json_data, erlasstitel, marginalia, law_id, version, folder)
+    return convert_to_html(json_data, erlasstitel, marginalia, law_id, version, folder)
+
+
+def main(json_file_law_updated, metadata, html_file, marginalia):
+    json_data = read_json(json_file_law_updated)
+    html_content = build_html(json_data, metadata, json_file_law_updated, marginalia)
     # Write the html content to a file
     with open(html_file, "w", encoding="utf-8") as file:
         file.write(str(html_content))
@@ -25,6 +25,7 @@ from bs4 import BeautifulSoup, NavigableString, Tag
 from src.utils.logging_utils import get_module_logger
 # Import centralized patterns
 from src.constants import Patterns
+from src.utils.html_utils import DocumentOrderIndex, parse_html_file
 
 logger = get_module_logger(__name__)
 
@@ -402,8 +403,9 @@ def merge_numbered_paragraphs(soup: BeautifulSoup) -> BeautifulSoup:
             and current_paragraph.get_text(strip=True).startswith("[")
             and current_paragraph.get_text(strip=True).endswith("]")
         ):
-            preserved_content = current_paragraph.encode_contents()
-            previous_sibling.append(BeautifulSoup(preserved_content, "html.parser"))
+            previous_sibling.extend(list(current_paragraph.contents))
+            # Join the adjacent strings like parsing the written file would
+            previous_sibling.smooth()
             current_paragraph.decompose()
     return soup
 
@@ -478,24 +480,23 @@ def find_footnotes(soup: BeautifulSoup) -> BeautifulSoup:
             os_match = p
             break
 
+    # Region checks compare document positions instead of scanning
+    # find_all_previous()/find_all_next() for every paragraph.
+    order = DocumentOrderIndex(soup)
+
     region: str = "after_last_heading"
     if os_match and annex_match:
-        if os_match in annex_match.find_all_previous():
+        if order.is_before(os_match, annex_match):
             region = "between_last_heading_before_annex_and_annex_match"
         else:
             region = "after_last_heading"
 
     for p in all_paragraphs:
         if region == "after_last_heading":
-            if last_heading is not None and last_heading not in p.find_all_previous():
+            if not order.is_between(p, last_heading, None):
                 continue
         elif region == "between_last_heading_before_annex_and_annex_match":
-            if (
-                last_heading_before_annex is not None
-                and last_heading_before_annex not in p.find_all_previous()
-            ):
-                continue
-            if annex_match is not None and annex_match not in p.find_all_next():
+            if not order.is_between(p, last_heading_before_annex, annex_match):
                 continue
 
         try:
@@ -567,13 +568,24 @@ def main(merged_html_law: str, updated_json_file_law: str) -> None:
     Finally, saves the updated HTML back to the same file.
     """
     json_data = read_json_file(updated_json_file_law)
+
+    soup = parse_html_file(merged_html_law)
+
+    soup = process_soup(soup, json_data)
+
+    from src.utils.html_utils import write_html
+    write_html(soup, merged_html_law, encoding="utf-8", add_doctype=False, minify=True)
+
+
+def process_soup(soup: BeautifulSoup, json_data: Dict[str, Any]) -> BeautifulSoup:
+    """
+    Apply all hyperlink processing steps to an already parsed document.
+    The hyperlinks are taken from the extended metadata of json_data.
+    """
     hyperlinks: List[Dict[str, str]] = json_data.get("extended_metadata", {}).get(
         "hyperlinks", []
     )
 
-    with open(merged_html_law, "r", encoding="utf-8") as file:
-        soup = BeautifulSoup(file, "html.parser")
-
     soup = find_subprovisions(soup)
     soup = find_enumerations(soup)
     soup = find_footnotes(soup)
@@ -588,9 +600,7 @@ def main(merged_html_law: str, updated_json_file_law: str) -> None:
     soup = hyperlink_provisions_and_subprovisions(soup)
     soup = merge_numbered_paragraphs(soup)
     soup = update_html_with_hyperlinks(hyperlinks, soup)
-
-    from src.utils.html_utils import write_html
-    write_html(soup, merged_html_law, encoding="utf-8", add_doctype=False, minify=True)
+    return soup
 
 
 if __name__ == "__main__":
@@ -17,6 +17,7 @@ License:
 """
 
 import fitz
+import numpy as np
 import re
 import json
 import random
@@ -34,6 +35,10 @@ DEFAULT_PAGE_HEIGHT = 595.0
 DEBUG_DRAWING_COLOR = (1, 0, 0)  # Red color for debug drawing
 DEBUG_DRAWING_WIDTH = 1.5
 DPI_DEFAULT = 300
+BLUE_MIN_VALUE = 100  # Minimum blue channel value for link-blue detection
+
+DIGIT_PATTERN = re.compile(r"\d")
+LETTER_PATTERN = re.compile(r"[a-zA-Z]")
 
 
 # -----------------------------------------------------------------------------
@@ -511,40 +516,117 @@ def mark_non_subprovision_elements(elements):
     return elements
 
 
-def check_blue_color(document_path, elements, margin=5, dpi=DPI_DEFAULT):
+def is_blue_rgb(r, g, b):
+    """
+    Returns True if an RGB triple (0-255) is dominated by its blue channel.
+    """
+    return b > r and b > g and b > BLUE_MIN_VALUE
+
+
+def collect_text_spans(page):
+    """
+    Returns (rect, rgb) tuples for every non-empty text span on a page.
+    """
+    spans = []
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                if span["text"].strip():
+                    spans.append(
+                        (fitz.Rect(span["bbox"]), fitz.sRGB_to_rgb(span["color"]))
+                    )
+    return spans
+
+
+def classify_rect_by_spans(rect, spans):
+    """
+    Classifies a rectangle using the colours of the text spans it overlaps.
+
+    Returns True if any overlapping span is blue and None otherwise: black or
+    grey span colours do not rule out blue link markup drawn by other means
+    (e.g. underlines or annotations), so the rendered pixels have to decide.
+    """
+    for span_rect, rgb in spans:
+        if span_rect.intersects(rect) and is_blue_rgb(*rgb):
+            return True
+    return None
+
+
+def render_page_array(page, mat):
+    """
+    Renders a page once and returns the pixmap and its samples as an
+    (height, width, 3) NumPy array.
+    """
+    pix = page.get_pixmap(matrix=mat, alpha=False, colorspace=fitz.csRGB)
+    samples = np.frombuffer(pix.samples, dtype=np.uint8)
+    return pix, samples.reshape(pix.height, pix.width, pix.n)
+
+
+def classify_rect_by_pixels(rect, pix, pixels, mat):
+    """
+    Checks a rectangle (page coordinates) for blue-dominant pixels in a
+    pre-rendered page buffer.
+    """
+    irect = (rect * mat).irect & pix.irect
+    if irect.is_empty:
+        return False
+    clip = pixels[
+        irect.y0 - pix.y : irect.y1 - pix.y, irect.x0 - pix.x : irect.x1 - pix.x
+    ]
+    r, g, b = clip[..., 0], clip[..., 1], clip[..., 2]
+    return bool(np.any((b > r) & (b > g) & (b > BLUE_MIN_VALUE)))
+
+
+def check_blue_color(document_path, elements, margin=5, dpi=DPI_DEFAULT, debug=False):
     """
     Checks for blue color within the bounds of text elements in a PDF document.
+
+    Candidate elements (digits, no letters) are first checked against the span
+    colours reported by PyMuPDF. Rectangles without a blue span are checked
+    against the rendered page, which is rendered at most once.
+    If debug is set, the checked rectangles are drawn onto the pages and the
+    document is saved next to the input with a "-debug.pdf" suffix.
     """
     doc = fitz.open(document_path)
     zoom = dpi / 72  # Calculate zoom factor
     mat = fitz.Matrix(zoom, zoom)
 
+    # Group candidate elements by page so every page is inspected only once
+    candidates_by_page = {}
     for element in elements:
-        page = doc.load_page(element["Page"])
+        text = element.get("Text", "")
         # Process only elements that contain digits and no letters
-        if re.search(r"\d", element.get("Text", "")) and not re.search(
-            r"[a-zA-Z]", element.get("Text", "")
-        ):
+        if DIGIT_PATTERN.search(text) and not LETTER_PATTERN.search(text):
+            candidates_by_page.setdefault(element["Page"], []).append(element)
+
+    span_hits = 0
+    pixel_hits = 0
+    for page_no, page_elements in candidates_by_page.items():
+        page = doc.load_page(page_no)
+        spans = collect_text_spans(page)
+        pix = pixels = None
+        debug_rects = []
+
+        for element in page_elements:
             bounds_list = element.get("CharBounds", [element["Bounds"]])
             found_blue = False
 
             for bounds in bounds_list:
-                rect = fitz.Rect(*bounds)
-                expanded_rect = expand_rect(rect, margin)
-                # Draw debug rectangle on the page
-                page.draw_rect(
-                    expanded_rect, color=DEBUG_DRAWING_COLOR, width=DEBUG_DRAWING_WIDTH
-                )
-                clip_pix = page.get_pixmap(clip=expanded_rect, matrix=mat)
-                img = clip_pix.samples
-
-                # Check pixel data for blue dominance
-                for i in range(0, len(img), 3):
-                    r, g, b = img[i], img[i + 1], img[i + 2]
-                    if b > r and b > g and b > 100:
-                        found_blue = True
-                        break
-                if found_blue:
+                expanded_rect = expand_rect(fitz.Rect(*bounds), margin)
+                if debug:
+                    debug_rects.append(expanded_rect)
+
+                is_blue = classify_rect_by_spans(expanded_rect, spans)
+                if is_blue is None:
+                    if pixels is None:
+                        pix, pixels = render_page_array(page, mat)
+                    is_blue = classify_rect_by_pixels(expanded_rect, pix, pixels, mat)
+                    pixel_hits += 1
+                else:
+                    span_hits += 1
+
+                if is_blue:
+                    found_blue = True
                     break
 
             if found_blue:
@@ -552,6 +634,17 @@ def check_blue_color(document_path, elements, margin=5, dpi=DPI_DEFAULT):
                     element["attributes"] = {}
                 element["attributes"]["TextColor"] = "LinkBlue"
 
+        # Draw debug rectangles only after the page has been classified
+        for rect in debug_rects:
+            page.draw_rect(rect, color=DEBUG_DRAWING_COLOR, width=DEBUG_DRAWING_WIDTH)
+
+    logger.debug(
+        f"Blue color check for {document_path}: {span_hits} rectangles resolved "
+        f"by span colour, {pixel_hits} by pixels"
+    )
+
+    if debug:
+        doc.save(document_path.replace(".pdf", "-debug.pdf"))
     doc.close()
     return elements
 
@@ -1095,15 +1188,16 @@ def normalize_font_weight_after_final_provisions(elements):
     return elements
 
 
-def main(original_pdf_path, modified_pdf_path, json_path, updated_json_path):
+def extend_json_data(original_pdf_path, modified_pdf_path, json_data, debug=False):
     """
-    Extracts color information and hyperlinks from the PDF and updates the JSON data.
+    Extracts color information and hyperlinks from the PDF and updates the
+    JSON data in memory. Returns the updated JSON data.
+
+    If debug is set, the rectangles checked for link colour are drawn into a
+    "-debug.pdf" copy of the modified PDF.
     """
     hyperlinks = extract_hyperlinks(original_pdf_path)
 
-    with open(json_path, "r", encoding="utf-8") as file:
-        json_data = json.load(file)
-
     elements = json_data["elements"]
 
     # Flatten elements
@@ -1140,7 +1234,7 @@ def main(original_pdf_path, modified_pdf_path, json_path, updated_json_path):
     # Remove header and footer elements
     elements = remove_header_footer(elements)
     # Check for blue color in elements
-    elements = check_blue_color(modified_pdf_path, elements)
+    elements = check_blue_color(modified_pdf_path, elements, debug=debug)
     # Mark square and cubic meters
     elements = mark_non_subprovision_elements(elements)
     # Remove sup tag from text elements
@@ -1156,6 +1250,20 @@ def main(original_pdf_path, modified_pdf_path, json_path, updated_json_path):
     # Update JSON data
     json_data["elements"] = elements
 
+    return json_data
+
+
+def main(original_pdf_path, modified_pdf_path, json_path, updated_json_path, debug=False):
+    """
+    Extracts color information and hyperlinks from the PDF and updates the JSON data.
+    """
+    with open(json_path, "r", encoding="utf-8") as file:
+        json_data = json.load(file)
+
+    json_data = extend_json_data(
+        original_pdf_path, modified_pdf_path, json_data, debug=debug
+    )
+
     with open(updated_json_path, "w", encoding="utf-8") as file:
         json.dump(json_data, file, indent=4, ensure_ascii=False)
 
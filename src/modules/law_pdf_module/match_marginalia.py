@@ -16,10 +16,12 @@ License:
 """
 
 from bs4 import BeautifulSoup, NavigableString
+import bisect
 import re
 
 # Get logger from main module
 from src.utils.logging_utils import get_module_logger
+from src.utils.html_utils import parse_html_file
 logger = get_module_logger(__name__)
 
 
@@ -110,6 +112,105 @@ def calculate_group_overlap(group, mod_pos):
     return total_overlap
 
 
+class ProvisionIndex:
+    """
+    Per-page interval index of the provisions of a document.
+
+    Built once per document. Provisions are sorted by their top position on
+    each page, so overlap and "next provision below" lookups are bisections
+    instead of scans over all provisions.
+    """
+
+    def __init__(self, soup):
+        # page (as found in data-page-count) -> provisions sorted by top
+        self.pages = {}
+        # Positions of every indexed provision sorted by (page, top)
+        self.order_keys = []
+        self.order_elements = []
+
+        ordered = []
+        for doc_index, p in enumerate(soup.find_all("p", {"class": "provision"})):
+            # Only provisions with IDs can be referenced by marginalia
+            if not p.get("id"):
+                continue
+            page = p.get("data-page-count")
+            top = p.get("data-vertical-position-top")
+            if not page or not top:
+                continue
+            top = float(top)
+            ordered.append((int(page), top, doc_index, p))
+
+            bottom = p.get("data-vertical-position-bottom")
+            if bottom is None:
+                continue
+            page_entry = self.pages.setdefault(
+                page, {"entries": [], "tops": [], "max_height": 0.0}
+            )
+            page_entry["entries"].append((top, float(bottom), doc_index, p))
+
+        for page_entry in self.pages.values():
+            page_entry["entries"].sort(key=lambda e: (e[0], e[2]))
+            page_entry["tops"] = [e[0] for e in page_entry["entries"]]
+            page_entry["max_height"] = max(
+                [0.0] + [bottom - top for top, bottom, _, _ in page_entry["entries"]]
+            )
+
+        ordered.sort(key=lambda e: (e[0], e[1], e[2]))
+        self.order_keys = [(page, top) for page, top, _, _ in ordered]
+        self.order_elements = [p for _, _, _, p in ordered]
+
+    def best_overlap(self, page, pos):
+        """
+        Find the provision on a page with the largest vertical overlap.
+
+        Args:
+            page: Page number as found in data-page-count
+            pos: Position tuple (top, bottom) of the marginalia
+
+        Returns:
+            The provision with the largest overlap (the first one in document
+            order on ties), or None if no provision overlaps
+        """
+        page_entry = self.pages.get(page)
+        if not page_entry:
+            return None
+
+        top, bottom = pos
+        tops = page_entry["tops"]
+        # Only provisions starting within max_height above the marginalia
+        # and before its bottom can overlap it
+        start = bisect.bisect_left(tops, top - page_entry["max_height"])
+        end = bisect.bisect_left(tops, bottom)
+
+        best_overlap = 0
+        best = None
+        for mod_top, mod_bottom, doc_index, mod_p in page_entry["entries"][start:end]:
+            overlap = calculate_overlap((mod_top, mod_bottom), pos)
+            if overlap > best_overlap or (
+                overlap == best_overlap and best is not None and doc_index < best[0]
+            ):
+                best_overlap = overlap
+                best = (doc_index, mod_p)
+
+        return best[1] if best else None
+
+    def next_below(self, page, top):
+        """
+        Find the first provision on a later page or below a position.
+
+        Args:
+            page: Page number
+            top: Vertical position on that page
+
+        Returns:
+            The next provision (top-down), or None if there is none
+        """
+        i = bisect.bisect_right(self.order_keys, (int(page), top))
+        if i < len(self.order_elements):
+            return self.order_elements[i]
+        return None
+
+
 def merge_marginalia_containers(soup):
     """
     Merge multiple marginalia-containers that have the same data-related-provision.
@@ -220,11 +321,17 @@ def sort_paragraphs(soup):
 
 def merge_html(modified_path, marginalia_path):
     # Read and parse the HTML files
-    with open(modified_path, "r", encoding="utf-8") as file:
-        soup_modified = BeautifulSoup(file, "html.parser")
-    with open(marginalia_path, "r", encoding="utf-8") as file:
-        soup_marginalia = BeautifulSoup(file, "html.parser")
+    soup_modified = parse_html_file(modified_path)
+    soup_marginalia = parse_html_file(marginalia_path)
+
+    return merge_soups(soup_modified, soup_marginalia)
+
 
+def merge_soups(soup_modified, soup_marginalia):
+    """
+    Inserts the marginalia containers of soup_marginalia into soup_modified
+    next to the provisions they belong to and returns soup_modified.
+    """
     # Collect all marginalia containers with their positioning data
     marginalia_containers = soup_marginalia.find_all(
         "div",
@@ -249,63 +356,24 @@ def merge_html(modified_path, marginalia_path):
             "text": container.get_text(strip=True)
         })
 
+    # Index the provisions once for all containers
+    provision_index = ProvisionIndex(soup_modified)
+
     # Process each container
     for container_data in marginalia_data:
         container = container_data["element"]
         container_page = container_data["page"]
-        
+
         # Find the best matching provision for this container
-        best_overlap = 0
-        best_mod_p = None
-        best_provision_id = None
-        
-        # Only search for provisions (elements with class="provision")
-        for mod_p in soup_modified.find_all("p", {"class": "provision", "data-page-count": container_page}):
-            # Skip provisions without IDs
-            if not mod_p.get("id"):
-                continue
-                
-            mod_pos = (
-                float(mod_p["data-vertical-position-top"]),
-                float(mod_p["data-vertical-position-bottom"]),
-            )
-            overlap = calculate_overlap(mod_pos, container_data["pos"])
-            if overlap > best_overlap:
-                best_overlap = overlap
-                best_mod_p = mod_p
-                # Use existing provision ID
-                best_provision_id = mod_p.get("id")
-        
+        best_mod_p = provision_index.best_overlap(container_page, container_data["pos"])
+
         # If no overlapping provision found, find the next provision (top-down)
         if not best_mod_p:
-            # Get all provisions with IDs sorted by page and vertical position
-            all_provisions = []
-            for p in soup_modified.find_all("p", {"class": "provision"}):
-                # Only include provisions that have IDs and positional data
-                if (p.get("id") and p.get("data-page-count") and p.get("data-vertical-position-top")):
-                    all_provisions.append({
-                        "element": p,
-                        "page": int(p["data-page-count"]),
-                        "top": float(p["data-vertical-position-top"]),
-                        "id": p.get("id")
-                    })
-            
-            # Sort by page, then by vertical position
-            all_provisions.sort(key=lambda x: (x["page"], x["top"]))
-            
-            # Find the first provision that comes after the marginalia
-            container_page_int = int(container_page)
-            container_top = container_data["pos"][0]
-            
-            for prov in all_provisions:
-                # Find the first provision that's either on a later page
-                # or on the same page but below the marginalia
-                if (prov["page"] > container_page_int or 
-                    (prov["page"] == container_page_int and prov["top"] > container_top)):
-                    best_mod_p = prov["element"]
-                    best_provision_id = prov["id"]  # Use the pre-validated ID
-                    break
-        
+            best_mod_p = provision_index.next_below(
+                container_page, container_data["pos"][0]
+            )
+        best_provision_id = best_mod_p.get("id") if best_mod_p else None
+
         # Add data-related-provision attribute to the container
         if best_mod_p and best_provision_id:
             container["data-related-provision"] = best_provision_id
@@ -350,8 +418,12 @@ def clean_html(soup: BeautifulSoup) -> None:
         # Process text nodes individually rather than using element.string
         for content in list(element.contents):
             if isinstance(content, NavigableString):
-                # Strip whitespace from direct text nodes only
-                content.replace_with(content.strip())
+                # Strip whitespace from direct text nodes only, dropping the ones
+                # left empty (the parsed file has none)
+                if content.strip():
+                    content.replace_with(content.strip())
+                else:
+                    content.extract()
 
         # Check if the element contains only a single number and doesn't have sup or sub tags
         if (
@@ -20,6 +20,7 @@ from bs4 import BeautifulSoup
 import re
 from typing import Any, Dict, List
 from src.constants import Patterns
+from src.utils.html_utils import parse_html_file
 
 # -----------------------------------------------------------------------------
 # Module-Level Constants
@@ -438,8 +439,7 @@ def main(html_file_marginalia: str) -> None:
 
     :param html_file_marginalia: Path to the HTML file.
     """
-    with open(html_file_marginalia, "r", encoding="utf-8") as file:
-        soup = BeautifulSoup(file, "html.parser")
+    soup = parse_html_file(html_file_marginalia)
 
     merged_paragraphs = merge_paragraphs(soup)
 
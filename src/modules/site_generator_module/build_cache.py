@@ -0,0 +1,289 @@
+"""
+Build Cache Module
+
+Content-addressed cache for rendered law pages. Every page is keyed on a hash
+of all inputs that determine its output: the source HTML, the metadata, the
+table-corrections file, the asset version map and a fingerprint of the build
+code. Pages whose inputs did not change since an earlier build are copied from
+the cache instead of being rendered again.
+
+License:
+    https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from src.utils.compression_utils import COMPRESSED_SUFFIXES, expected_suffixes
+from src.utils.file_utils import fingerprint_sources
+from src.utils.logging_utils import get_module_logger
+
+logger = get_module_logger(__name__)
+
+# Bump to invalidate all cached pages, e.g. after changing the page output in
+# a way the code fingerprint does not cover
+BUILD_CACHE_VERSION = "1"
+
+DEFAULT_CACHE_DIR = "data/build_cache"
+# Test builds keep their own cache, so pruning one does not empty the other
+DEFAULT_TEST_CACHE_DIR = "data/build_cache_test"
+
+SRC_DIR = Path(__file__).parent.parent.parent
+
+# Sources that influence the rendered pages
+FINGERPRINT_SOURCES = [
+    SRC_DIR / "modules" / "site_generator_module",
+    SRC_DIR / "modules" / "manual_review_module",
+    SRC_DIR / "utils",
+    SRC_DIR / "static_files" / "markup" / "icons",
+]
+
+
+def compute_code_fingerprint() -> str:
+    """
+    Hash the build code and the files it embeds into pages.
+
+    Returns:
+        Hex digest over the contents of all fingerprint sources
+    """
+    return fingerprint_sources(FINGERPRINT_SOURCES, suffixes=(".py", ".svg"))
+
+
+class BuildCache:
+    """Persistent, content-addressed store of rendered pages."""
+
+    def __init__(
+        self,
+        version_map: Dict[str, str],
+        minify_output: bool,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+    ):
+        """
+        Args:
+            version_map: Asset version map used to render the pages
+            minify_output: Whether pages are written minified
+            cache_dir: Directory holding the cached pages
+        """
+        self.cache_dir = Path(cache_dir)
+        # Keys of the pages of the current build, see prune()
+        self.used_keys: Set[str] = set()
+        hasher = hashlib.sha256()
+        hasher.update(BUILD_CACHE_VERSION.encode("utf-8"))
+        hasher.update(compute_code_fingerprint().encode("utf-8"))
+        hasher.update(json.dumps(version_map, sort_keys=True).encode("utf-8"))
+        hasher.update(b"minify" if minify_output else b"pretty")
+        self.fingerprint = hasher.hexdigest()
+
+    def page_key(
+        self,
+        html_file: str,
+        file_type: str,
+        law_origin: str,
+        metadata: Dict[str, Any],
+        corrections_file: Optional[Path] = None,
+    ) -> str:
+        """
+        Compute the cache key of a page from its inputs.
+
+        Args:
+            html_file: Source HTML file
+            file_type: "old_html", "new_html" or "site_element"
+            law_origin: "zh" or "ch"
+            metadata: Loaded metadata of the page
+            corrections_file: Table-corrections file of the page, if any
+
+        Returns:
+            Hex digest identifying the rendered page
+        """
+        hasher = hashlib.sha256()
+        hasher.update(self.fingerprint.encode("utf-8"))
+        for part in (html_file, file_type, law_origin):
+            hasher.update(b"\0" + str(part).encode("utf-8"))
+        with open(html_file, "rb") as f:
+            hasher.update(b"\0" + f.read())
+        # Hash the parsed metadata so reformatting the file does not invalidate
+        hasher.update(
+            b"\0" + json.dumps(metadata, sort_keys=True, ensure_ascii=False).encode()
+        )
+        if corrections_file is not None and corrections_file.exists():
+            hasher.update(b"\0" + corrections_file.read_bytes())
+        else:
+            hasher.update(b"\0no-corrections")
+        return hasher.hexdigest()
+
+    def placeholder_key(self, placeholder_page: Dict[str, Any]) -> str:
+        """
+        Compute the cache key of a placeholder page from the version data it
+        is rendered with (see create_placeholders.find_placeholder_pages).
+
+        Args:
+            placeholder_page: File name and doc_info of the placeholder
+
+        Returns:
+            Hex digest identifying the rendered page
+        """
+        hasher = hashlib.sha256()
+        hasher.update(self.fingerprint.encode("utf-8"))
+        hasher.update(b"\0placeholder\0")
+        hasher.update(
+            json.dumps(placeholder_page, sort_keys=True, ensure_ascii=False).encode()
+        )
+        return hasher.hexdigest()
+
+    def _entry_path(self, key: str, suffix: str = ".html") -> Path:
+        return self.cache_dir / key[:2] / f"{key}{suffix}"
+
+    def restore(self, key: str, dest: str) -> bool:
+        """
+        Copy a cached page to its output path.
+
+        Args:
+            key: Cache key of the page
+            dest: Output path
+
+        Returns:
+            True if the page was in the cache, False otherwise
+        """
+        entry = self._entry_path(key)
+        if not entry.exists():
+            return False
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        shutil.copyfile(entry, dest)
+        return True
+
+    def restore_summary(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the summary stored with a cached page.
+
+        Args:
+            key: Cache key of the page
+
+        Returns:
+            The summary, or None if the page has none
+        """
+        entry = self._entry_path(key, ".json")
+        try:
+            with open(entry, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(
+        self, key: str, src: str, summary: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Add a rendered page to the cache.
+
+        The entry is written to a temporary file and renamed, so concurrent
+        workers never see partially written entries. The summary is stored
+        before the page, so a cached page never lacks its summary.
+
+        Args:
+            key: Cache key of the page
+            src: Path of the rendered page
+            summary: Data collected while rendering the page, e.g. its anchors
+        """
+        entry = self._entry_path(key)
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            if summary is not None:
+                self._write_atomic(
+                    self._entry_path(key, ".json"),
+                    json.dumps(summary, ensure_ascii=False).encode("utf-8"),
+                )
+            fd, tmp_path = tempfile.mkstemp(dir=entry.parent, suffix=".tmp")
+            os.close(fd)
+            shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, entry)
+        except OSError as e:
+            logger.warning(f"Could not add {src} to build cache: {e}")
+
+    def restore_variants(self, key: str, dest: str) -> bool:
+        """
+        Copy the compressed variants of a cached page next to its output path.
+
+        Variants are only restored if they were stored by an installation
+        writing the same variants (e.g. not gzip only, before brotli was
+        installed). Variants the cached page has none of, because they don't
+        compress well enough, are removed from the output path.
+
+        Args:
+            key: Cache key of the page
+            dest: Output path of the page
+
+        Returns:
+            True if the cache holds variants of the page, False otherwise
+        """
+        suffixes = expected_suffixes()
+        try:
+            stored = self._entry_path(key, ".variants").read_text(encoding="utf-8")
+        except OSError:
+            return False
+        if stored != " ".join(suffixes):
+            return False
+        for suffix in COMPRESSED_SUFFIXES:
+            entry = self._entry_path(key, f".html{suffix}")
+            variant = f"{dest}{suffix}"
+            if suffix in suffixes and entry.exists():
+                shutil.copyfile(entry, variant)
+            elif os.path.exists(variant):
+                os.remove(variant)
+        return True
+
+    def store_variants(self, key: str, src: str) -> None:
+        """
+        Add the compressed variants of a rendered page to the cache.
+
+        Args:
+            key: Cache key of the page
+            src: Path of the rendered page, the variants are next to it
+        """
+        suffixes = expected_suffixes()
+        try:
+            for suffix in suffixes:
+                variant = f"{src}{suffix}"
+                entry = self._entry_path(key, f".html{suffix}")
+                if os.path.exists(variant):
+                    entry.parent.mkdir(parents=True, exist_ok=True)
+                    with open(variant, "rb") as f:
+                        self._write_atomic(entry, f.read())
+                elif entry.exists():
+                    entry.unlink()
+            # Written last: records which variants the entries above cover
+            marker = self._entry_path(key, ".variants")
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            self._write_atomic(marker, " ".join(suffixes).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"Could not add variants of {src} to build cache: {e}")
+
+    def prune(self, keys: Set[str]) -> int:
+        """
+        Remove the entries of pages that are not part of the current build,
+        e.g. all pages of an earlier code fingerprint.
+
+        Args:
+            keys: Keys of the entries to keep
+
+        Returns:
+            Number of removed files (pages, summaries and variants)
+        """
+        removed = 0
+        if not self.cache_dir.exists():
+            return removed
+        for entry in self.cache_dir.glob("*/*"):
+            if entry.name.split(".", 1)[0] not in keys:
+                entry.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -0,0 +1,233 @@
+"""
+Build Manifest Module
+
+Records every page of a site build: its URL and, for law pages, the collection,
+ordnungsnummer, nachtragsnummer, in_force status and the dates the sitemap
+derives lastmod from. The records are assembled from the collection metadata
+and one walk over the output directory, so consumers like the sitemap
+generator neither walk the site nor stat individual pages.
+
+License:
+    https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.utils.logging_utils import get_module_logger
+
+logger = get_module_logger(__name__)
+
+DEFAULT_MANIFEST_DIR = "data/build_manifest"
+
+# Processed collection metadata by collection
+COLLECTION_DATA_FILES = {
+    "zh": "data/zhlex/zhlex_data/zhlex_data_processed.json",
+    "ch": "data/fedlex/fedlex_data/fedlex_data_processed.json",
+}
+
+# Output directory of each collection, relative to the site root
+COLLECTION_DIRS = {
+    "zh": "col-zh",
+    "ch": "col-ch",
+}
+
+LAW_PAGE_PATTERN = re.compile(r"(.+)-(\d+)\.html$")
+
+
+def load_collection_data() -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Load the processed metadata of all collections that have been built.
+
+    Returns:
+        Laws by collection; collections without a metadata file are left out
+    """
+    collection_data = {}
+    for collection, metadata_path in COLLECTION_DATA_FILES.items():
+        try:
+            if os.path.exists(metadata_path):
+                with open(metadata_path, "r", encoding="utf-8") as f:
+                    collection_data[collection] = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load {collection} metadata: {e}")
+    return collection_data
+
+
+def index_law_versions(
+    collection_data: Dict[str, List[Dict[str, Any]]]
+) -> Dict[Tuple[str, str], Dict[str, Dict[str, Any]]]:
+    """
+    Index the metadata of all law versions for constant-time lookups.
+
+    A law entry is indexed under its own nachtragsnummer; its versions get
+    the process_steps of the law. Where several entries share a key, the
+    first one wins.
+
+    Args:
+        collection_data: Laws by collection, see load_collection_data()
+
+    Returns:
+        Dictionary keyed on (collection, ordnungsnummer), mapping each
+        nachtragsnummer to the metadata of that version
+    """
+    index = {}
+    for collection, laws in collection_data.items():
+        for law in laws or []:
+            ordnungsnummer = law.get("ordnungsnummer")
+            if not ordnungsnummer:
+                continue
+            law_versions = index.setdefault((collection, ordnungsnummer), {})
+            nachtragsnummer = str(law.get("nachtragsnummer", ""))
+            if nachtragsnummer:
+                law_versions.setdefault(nachtragsnummer, law)
+            for version in law.get("versions", []):
+                nachtragsnummer = str(version.get("nachtragsnummer", ""))
+                if nachtragsnummer and nachtragsnummer not in law_versions:
+                    version_data = version.copy()
+                    version_data["process_steps"] = law.get("process_steps", {})
+                    law_versions[nachtragsnummer] = version_data
+    return index
+
+
+def _page_record(
+    url: str,
+    page_type: str,
+    collection: Optional[str] = None,
+    ordnungsnummer: Optional[str] = None,
+    nachtragsnummer: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    dates = {}
+    if metadata is not None:
+        dates = {
+            "publikationsdatum": metadata.get("publikationsdatum"),
+            "generate_html": (metadata.get("process_steps") or {}).get("generate_html"),
+        }
+    return {
+        "url": url,
+        "page_type": page_type,
+        "collection": collection,
+        "ordnungsnummer": ordnungsnummer,
+        "nachtragsnummer": nachtragsnummer,
+        # None if the collection metadata has no entry for the page
+        "in_force": metadata.get("in_force", False) if metadata is not None else None,
+        "dates": dates,
+    }
+
+
+def collect_page_records(
+    static_path: str,
+    collection_data: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Record every HTML page of a built site.
+
+    Walks the whole site. Pages directly in a collection directory are law
+    pages, pages in a "diff" directory are diff pages and all others are site
+    pages; pages below a collection directory belong to that collection.
+
+    Args:
+        static_path: Root directory of the site, e.g. "public/"
+        collection_data: Laws by collection (default: load_collection_data())
+
+    Returns:
+        One record per page, URLs relative to the site root
+    """
+    if collection_data is None:
+        collection_data = load_collection_data()
+    law_index = index_law_versions(collection_data)
+    collections_by_dir = {
+        collection_dir: collection for collection, collection_dir in COLLECTION_DIRS.items()
+    }
+
+    records = []
+    for root, dirs, files in os.walk(static_path):
+        dirs.sort()
+        parts = Path(os.path.relpath(root, static_path)).parts
+        if parts == (".",):
+            parts = ()
+        collection = collections_by_dir.get(parts[0]) if parts else None
+        for name in sorted(files):
+            if not name.endswith(".html"):
+                continue
+            url = "/".join(parts + (name,))
+            if "diff" in parts:
+                records.append(_page_record(url, "diff", collection))
+            elif collection is None:
+                records.append(_page_record(url, "site"))
+            elif len(parts) > 1 or not LAW_PAGE_PATTERN.match(name):
+                records.append(_page_record(url, "law", collection))
+            else:
+                ordnungsnummer, nachtragsnummer = LAW_PAGE_PATTERN.match(name).groups()
+                metadata = law_index.get((collection, ordnungsnummer), {}).get(
+                    nachtragsnummer
+                )
+                records.append(
+                    _page_record(
+                        url, "law", collection, ordnungsnummer, nachtragsnummer, metadata
+                    )
+                )
+
+    logger.info(f"Collected {len(records)} pages of {static_path}")
+    return records
+
+
+def manifest_path(static_path: str, manifest_dir: str = DEFAULT_MANIFEST_DIR) -> Path:
+    """
+    Path of the build manifest of a site, e.g. data/build_manifest/public.json.
+    """
+    return Path(manifest_dir) / f"{Path(static_path).name}.json"
+
+
+def write_build_manifest(
+    static_path: str,
+    records: List[Dict[str, Any]],
+    manifest_dir: str = DEFAULT_MANIFEST_DIR,
+) -> Dict[str, Any]:
+    """
+    Write the build manifest of a site.
+
+    Args:
+        static_path: Root directory of the site
+        records: Page records, see collect_page_records()
+        manifest_dir: Directory holding the manifests
+
+    Returns:
+        The manifest: build date and page records
+    """
+    manifest = {
+        "build_date": datetime.now().strftime("%Y-%m-%d"),
+        "pages": records,
+    }
+    path = manifest_path(static_path, manifest_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    tmp_path.replace(path)
+    logger.info(f"Wrote build manifest with {len(records)} pages: {path}")
+    return manifest
+
+
+def load_build_manifest(
+    static_path: str, manifest_dir: str = DEFAULT_MANIFEST_DIR
+) -> Optional[Dict[str, Any]]:
+    """
+    Load the build manifest of a site.
+
+    Returns:
+        The manifest, or None if the site has no readable manifest
+    """
+    path = manifest_path(static_path, manifest_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load build manifest {path}: {e}")
+        return None
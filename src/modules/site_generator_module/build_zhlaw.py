@@ -18,13 +18,21 @@ License:
     https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
 """
 
+import copy
 import re
 import json
 import os
 from pathlib import Path
 from typing import Any, Dict, List, Tuple, Union
 from bs4 import BeautifulSoup, Tag
+from bs4.formatter import HTMLFormatter
 import arrow
+from src.utils.html_utils import (
+    DocumentOrderIndex,
+    MergeNode,
+    ParagraphMergeEngine,
+    RawHTML,
+)
 from src.utils.logging_utils import get_module_logger
 
 # Get logger from main module
@@ -40,6 +48,42 @@ def set_version_map(version_map: dict):
     _VERSION_MAP = version_map
 
 
+ICONS_DIR = Path(__file__).parent.parent.parent / "static_files" / "markup" / "icons"
+
+# Parsed <svg> elements of the icon files, filled once per process
+_SVG_ICON_CACHE: Dict[str, Union[Tag, None]] = {}
+
+
+def get_svg_icon(file_name: str) -> Union[Tag, None]:
+    """
+    Get the parsed <svg> element of an icon file.
+
+    Each file is read and parsed only once per process. The returned element is
+    shared between pages and must be cloned, not modified or moved.
+
+    Args:
+        file_name: Name of the icon file (with .svg extension)
+
+    Returns:
+        The <svg> element, or None if the file does not exist or has no <svg>
+    """
+    if file_name not in _SVG_ICON_CACHE:
+        svg_element = None
+        svg_path = ICONS_DIR / file_name
+        if svg_path.exists():
+            with open(svg_path, "r", encoding="utf-8") as f:
+                svg_element = BeautifulSoup(f.read(), "xml").find("svg")
+        _SVG_ICON_CACHE[file_name] = svg_element
+    return _SVG_ICON_CACHE[file_name]
+
+
+def preload_svg_icons() -> None:
+    """Parse all icon files into the icon cache (used by build workers)."""
+    if ICONS_DIR.exists():
+        for svg_path in sorted(ICONS_DIR.glob("*.svg")):
+            get_svg_icon(svg_path.name)
+
+
 def load_svg_icon(icon_name: str) -> tuple:
     """
     Load SVG icon from the icons directory.
@@ -51,25 +95,15 @@ def load_svg_icon(icon_name: str) -> tuple:
         Tuple of (attributes_dict, inner_elements_list)
     """
     try:
-        icons_dir = (
-            Path(__file__).parent.parent.parent / "static_files" / "markup" / "icons"
-        )
-        svg_path = icons_dir / f"{icon_name}.svg"
-
-        if svg_path.exists():
-            with open(svg_path, "r", encoding="utf-8") as f:
-                svg_content = f.read()
-                # Parse and extract the inner elements
-                soup = BeautifulSoup(svg_content, "xml")
-                svg_tag = soup.find("svg")
-                if svg_tag:
-                    # Get all attributes from the SVG tag
-                    attrs = svg_tag.attrs
-                    # Get inner elements (not string, but actual elements)
-                    inner_elements = [
-                        child for child in svg_tag.children if hasattr(child, "name")
-                    ]
-                    return attrs, inner_elements
+        svg_tag = get_svg_icon(f"{icon_name}.svg")
+        if svg_tag:
+            # Get all attributes from the SVG tag
+            attrs = dict(svg_tag.attrs)
+            # Clone the inner elements, the cached icon stays untouched
+            inner_elements = [
+                copy.copy(child) for child in svg_tag.children if hasattr(child, "name")
+            ]
+            return attrs, inner_elements
         return {}, []
     except Exception as e:
         logger.warning(f"Failed to load SVG icon {icon_name}: {e}")
@@ -121,6 +155,330 @@ def add_class(tag: Tag, class_name: str) -> None:
         tag["class"] = classes + [class_name]
 
 
+def next_tag_sibling(element: Tag) -> Union[Tag, None]:
+    """
+    Returns the next sibling that is a tag, like find_next_sibling() without
+    arguments, but without BeautifulSoup's search machinery. The structural
+    passes below call this for every element of a page.
+    """
+    sibling = element.next_sibling
+    while sibling is not None and not isinstance(sibling, Tag):
+        sibling = sibling.next_sibling
+    return sibling
+
+
+# -----------------------------------------------------------------------------
+# Page Chrome Templates
+# -----------------------------------------------------------------------------
+# The head elements and the footer are the same on every page apart from a few
+# values, so they are filled into HTML templates instead of being built element
+# by element. The result is inserted as RawHTML, which is written out as is.
+
+# Pages are written with the minimal formatter (str() and prettify())
+CHROME_FORMATTER = HTMLFormatter.REGISTRY["minimal"]
+
+FOUC_PREVENTION_SCRIPT = """
+// Prevent FOUC by immediately applying theme before CSS loads
+(function() {
+    'use strict';
+    
+    // Remove the default light-mode class first
+    document.documentElement.classList.remove('light-mode');
+    
+    // Check localStorage for saved theme preference
+    const colorMode = localStorage.getItem('colorMode');
+    
+    if (colorMode === 'dark') {
+        document.documentElement.classList.add('dark-mode');
+    } else if (colorMode === 'light') {
+        document.documentElement.classList.add('light-mode');
+    } else {
+        // If no preference is saved, check system preference
+        if (window.matchMedia && window.matchMedia('(prefers-color-scheme: dark)').matches) {
+            document.documentElement.classList.add('dark-mode');
+        } else {
+            document.documentElement.classList.add('light-mode');
+        }
+    }
+})();
+"""
+
+ANCHOR_CHECK_SCRIPT = """
+// Immediate check to prevent scrolling to missing anchors
+(function() {
+    'use strict';
+    
+    // Parse anchor ID to extract provision and subprovision numbers
+    function parseAnchorId(anchorId) {
+        const match = anchorId.match(/seq-\\d+-prov-(\\d+[a-z]?)(?:-sub-(\\d+))?/);
+        if (match) {
+            return {
+                provision: match[1],
+                subprovision: match[2] || null
+            };
+        }
+        return null;
+    }
+    
+    // Force scroll to top immediately
+    window.scrollTo(0, 0);
+    
+    // This runs immediately when the script loads, before DOM is ready
+    const hash = window.location.hash.substring(1);
+    if (hash) {
+        const parsed = parseAnchorId(hash);
+        if (parsed) {
+            const urlParams = new URLSearchParams(window.location.search);
+            
+            // Case 1: Redirect with missing anchor
+            if (urlParams.get('redirected') === 'true' && urlParams.get('anchor_missing') === 'true') {
+                // Store the original hash for later use
+                window.__originalMissingAnchor = hash;
+                // Remove hash to prevent browser scrolling
+                history.replaceState(null, '', window.location.pathname + window.location.search);
+                // Set flag to prevent anchor-highlight.js from scrolling
+                window.__preventAnchorScroll = true;
+                // Force position at top
+                window.__forceTopPosition = true;
+            }
+            // Case 2: Direct access - we need to check if anchor exists after DOM loads
+            else {
+                // Store hash for checking later
+                window.__pendingAnchorCheck = hash;
+                // Temporarily remove hash to prevent immediate browser scroll
+                history.replaceState(null, '', window.location.pathname + window.location.search);
+            }
+        }
+    }
+})();
+
+// Continuously force top position until modal is shown
+if (window.__forceTopPosition) {
+    let scrollInterval = setInterval(function() {
+        window.scrollTo(0, 0);
+        // Stop when modal appears
+        if (document.querySelector('.anchor-warning-modal')) {
+            clearInterval(scrollInterval);
+            delete window.__forceTopPosition;
+        }
+    }, 10);
+    
+    // Failsafe: stop after 2 seconds
+    setTimeout(function() {
+        clearInterval(scrollInterval);
+        delete window.__forceTopPosition;
+    }, 2000);
+}
+
+// Check for direct access to missing anchors after DOM is ready
+document.addEventListener('DOMContentLoaded', function() {
+    if (window.__pendingAnchorCheck) {
+        const hash = window.__pendingAnchorCheck;
+        const anchorExists = document.getElementById(hash);
+        
+        if (!anchorExists) {
+            // Anchor doesn't exist - keep it removed and store for warning
+            window.__originalMissingAnchor = hash;
+            window.__preventAnchorScroll = true;
+            window.__forceTopPosition = true;
+            
+            // Start forcing top position
+            let scrollInterval = setInterval(function() {
+                window.scrollTo(0, 0);
+                // Stop when modal appears
+                if (document.querySelector('.anchor-warning-modal')) {
+                    clearInterval(scrollInterval);
+                    delete window.__forceTopPosition;
+                }
+            }, 10);
+            
+            // Failsafe: stop after 2 seconds
+            setTimeout(function() {
+                clearInterval(scrollInterval);
+                delete window.__forceTopPosition;
+            }, 2000);
+        } else {
+            // Anchor exists - restore it and let normal scrolling happen
+            history.replaceState(null, '', '#' + hash);
+            // Trigger hashchange event to update highlighting
+            window.dispatchEvent(new Event('hashchange'));
+        }
+        
+        delete window.__pendingAnchorCheck;
+    }
+});
+"""
+
+# Attribute slots take quoted values, see escape_attribute()
+HEAD_TEMPLATE = (
+    "<link href={styles_css} rel=\"stylesheet\"/>"
+    '<link href="/favicon.ico" rel="shortcut icon" type="image/x-icon"/>'
+    '<link href="/favicon.ico" rel="icon" type="image/x-icon"/>'
+    "<title>{title}</title>"
+    '<meta content="width=device-width, initial-scale=1" name="viewport"/>'
+    '<meta charset="utf-8"/>'
+    '<meta content="de-CH" name="language"/>'
+    '<meta content={description} name="description"/>'
+    "{canonical_link}"
+    "{fouc_prevention_script}"
+    '<script defer="True" src={dark_mode_js}></script>'
+    "<script>{anchor_check_script}</script>"
+)
+
+FOOTER_LINKS = [
+    ("Home", "/"),
+    ("Über zhlaw.ch", "/about.html"),
+    ("Datenschutz", "/privacy.html"),
+    ("Ratsversand", "/dispatch.html"),
+    ("Datensätze", "/data.html"),
+    ("Kontakt", "mailto:admin@zhlaw.ch"),
+]
+
+FOOTER_TEMPLATE = (
+    '<div id="page-footer"><div class="footer-links-container">{links}</div>'
+    '<div id="disclaimer">'
+    "<p>Dies ist keine amtliche Veröffentlichung. Massgebend ist die "
+    "Veröffentlichung durch die Staatskanzlei ZH.</p>"
+    "<p>Es wird keine Gewähr für die Richtigkeit, Vollständigkeit oder Aktualität "
+    "der hier zur Verfügung gestellten Inhalte übernommen.</p>"
+    "</div></div>"
+    '<script defer="True" src={custom_search_js}></script>'
+    '<script defer="True" src={quick_select_js}></script>'
+    '<script defer="True" src={provision_jump_js}></script>'
+    '<script defer="True" src={anchor_tooltip_js}></script>'
+    '<script defer="True" src={copy_links_js}></script>'
+    '<script defer="True" src={nav_tooltips_js}></script>'
+    "{sidebar_modal}"
+    # GoatCounter script, comment out if not needed on clone
+    '<script async data-goatcounter="https://stats.zhlaw.ch/count" '
+    'src="//stats.zhlaw.ch/count.js"></script>'
+)
+
+# Floating info button and sidebar modal (content will be moved by JavaScript
+# on mobile), only on pages with a sidebar
+SIDEBAR_MODAL_TEMPLATE = (
+    '<script defer="True" src={sidebar_modal_js}></script>'
+    '<button aria-label="Informationen anzeigen" class={button_classes} '
+    'id="floating-info-button" title="Informationen anzeigen">{info_icon}</button>'
+    '<div aria-hidden="true" aria-labelledby="sidebar-modal-title" '
+    'class="sidebar-modal" id="sidebar-modal" role="dialog">'
+    '<div class="sidebar-modal-content"></div></div>'
+)
+
+
+def escape_attribute(value: str) -> str:
+    """Returns an attribute value quoted and escaped the way BeautifulSoup writes it."""
+    return CHROME_FORMATTER.quoted_attribute_value(
+        CHROME_FORMATTER.attribute_value(value)
+    )
+
+
+def versioned_asset_attribute(asset_url: str) -> str:
+    """Returns the versioned URL of an asset as a quoted attribute value."""
+    return escape_attribute(get_versioned_asset_url(asset_url))
+
+
+def render_info_icon() -> str:
+    """
+    Returns the LucideInfo.svg icon of the floating info button, sized to 20px,
+    or "i" if the icon is missing.
+    """
+    svg_element = get_svg_icon("LucideInfo.svg")
+    if not svg_element:
+        return "i"
+    soup = BeautifulSoup("", "html.parser")
+
+    # Copy the tag elements (no comments), the cached icon stays untouched
+    def copy_element(source_elem: Tag) -> Tag:
+        new_elem = soup.new_tag(source_elem.name)
+        for attr, value in source_elem.attrs.items():
+            new_elem[attr] = value
+        for child in source_elem.children:
+            if isinstance(child, Tag):
+                new_elem.append(copy_element(child))
+        if source_elem.string and source_elem.string.strip():
+            new_elem.string = source_elem.string
+        return new_elem
+
+    new_svg = copy_element(svg_element)
+    new_svg["width"] = "20"
+    new_svg["height"] = "20"
+    return str(new_svg)
+
+
+def fill_head_template(
+    erlasstitel: str,
+    ordnungsnummer: str = "",
+    nachtragsnummer: str = "",
+    canonical_url: str = "",
+    add_fouc_script: bool = True,
+) -> RawHTML:
+    """
+    Returns the head elements of a law page: stylesheet, favicons, title, meta
+    tags (language, description, canonical URL) and the dark mode and anchor
+    scripts.
+    """
+    if ordnungsnummer and nachtragsnummer:
+        description = f"{ordnungsnummer}-{nachtragsnummer} ∗ {erlasstitel}"
+    else:
+        description = erlasstitel
+    canonical_link = ""
+    if canonical_url:
+        canonical_link = (
+            f"<link href={escape_attribute(canonical_url)} rel=\"canonical\"/>"
+        )
+    return RawHTML(
+        HEAD_TEMPLATE.format(
+            styles_css=versioned_asset_attribute("/styles.css"),
+            title=CHROME_FORMATTER.substitute(erlasstitel),
+            description=escape_attribute(description),
+            canonical_link=canonical_link,
+            fouc_prevention_script=(
+                f"<script>{FOUC_PREVENTION_SCRIPT}</script>" if add_fouc_script else ""
+            ),
+            dark_mode_js=versioned_asset_attribute("/dark-mode.js"),
+            anchor_check_script=ANCHOR_CHECK_SCRIPT,
+        )
+    )
+
+
+def fill_footer_template(
+    has_sidebar: bool, in_force_status: Union[bool, None] = None
+) -> RawHTML:
+    """
+    Returns the footer (links, disclaimer and scripts) of a page. Pages with a
+    sidebar also get the floating info button, styled by the in-force status,
+    and the sidebar modal.
+    """
+    links = '<span class="footer-seperator">∗</span>'.join(
+        f'<a class="footer-links" href={escape_attribute(href)}>'
+        f"{CHROME_FORMATTER.substitute(text)}</a>"
+        for text, href in FOOTER_LINKS
+    )
+    sidebar_modal = ""
+    if has_sidebar:
+        button_classes = "floating-info-button"
+        if in_force_status is not None:
+            button_classes += " in-force-yes" if in_force_status else " in-force-no"
+        sidebar_modal = SIDEBAR_MODAL_TEMPLATE.format(
+            sidebar_modal_js=versioned_asset_attribute("/sidebar-modal.js"),
+            button_classes=escape_attribute(button_classes),
+            info_icon=render_info_icon(),
+        )
+    return RawHTML(
+        FOOTER_TEMPLATE.format(
+            links=links,
+            custom_search_js=versioned_asset_attribute("/custom-search.js"),
+            quick_select_js=versioned_asset_attribute("/quick-select.js"),
+            provision_jump_js=versioned_asset_attribute("/provision-jump.js"),
+            anchor_tooltip_js=versioned_asset_attribute("/anchor-tooltip.js"),
+            copy_links_js=versioned_asset_attribute("/copy-links.js"),
+            nav_tooltips_js=versioned_asset_attribute("/nav-button-tooltips.js"),
+            sidebar_modal=sidebar_modal,
+        )
+    )
+
+
 # -----------------------------------------------------------------------------
 # Navigation and Header Functions
 # -----------------------------------------------------------------------------
@@ -130,11 +488,6 @@ def create_nav_buttons(soup: BeautifulSoup) -> Tag:
     """
     nav_div: Tag = soup.new_tag("div", **{"class": "nav-buttons"})
 
-    # Path to icon directory
-    icons_dir = (
-        Path(__file__).parent.parent.parent / "static_files" / "markup" / "icons"
-    )
-
     for config in BUTTON_CONFIGS:
         # Handle special buttons (like provision jump) differently
         if config.get("special"):
@@ -157,56 +510,44 @@ def create_nav_buttons(soup: BeautifulSoup) -> Tag:
                 },
             )
 
-        # Load and parse SVG icon
-        icon_path = icons_dir / config["icon"]
-        if icon_path.exists():
-            with open(icon_path, "r", encoding="utf-8") as f:
-                svg_content = f.read()
-
-            # Parse SVG and extract content
-            svg_soup = BeautifulSoup(svg_content, "xml")
-            svg_element = svg_soup.find("svg")
-
-            if svg_element:
-                # Create a new SVG element for the button
-                symbol: Tag = soup.new_tag("span", **{"class": "nav-symbol"})
-
-                # Clone the SVG element with all its attributes and content
-                new_svg = soup.new_tag("svg")
-
-                # Copy SVG attributes but ensure proper sizing
-                for attr, value in svg_element.attrs.items():
-                    if attr == "width":
-                        new_svg[attr] = "24"
-                    elif attr == "height":
-                        new_svg[attr] = "24"
-                    else:
-                        new_svg[attr] = value
-
-                # Copy all child elements recursively
-                def copy_element(source_elem, parent_elem):
-                    for child in source_elem.children:
-                        if (
-                            hasattr(child, "name") and child.name
-                        ):  # Only copy tag elements with valid names
-                            new_child = soup.new_tag(child.name)
-                            for attr, value in child.attrs.items():
-                                new_child[attr] = value
-                            if child.string and child.string.strip():
-                                new_child.string = child.string
-                            parent_elem.append(new_child)
-                            # Recursively copy nested elements
-                            copy_element(child, new_child)
-
-                copy_element(svg_element, new_svg)
-
-                symbol.append(new_svg)
-            else:
-                # Fallback to text if SVG parsing fails
-                symbol: Tag = soup.new_tag("span", **{"class": "nav-symbol"})
-                symbol.string = "•"
+        # Get the parsed SVG icon
+        svg_element = get_svg_icon(config["icon"])
+        if svg_element:
+            # Create a new SVG element for the button
+            symbol: Tag = soup.new_tag("span", **{"class": "nav-symbol"})
+
+            # Clone the SVG element with all its attributes and content
+            new_svg = soup.new_tag("svg")
+
+            # Copy SVG attributes but ensure proper sizing
+            for attr, value in svg_element.attrs.items():
+                if attr == "width":
+                    new_svg[attr] = "24"
+                elif attr == "height":
+                    new_svg[attr] = "24"
+                else:
+                    new_svg[attr] = value
+
+            # Copy all child elements recursively
+            def copy_element(source_elem, parent_elem):
+                for child in source_elem.children:
+                    if (
+                        hasattr(child, "name") and child.name
+                    ):  # Only copy tag elements with valid names
+                        new_child = soup.new_tag(child.name)
+                        for attr, value in child.attrs.items():
+                            new_child[attr] = value
+                        if child.string and child.string.strip():
+                            new_child.string = child.string
+                        parent_elem.append(new_child)
+                        # Recursively copy nested elements
+                        copy_element(child, new_child)
+
+            copy_element(svg_element, new_svg)
+
+            symbol.append(new_svg)
         else:
-            # Fallback to text if icon file doesn't exist
+            # Fallback to text if the icon is missing or has no SVG
             symbol: Tag = soup.new_tag("span", **{"class": "nav-symbol"})
             symbol.string = "•"
 
@@ -253,75 +594,41 @@ def insert_header(soup: BeautifulSoup, law_origin: str = None) -> BeautifulSoup:
         **{"aria-label": "Dark Mode umschalten", "class": "dark-mode-button"},
     )
 
-    # Load and add LucideMoon.svg icon (default for light mode)
-    moon_icon_path = (
-        Path(__file__).parent.parent.parent
-        / "static_files"
-        / "markup"
-        / "icons"
-        / "LucideMoon.svg"
-    )
-    if moon_icon_path.exists():
-        with open(moon_icon_path, "r", encoding="utf-8") as f:
-            svg_content = f.read()
-
-        # Parse SVG and extract content
-        svg_soup = BeautifulSoup(svg_content, "xml")
-        svg_element = svg_soup.find("svg")
-
-        if svg_element:
-            # Create a new SVG element for the button
-            new_svg = soup.new_tag("svg")
-            new_svg["class"] = "dark-mode-icon"
-
-            # Copy SVG attributes but ensure proper sizing
-            for attr, value in svg_element.attrs.items():
-                if attr == "width":
-                    new_svg[attr] = "24"
-                elif attr == "height":
-                    new_svg[attr] = "24"
-                elif attr != "class":  # Don't override our class
-                    new_svg[attr] = value
-
-            # Copy all child elements recursively
-            def copy_element(source_elem, parent_elem):
-                for child in source_elem.children:
-                    if (
-                        hasattr(child, "name") and child.name
-                    ):  # Only copy tag elements with valid names
-                        new_child = soup.new_tag(child.name)
-                        for attr, value in child.attrs.items():
-                            new_child[attr] = value
-                        if child.string and child.string.strip():
-                            new_child.string = child.string
-                        parent_elem.append(new_child)
-                        # Recursively copy nested elements
-                        copy_element(child, new_child)
-
-            copy_element(svg_element, new_svg)
-            dark_mode_toggle.append(new_svg)
-        else:
-            # Fallback to hardcoded moon SVG if parsing fails
-            moon_svg = soup.new_tag(
-                "svg",
-                xmlns="http://www.w3.org/2000/svg",
-                width="24",
-                height="24",
-                viewBox="0 0 24 24",
-                fill="none",
-                stroke="currentColor",
-                **{
-                    "stroke-width": "2",
-                    "stroke-linecap": "round",
-                    "stroke-linejoin": "round",
-                    "class": "dark-mode-icon",
-                },
-            )
-            moon_path = soup.new_tag("path", d="M12 3a6 6 0 0 0 9 9a9 9 0 1 1-9-9")
-            moon_svg.append(moon_path)
-            dark_mode_toggle.append(moon_svg)
+    # Add LucideMoon.svg icon (default for light mode)
+    svg_element = get_svg_icon("LucideMoon.svg")
+    if svg_element:
+        # Create a new SVG element for the button
+        new_svg = soup.new_tag("svg")
+        new_svg["class"] = "dark-mode-icon"
+
+        # Copy SVG attributes but ensure proper sizing
+        for attr, value in svg_element.attrs.items():
+            if attr == "width":
+                new_svg[attr] = "24"
+            elif attr == "height":
+                new_svg[attr] = "24"
+            elif attr != "class":  # Don't override our class
+                new_svg[attr] = value
+
+        # Copy all child elements recursively
+        def copy_element(source_elem, parent_elem):
+            for child in source_elem.children:
+                if (
+                    hasattr(child, "name") and child.name
+                ):  # Only copy tag elements with valid names
+                    new_child = soup.new_tag(child.name)
+                    for attr, value in child.attrs.items():
+                        new_child[attr] = value
+                    if child.string and child.string.strip():
+                        new_child.string = child.string
+                    parent_elem.append(new_child)
+                    # Recursively copy nested elements
+                    copy_element(child, new_child)
+
+        copy_element(svg_element, new_svg)
+        dark_mode_toggle.append(new_svg)
     else:
-        # Fallback to hardcoded moon SVG if file doesn't exist
+        # Fallback to hardcoded moon SVG if the icon is missing or has no SVG
         moon_svg = soup.new_tag(
             "svg",
             xmlns="http://www.w3.org/2000/svg",
@@ -375,7 +682,9 @@ def insert_header(soup: BeautifulSoup, law_origin: str = None) -> BeautifulSoup:
         head.append(anchor_handling_script)
 
         # Add version comparison script
-        # TODO: Uncomment if diffs are needed (see block in build_site)
+        # TODO: Diff pages are only built with --diffs and not linked from the
+        # law pages yet: old_code/version-comparison.js expects the former
+        # navigation markup (prev_ver button) and only handles col-zh
         # version_comparison_script: Tag = soup.new_tag(
         #     "script", src="/version-comparison.js", defer=True
         # )
@@ -397,182 +706,11 @@ def insert_footer(soup: BeautifulSoup, in_force_status: bool = None) -> Beautifu
         soup: BeautifulSoup object to modify
         in_force_status: Boolean indicating if the law is in force (affects floating button styling)
     """
-    footer: Tag = soup.new_tag("div", **{"id": "page-footer"})
-    links_container: Tag = soup.new_tag("div", **{"class": "footer-links-container"})
-    links = [
-        ("Home", "/"),
-        ("Über zhlaw.ch", "/about.html"),
-        ("Datenschutz", "/privacy.html"),
-        ("Ratsversand", "/dispatch.html"),
-        ("Datensätze", "/data.html"),
-        ("Kontakt", "mailto:admin@zhlaw.ch"),
-    ]
-    for i, (text, href) in enumerate(links):
-        link: Tag = soup.new_tag("a", href=href, **{"class": "footer-links"})
-        link.string = text
-        links_container.append(link)
-        if i < len(links) - 1:
-            separator: Tag = soup.new_tag("span", **{"class": "footer-seperator"})
-            separator.string = "∗"
-            links_container.append(separator)
-    footer.append(links_container)
-    disclaimer_container: Tag = soup.new_tag("div", **{"id": "disclaimer"})
-    disclaimer_p1: Tag = soup.new_tag("p")
-    disclaimer_p1.string = "Dies ist keine amtliche Veröffentlichung. Massgebend ist die Veröffentlichung durch die Staatskanzlei ZH."
-    disclaimer_container.append(disclaimer_p1)
-    disclaimer_p2: Tag = soup.new_tag("p")
-    disclaimer_p2.string = "Es wird keine Gewähr für die Richtigkeit, Vollständigkeit oder Aktualität der hier zur Verfügung gestellten Inhalte übernommen."
-    disclaimer_container.append(disclaimer_p2)
-    footer.append(disclaimer_container)
     body: Union[Tag, None] = soup.find("body")
     if body:
-        body.append(footer)
-
-        # Add JavaScript files with versioning
-
-        # Custom search script (load early for search functionality)
-        custom_search_src = get_versioned_asset_url("/custom-search.js")
-        custom_search_script = soup.new_tag("script", src=custom_search_src, defer=True)
-        body.append(custom_search_script)
-
-        # Quick select script
-        quick_select_src = get_versioned_asset_url("/quick-select.js")
-        quick_select_script = soup.new_tag("script", src=quick_select_src, defer=True)
-        body.append(quick_select_script)
-
-        # Provision jump script
-        provision_jump_src = get_versioned_asset_url("/provision-jump.js")
-        provision_jump_script = soup.new_tag(
-            "script", src=provision_jump_src, defer=True
-        )
-        body.append(provision_jump_script)
-
-        # Anchor tooltip script
-        anchor_tooltip_src = get_versioned_asset_url("/anchor-tooltip.js")
-        anchor_tooltip_script = soup.new_tag(
-            "script", src=anchor_tooltip_src, defer=True
-        )
-        body.append(anchor_tooltip_script)
-
-        # Copy links script
-        copy_links_src = get_versioned_asset_url("/copy-links.js")
-        copy_links_script = soup.new_tag("script", src=copy_links_src, defer=True)
-        body.append(copy_links_script)
-
-        # Nav button tooltips script
-        nav_tooltips_src = get_versioned_asset_url("/nav-button-tooltips.js")
-        nav_tooltips_script = soup.new_tag("script", src=nav_tooltips_src, defer=True)
-        body.append(nav_tooltips_script)
-
         # Only add floating button and sidebar modal if a sidebar exists
         sidebar = soup.find("div", id="sidebar")
-        if sidebar:
-            # Sidebar modal script (only load when sidebar exists)
-            sidebar_modal_src = get_versioned_asset_url("/sidebar-modal.js")
-            sidebar_modal_script = soup.new_tag(
-                "script", src=sidebar_modal_src, defer=True
-            )
-            body.append(sidebar_modal_script)
-
-            # Add floating info button with status-based styling
-            button_classes = "floating-info-button"
-            if in_force_status is not None:
-                button_classes += " in-force-yes" if in_force_status else " in-force-no"
-
-            floating_button = soup.new_tag(
-                "button",
-                id="floating-info-button",
-                **{
-                    "class": button_classes,
-                    "aria-label": "Informationen anzeigen",
-                    "title": "Informationen anzeigen",
-                },
-            )
-
-            # Load and add LucideInfo.svg icon
-            info_icon_path = (
-                Path(__file__).parent.parent.parent
-                / "static_files"
-                / "markup"
-                / "icons"
-                / "LucideInfo.svg"
-            )
-            if info_icon_path.exists():
-                with open(info_icon_path, "r", encoding="utf-8") as f:
-                    svg_content = f.read()
-
-                # Parse SVG and extract content
-                svg_soup = BeautifulSoup(svg_content, "xml")
-                svg_element = svg_soup.find("svg")
-
-                if svg_element:
-                    # Create a new SVG element for the button
-                    new_svg = soup.new_tag("svg")
-
-                    # Copy SVG attributes but ensure proper sizing
-                    for attr, value in svg_element.attrs.items():
-                        if attr == "width":
-                            new_svg[attr] = "20"
-                        elif attr == "height":
-                            new_svg[attr] = "20"
-                        else:
-                            new_svg[attr] = value
-
-                    # Copy all child elements recursively
-                    def copy_element(source_elem, parent_elem):
-                        for child in source_elem.children:
-                            if (
-                                hasattr(child, "name") and child.name
-                            ):  # Only copy tag elements with valid names
-                                new_child = soup.new_tag(child.name)
-                                for attr, value in child.attrs.items():
-                                    new_child[attr] = value
-                                if child.string and child.string.strip():
-                                    new_child.string = child.string
-                                parent_elem.append(new_child)
-                                # Recursively copy nested elements
-                                copy_element(child, new_child)
-
-                    copy_element(svg_element, new_svg)
-                    floating_button.append(new_svg)
-                else:
-                    # Fallback to text if SVG parsing fails
-                    floating_button.string = "i"
-            else:
-                # Fallback to text if icon file doesn't exist
-                floating_button.string = "i"
-
-            body.append(floating_button)
-
-            # Add sidebar modal (content will be moved by JavaScript on mobile)
-            sidebar_modal = soup.new_tag(
-                "div",
-                id="sidebar-modal",
-                **{
-                    "class": "sidebar-modal",
-                    "role": "dialog",
-                    "aria-labelledby": "sidebar-modal-title",
-                    "aria-hidden": "true",
-                },
-            )
-
-            sidebar_modal_content = soup.new_tag(
-                "div", **{"class": "sidebar-modal-content"}
-            )
-            sidebar_modal.append(sidebar_modal_content)
-            body.append(sidebar_modal)
-
-        # Add GoatCounter script
-        # Comment out if not needed on clone
-        goatcounter_script = soup.new_tag(
-            "script",
-            attrs={
-                "data-goatcounter": "https://stats.zhlaw.ch/count",
-                "async": None,
-                "src": "//stats.zhlaw.ch/count.js",
-            },
-        )
-        body.append(goatcounter_script)
+        body.append(fill_footer_template(sidebar is not None, in_force_status))
     return soup
 
 
@@ -621,206 +759,20 @@ def modify_html(
         if href in ["styles.css", "/styles.css"]:
             link.decompose()
 
-    # Add CSS stylesheet with versioning
-    css_href = get_versioned_asset_url("/styles.css")
-    css_link: Tag = soup.new_tag("link", rel="stylesheet", href=css_href)
-    head.append(css_link)
-
-    # Add favicon links
-    shortcut_icon: Tag = soup.new_tag(
-        "link", rel="shortcut icon", href="/favicon.ico", type="image/x-icon"
-    )
-    head.append(shortcut_icon)
-    favicon: Tag = soup.new_tag(
-        "link", rel="icon", href="/favicon.ico", type="image/x-icon"
-    )
-    head.append(favicon)
-
-    # Add title
-    title_tag: Tag = soup.new_tag("title")
-    title_tag.string = erlasstitel
-    head.append(title_tag)
-
-    # Add viewport and charset meta tags
-    viewport_meta: Tag = soup.new_tag(
-        "meta",
-        attrs={"name": "viewport", "content": "width=device-width, initial-scale=1"},
-    )
-    head.append(viewport_meta)
-    encoding_meta: Tag = soup.new_tag("meta", charset="utf-8")
-    head.append(encoding_meta)
-
-    # Add language meta tag
-    language_meta: Tag = soup.new_tag(
-        "meta", attrs={"name": "language", "content": "de-CH"}
-    )
-    head.append(language_meta)
-
-    # Add description meta tag
-    if ordnungsnummer and nachtragsnummer:
-        description = f"{ordnungsnummer}-{nachtragsnummer} ∗ {erlasstitel}"
-    else:
-        description = erlasstitel
-
-    description_meta: Tag = soup.new_tag(
-        "meta", attrs={"name": "description", "content": description}
-    )
-    head.append(description_meta)
-
-    # Add canonical URL if provided and different from current page
-    if canonical_url:
-        canonical_link: Tag = soup.new_tag("link", rel="canonical", href=canonical_url)
-        head.append(canonical_link)
-
-    # Add inline script to prevent FOUC (Flash of Unstyled Content) for dark mode
-    # Only add if not already present
+    # Add stylesheet, favicons, title, meta tags and scripts
     existing_fouc_scripts = head.find_all("script")
     has_fouc_script = any(
         "Prevent FOUC" in script.get_text() for script in existing_fouc_scripts
     )
-
-    if not has_fouc_script:
-        fouc_prevention_script: Tag = soup.new_tag("script")
-        fouc_prevention_script.string = """
-// Prevent FOUC by immediately applying theme before CSS loads
-(function() {
-    'use strict';
-    
-    // Remove the default light-mode class first
-    document.documentElement.classList.remove('light-mode');
-    
-    // Check localStorage for saved theme preference
-    const colorMode = localStorage.getItem('colorMode');
-    
-    if (colorMode === 'dark') {
-        document.documentElement.classList.add('dark-mode');
-    } else if (colorMode === 'light') {
-        document.documentElement.classList.add('light-mode');
-    } else {
-        // If no preference is saved, check system preference
-        if (window.matchMedia && window.matchMedia('(prefers-color-scheme: dark)').matches) {
-            document.documentElement.classList.add('dark-mode');
-        } else {
-            document.documentElement.classList.add('light-mode');
-        }
-    }
-})();
-"""
-        head.append(fouc_prevention_script)
-
-    # Add dark mode script with versioning
-    dark_mode_src = get_versioned_asset_url("/dark-mode.js")
-    dark_mode_script: Tag = soup.new_tag("script", src=dark_mode_src, defer=True)
-    head.append(dark_mode_script)
-
-    # Add inline script to prevent scrolling to missing anchors
-    anchor_check_script: Tag = soup.new_tag("script")
-    anchor_check_script.string = """
-// Immediate check to prevent scrolling to missing anchors
-(function() {
-    'use strict';
-    
-    // Parse anchor ID to extract provision and subprovision numbers
-    function parseAnchorId(anchorId) {
-        const match = anchorId.match(/seq-\\d+-prov-(\\d+[a-z]?)(?:-sub-(\\d+))?/);
-        if (match) {
-            return {
-                provision: match[1],
-                subprovision: match[2] || null
-            };
-        }
-        return null;
-    }
-    
-    // Force scroll to top immediately
-    window.scrollTo(0, 0);
-    
-    // This runs immediately when the script loads, before DOM is ready
-    const hash = window.location.hash.substring(1);
-    if (hash) {
-        const parsed = parseAnchorId(hash);
-        if (parsed) {
-            const urlParams = new URLSearchParams(window.location.search);
-            
-            // Case 1: Redirect with missing anchor
-            if (urlParams.get('redirected') === 'true' && urlParams.get('anchor_missing') === 'true') {
-                // Store the original hash for later use
-                window.__originalMissingAnchor = hash;
-                // Remove hash to prevent browser scrolling
-                history.replaceState(null, '', window.location.pathname + window.location.search);
-                // Set flag to prevent anchor-highlight.js from scrolling
-                window.__preventAnchorScroll = true;
-                // Force position at top
-                window.__forceTopPosition = true;
-            }
-            // Case 2: Direct access - we need to check if anchor exists after DOM loads
-            else {
-                // Store hash for checking later
-                window.__pendingAnchorCheck = hash;
-                // Temporarily remove hash to prevent immediate browser scroll
-                history.replaceState(null, '', window.location.pathname + window.location.search);
-            }
-        }
-    }
-})();
-
-// Continuously force top position until modal is shown
-if (window.__forceTopPosition) {
-    let scrollInterval = setInterval(function() {
-        window.scrollTo(0, 0);
-        // Stop when modal appears
-        if (document.querySelector('.anchor-warning-modal')) {
-            clearInterval(scrollInterval);
-            delete window.__forceTopPosition;
-        }
-    }, 10);
-    
-    // Failsafe: stop after 2 seconds
-    setTimeout(function() {
-        clearInterval(scrollInterval);
-        delete window.__forceTopPosition;
-    }, 2000);
-}
-
-// Check for direct access to missing anchors after DOM is ready
-document.addEventListener('DOMContentLoaded', function() {
-    if (window.__pendingAnchorCheck) {
-        const hash = window.__pendingAnchorCheck;
-        const anchorExists = document.getElementById(hash);
-        
-        if (!anchorExists) {
-            // Anchor doesn't exist - keep it removed and store for warning
-            window.__originalMissingAnchor = hash;
-            window.__preventAnchorScroll = true;
-            window.__forceTopPosition = true;
-            
-            // Start forcing top position
-            let scrollInterval = setInterval(function() {
-                window.scrollTo(0, 0);
-                // Stop when modal appears
-                if (document.querySelector('.anchor-warning-modal')) {
-                    clearInterval(scrollInterval);
-                    delete window.__forceTopPosition;
-                }
-            }, 10);
-            
-            // Failsafe: stop after 2 seconds
-            setTimeout(function() {
-                clearInterval(scrollInterval);
-                delete window.__forceTopPosition;
-            }, 2000);
-        } else {
-            // Anchor exists - restore it and let normal scrolling happen
-            history.replaceState(null, '', '#' + hash);
-            // Trigger hashchange event to update highlighting
-            window.dispatchEvent(new Event('hashchange'));
-        }
-        
-        delete window.__pendingAnchorCheck;
-    }
-});
-"""
-    head.append(anchor_check_script)
+    head.append(
+        fill_head_template(
+            erlasstitel,
+            ordnungsnummer,
+            nachtragsnummer,
+            canonical_url,
+            add_fouc_script=not has_fouc_script,
+        )
+    )
 
     # Reorganize body contents into structured containers
     body: Union[Tag, None] = soup.body
@@ -1307,8 +1259,11 @@ def consolidate_enum_paragraphs(soup: BeautifulSoup) -> BeautifulSoup:
                 next_p = paragraphs[next_idx]
                 # Check for any heading element between the current enumeration paragraph and the next paragraph.
                 barrier_found = False
-                next_element = current.find_next()
-                while next_element is not None and next_element != next_p:
+                for next_element in current.next_elements:
+                    if not isinstance(next_element, Tag):
+                        continue
+                    if next_element == next_p:
+                        break
                     if next_element.name in {
                         "h1",
                         "h2",
@@ -1320,7 +1275,6 @@ def consolidate_enum_paragraphs(soup: BeautifulSoup) -> BeautifulSoup:
                     }:
                         barrier_found = True
                         break
-                    next_element = next_element.find_next()
                 # If a heading is found between, stop merging further paragraphs.
                 if barrier_found:
                     break
@@ -1379,7 +1333,7 @@ def wrap_subprovisions(soup: BeautifulSoup) -> BeautifulSoup:
         first_content_p_marked = False
 
         while current_element:
-            next_sibling = current_element.find_next_sibling()
+            next_sibling = next_tag_sibling(current_element)
 
             stop = False
             if isinstance(current_element, Tag):
@@ -1466,62 +1420,58 @@ def merge_paragraphs_with_footnote_refs(soup: BeautifulSoup) -> BeautifulSoup:
     excluded_classes = ["first-level", "second-level"]
     punctuation_chars = ".,;:?!()[]{}"
 
-    # Process multiple passes until no more changes
-    changes_made = True
-    while changes_made:
-        changes_made = False
+    def footnote_continuation_rule(engine: ParagraphMergeEngine, node: MergeNode):
+        if node.next is None:
+            return None
+        current_elem = node.tag
+        next_elem = node.next.tag
 
-        # Get fresh list of elements
-        elements = soup.find_all(["p", "h1", "h2", "h3", "h4", "h5", "h6"])
+        # Must be direct siblings
+        if next_elem != next_tag_sibling(current_elem):
+            return None
 
-        for i in range(len(elements) - 1):
-            current_elem = elements[i]
-            next_elem = elements[i + 1]
+        # Check for excluded classes
+        current_classes = current_elem.get("class", [])
+        next_classes = next_elem.get("class", [])
 
-            # Must be direct siblings
-            if next_elem != current_elem.find_next_sibling():
-                continue
-
-            # Check for excluded classes
-            current_classes = current_elem.get("class", [])
-            next_classes = next_elem.get("class", [])
-
-            if any(cls in excluded_classes for cls in current_classes) or any(
-                cls in excluded_classes for cls in next_classes
-            ):
-                continue
+        if any(cls in excluded_classes for cls in current_classes) or any(
+            cls in excluded_classes for cls in next_classes
+        ):
+            return None
 
-            # Must be same tag type
-            if current_elem.name != next_elem.name:
-                continue
+        # Must be same tag type
+        if current_elem.name != next_elem.name:
+            return None
 
-            # Must have identical classes
-            if set(current_classes) != set(next_classes):
-                continue
+        # Must have identical classes
+        if set(current_classes) != set(next_classes):
+            return None
 
-            # First element must contain a footnote reference
-            footnote_ref = current_elem.find("sup", class_="footnote-ref")
-            if not footnote_ref:
-                continue
+        # First element must contain a footnote reference
+        footnote_ref = current_elem.find("sup", class_="footnote-ref")
+        if not footnote_ref:
+            return None
 
-            # Second element must start with lowercase or punctuation
-            next_text = next_elem.get_text().strip()
-            if not next_text:
-                continue
+        # Second element must start with lowercase or punctuation
+        next_text = next_elem.get_text().strip()
+        if not next_text:
+            return None
 
-            if not (next_text[0].islower() or next_text[0] in punctuation_chars):
-                continue
+        if not (next_text[0].islower() or next_text[0] in punctuation_chars):
+            return None
 
-            # All conditions met - merge the elements
-            current_elem.append(" ")
-            while next_elem.contents:
-                current_elem.append(next_elem.contents[0])
-            next_elem.decompose()
+        # All conditions met - merge the elements
+        current_elem.append(" ")
+        while next_elem.contents:
+            current_elem.append(next_elem.contents[0])
+        engine.remove(node.next)
 
-            changes_made = True
-            break
+        # Compare the merged element with its new successor
+        return node
 
-    return soup
+    return ParagraphMergeEngine(
+        soup, ["p", "h1", "h2", "h3", "h4", "h5", "h6"]
+    ).run([footnote_continuation_rule])
 
 
 def exclude_footnotes_from_search(soup: BeautifulSoup) -> BeautifulSoup:
@@ -1550,6 +1500,17 @@ def wrap_provisions(soup: BeautifulSoup) -> BeautifulSoup:
     # Find all provision paragraphs
     provision_paragraphs = soup.find_all("p", class_="provision")
 
+    # Moving processed elements into containers keeps the relative order of
+    # the remaining ones, so a single index serves all order checks below.
+    order = DocumentOrderIndex(soup)
+
+    # Group marginalia containers by the provision they reference
+    marginalia_by_provision = {}
+    for marginalia in soup.find_all("div", class_="marginalia-container"):
+        marginalia_by_provision.setdefault(
+            marginalia.get("data-related-provision"), []
+        ).append(marginalia)
+
     for provision in provision_paragraphs:
         # Skip if already processed
         if id(provision) in processed_elements:
@@ -1566,15 +1527,11 @@ def wrap_provisions(soup: BeautifulSoup) -> BeautifulSoup:
             continue
 
         # Find all marginalia containers that reference this provision
-        related_marginalia = []
-        all_marginalia = soup.find_all("div", class_="marginalia-container")
-
-        for marginalia in all_marginalia:
-            if id(marginalia) in processed_elements:
-                continue
-
-            if marginalia.get("data-related-provision") == provision_id:
-                related_marginalia.append(marginalia)
+        related_marginalia = [
+            marginalia
+            for marginalia in marginalia_by_provision.get(provision_id, [])
+            if id(marginalia) not in processed_elements
+        ]
 
         # Create provision container
         prov_container = soup.new_tag("div", **{"class": "provision-container"})
@@ -1582,14 +1539,11 @@ def wrap_provisions(soup: BeautifulSoup) -> BeautifulSoup:
         # Insert container before the first element (either marginalia or provision)
         if related_marginalia:
             # Sort marginalia by their position in the document
-            related_marginalia.sort(key=lambda x: list(soup.descendants).index(x))
+            related_marginalia = order.sort(related_marginalia)
             first_element = related_marginalia[0]
 
             # Check if provision comes before its marginalia
-            prov_index = list(soup.descendants).index(provision)
-            first_marg_index = list(soup.descendants).index(first_element)
-
-            if prov_index < first_marg_index:
+            if order.is_before(provision, first_element):
                 first_element = provision
         else:
             first_element = provision
@@ -1606,10 +1560,10 @@ def wrap_provisions(soup: BeautifulSoup) -> BeautifulSoup:
         processed_elements.add(id(provision))
 
         # Collect subsequent content until a stop element is found
-        current_element = prov_container.find_next_sibling()
+        current_element = next_tag_sibling(prov_container)
 
         while current_element:
-            next_sibling = current_element.find_next_sibling()
+            next_sibling = next_tag_sibling(current_element)
 
             stop = False
             if isinstance(current_element, Tag):
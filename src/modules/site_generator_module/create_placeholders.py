@@ -8,6 +8,9 @@ or missing source documents). It:
 - Processes placeholders through the standard build pipeline
 - Ensures consistent formatting with regular law pages
 
+Placeholders are rendered from an in-memory template, so d1_build_site can
+submit them to the same process pool as the regular law pages.
+
 Placeholder pages inform users that the text is unavailable and provide a link
 to the original source for verification.
 
@@ -15,95 +18,124 @@ License:
     https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
 """
 
+import html
 import os
+from typing import Any, Dict, Iterable, List
+
 from bs4 import BeautifulSoup
 
 from src.modules.site_generator_module import build_zhlaw
 from src.utils.logging_utils import get_module_logger
+from src.utils.html_utils import parse_html, write_html
 from src.utils.progress_utils import progress_manager
 
 # Get logger from main module
 logger = get_module_logger(__name__)
 
+PLACEHOLDER_TEMPLATE = (
+    "<html><body><div id='law'><div id='source-text'>"
+    "<h1>Kein Erlasstext vorhanden.</h1>"
+    "<p>Möglicherweise enthält diese Nachtragsnummer keinen Text oder es liegt ein "
+    "Fehler in der automatisierten Verarbeitung vor. Bitte überprüfe die "
+    "<a href='{law_page_url}'>Quelle</a> für mehr Informationen.</p>"
+    "</div></div></body></html>"
+)
+
+
+def find_placeholder_pages(
+    laws: List[Dict[str, Any]], existing_files: Iterable[str]
+) -> List[Dict[str, Any]]:
+    """
+    Determine the law versions that need a placeholder page.
+
+    :param laws: List of laws as JSON data.
+    :param existing_files: File names of the law pages that exist (or will).
+    :return: One placeholder page per version without a page: its file name
+        and the doc_info to render it with.
+    """
+    existing_files = set(existing_files)
+    placeholder_pages = []
+
+    for law in laws:
+        ordnungsnummer = law["ordnungsnummer"]
+        erlasstitel = law["erlasstitel"]
+        for version in law["versions"]:
+            filename = f"{ordnungsnummer}-{version['nachtragsnummer']}.html"
+            if filename in existing_files:
+                continue
+            # Add to existing_files to prevent re-creation
+            existing_files.add(filename)
+
+            # Every page gets its own copy of the versions, as rendering marks
+            # the current version in them
+            versions = [
+                dict(other, erlasstitel=erlasstitel, ordnungsnummer=ordnungsnummer)
+                for other in law["versions"]
+            ]
+            doc_info = {
+                "erlasstitel": erlasstitel,
+                "ordnungsnummer": ordnungsnummer,
+                "nachtragsnummer": version["nachtragsnummer"],
+                "in_force": version.get("in_force", False),
+                "versions": versions,
+            }
+            # Add all other version info
+            doc_info.update(version, erlasstitel=erlasstitel, ordnungsnummer=ordnungsnummer)
+            placeholder_pages.append({"filename": filename, "doc_info": doc_info})
+
+    return placeholder_pages
 
-def main(laws, html_files, placeholder_dir):
+
+def render_placeholder(placeholder_page: Dict[str, Any]) -> BeautifulSoup:
+    """
+    Render a placeholder page like a regular law page.
+
+    Requires the state build_zhlaw renders pages with (e.g. its version map).
+
+    :param placeholder_page: Placeholder page, see find_placeholder_pages().
+    :return: The rendered page.
+    """
+    doc_info = placeholder_page["doc_info"]
+    law_page_url = html.escape(doc_info.get("law_page_url") or "", quote=True)
+    soup = parse_html(PLACEHOLDER_TEMPLATE.format(law_page_url=law_page_url))
+    return build_zhlaw.main(
+        soup, placeholder_page["filename"], doc_info, "new_html", law_origin="zh"
+    )
+
+
+def main(laws, html_files, placeholder_dir, minify_output=True):
     """
     Processes the collection data and creates placeholder HTML files where necessary.
     :param laws: List of laws as JSON data.
     :param html_files: List of paths to existing HTML files.
     :param placeholder_dir: Directory where placeholder HTML files should be created.
+    :param minify_output: Whether to minify the placeholder pages.
     """
     # Convert paths to filenames for easier comparison
     existing_files = set(os.path.basename(file) for file in html_files)
     # Ensure the placeholder folder exists
     os.makedirs(placeholder_dir, exist_ok=True)
-    
-    # Count total versions to process for progress tracking
+
     total_versions = sum(len(law.get("versions", [])) for law in laws)
-    placeholders_created = 0
-    
     logger.info(f"Checking {total_versions} law versions for missing HTML files")
-    
-    # Process each law and its versions
+    placeholder_pages = find_placeholder_pages(laws, existing_files)
+
     with progress_manager() as pm:
         counter = pm.create_counter(
-            total=total_versions,
-            desc=f"Checking {total_versions} versions for placeholders",
-            unit="versions"
+            total=len(placeholder_pages),
+            desc=f"Creating {len(placeholder_pages)} placeholders",
+            unit="pages"
         )
-        
-        for law in laws:
-            ordnungsnummer = law["ordnungsnummer"]
-            erlasstitel = law["erlasstitel"]
-            versions = law["versions"]
-            for version in versions:
-                nachtragsnummer = version["nachtragsnummer"]
-                law_page_url = version.get("law_page_url", "")
-                filename = f"{ordnungsnummer}-{nachtragsnummer}.html"
-                in_force = version.get("in_force", False)
-                # Add erlasstitel and ordnungsnummer to version
-                version["erlasstitel"] = erlasstitel
-                version["ordnungsnummer"] = ordnungsnummer
-                # Check if HTML file exists in the provided list
-                if filename not in existing_files:
-                    placeholder_path = os.path.join(placeholder_dir, filename)
-                    # File does not exist, create placeholder
-                    with open(placeholder_path, "w") as f:
-                        f.write(
-                            f"<html><body><div id='law'><div id='source-text'><h1>Kein Erlasstext vorhanden.</h1><p>Möglicherweise enthält diese Nachtragsnummer keinen Text oder es liegt ein Fehler in der automatisierten Verarbeitung vor. Bitte überprüfe die <a href='{law_page_url}'>Quelle</a> für mehr Informationen.</p></div></div></body></html>"
-                        )
-                    logger.debug(f"Created placeholder HTML file: {placeholder_path}")
-                    # Add to existing_files to prevent re-creation
-                    existing_files.add(filename)
-
-                    # Process the HTML with BeautifulSoup
-                    with open(placeholder_path, "r") as file:
-                        soup = BeautifulSoup(file, "html.parser")
-
-                    # Create document info dictionary
-                    doc_info = {
-                        "erlasstitel": erlasstitel,
-                        "ordnungsnummer": ordnungsnummer,
-                        "nachtragsnummer": nachtragsnummer,
-                        "in_force": in_force,
-                        "versions": versions,
-                    }
-                    doc_info.update(version)  # Add all other version info
-
-                    # Process the HTML using build_zhlaw's main function
-                    soup = build_zhlaw.main(
-                        soup, placeholder_path, doc_info, "new_html", law_origin="zh"
-                    )
-
-                    # Write the modified HTML back to the file
-                    from src.utils.html_utils import write_pretty_html
-                    write_pretty_html(soup, placeholder_path, encoding="utf-8", add_doctype=True)
-                    placeholders_created += 1
-                
-                counter.update()
-    
-    logger.info(f"Created {placeholders_created} placeholder files out of {total_versions} checked versions")
-
-
-if __name__ == "__main__":
-    main()
+
+        for placeholder_page in placeholder_pages:
+            placeholder_path = os.path.join(placeholder_dir, placeholder_page["filename"])
+            soup = render_placeholder(placeholder_page)
+            write_html(
+                soup, placeholder_path, encoding="utf-8", add_doctype=True, minify=minify_output
+            )
+            logger.debug(f"Created placeholder HTML file: {placeholder_path}")
+            counter.update()
+
+    logger.info(
+        f"Created {len(placeholder_pages)} placeholder files out of {total_versions} checked versions"
+    )
@@ -2,6 +2,10 @@
 
 This module creates sitemap.xml files following the sitemap protocol with enhanced
 features including:
+- A sitemap index (sitemap.xml) referencing one or more sitemap files per collection,
+  each within the protocol limit of 50,000 URLs
+- Pages taken from the build manifest written by d1_build_site (see build_manifest),
+  so the site is neither walked nor are pages stat'ed
 - Metadata-aware lastmod dates (generation date for newest versions, publikationsdatum for older)
 - Canonical URL references for law versions
 - Language and description meta tags
@@ -17,7 +21,6 @@ License:
 """
 
 import os
-import json
 import re
 from datetime import datetime
 from urllib.parse import urljoin
@@ -26,10 +29,22 @@ from typing import Dict, List, Optional, Tuple, Any
 import yaml
 from src.utils.logging_utils import get_module_logger
 from .build_zhlaw import alphanum_key
+from .build_manifest import (
+    collect_page_records,
+    index_law_versions,
+    load_build_manifest,
+    load_collection_data,
+)
 
 # Get logger for this module
 logger = get_module_logger(__name__)
 
+# Maximum number of URLs in one sitemap file (sitemap protocol limit)
+MAX_URLS_PER_SITEMAP = 50000
+
+# Sitemap files are grouped by these page groups, in this order
+SITEMAP_GROUPS = ["site", "zh", "ch"]
+
 
 def should_filter_version(version: Dict[str, Any], all_versions: List[Dict[str, Any]]) -> bool:
     """
@@ -70,9 +85,24 @@ def should_filter_version(version: Dict[str, Any], all_versions: List[Dict[str,
 
 
 class SitemapGenerator:
-    def __init__(self, domain, public_dir="public"):
+    def __init__(
+        self,
+        domain,
+        public_dir="public",
+        manifest: Optional[Dict[str, Any]] = None,
+        collection_data: Optional[Dict[str, List[Dict]]] = None,
+    ):
+        """
+        Args:
+            domain: Base URL of the site
+            public_dir: Root directory of the site
+            manifest: Build manifest of the site (default: the manifest
+                written by d1_build_site, or the pages found in public_dir)
+            collection_data: Laws by collection (default: loaded from data/)
+        """
         self.domain = domain.rstrip("/")
         self.public_dir = public_dir
+        self.manifest = manifest
         self.static_priorities = {
             "404.html": "0.1",
             "about.html": "0.5",
@@ -83,8 +113,12 @@ class SitemapGenerator:
         }
         
         # Load collection metadata
-        self.zh_metadata = self._load_collection_metadata("zh")
-        self.ch_metadata = self._load_collection_metadata("ch")
+        if collection_data is None:
+            collection_data = load_collection_data()
+        self.collection_data = collection_data
+        self.zh_metadata = collection_data.get("zh")
+        self.ch_metadata = collection_data.get("ch")
+        self.law_index = index_law_versions(collection_data)
         
         # Build canonical URL mappings
         self.canonical_urls = self._build_canonical_urls()
@@ -92,23 +126,6 @@ class SitemapGenerator:
         # Parse static content metadata
         self.static_content_metadata = self._parse_static_content_metadata()
 
-    def _load_collection_metadata(self, collection_type: str) -> Optional[Dict]:
-        """Load collection metadata from JSON files."""
-        try:
-            if collection_type == "zh":
-                metadata_path = "data/zhlex/zhlex_data/zhlex_data_processed.json"
-            elif collection_type == "ch":
-                metadata_path = "data/fedlex/fedlex_data/fedlex_data_processed.json"
-            else:
-                return None
-                
-            if os.path.exists(metadata_path):
-                with open(metadata_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-        except Exception as e:
-            logger.warning(f"Could not load {collection_type} metadata: {e}")
-        return None
-    
     def _parse_static_content_metadata(self) -> Dict[str, Dict]:
         """Parse YAML frontmatter from static content files."""
         metadata = {}
@@ -207,52 +224,50 @@ class SitemapGenerator:
         
         return canonical_urls
 
-    def get_last_modified(self, file_path: str, url: str) -> str:
-        """Get last modified date based on file type and version status."""
-        # Check if this is a law file
-        law_metadata = self._get_law_metadata_from_url(url)
-        if law_metadata:
-            # Use generation date for newest version, publikationsdatum for older versions
-            if law_metadata.get("in_force", False):
+    @staticmethod
+    def _format_date(date: Any) -> Optional[str]:
+        """Convert "20250628" or "20250628-094121" to "2025-06-28"."""
+        if not date:
+            return None
+        date_part = str(date).split("-")[0]
+        if len(date_part) != 8:
+            return None
+        return f"{date_part[:4]}-{date_part[4:6]}-{date_part[6:8]}"
+
+    def get_last_modified(self, record: Dict[str, Any], build_date: str) -> str:
+        """
+        Get last modified date based on page type and version status.
+
+        Law pages in force use their generation date, older versions their
+        publikationsdatum. Other pages were last written by the build.
+
+        Args:
+            record: Page record of the build manifest
+            build_date: Date of the build ("YYYY-MM-DD")
+        """
+        dates = record.get("dates") or {}
+        in_force = record.get("in_force")
+        if in_force is not None:
+            if in_force:
                 # Newest version - use generation date
-                process_steps = law_metadata.get("process_steps", {})
-                generate_html_date = process_steps.get("generate_html")
-                if generate_html_date:
-                    try:
-                        # Convert from format "20250628-094121" to "2025-06-28"
-                        date_part = generate_html_date.split("-")[0]
-                        if len(date_part) == 8:
-                            return f"{date_part[:4]}-{date_part[4:6]}-{date_part[6:8]}"
-                    except Exception:
-                        pass
+                last_modified = self._format_date(dates.get("generate_html"))
             else:
                 # Older version - use publikationsdatum
-                publikationsdatum = law_metadata.get("publikationsdatum")
-                if publikationsdatum and len(publikationsdatum) == 8:
-                    try:
-                        return f"{publikationsdatum[:4]}-{publikationsdatum[4:6]}-{publikationsdatum[6:8]}"
-                    except Exception:
-                        pass
-        
-        # Fallback to file modification time
-        timestamp = os.path.getmtime(file_path)
-        return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+                last_modified = self._format_date(dates.get("publikationsdatum"))
+            if last_modified:
+                return last_modified
+        return build_date
     
     def _get_law_metadata_from_url(self, url: str) -> Optional[Dict]:
         """Extract law metadata from URL by finding matching law and version."""
         # Parse URL to extract collection and filename
         if "/col-zh/" in url:
             collection = "zh"
-            metadata_list = self.zh_metadata
         elif "/col-ch/" in url:
             collection = "ch"
-            metadata_list = self.ch_metadata
         else:
             return None
             
-        if not metadata_list:
-            return None
-            
         # Extract ordnungsnummer and nachtragsnummer from filename
         filename = url.split("/")[-1].replace(".html", "")
         match = re.match(r"(.+)-(\d+)$", filename)
@@ -261,23 +276,7 @@ class SitemapGenerator:
             
         ordnungsnummer = match.group(1)
         nachtragsnummer = match.group(2)
-        
-        # Find the law and version
-        for law in metadata_list:
-            if law.get("ordnungsnummer") == ordnungsnummer:
-                # Check current version
-                if str(law.get("nachtragsnummer", "")) == nachtragsnummer:
-                    return law
-                    
-                # Check versions list
-                for version in law.get("versions", []):
-                    if str(version.get("nachtragsnummer", "")) == nachtragsnummer:
-                        # Return version data with process_steps from main law
-                        version_data = version.copy()
-                        version_data["process_steps"] = law.get("process_steps", {})
-                        return version_data
-        
-        return None
+        return self.law_index.get((collection, ordnungsnummer), {}).get(nachtragsnummer)
 
     def parse_col_zh_filename(self, filename):
         match = re.match(r"(.+)-(\d+)", filename.replace(".html", ""))
@@ -287,45 +286,36 @@ class SitemapGenerator:
             return ordnungsnummer, nachtragsnummer
         return None, None
 
-    def get_priority(self, root: str, file: str, url: str) -> str:
+    def get_priority(
+        self, record: Dict[str, Any], latest_versions: Dict[Tuple[str, str], int]
+    ) -> str:
         """
-        Determines the priority of a file based on its location, name, and metadata.
+        Determines the priority of a page based on its type, name, and metadata.
 
         Args:
-            root: Directory containing the file
-            file: Filename
-            url: Full URL
+            record: Page record of the build manifest
+            latest_versions: Highest nachtragsnummer of the pages of each
+                (collection, ordnungsnummer)
 
         Returns:
             str: Priority value between 0.0 and 1.0
         """
         # Assign lowest priority (0.1) to diff files
-        if "diff" in root:
+        if record["page_type"] == "diff":
             return "0.1"
 
-        if "col-zh" in root or "col-ch" in root:
-            law_metadata = self._get_law_metadata_from_url(url)
-            if law_metadata:
+        if record["page_type"] == "law":
+            in_force = record.get("in_force")
+            if in_force is not None:
                 # Highest priority for laws currently in force
-                return "1.0" if law_metadata.get("in_force", False) else "0.2"
+                return "1.0" if in_force else "0.2"
             
-            # Fallback to filename parsing
-            ordnungsnummer, nachtragsnummer = self.parse_col_zh_filename(file)
-            if ordnungsnummer is not None:
-                # Group files by ordnungsnummer
-                same_law_files = [
-                    f for f in os.listdir(root) if f.startswith(f"{ordnungsnummer}-")
-                ]
-                if same_law_files:
-                    max_number = max(
-                        int(self.parse_col_zh_filename(f)[1] or 0)
-                        for f in same_law_files
-                        if self.parse_col_zh_filename(f)[1] is not None
-                    )
-                    return "1.0" if nachtragsnummer == max_number else "0.2"
-                return "1.0"  # Single file case
+            # Fallback to the newest page of the law
+            if record.get("ordnungsnummer") is not None:
+                latest = latest_versions.get((record["collection"], record["ordnungsnummer"]))
+                return "1.0" if int(record["nachtragsnummer"]) == latest else "0.2"
             return "0.2"
-        return self.static_priorities.get(file, "0.8")
+        return self.static_priorities.get(os.path.basename(record["url"]), "0.8")
     
     def get_language_and_description(self, file: str, url: str) -> Tuple[str, str]:
         """
@@ -373,131 +363,129 @@ class SitemapGenerator:
     def get_canonical_url(self, url: str) -> Optional[str]:
         """Get canonical URL for a page. Returns the canonical URL even if it's self-referencing."""
         return self.canonical_urls.get(url)
+
+    def _get_manifest(self) -> Dict[str, Any]:
+        """Return the build manifest, collecting the pages if there is none."""
+        manifest = self.manifest or load_build_manifest(self.public_dir)
+        if manifest is None:
+            manifest = {
+                "build_date": datetime.now().strftime("%Y-%m-%d"),
+                "pages": collect_page_records(self.public_dir, self.collection_data),
+            }
+        return manifest
     
-    def _sort_urls_by_law(self, urls: List[Dict]) -> List[Dict]:
+    def _sort_key(self, record: Dict[str, Any]) -> Tuple:
         """
-        Sort URLs to group same laws together with canonical version last.
-        
-        Args:
-            urls: List of URL dictionaries
-            
+        Sort key grouping the versions of a law, with the canonical version last.
+
+        Pages without a law (site pages, diffs) are sorted by URL, site pages
+        before law pages and law pages before other collection pages.
+        """
+        if record.get("ordnungsnummer") is None:
+            return (record["page_type"] != "site", 1, record["url"])
+        return (
+            True,
+            0,
+            record["ordnungsnummer"],
+            record.get("in_force") is True,  # False comes before True
+            int(record["nachtragsnummer"]),
+        )
+
+    def generate_url_entries(self) -> Dict[str, List[Dict]]:
+        """
+        Build the sitemap entries of all pages of the build manifest.
+
         Returns:
-            Sorted list of URL dictionaries
+            Sorted URL entries by sitemap group (see SITEMAP_GROUPS)
         """
-        # Separate law URLs from other URLs
-        law_urls = []
-        other_urls = []
-        
-        for url_data in urls:
-            url = url_data["loc"]
-            if "/col-zh/" in url or "/col-ch/" in url:
-                law_urls.append(url_data)
-            else:
-                other_urls.append(url_data)
-        
-        # Group law URLs by ordnungsnummer
-        law_groups = {}
-        for url_data in law_urls:
-            url = url_data["loc"]
-            
-            # Extract ordnungsnummer from URL
-            filename = url.split("/")[-1].replace(".html", "")
-            match = re.match(r"(.+)-(\d+)$", filename)
-            
-            if match:
-                ordnungsnummer = match.group(1)
-                nachtragsnummer = int(match.group(2))
-                
-                # Determine collection
-                collection = "zh" if "/col-zh/" in url else "ch"
-                group_key = f"{collection}:{ordnungsnummer}"
-                
-                if group_key not in law_groups:
-                    law_groups[group_key] = []
-                
-                # Add metadata for sorting
-                url_data["_ordnungsnummer"] = ordnungsnummer
-                url_data["_nachtragsnummer"] = nachtragsnummer
-                url_data["_collection"] = collection
-                
-                # Check if this is the canonical version
-                law_metadata = self._get_law_metadata_from_url(url)
-                url_data["_is_canonical"] = law_metadata.get("in_force", False) if law_metadata else False
-                
-                law_groups[group_key].append(url_data)
-        
-        # Sort within each group and collect results
-        sorted_law_urls = []
-        for group_key in sorted(law_groups.keys()):
-            group = law_groups[group_key]
-            
-            # Sort by nachtragsnummer, with canonical version last
-            group.sort(key=lambda x: (
-                x["_is_canonical"],  # False comes before True
-                x["_nachtragsnummer"]
-            ))
-            
-            # Clean up temporary sorting metadata
-            for url_data in group:
-                for key in ["_ordnungsnummer", "_nachtragsnummer", "_collection", "_is_canonical"]:
-                    url_data.pop(key, None)
-            
-            sorted_law_urls.extend(group)
-        
-        # Combine other URLs first, then sorted law URLs
-        return other_urls + sorted_law_urls
+        manifest = self._get_manifest()
+        build_date = manifest["build_date"]
+        records = manifest["pages"]
 
-    def generate_sitemap(self):
-        urls = []
+        latest_versions = {}
+        for record in records:
+            if record["page_type"] == "law" and record.get("ordnungsnummer") is not None:
+                key = (record["collection"], record["ordnungsnummer"])
+                nachtragsnummer = int(record["nachtragsnummer"])
+                if nachtragsnummer > latest_versions.get(key, -1):
+                    latest_versions[key] = nachtragsnummer
 
-        for root, dirs, files in os.walk(self.public_dir):
-            for file in files:
-                if not file.endswith(".html"):
-                    continue
+        groups = {group: [] for group in SITEMAP_GROUPS}
+        for record in sorted(records, key=self._sort_key):
+            url = urljoin(self.domain, record["url"])
+            url_data = {
+                "loc": url,
+                "lastmod": self.get_last_modified(record, build_date),
+                "priority": self.get_priority(record, latest_versions),
+            }
 
-                file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, self.public_dir)
-                url = urljoin(self.domain, relative_path)
-                
-                last_mod = self.get_last_modified(file_path, url)
-                priority = self.get_priority(root, file, url)
-                canonical_url = self.get_canonical_url(url)
-
-                url_data = {
-                    "loc": url,
-                    "lastmod": last_mod,
-                    "priority": priority,
-                }
-                
-                if canonical_url:
-                    url_data["canonical"] = canonical_url
-                
-                urls.append(url_data)
+            canonical_url = self.get_canonical_url(url)
+            if canonical_url:
+                url_data["canonical"] = canonical_url
 
-        # Sort URLs to group same laws together with canonical version last
-        sorted_urls = self._sort_urls_by_law(urls)
-        
-        return self.create_sitemap_xml(sorted_urls)
+            groups.setdefault(record.get("collection") or "site", []).append(url_data)
+        return groups
+
+    def generate_sitemaps(self) -> List[Tuple[str, str, str]]:
+        """
+        Split the URL entries into sitemap files of at most MAX_URLS_PER_SITEMAP URLs.
+
+        Returns:
+            List of (file name, last modification date, XML content)
+        """
+        sitemaps = []
+        for group, urls in self.generate_url_entries().items():
+            for shard, start in enumerate(range(0, len(urls), MAX_URLS_PER_SITEMAP), 1):
+                shard_urls = urls[start:start + MAX_URLS_PER_SITEMAP]
+                sitemaps.append((
+                    f"sitemap-{group}-{shard}.xml",
+                    max(url["lastmod"] for url in shard_urls),
+                    self.create_sitemap_xml(shard_urls),
+                ))
+        return sitemaps
 
     def create_sitemap_xml(self, urls):
-        xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        xml += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
-        xml += 'xmlns:xhtml="http://www.w3.org/1999/xhtml">\n'
+        parts = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" ',
+            'xmlns:xhtml="http://www.w3.org/1999/xhtml">\n',
+        ]
 
         for url in urls:
-            xml += "  <url>\n"
-            xml += f'    <loc>{self._escape_xml(url["loc"])}</loc>\n'
-            xml += f'    <lastmod>{url["lastmod"]}</lastmod>\n'
-            xml += f'    <priority>{url["priority"]}</priority>\n'
+            parts.append("  <url>\n")
+            parts.append(f'    <loc>{self._escape_xml(url["loc"])}</loc>\n')
+            parts.append(f'    <lastmod>{url["lastmod"]}</lastmod>\n')
+            parts.append(f'    <priority>{url["priority"]}</priority>\n')
             
             # Add canonical link if present
             if url.get("canonical"):
-                xml += f'    <xhtml:link rel="canonical" href="{self._escape_xml(url["canonical"])}" />\n'
+                parts.append(
+                    f'    <xhtml:link rel="canonical" href="{self._escape_xml(url["canonical"])}" />\n'
+                )
             
-            xml += "  </url>\n"
+            parts.append("  </url>\n")
+
+        parts.append("</urlset>")
+        return "".join(parts)
+
+    def create_sitemap_index_xml(self, sitemaps: List[Tuple[str, str]]) -> str:
+        """
+        Create the sitemap index referencing the sitemap files.
 
-        xml += "</urlset>"
-        return xml
+        Args:
+            sitemaps: List of (URL, last modification date) of the sitemap files
+        """
+        parts = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n',
+        ]
+        for loc, lastmod in sitemaps:
+            parts.append("  <sitemap>\n")
+            parts.append(f"    <loc>{self._escape_xml(loc)}</loc>\n")
+            parts.append(f"    <lastmod>{lastmod}</lastmod>\n")
+            parts.append("  </sitemap>\n")
+        parts.append("</sitemapindex>")
+        return "".join(parts)
     
     def _escape_xml(self, text: str) -> str:
         """Escape special characters for XML."""
@@ -508,11 +496,36 @@ class SitemapGenerator:
                    .replace("'", "&#39;"))
 
     def save_sitemap(self, output_path="public/sitemap.xml"):
+        """
+        Write the sitemap index to output_path and the sitemap files next to it.
+
+        Sitemap files of earlier builds that are no longer referenced are removed.
+        """
         try:
-            sitemap_content = self.generate_sitemap()
+            output_dir = os.path.dirname(output_path) or "."
+            relative_dir = os.path.relpath(output_dir, self.public_dir)
+            sitemaps = self.generate_sitemaps()
+
+            index_entries = []
+            for filename, lastmod, content in sitemaps:
+                with open(os.path.join(output_dir, filename), "w", encoding="utf-8") as f:
+                    f.write(content)
+                relative_path = filename if relative_dir == "." else f"{relative_dir}/{filename}"
+                index_entries.append((urljoin(self.domain, relative_path), lastmod))
+
             with open(output_path, "w", encoding="utf-8") as f:
-                f.write(sitemap_content)
-            logger.info(f"Enhanced sitemap saved to {output_path}")
+                f.write(self.create_sitemap_index_xml(index_entries))
+
+            current_files = {filename for filename, _, _ in sitemaps}
+            for stale_file in Path(output_dir).glob("sitemap-*.xml"):
+                if stale_file.name not in current_files:
+                    stale_file.unlink()
+
+            url_count = sum(content.count("<url>") for _, _, content in sitemaps)
+            logger.info(
+                f"Enhanced sitemap saved to {output_path} "
+                f"({url_count} URLs in {len(sitemaps)} sitemap files)"
+            )
         except Exception as e:
             logger.error(f"Failed to generate sitemap: {e}")
             # Fallback to basic sitemap
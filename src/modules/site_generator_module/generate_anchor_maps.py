@@ -9,20 +9,152 @@ import json
 import os
 import re
 from pathlib import Path
-from bs4 import BeautifulSoup
-from typing import Dict, List, Set, Tuple, Optional
+from typing import Dict, Iterable, List, Set, Tuple, Optional
+from bs4 import BeautifulSoup, Tag
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import defaultdict
 from src.utils.logging_utils import get_module_logger
+from src.utils.html_utils import scan_elements
 from src.utils.progress_utils import progress_manager, track_concurrent_futures
 
 logger = get_module_logger(__name__)
 
 
+# Pattern to capture sequence, provision and subprovision number of anchor IDs
+SEQ_ANCHOR_PATTERN = re.compile(r'seq-(\d+)-prov-(\d+[a-z]?)(?:-sub-(\d+))?')
+
+# Links to provisions, used to determine the provision type
+PROVISION_LINK_PATTERN = re.compile(r'#seq-\d+-prov-\d+')
+
+
+def build_anchor_summary(anchor_ids: Iterable[str], provision_link_text: Optional[str]) -> Dict:
+    """
+    Summarize the provision and subprovision anchors of a law page.
+    
+    Args:
+        anchor_ids: IDs of the elements of the page in document order
+        provision_link_text: Text of the first link to a provision, if any
+        
+    Returns:
+        Dictionary with the "provision_type" and the "provisions" of the anchor map
+    """
+    # Track the highest sequence number for each provision
+    prov_sequences = {}  # prov_num -> max_seq
+    subprov_sequences = {}  # (prov_num, sub_num) -> max_seq
+    
+    for anchor_id in anchor_ids:
+        match = SEQ_ANCHOR_PATTERN.match(anchor_id)
+        if not match:
+            continue
+        
+        seq_num = int(match.group(1))
+        prov_num = match.group(2)
+        sub_num = match.group(3)
+        
+        if sub_num:
+            # Track max sequence for this subprovision
+            key = (prov_num, sub_num)
+            if key not in subprov_sequences or seq_num > subprov_sequences[key]:
+                subprov_sequences[key] = seq_num
+        else:
+            # Track max sequence for this provision
+            if prov_num not in prov_sequences or seq_num > prov_sequences[prov_num]:
+                prov_sequences[prov_num] = seq_num
+    
+    provisions = {}
+    for prov_num, max_seq in prov_sequences.items():
+        provisions[prov_num] = {
+            "sequences": max_seq + 1,  # Convert to count (0-based to 1-based)
+            "subprovisions": {}
+        }
+    
+    # Update subprovisions with sequence counts
+    for (prov_num, sub_num), max_seq in subprov_sequences.items():
+        if prov_num not in provisions:
+            provisions[prov_num] = {
+                "sequences": 0,
+                "subprovisions": {}
+            }
+        
+        provisions[prov_num]["subprovisions"][sub_num] = {
+            "sequences": max_seq + 1  # Convert to count
+        }
+    
+    # Determine provision type by looking at provision links
+    provision_type = ""
+    if provision_link_text is not None:
+        if provision_link_text.startswith('Art.'):
+            provision_type = "Art."
+        else:
+            # "§" or unclear, default to §
+            provision_type = "§"
+    
+    return {"provision_type": provision_type, "provisions": provisions}
+
+
+def summarize_soup(soup: BeautifulSoup) -> Dict:
+    """
+    Summarize the anchors of a rendered page from its tree.
+    
+    Called by the site build for every page it renders, so anchor maps can be
+    written without parsing the output again.
+    
+    Args:
+        soup: Rendered page
+        
+    Returns:
+        Anchor summary, see build_anchor_summary()
+    """
+    # One walk over the tree instead of two find calls
+    anchor_ids = []
+    provision_link = None
+    for element in soup.descendants:
+        if not isinstance(element, Tag):
+            continue
+        anchor_id = element.attrs.get('id')
+        if anchor_id:
+            anchor_ids.append(anchor_id)
+        if provision_link is None and element.name == 'a':
+            href = element.attrs.get('href')
+            if href and PROVISION_LINK_PATTERN.search(href):
+                provision_link = element
+    
+    return build_anchor_summary(
+        anchor_ids,
+        provision_link.get_text(strip=True) if provision_link else None,
+    )
+
+
+def summarize_html(html_content: str) -> Dict:
+    """
+    Summarize the anchors of a page from its HTML.
+    
+    Args:
+        html_content: HTML of the page
+        
+    Returns:
+        Anchor summary, see build_anchor_summary()
+    """
+    elements = scan_elements(html_content, ['id', 'href'])
+    provision_link = next(
+        (
+            element for element in elements
+            if element.name == 'a'
+            and PROVISION_LINK_PATTERN.search(element.attrs.get('href', ''))
+        ),
+        None,
+    )
+    return build_anchor_summary(
+        (element.attrs['id'] for element in elements if element.attrs.get('id')),
+        provision_link.text if provision_link else None,
+    )
+
+
 class AnchorMapGenerator:
     """Generate anchor maps for law collections."""
     
-    def __init__(self, public_dir: str, collection: str, collection_data: Optional[List[Dict]] = None):
+    def __init__(self, public_dir: str, collection: str, collection_data: Optional[List[Dict]] = None,
+                 anchor_summaries: Optional[Dict[str, Dict]] = None):
         """
         Initialize the anchor map generator.
         
@@ -30,11 +162,17 @@ class AnchorMapGenerator:
             public_dir: Path to the public directory
             collection: Collection name ('col-zh' or 'col-ch')
             collection_data: Optional collection metadata from processed JSON
+            anchor_summaries: Optional anchor summaries collected while rendering,
+                keyed by file name. Files without a summary are read from disk.
         """
         self.public_dir = Path(public_dir)
         self.collection = collection
         self.collection_dir = self.public_dir / collection
         self.anchor_maps_dir = self.public_dir / "anchor-maps" / collection.replace("col-", "")
+        self.anchor_summaries = anchor_summaries or {}
+        
+        # Entries of the anchor maps index, one per generated map
+        self.index_entries: List[Dict] = []
         
         # Ensure anchor maps directory exists
         self.anchor_maps_dir.mkdir(parents=True, exist_ok=True)
@@ -192,7 +330,10 @@ class AnchorMapGenerator:
         
         # Process only the latest version to get provision type and provisions
         try:
-            self._process_law_file(latest_file_path, anchor_map)
+            summary = self.anchor_summaries.get(latest_filename)
+            if summary is None:
+                summary = self._process_law_file(latest_file_path)
+            self._apply_summary(summary, anchor_map)
         except Exception as e:
             logger.error(f"Error processing latest version {latest_file_path}: {e}")
         
@@ -201,103 +342,42 @@ class AnchorMapGenerator:
         with open(map_file, 'w', encoding='utf-8') as f:
             json.dump(anchor_map, f, ensure_ascii=False, indent=2)
         
+        self.index_entries.append(index_entry(anchor_map, self.collection.replace("col-", "")))
+        
         logger.debug(f"Generated anchor map for {ordnungsnummer}")
     
-    def _process_law_file(self, file_path: Path, anchor_map: Dict) -> None:
+    def _process_law_file(self, file_path: Path) -> Dict:
         """
-        Process a single law file and update the anchor map.
+        Summarize the anchors of a law file that has no summary from the build.
         
         Args:
             file_path: Path to the HTML file
-            anchor_map: The anchor map to update
+            
+        Returns:
+            Anchor summary, see build_anchor_summary()
         """
         with open(file_path, 'r', encoding='utf-8') as f:
-            soup = BeautifulSoup(f.read(), 'html.parser')
-        
-        # Extract provision type from the HTML (title/abbreviation already set from collection data)
-        if not anchor_map["metadata"]["provision_type"]:
-            self._extract_provision_type(soup, anchor_map["metadata"])
-        
-        # Find all provision and subprovision anchors
-        provisions = anchor_map["provisions"]
-        
-        # Track the highest sequence number for each provision
-        prov_sequences = {}  # prov_num -> max_seq
-        subprov_sequences = {}  # (prov_num, sub_num) -> max_seq
-        
-        # Updated pattern to capture sequence number
-        seq_anchor_pattern = re.compile(r'seq-(\d+)-prov-(\d+[a-z]?)(?:-sub-(\d+))?')
-        
-        # Process all elements with provision/subprovision IDs
-        for element in soup.find_all(id=seq_anchor_pattern):
-            anchor_id = element.get('id', '')
-            match = seq_anchor_pattern.match(anchor_id)
-            if not match:
-                continue
-            
-            seq_num = int(match.group(1))
-            prov_num = match.group(2)
-            sub_num = match.group(3)
-            
-            if sub_num:
-                # Track max sequence for this subprovision
-                key = (prov_num, sub_num)
-                if key not in subprov_sequences or seq_num > subprov_sequences[key]:
-                    subprov_sequences[key] = seq_num
-            else:
-                # Track max sequence for this provision
-                if prov_num not in prov_sequences or seq_num > prov_sequences[prov_num]:
-                    prov_sequences[prov_num] = seq_num
-        
-        # Now update the provisions structure with sequence counts
-        for prov_num, max_seq in prov_sequences.items():
-            if prov_num not in provisions:
-                provisions[prov_num] = {
-                    "sequences": max_seq + 1,  # Convert to count (0-based to 1-based)
-                    "subprovisions": {}
-                }
-            else:
-                provisions[prov_num]["sequences"] = max_seq + 1
-        
-        # Update subprovisions with sequence counts
-        for (prov_num, sub_num), max_seq in subprov_sequences.items():
-            if prov_num not in provisions:
-                provisions[prov_num] = {
-                    "sequences": 0,
-                    "subprovisions": {}
-                }
-            
-            if "subprovisions" not in provisions[prov_num]:
-                provisions[prov_num]["subprovisions"] = {}
-            
-            provisions[prov_num]["subprovisions"][sub_num] = {
-                "sequences": max_seq + 1  # Convert to count
-            }
+            return summarize_html(f.read())
     
-    def _extract_provision_type(self, soup: BeautifulSoup, metadata: Dict) -> None:
+    @staticmethod
+    def _apply_summary(summary: Dict, anchor_map: Dict) -> None:
         """
-        Extract provision type from the law HTML.
+        Update the anchor map with the anchor summary of its latest version.
         
         Args:
-            soup: BeautifulSoup object of the HTML
-            metadata: Metadata dictionary to update
+            summary: Anchor summary, see build_anchor_summary()
+            anchor_map: The anchor map to update
         """
-        # Determine provision type by looking at provision links
-        provision_link = soup.find('a', href=re.compile(r'#seq-\d+-prov-\d+'))
-        if provision_link:
-            link_text = provision_link.get_text(strip=True)
-            if link_text.startswith('§'):
-                metadata["provision_type"] = "§"
-            elif link_text.startswith('Art.'):
-                metadata["provision_type"] = "Art."
-            else:
-                # Default to § if unclear
-                metadata["provision_type"] = "§"
+        # Title/abbreviation are already set from collection data
+        if not anchor_map["metadata"]["provision_type"]:
+            anchor_map["metadata"]["provision_type"] = summary["provision_type"]
+        anchor_map["provisions"] = summary["provisions"]
 
 
 def generate_anchor_maps_for_collection(public_dir: str, collection: str, 
                                       collection_data: Optional[List[Dict]] = None,
-                                      concurrent: bool = True, max_workers: int = 10) -> None:
+                                      concurrent: bool = True, max_workers: int = 10,
+                                      anchor_summaries: Optional[Dict[str, Dict]] = None) -> List[Dict]:
     """
     Generate anchor maps for a specific collection.
     
@@ -307,9 +387,15 @@ def generate_anchor_maps_for_collection(public_dir: str, collection: str,
         collection_data: Optional collection metadata from processed JSON
         concurrent: Whether to process laws concurrently
         max_workers: Maximum number of concurrent workers
+        anchor_summaries: Optional anchor summaries collected while rendering,
+            keyed by file name
+        
+    Returns:
+        Anchor maps index entries of the generated maps
     """
-    generator = AnchorMapGenerator(public_dir, collection, collection_data)
+    generator = AnchorMapGenerator(public_dir, collection, collection_data, anchor_summaries)
     generator.generate_all_maps(concurrent, max_workers)
+    return generator.index_entries
 
 
 def generate_all_anchor_maps(public_dir: str, concurrent: bool = True, max_workers: int = 10) -> None:
@@ -326,20 +412,43 @@ def generate_all_anchor_maps(public_dir: str, concurrent: bool = True, max_worke
         generate_anchor_maps_for_collection(public_dir, collection, None, concurrent, max_workers)
 
 
-def generate_anchor_maps_index(public_dir: str) -> None:
+def index_entry(anchor_map: Dict, collection_short: str) -> Dict:
     """
-    Generate an index file of all anchor maps for the quick select feature.
+    Create the anchor maps index entry of an anchor map.
+    
+    Args:
+        anchor_map: The anchor map
+        collection_short: Collection name without prefix ('zh' or 'ch')
+        
+    Returns:
+        Index entry for the quick select feature
+    """
+    metadata = anchor_map.get("metadata", {})
+    return {
+        "ordnungsnummer": metadata.get("ordnungsnummer", ""),
+        "title": metadata.get("title", ""),
+        "abbreviation": metadata.get("abbreviation", ""),
+        "kurztitel": metadata.get("kurztitel", ""),
+        "collection": collection_short
+    }
+
+
+def read_index_entries(public_dir: str) -> List[Dict]:
+    """
+    Read the anchor maps index entries from the anchor map files on disk.
     
     Args:
         public_dir: Path to the public directory
+        
+    Returns:
+        Index entries of all anchor maps
     """
     public_path = Path(public_dir)
-    index_data = {"laws": []}
+    entries = []
     
     # Process both collections
     for collection_short in ['zh', 'ch']:
         anchor_maps_dir = public_path / "anchor-maps" / collection_short
-        collection_full = f"col-{collection_short}"
         
         if not anchor_maps_dir.exists():
             logger.warning(f"Anchor maps directory {anchor_maps_dir} does not exist")
@@ -351,19 +460,28 @@ def generate_anchor_maps_index(public_dir: str) -> None:
                 with open(map_file, 'r', encoding='utf-8') as f:
                     anchor_map = json.load(f)
                 
-                metadata = anchor_map.get("metadata", {})
-                
                 # Add to index
-                index_data["laws"].append({
-                    "ordnungsnummer": metadata.get("ordnungsnummer", ""),
-                    "title": metadata.get("title", ""),
-                    "abbreviation": metadata.get("abbreviation", ""),
-                    "kurztitel": metadata.get("kurztitel", ""),
-                    "collection": collection_short
-                })
+                entries.append(index_entry(anchor_map, collection_short))
             except Exception as e:
                 logger.error(f"Error reading anchor map {map_file}: {e}")
     
+    return entries
+
+
+def generate_anchor_maps_index(public_dir: str, index_entries: Optional[List[Dict]] = None) -> None:
+    """
+    Generate an index file of all anchor maps for the quick select feature.
+    
+    Args:
+        public_dir: Path to the public directory
+        index_entries: Optional entries returned by generate_anchor_maps_for_collection().
+            If omitted, the anchor map files are read from disk.
+    """
+    public_path = Path(public_dir)
+    if index_entries is None:
+        index_entries = read_index_entries(public_dir)
+    index_data = {"laws": list(index_entries)}
+    
     # Sort laws by ordnungsnummer within each collection
     index_data["laws"].sort(key=lambda x: (x["collection"], x["ordnungsnummer"]))
     
@@ -1,32 +1,67 @@
 """
 Module for generating HTML diffs between consecutive versions of laws.
-Uses the htmldiff library to create diffs, then applies proper styling and structure.
+
+The law text of two versions is split into blocks: every provision container
+and every run of content between two provisions (headings, footnotes,
+annexes). Provisions are aligned by their stable IDs (seq-N-prov-X), the
+content between them by its text. Blocks whose normalized HTML is identical
+in both versions are copied, blocks only present in one version are marked as
+inserted or deleted as a whole, and only the changed blocks are diffed word
+by word with the htmldiff library. The word
+diffs are cached on disk, keyed on the hashes of both blocks, so that later
+builds only diff provisions that changed since.
 
 License:
     https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
 """
 
 import os
+import re
+import difflib
 import json
-from bs4 import BeautifulSoup
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from bs4 import BeautifulSoup, Tag
 import htmldiff.lib as diff_lib
-import shutil
 import concurrent.futures
 # from tqdm import tqdm  # Replaced with progress_utils
+from src.utils.html_utils import parse_html
 from src.utils.progress_utils import progress_manager, track_concurrent_futures
 from src.utils.logging_utils import get_module_logger
 
 # Set up logging
 logger = get_module_logger(__name__)
 
+# Bump to invalidate all cached diffs, e.g. after changing the diff markup
+DIFF_CACHE_VERSION = "1"
+
+DEFAULT_DIFF_CACHE_DIR = "data/diff_cache"
+
+# ID of a provision (without subprovision part)
+PROVISION_ID_PATTERN = re.compile(r"seq-\d+-prov-\d+[a-z]?$")
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Key of the blocks between two provisions
+GAP_KEY = "gap"
 
-def find_consecutive_versions(collection_data_path):
+# Replaced by the diffed law text once the page around it is serialized
+DIFF_CONTENT_MARKER = "\0diff-content\0"
+
+# A block of a law text: (alignment key, HTML, hash of the normalized HTML)
+Block = Tuple[str, str, str]
+
+
+def find_consecutive_versions(collection_data_path, max_versions=None):
     """
     Read the collection data and find consecutive versions of each law.
-    Limited to only the 3 most recent versions to reduce processing time.
 
     Args:
         collection_data_path: Path to the collection metadata JSON file
+        max_versions: Only diff the given number of most recent versions of
+            each law (default: the full version history)
 
     Returns:
         A dictionary mapping law ordnungsnummer to a list of version pairs
@@ -42,11 +77,6 @@ def find_consecutive_versions(collection_data_path):
     # Dictionary to store version pairs for each law
     law_versions = {}
 
-    # Counters for logging
-    total_full_version_pairs = 0
-    total_limited_version_pairs = 0
-    laws_with_reduced_pairs = 0
-
     for law in collection_data:
         ordnungsnummer = law.get("ordnungsnummer")
         if not ordnungsnummer:
@@ -74,36 +104,14 @@ def find_consecutive_versions(collection_data_path):
             logger.error(f"Error sorting versions for {ordnungsnummer}: {e}")
             continue
 
-        # Count all possible version pairs (before limiting)
-        all_version_pairs = []
+        if max_versions is not None:
+            sorted_versions = sorted_versions[-max_versions:]
+
+        # Create pairs of consecutive versions
+        version_pairs = []
         for i in range(1, len(sorted_versions)):
             older_version = sorted_versions[i - 1]
             newer_version = sorted_versions[i]
-            all_version_pairs.append(
-                (
-                    newer_version.get("nachtragsnummer"),
-                    older_version.get("nachtragsnummer"),
-                )
-            )
-
-        total_full_version_pairs += len(all_version_pairs)
-
-        # Limit to the 3 most recent versions to reduce processing time
-        # For diffing only the latest version (newest compared to previous):
-        # recent_versions = sorted_versions[-2:] if len(sorted_versions) >= 2 else sorted_versions
-        # Current setting - diff the 3 most recent versions (2 comparisons):
-        # recent_versions = sorted_versions[-3:] if len(sorted_versions) >= 3 else sorted_versions
-        # For diffing all versions (no limit):
-        # recent_versions = sorted_versions  # No slicing means use all versions
-        recent_versions = (
-            sorted_versions[-3:] if len(sorted_versions) >= 3 else sorted_versions
-        )
-
-        # Create pairs of consecutive versions from the recent versions only
-        version_pairs = []
-        for i in range(1, len(recent_versions)):
-            older_version = recent_versions[i - 1]
-            newer_version = recent_versions[i]
             version_pairs.append(
                 (
                     newer_version.get("nachtragsnummer"),
@@ -111,67 +119,343 @@ def find_consecutive_versions(collection_data_path):
                 )
             )
 
-        total_limited_version_pairs += len(version_pairs)
-
-        # Count laws where we reduced the number of pairs
-        if len(version_pairs) < len(all_version_pairs):
-            laws_with_reduced_pairs += 1
-
         if version_pairs:
             law_versions[ordnungsnummer] = version_pairs
 
-    # Log the reduction stats
-    diff_reduction = total_full_version_pairs - total_limited_version_pairs
-    percentage = (
-        (diff_reduction / total_full_version_pairs * 100)
-        if total_full_version_pairs > 0
-        else 0
+    total_pairs = sum(len(pairs) for pairs in law_versions.values())
+    logger.info(
+        f"Found {total_pairs} version pairs for {len(law_versions)} laws"
+        + (f" (limited to {max_versions} versions per law)" if max_versions else "")
     )
 
-    logger.info(f"Diff reduction statistics:")
-    logger.info(f"  - Total laws with version pairs: {len(law_versions)}")
-    logger.info(f"  - Laws with reduced version pairs: {laws_with_reduced_pairs}")
-    logger.info(f"  - Original diff pairs: {total_full_version_pairs}")
-    logger.info(f"  - Limited diff pairs: {total_limited_version_pairs}")
-    logger.info(f"  - Reduction: {diff_reduction} diffs ({percentage:.1f}%)")
-
     return law_versions
 
 
-def generate_diff(html1_path, html2_path, accurate_mode=True):
-    try:
-        # Read files - but extract only the law content div directly with regex
-        with open(html1_path, "r", encoding="utf-8") as f:
-            html1 = f.read()
-        with open(html2_path, "r", encoding="utf-8") as f:
-            html2 = f.read()
-
-        # Extract only the content div using regex (much faster than BeautifulSoup)
-        import re
-
-        content_pattern = re.compile(r'<div id="source-text".*?>(.*?)</div>', re.DOTALL)
-
-        match1 = content_pattern.search(html1)
-        match2 = content_pattern.search(html2)
-
-        if not match1 or not match2:
-            # Fall back to BeautifulSoup if regex doesn't match
-            soup1 = BeautifulSoup(html1, "html.parser")
-            soup2 = BeautifulSoup(html2, "html.parser")
-            law_div1 = soup1.find("div", id="source-text")
-            law_div2 = soup2.find("div", id="source-text")
-            law_html1 = str(law_div1)
-            law_html2 = str(law_div2)
-        else:
-            law_html1 = match1.group(1)
-            law_html2 = match2.group(1)
-
-        # Generate the diff
-        diffed_html = diff_lib.diff_strings(law_html1, law_html2, accurate_mode)
+class DiffCache:
+    """Persistent store of block diffs, keyed on the hashes of both blocks."""
+
+    def __init__(self, cache_dir: str = DEFAULT_DIFF_CACHE_DIR, accurate_mode: bool = True):
+        """
+        Args:
+            cache_dir: Directory holding the cached diffs
+            accurate_mode: Diff mode of the htmldiff library
+        """
+        self.cache_dir = Path(cache_dir)
+        self.accurate_mode = accurate_mode
+        self.hits = 0
+        self.misses = 0
+        # Keys of the diffs used by this cache, see prune()
+        self.used_keys: Set[str] = set()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.html"
+
+    def diff(self, old_block: Block, new_block: Block) -> str:
+        """
+        Diff two blocks word by word, reusing an earlier result if possible.
+
+        Args:
+            old_block: Block of the older version
+            new_block: Block of the newer version
+
+        Returns:
+            The diffed HTML
+        """
+        hasher = hashlib.sha256()
+        for part in (DIFF_CACHE_VERSION, str(self.accurate_mode), old_block[2], new_block[2]):
+            hasher.update(part.encode("utf-8") + b"\0")
+        key = hasher.hexdigest()
+        self.used_keys.add(key)
+        entry = self._entry_path(key)
+
+        try:
+            diffed_html = entry.read_text(encoding="utf-8")
+            self.hits += 1
+            return diffed_html
+        except OSError:
+            pass
+
+        self.misses += 1
+        diffed_html = diff_lib.diff_strings(old_block[1], new_block[1], self.accurate_mode)
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            # Written to a temporary file and renamed, so concurrent workers
+            # never see partially written entries
+            fd, tmp_path = tempfile.mkstemp(dir=entry.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(diffed_html)
+            os.replace(tmp_path, entry)
+        except OSError as e:
+            logger.warning(f"Could not add diff to diff cache: {e}")
         return diffed_html
-    except Exception as e:
-        logger.error(f"Error generating diff: {e}")
+
+    def prune(self, keys: Set[str]) -> int:
+        """
+        Remove the diffs that were not used in the current run.
+
+        Args:
+            keys: Keys of the diffs to keep
+
+        Returns:
+            Number of removed diffs
+        """
+        removed = 0
+        if not self.cache_dir.exists():
+            return removed
+        for entry in self.cache_dir.glob("*/*.html"):
+            if entry.stem not in keys:
+                entry.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+def _provision_id(element) -> Optional[str]:
+    """Return the provision ID of a top-level element of the law text, if any."""
+    if not isinstance(element, Tag):
         return None
+    if element.name == "div" and "provision-container" in element.get("class", []):
+        provision = element.find("p", class_="provision")
+        element = provision if provision is not None else element
+    provision_id = element.get("id", "")
+    if PROVISION_ID_PATTERN.match(provision_id):
+        return provision_id
+    return None
+
+
+def split_provision_blocks(source_text: Tag) -> List[Block]:
+    """
+    Split a law text into blocks that can be aligned across versions.
+
+    Each provision (container) is a block keyed on its ID. The content
+    between two provisions is a block keyed on GAP_KEY; gaps are aligned by
+    their content, as their position changes whenever a provision is added
+    or removed before them.
+
+    Args:
+        source_text: The source-text div of a law page
+
+    Returns:
+        The blocks in document order
+    """
+    blocks = []
+    seen_keys = {}
+
+    def add_block(key, parts):
+        block_html = "".join(parts)
+        normalized = WHITESPACE_PATTERN.sub(" ", block_html).strip()
+        if not normalized:
+            return
+        # Provision keys must be unique to align blocks, e.g. for duplicated provisions
+        if key != GAP_KEY:
+            seen_keys[key] = seen_keys.get(key, 0) + 1
+            if seen_keys[key] > 1:
+                key = f"{key}#{seen_keys[key]}"
+        block_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        blocks.append((key, block_html, block_hash))
+
+    gap_parts = []
+    for element in source_text.contents:
+        provision_id = _provision_id(element)
+        if provision_id is None:
+            # Strings are serialized escaped, like they are inside tags
+            gap_parts.append(
+                str(element) if isinstance(element, Tag) else element.output_ready()
+            )
+            continue
+        add_block(GAP_KEY, gap_parts)
+        add_block(provision_id, [str(element)])
+        gap_parts = []
+    add_block(GAP_KEY, gap_parts)
+
+    return blocks
+
+
+def load_version(html_path: str) -> Optional[Dict]:
+    """
+    Load the title and the law text blocks of a law page.
+
+    Args:
+        html_path: Path of the law page
+
+    Returns:
+        Dictionary with the "title" and the "blocks" of the page, or None if
+        the page has no law text
+    """
+    with open(html_path, "r", encoding="utf-8") as f:
+        soup = parse_html(f.read())
+    source_text = soup.find("div", id="source-text")
+    if source_text is None:
+        return None
+    title = soup.title.string if soup.title and soup.title.string else ""
+    return {"title": title, "blocks": split_provision_blocks(source_text)}
+
+
+def _alignment_token(block: Block) -> Tuple[str, str]:
+    """Provisions are aligned on their key, gaps on their content."""
+    if block[0] == GAP_KEY:
+        return (GAP_KEY, block[2])
+    return (block[0], "")
+
+
+def diff_blocks(old_blocks: List[Block], new_blocks: List[Block], cache: DiffCache) -> str:
+    """
+    Diff two law texts block by block.
+
+    Provisions are matched on their keys and gaps on their content, in
+    document order. Matched blocks with equal hashes are copied from the
+    newer version, matched provisions that changed are diffed word by word.
+    Among the unmatched blocks between two matches, gaps are paired in order
+    and diffed word by word; the remaining blocks are deleted or inserted as
+    a whole, deletions first.
+
+    Args:
+        old_blocks: Blocks of the older version
+        new_blocks: Blocks of the newer version
+        cache: Cache of the word diffs
+
+    Returns:
+        The diffed HTML of the law text
+    """
+    matcher = difflib.SequenceMatcher(
+        None,
+        [_alignment_token(block) for block in old_blocks],
+        [_alignment_token(block) for block in new_blocks],
+        autojunk=False,
+    )
+    parts = []
+
+    def diff_pair(old_block, new_block):
+        if old_block[2] == new_block[2]:
+            return new_block[1]
+        return cache.diff(old_block, new_block)
+
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            for old_block, new_block in zip(
+                old_blocks[old_start:old_end], new_blocks[new_start:new_end]
+            ):
+                parts.append(diff_pair(old_block, new_block))
+            continue
+
+        # Pair the changed gaps, e.g. footnotes after an added provision
+        old_gaps = [block for block in old_blocks[old_start:old_end] if block[0] == GAP_KEY]
+        paired = dict(
+            zip(
+                (i for i in range(new_start, new_end) if new_blocks[i][0] == GAP_KEY),
+                old_gaps,
+            )
+        )
+        paired_ids = {id(block) for block in paired.values()}
+
+        for old_block in old_blocks[old_start:old_end]:
+            if id(old_block) not in paired_ids:
+                parts.append(f'<div class="delete">{old_block[1]}</div>')
+        for i in range(new_start, new_end):
+            new_block = new_blocks[i]
+            if i in paired:
+                parts.append(diff_pair(paired[i], new_block))
+            else:
+                parts.append(f'<div class="insert">{new_block[1]}</div>')
+
+    return "".join(parts)
+
+
+def build_diff_page(erlasstitel, ordnungsnummer, older_version, newer_version):
+    """
+    Create the page around a diff.
+
+    Returns:
+        The page HTML, with DIFF_CONTENT_MARKER in place of the diffed law text
+    """
+    # Create minimal HTML structure for diff file
+    diff_soup = BeautifulSoup("<!DOCTYPE html>", "html.parser")
+
+    # Create html element
+    html_tag = diff_soup.new_tag("html")
+    diff_soup.append(html_tag)
+
+    # Create minimal head with only charset and title
+    head = diff_soup.new_tag("head")
+    html_tag.append(head)
+
+    # Add charset meta
+    charset_meta = diff_soup.new_tag("meta", charset="utf-8")
+    head.append(charset_meta)
+
+    # Add title
+    title = diff_soup.new_tag("title")
+    title.string = f"Diff: {erlasstitel} ({ordnungsnummer}-{older_version} → {newer_version})"
+    head.append(title)
+
+    # Create body
+    body = diff_soup.new_tag("body")
+    html_tag.append(body)
+
+    # Create main-container div
+    main_container = diff_soup.new_tag("div", **{"class": "main-container"})
+    body.append(main_container)
+
+    # Create content div
+    content_div = diff_soup.new_tag("div", **{"class": "content"})
+    main_container.append(content_div)
+
+    # Add heading
+    h1 = diff_soup.new_tag("h1")
+    h1.string = f"Änderungen: {erlasstitel}"
+    content_div.append(h1)
+
+    # Add subheading with version info
+    subheading = diff_soup.new_tag("h2")
+    subheading.string = f"Version {older_version} → {newer_version}"
+    content_div.append(subheading)
+
+    # Add explanation of diff colors
+    explanation = diff_soup.new_tag(
+        "div",
+        **{
+            "class": "diff-explanation",
+            "style": "margin-bottom: 20px; padding: 10px; border: 1px solid #ccc;",
+        },
+    )
+    explanation.string = "Änderungen: "
+
+    # Add color examples
+    insert_example = diff_soup.new_tag(
+        "span",
+        **{
+            "class": "insert",
+            "style": "background-color: #AFA; padding: 2px 5px;",
+        },
+    )
+    insert_example.string = "Grün = hinzugefügt"
+    explanation.append(insert_example)
+
+    explanation.append(" | ")
+
+    delete_example = diff_soup.new_tag(
+        "span",
+        **{
+            "class": "delete",
+            "style": "background-color: #F88; text-decoration: line-through; padding: 2px 5px;",
+        },
+    )
+    delete_example.string = "Rot = entfernt"
+    explanation.append(delete_example)
+
+    content_div.append(explanation)
+
+    # Create law div
+    law_div = diff_soup.new_tag("div", id="law")
+    content_div.append(law_div)
+
+    # Create source-text div, the diffed content is inserted after serializing
+    source_div = diff_soup.new_tag(
+        "div", id="source-text", **{"class": "pdf-source"}
+    )
+    source_div.string = DIFF_CONTENT_MARKER
+    law_div.append(source_div)
+
+    return str(diff_soup)
 
 
 def generate_law_diffs(args):
@@ -179,160 +463,91 @@ def generate_law_diffs(args):
     Generate diffs for all consecutive versions of a law.
     This function is designed to be called from both sequential and parallel processors.
 
+    Every version page is loaded once, even if it is part of two pairs.
+
     Args:
-        args: Tuple containing (ordnungsnummer, version_pairs, collection_path, diff_path, law_origin)
+        args: Tuple containing (ordnungsnummer, version_pairs, collection_path,
+            diff_path, law_origin, cache_dir)
 
     Returns:
-        Number of successfully generated diffs
+        Number of successfully generated diffs and the keys of the cached
+        diffs they used
     """
-    ordnungsnummer, version_pairs, collection_path, diff_path, law_origin = args
+    ordnungsnummer, version_pairs, collection_path, diff_path, law_origin, cache_dir = args
+
+    cache = DiffCache(cache_dir)
+    loaded_versions = {}
+
+    def get_version(nachtragsnummer):
+        if nachtragsnummer not in loaded_versions:
+            html_path = os.path.join(
+                collection_path, f"{ordnungsnummer}-{nachtragsnummer}.html"
+            )
+            loaded_versions[nachtragsnummer] = (
+                load_version(html_path) if os.path.exists(html_path) else None
+            )
+        return loaded_versions[nachtragsnummer]
 
     success_count = 0
     for newer_version, older_version in version_pairs:
         try:
-            # Construct file paths
-            html1_path = os.path.join(
-                collection_path, f"{ordnungsnummer}-{older_version}.html"
-            )
-            html2_path = os.path.join(
-                collection_path, f"{ordnungsnummer}-{newer_version}.html"
-            )
             output_path = os.path.join(
                 diff_path, f"{ordnungsnummer}-{older_version}-diff-{newer_version}.html"
             )
 
+            older = get_version(older_version)
+            newer = get_version(newer_version)
+
             # Skip if both input files don't exist
-            if not (os.path.exists(html1_path) and os.path.exists(html2_path)):
+            if older is None or newer is None:
                 logger.warning(
                     f"Skipping diff for {ordnungsnummer} ({older_version} -> {newer_version}): Input files missing"
                 )
                 continue
 
-            # Generate diff
-            diffed_html = generate_diff(html1_path, html2_path, accurate_mode=True)
-
-            if diffed_html:
-                # Create diff directory if it doesn't exist
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-                # Extract title from newer version
-                with open(html2_path, "r", encoding="utf-8") as f:
-                    newer_soup = BeautifulSoup(f.read(), "html.parser")
-                    erlasstitel = ""
-                    title_tag = newer_soup.title
-                    if title_tag:
-                        erlasstitel = title_tag.string
-
-                # Create minimal HTML structure for diff file
-                diff_soup = BeautifulSoup("<!DOCTYPE html>", "html.parser")
-
-                # Create html element
-                html_tag = diff_soup.new_tag("html")
-                diff_soup.append(html_tag)
-
-                # Create minimal head with only charset and title
-                head = diff_soup.new_tag("head")
-                html_tag.append(head)
-
-                # Add charset meta
-                charset_meta = diff_soup.new_tag("meta", charset="utf-8")
-                head.append(charset_meta)
-
-                # Add title
-                title = diff_soup.new_tag("title")
-                title.string = f"Diff: {erlasstitel} ({ordnungsnummer}-{older_version} → {newer_version})"
-                head.append(title)
-
-                # Create body
-                body = diff_soup.new_tag("body")
-                html_tag.append(body)
-
-                # Create main-container div
-                main_container = diff_soup.new_tag("div", **{"class": "main-container"})
-                body.append(main_container)
-
-                # Create content div
-                content_div = diff_soup.new_tag("div", **{"class": "content"})
-                main_container.append(content_div)
-
-                # Add heading
-                h1 = diff_soup.new_tag("h1")
-                h1.string = f"Änderungen: {erlasstitel}"
-                content_div.append(h1)
-
-                # Add subheading with version info
-                subheading = diff_soup.new_tag("h2")
-                subheading.string = f"Version {older_version} → {newer_version}"
-                content_div.append(subheading)
-
-                # Add explanation of diff colors
-                explanation = diff_soup.new_tag(
-                    "div",
-                    **{
-                        "class": "diff-explanation",
-                        "style": "margin-bottom: 20px; padding: 10px; border: 1px solid #ccc;",
-                    },
-                )
-                explanation.string = "Änderungen: "
-
-                # Add color examples
-                insert_example = diff_soup.new_tag(
-                    "span",
-                    **{
-                        "class": "insert",
-                        "style": "background-color: #AFA; padding: 2px 5px;",
-                    },
-                )
-                insert_example.string = "Grün = hinzugefügt"
-                explanation.append(insert_example)
-
-                explanation.append(" | ")
-
-                delete_example = diff_soup.new_tag(
-                    "span",
-                    **{
-                        "class": "delete",
-                        "style": "background-color: #F88; text-decoration: line-through; padding: 2px 5px;",
-                    },
-                )
-                delete_example.string = "Rot = entfernt"
-                explanation.append(delete_example)
+            diffed_html = diff_blocks(older["blocks"], newer["blocks"], cache)
 
-                content_div.append(explanation)
+            # Create diff directory if it doesn't exist
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-                # Create law div
-                law_div = diff_soup.new_tag("div", id="law")
-                content_div.append(law_div)
-
-                # Create source-text div and add diffed content
-                source_div = diff_soup.new_tag(
-                    "div", id="source-text", **{"class": "pdf-source"}
-                )
-                law_div.append(source_div)
-
-                # Add the diffed HTML content
-                diff_content = BeautifulSoup(diffed_html, "html.parser")
-                source_div.append(diff_content)
-
-                # Save the diff file
-                with open(output_path, "w", encoding="utf-8") as f:
-                    f.write(str(diff_soup))
+            page = build_diff_page(
+                newer["title"], ordnungsnummer, older_version, newer_version
+            )
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(page.replace(DIFF_CONTENT_MARKER, diffed_html))
 
-                success_count += 1
-                logger.info(
-                    f"Generated diff for {ordnungsnummer} ({older_version} -> {newer_version})"
-                )
+            success_count += 1
+            logger.debug(
+                f"Generated diff for {ordnungsnummer} ({older_version} -> {newer_version})"
+            )
 
         except Exception as e:
             logger.error(
                 f"Error generating diff for {ordnungsnummer} ({older_version} -> {newer_version}): {e}"
             )
 
-    return success_count
+    logger.debug(
+        f"{ordnungsnummer}: {cache.misses} provision diffs computed, {cache.hits} from cache"
+    )
+    return success_count, cache.used_keys
+
+
+def prune_diff_cache(cache_dir, used_keys, law_origin):
+    """Remove the cached diffs that no version pair of this run used."""
+    removed = DiffCache(cache_dir).prune(used_keys)
+    logger.info(
+        f"Diff cache for {law_origin}: {len(used_keys)} diffs used, {removed} removed"
+    )
 
 
 def process_all_diffs_concurrently(
-    collection_data_path, collection_path, diff_path, law_origin, max_workers=None
+    collection_data_path,
+    collection_path,
+    diff_path,
+    law_origin,
+    max_workers=None,
+    max_versions=None,
+    cache_dir=DEFAULT_DIFF_CACHE_DIR,
 ):
     """
     Process diffs in parallel using ProcessPoolExecutor.
@@ -343,13 +558,16 @@ def process_all_diffs_concurrently(
         diff_path: Path to store the diffs
         law_origin: Origin of the laws ('zh' or 'ch')
         max_workers: Maximum number of worker processes
+        max_versions: Number of most recent versions to diff per law (default: all)
+        cache_dir: Directory of the diff cache; diffs not used by this run
+            are removed from it
 
     Returns:
         Total number of successfully generated diffs
     """
 
     # Find consecutive versions
-    law_versions = find_consecutive_versions(collection_data_path)
+    law_versions = find_consecutive_versions(collection_data_path, max_versions)
 
     # Create the diff directory
     os.makedirs(diff_path, exist_ok=True)
@@ -358,59 +576,48 @@ def process_all_diffs_concurrently(
     total_diffs = sum(len(pairs) for pairs in law_versions.values())
     logger.info(f"Processing {total_diffs} diffs for {len(law_versions)} laws")
 
-    # Process laws with less than 4 version pairs sequentially for efficiency
-    small_law_results = []
-    large_laws = {}
-
-    for ordnungsnummer, version_pairs in law_versions.items():
-        if len(version_pairs) <= 3:  # Process small laws directly
-            count = generate_law_diffs(
-                (ordnungsnummer, version_pairs, collection_path, diff_path, law_origin)
-            )
-            small_law_results.append(count)
-        else:
-            large_laws[ordnungsnummer] = version_pairs
-
-    # Only use parallel processing for laws with many diffs
-    if large_laws:
-        # Prepare arguments for parallel processing
-        process_args = [
-            (ordnungsnummer, version_pairs, collection_path, diff_path, law_origin)
-            for ordnungsnummer, version_pairs in large_laws.items()
-        ]
-
-        large_law_diffs = sum(len(pairs) for pairs in large_laws.values())
+    # Submit laws with many versions first, so they don't hold up the end
+    process_args = [
+        (ordnungsnummer, version_pairs, collection_path, diff_path, law_origin, cache_dir)
+        for ordnungsnummer, version_pairs in sorted(
+            law_versions.items(), key=lambda item: len(item[1]), reverse=True
+        )
+    ]
 
-        # Process in parallel
+    total_success = 0
+    used_keys = set()
+    if process_args:
         with concurrent.futures.ProcessPoolExecutor(
             max_workers=max_workers
         ) as executor:
             # Submit all tasks
             futures = [executor.submit(generate_law_diffs, args) for args in process_args]
-            
+
             # Track progress with enlighten-compatible progress bar
-            results = []
             for future in track_concurrent_futures(
                 futures,
-                desc=f"Processing {large_law_diffs} diffs for {len(large_laws)} complex laws ({law_origin})",
+                desc=f"Processing {total_diffs} diffs for {len(law_versions)} laws ({law_origin})",
                 unit="laws"
             ):
-                results.append(future.result())
-            large_law_results = results
-    else:
-        large_law_results = []
+                success_count, law_keys = future.result()
+                total_success += success_count
+                used_keys.update(law_keys)
 
-    # Calculate total success count
-    total_success = sum(small_law_results) + sum(large_law_results)
     logger.info(
         f"Successfully generated {total_success} of {total_diffs} diffs for {law_origin}"
     )
+    prune_diff_cache(cache_dir, used_keys, law_origin)
 
     return total_success
 
 
 def process_all_diffs_sequentially(
-    collection_data_path, collection_path, diff_path, law_origin
+    collection_data_path,
+    collection_path,
+    diff_path,
+    law_origin,
+    max_versions=None,
+    cache_dir=DEFAULT_DIFF_CACHE_DIR,
 ):
     """
     Process diffs sequentially for easier debugging.
@@ -420,50 +627,47 @@ def process_all_diffs_sequentially(
         collection_path: Path to the HTML files
         diff_path: Path to store the diffs
         law_origin: Origin of the laws ('zh' or 'ch')
+        max_versions: Number of most recent versions to diff per law (default: all)
+        cache_dir: Directory of the diff cache; diffs not used by this run
+            are removed from it
 
     Returns:
         Total number of successfully generated diffs
     """
     # Find consecutive versions
-    law_versions = find_consecutive_versions(collection_data_path)
+    law_versions = find_consecutive_versions(collection_data_path, max_versions)
 
     # Create the diff directory
     os.makedirs(diff_path, exist_ok=True)
 
-    # Count total diffs for better progress reporting
-    all_pairs = []
-    for ordnungsnummer, version_pairs in law_versions.items():
-        for pair in version_pairs:
-            all_pairs.append((ordnungsnummer, pair))
-
-    total_diffs = len(all_pairs)
+    total_diffs = sum(len(pairs) for pairs in law_versions.values())
     logger.info(
         f"Processing {total_diffs} diffs for {len(law_versions)} laws sequentially"
     )
 
-    # Process each diff with a progress bar
+    # Process each law with a progress bar
     total_success = 0
+    used_keys = set()
 
     with progress_manager() as pm:
         counter = pm.create_counter(
-            total=len(all_pairs),
-            desc=f"Processing {len(all_pairs)} {law_origin} diffs",
+            total=total_diffs,
+            desc=f"Processing {total_diffs} {law_origin} diffs",
             unit="diffs"
         )
-        
-        for i, (ordnungsnummer, pair) in enumerate(all_pairs):
-            version_pairs = [
-                pair
-            ]  # Just process one pair at a time for better progress reporting
-            success_count = generate_law_diffs(
-                (ordnungsnummer, version_pairs, collection_path, diff_path, law_origin)
+
+        for ordnungsnummer, version_pairs in law_versions.items():
+            success_count, law_keys = generate_law_diffs(
+                (ordnungsnummer, version_pairs, collection_path, diff_path, law_origin, cache_dir)
             )
             total_success += success_count
-            counter.update()
+            used_keys.update(law_keys)
+            counter.update(len(version_pairs))
 
     logger.info(
         f"Successfully generated {total_success} of {total_diffs} diffs for {law_origin}"
     )
+    prune_diff_cache(cache_dir, used_keys, law_origin)
     return total_success
 
 
@@ -474,6 +678,8 @@ def main(
     law_origin,
     processing_mode,
     max_workers=None,
+    max_versions=None,
+    cache_dir=None,
 ):
     """
     Main entry point for generating diffs for a collection of laws.
@@ -485,18 +691,35 @@ def main(
         law_origin: Origin of the laws ('zh' or 'ch')
         processing_mode: 'concurrent' or 'sequential'
         max_workers: Maximum number of worker processes (for concurrent mode)
+        max_versions: Number of most recent versions to diff per law (default: all)
+        cache_dir: Directory of the diff cache (default:
+            data/diff_cache/<law_origin>); diffs not used by this run are
+            removed from it
 
     Returns:
         Total number of successfully generated diffs
     """
     logger.info(f"Generating diffs for {law_origin} laws ({processing_mode} mode)")
+    if cache_dir is None:
+        cache_dir = os.path.join(DEFAULT_DIFF_CACHE_DIR, law_origin)
 
     # Process either sequentially or concurrently based on the mode
     if processing_mode == "concurrent":
         return process_all_diffs_concurrently(
-            collection_data_path, collection_path, diff_path, law_origin, max_workers
+            collection_data_path,
+            collection_path,
+            diff_path,
+            law_origin,
+            max_workers,
+            max_versions,
+            cache_dir,
         )
     else:
         return process_all_diffs_sequentially(
-            collection_data_path, collection_path, diff_path, law_origin
+            collection_data_path,
+            collection_path,
+            diff_path,
+            law_origin,
+            max_versions,
+            cache_dir,
         )
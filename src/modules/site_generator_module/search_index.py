@@ -0,0 +1,403 @@
+"""
+Search Index Module
+
+Builds the Pagefind search index of a site incrementally. Instead of letting
+the Pagefind CLI read and parse every page, each page is reduced to the parts
+Pagefind indexes (a "fragment"): the elements marked with data-pagefind-body,
+the elements carrying Pagefind metadata or filters, the page title and
+language. Fragments are kept in a persistent store keyed on a hash of the
+page, so only pages that changed since an earlier build are parsed again.
+Pages without data-pagefind-body (e.g. older law versions) are recognized
+without parsing them at all.
+
+The fragments are linked into a staging copy of the site, which the Pagefind
+binary indexes into the same index shards as before. Only the extraction is
+incremental: Pagefind cannot update an existing index, so it indexes the
+fragments of all pages again whenever any indexed page changed (reading the
+small fragments instead of the full pages). If no indexed page changed, the
+index of the previous build is copied instead. The binary of the pinned
+pagefind package runs offline; the stage fails if the package is missing
+rather than downloading Pagefind during the build.
+
+License:
+    https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
+"""
+
+import concurrent.futures
+import hashlib
+import html
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.exceptions import ConfigurationException
+from src.utils.html_utils import DocumentOrderIndex, parse_html
+from src.utils.logging_utils import get_module_logger
+from src.utils.progress_utils import track_concurrent_futures
+
+logger = get_module_logger(__name__)
+
+try:
+    from pagefind.service import get_executable
+
+    PAGEFIND_AVAILABLE = True
+except ImportError:
+    PAGEFIND_AVAILABLE = False
+
+# Pagefind release whose index format and JS API (/pagefind/pagefind.js) the
+# frontend uses; keep in sync with requirements.txt
+PAGEFIND_VERSION = "1.5.2"
+
+# Bump to invalidate all stored fragments, e.g. after changing the extraction
+SEARCH_INDEX_VERSION = "1"
+
+DEFAULT_STORE_DIR = "data/search_index"
+
+# Output directory of the index, relative to the site root
+PAGEFIND_DIR = "pagefind"
+
+# Pagefind only indexes pages with this attribute if any page has it
+PAGEFIND_BODY_MARKER = b"data-pagefind-body"
+
+# Attributes that make Pagefind read an element outside data-pagefind-body
+PAGEFIND_DATA_ATTRIBUTES = (
+    "data-pagefind-meta",
+    "data-pagefind-filter",
+    "data-pagefind-sort",
+    "data-pagefind-default-meta",
+)
+
+def extract_fragment(html_content: str) -> Optional[str]:
+    """
+    Reduce a page to the parts Pagefind indexes.
+
+    Keeps the language and title of the page, the head elements with Pagefind
+    attributes, and in document order: the data-pagefind-body elements, the
+    elements outside them carrying metadata or filters, and the first h1 and
+    img (Pagefind's default title and image).
+
+    Args:
+        html_content: HTML of the page
+
+    Returns:
+        The fragment, or None if the page has no data-pagefind-body element
+    """
+    soup = parse_html(html_content)
+    bodies = soup.find_all(attrs={"data-pagefind-body": True})
+    if not bodies:
+        return None
+
+    def has_pagefind_data(tag):
+        return any(tag.has_attr(attribute) for attribute in PAGEFIND_DATA_ATTRIBUTES)
+
+    head = soup.find("head")
+    head_parts = []
+    if soup.title is not None:
+        head_parts.append(str(soup.title))
+    if head is not None:
+        head_parts += [str(tag) for tag in head.find_all(has_pagefind_data)]
+
+    kept = list(bodies)
+    kept_ids = {id(tag) for tag in kept}
+    body = soup.find("body") or soup
+    candidates = body.find_all(has_pagefind_data)
+    for tag_name in ("h1", "img"):
+        first = body.find(tag_name)
+        if first is not None:
+            candidates.append(first)
+    for tag in candidates:
+        # Skip elements already contained in a kept element
+        if id(tag) in kept_ids or any(id(parent) in kept_ids for parent in tag.parents):
+            continue
+        kept.append(tag)
+        kept_ids.add(id(tag))
+    kept = DocumentOrderIndex(soup).sort(kept)
+
+    html_tag = soup.find("html")
+    lang = html_tag.get("lang") if html_tag is not None else None
+    lang_attr = f' lang="{html.escape(lang)}"' if lang else ""
+    return (
+        f"<!DOCTYPE html><html{lang_attr}><head>{''.join(head_parts)}</head>"
+        f"<body>{''.join(str(tag) for tag in kept)}</body></html>"
+    )
+
+
+class FragmentStore:
+    """Persistent store of page fragments, keyed on a hash of the page."""
+
+    def __init__(self, store_dir: str = DEFAULT_STORE_DIR):
+        """
+        Args:
+            store_dir: Directory holding the fragments and the last index
+        """
+        self.store_dir = Path(store_dir)
+        self.fragment_dir = self.store_dir / "fragments"
+        self.staging_dir = self.store_dir / "site"
+        self.index_dir = self.store_dir / PAGEFIND_DIR
+        self.digest_path = self.store_dir / "index_digest.txt"
+
+    @staticmethod
+    def page_key(page_content: bytes) -> str:
+        hasher = hashlib.sha256()
+        hasher.update(SEARCH_INDEX_VERSION.encode("utf-8") + b"\0")
+        hasher.update(page_content)
+        return hasher.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.fragment_dir / key[:2] / f"{key}.html"
+
+    def contains(self, key: str) -> bool:
+        return self._entry_path(key).exists()
+
+    def stage(self, pages: List[Tuple[str, str]]) -> int:
+        """
+        Recreate the staging site from the fragments of the given pages.
+
+        Fragments are hard-linked (or copied) to the path of their page;
+        pages without a fragment are left out.
+
+        Args:
+            pages: (relative path, key) per page
+
+        Returns:
+            Number of staged pages
+        """
+        if self.staging_dir.exists():
+            shutil.rmtree(self.staging_dir)
+        staged = 0
+        for relative_path, key in pages:
+            entry = self._entry_path(key)
+            if entry.stat().st_size == 0:
+                continue
+            dest = self.staging_dir / relative_path
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(entry, dest)
+            except OSError:
+                shutil.copyfile(entry, dest)
+            staged += 1
+        return staged
+
+    def store(self, key: str, fragment: Optional[str]) -> None:
+        """
+        Add a fragment; None records that the page is not indexed.
+
+        The entry is written to a temporary file and renamed, so concurrent
+        workers never see partially written entries.
+        """
+        entry = self._entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=entry.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(fragment or "")
+        os.replace(tmp_path, entry)
+
+    def prune(self, keys: Set[str]) -> int:
+        """
+        Remove the fragments of pages that no longer exist.
+
+        Args:
+            keys: Keys of the fragments to keep
+
+        Returns:
+            Number of removed fragments
+        """
+        removed = 0
+        if not self.fragment_dir.exists():
+            return removed
+        for entry in self.fragment_dir.glob("*/*.html"):
+            if entry.stem not in keys:
+                entry.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def load_index_digest(self) -> Optional[str]:
+        try:
+            return self.digest_path.read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+
+    def save_index(self, output_dir: Path, digest: str) -> None:
+        """Keep a copy of a written index, to restore it if no page changes."""
+        try:
+            self.digest_path.unlink(missing_ok=True)
+            if self.index_dir.exists():
+                shutil.rmtree(self.index_dir)
+            shutil.copytree(output_dir, self.index_dir)
+            self.digest_path.write_text(digest, encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"Could not store search index in {self.index_dir}: {e}")
+
+
+def extract_page_fragment(args):
+    """
+    Extract and store the fragment of a page.
+    This function is designed to be called from both sequential and parallel processors.
+
+    Args:
+        args: Tuple containing (html_path, key, store_dir)
+
+    Returns:
+        Tuple of (key, success)
+    """
+    html_path, key, store_dir = args
+    try:
+        with open(html_path, "r", encoding="utf-8") as f:
+            fragment = extract_fragment(f.read())
+        FragmentStore(store_dir).store(key, fragment)
+        return key, True
+    except Exception as e:
+        logger.error(f"Error extracting search fragment of {html_path}: {e}")
+        return key, False
+
+
+def scan_pages(static_path: str) -> List[Tuple[str, str, bool]]:
+    """
+    Hash all pages of a site.
+
+    Returns:
+        (relative path, key, candidate) per page, sorted by path; candidate
+        is False for pages without data-pagefind-body
+    """
+    site_root = Path(static_path)
+    pages = []
+    for html_path in site_root.rglob("*.html"):
+        relative_path = html_path.relative_to(site_root)
+        if relative_path.parts[0] == PAGEFIND_DIR:
+            continue
+        content = html_path.read_bytes()
+        pages.append(
+            (
+                relative_path.as_posix(),
+                FragmentStore.page_key(content),
+                PAGEFIND_BODY_MARKER in content,
+            )
+        )
+    return sorted(pages)
+
+
+def index_digest(pages: List[Tuple[str, str, bool]]) -> str:
+    """Hash identifying the index built from the given pages."""
+    hasher = hashlib.sha256()
+    hasher.update(SEARCH_INDEX_VERSION.encode("utf-8") + b"\0")
+    for relative_path, key, candidate in pages:
+        if candidate:
+            hasher.update(f"{relative_path}\0{key}\0".encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def run_pagefind(executable: str, site_path: str, output_dir: Path) -> bool:
+    """
+    Index a site with the Pagefind binary.
+
+    Returns:
+        True if the index was written
+    """
+    result = subprocess.run(
+        [executable, "--site", site_path, "--output-path", str(output_dir.resolve())]
+    )
+    if result.returncode != 0:
+        logger.error(f"Pagefind failed with exit code {result.returncode}")
+        return False
+    return True
+
+
+def main(
+    static_path: str,
+    processing_mode: str = "concurrent",
+    max_workers: Optional[int] = None,
+    store_dir: str = DEFAULT_STORE_DIR,
+) -> Dict[str, int]:
+    """
+    Build the search index of a site in <static_path>/pagefind.
+
+    Fragments are only extracted for new or changed pages, but Pagefind
+    indexes the fragments of all pages whenever any of them changed.
+
+    Args:
+        static_path: Root directory of the site
+        processing_mode: 'concurrent' or 'sequential' fragment extraction
+        max_workers: Maximum number of worker processes (for concurrent mode)
+        store_dir: Directory of the fragment store
+
+    Returns:
+        Statistics: number of pages, indexed pages, extracted and pruned
+        fragments
+
+    Raises:
+        ConfigurationException: If the pagefind package or its binary is missing
+    """
+    executable = get_executable() if PAGEFIND_AVAILABLE else None
+    if executable is None:
+        raise ConfigurationException(
+            "The Pagefind binary is missing, install the pinned package with "
+            f'pip install "pagefind[bin]=={PAGEFIND_VERSION}"'
+        )
+
+    store = FragmentStore(store_dir)
+    output_dir = Path(static_path) / PAGEFIND_DIR
+    pages = scan_pages(static_path)
+    candidates = [(relative_path, key) for relative_path, key, candidate in pages if candidate]
+    stats = {"pages": len(pages), "indexed": 0, "extracted": 0, "pruned": 0}
+
+    # Pagefind indexes all pages if none has data-pagefind-body
+    if not candidates:
+        logger.warning("No page has data-pagefind-body, indexing the whole site")
+        run_pagefind(str(executable), static_path, output_dir)
+        return stats
+
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+
+    digest = index_digest(pages)
+    if digest == store.load_index_digest() and store.index_dir.exists():
+        shutil.copytree(store.index_dir, output_dir)
+        stats["indexed"] = len(candidates)
+        logger.info(f"No indexed page changed, restored search index of {len(pages)} pages")
+        return stats
+
+    # Extract the fragments of new or changed pages
+    missing = {}
+    for relative_path, key in candidates:
+        if key not in missing and not store.contains(key):
+            missing[key] = os.path.join(static_path, relative_path)
+    extract_args = [(html_path, key, store_dir) for key, html_path in missing.items()]
+    failed = set()
+    if processing_mode == "concurrent" and len(extract_args) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(extract_page_fragment, args) for args in extract_args]
+            for future in track_concurrent_futures(
+                futures,
+                desc=f"Extracting search fragments of {len(extract_args)} pages",
+                unit="pages",
+            ):
+                key, success = future.result()
+                if not success:
+                    failed.add(key)
+    else:
+        for args in extract_args:
+            key, success = extract_page_fragment(args)
+            if not success:
+                failed.add(key)
+    stats["extracted"] = len(extract_args) - len(failed)
+
+    stats["indexed"] = store.stage(
+        [(relative_path, key) for relative_path, key in candidates if key not in failed]
+    )
+    stats["pruned"] = store.prune({key for _, key in candidates})
+    logger.info(
+        f"Indexing {stats['indexed']} of {len(pages)} pages "
+        f"({stats['extracted']} fragments extracted, "
+        f"{len(candidates) - len(extract_args)} from the fragment store, "
+        f"{stats['pruned']} removed)"
+    )
+    if not run_pagefind(str(executable), str(store.staging_dir), output_dir):
+        return stats
+
+    # An index missing failed pages must not be restored by later builds
+    if not failed:
+        store.save_index(output_dir, digest)
+    return stats
@@ -9,6 +9,33 @@
  * Production servers (Apache/Nginx) will ignore this file and use .htaccess instead.
  */
 
+/**
+ * Quality value the Accept-Encoding header gives an encoding, 0 if the
+ * encoding is not accepted. An encoding listed with q=0 is refused even if
+ * "*" is accepted.
+ */
+function encodingQuality(string $acceptEncoding, string $encoding): float {
+    $wildcardQuality = 0.0;
+    foreach (explode(',', $acceptEncoding) as $item) {
+        $params = explode(';', $item);
+        $coding = strtolower(trim(array_shift($params)));
+        $quality = 1.0;
+        foreach ($params as $param) {
+            $parts = explode('=', $param, 2);
+            if (count($parts) === 2 && strtolower(trim($parts[0])) === 'q') {
+                $quality = (float) trim($parts[1]);
+            }
+        }
+        if ($coding === $encoding) {
+            return $quality;
+        }
+        if ($coding === '*') {
+            $wildcardQuality = $quality;
+        }
+    }
+    return $wildcardQuality;
+}
+
 // Get the requested URI
 $uri = parse_url($_SERVER['REQUEST_URI'], PHP_URL_PATH);
 
@@ -42,6 +69,39 @@ if (is_dir($filePath)) {
 
 // If the file exists, let PHP's built-in server handle it
 if (file_exists($filePath) && is_file($filePath)) {
+    // Serve a precompressed variant (.br, .gz) if the client accepts it,
+    // like the .htaccess rules of builds with --precompress
+    $contentTypes = [
+        'html' => 'text/html; charset=UTF-8',
+        'json' => 'application/json',
+        'css' => 'text/css',
+        'js' => 'application/javascript',
+    ];
+    $extension = pathinfo($filePath, PATHINFO_EXTENSION);
+    if (isset($contentTypes[$extension])) {
+        $acceptEncoding = $_SERVER['HTTP_ACCEPT_ENCODING'] ?? '';
+        $servePath = $filePath;
+        $bestQuality = 0.0;
+        $contentEncoding = null;
+        foreach (['br' => 'br', 'gz' => 'gzip'] as $suffix => $encoding) {
+            $quality = encodingQuality($acceptEncoding, $encoding);
+            if ($quality > $bestQuality && is_file("$filePath.$suffix")) {
+                $servePath = "$filePath.$suffix";
+                $bestQuality = $quality;
+                $contentEncoding = $encoding;
+            }
+        }
+        header('Content-Type: ' . $contentTypes[$extension]);
+        if ($contentEncoding !== null) {
+            header("Content-Encoding: $contentEncoding");
+        }
+        // The response depends on Accept-Encoding for the original as well
+        header('Vary: Accept-Encoding');
+        header('Content-Length: ' . filesize($servePath));
+        readfile($servePath);
+        exit;
+    }
+
     return false; // Let PHP's built-in server handle the file
 }
 
@@ -8,6 +8,7 @@ and provide consistent implementations across the codebase.
 from .file_utils import (
     FileOperations,
     MetadataHandler,
+    TrackedMetadata,
     PathBuilder,
     read_json,
     write_json,
@@ -26,6 +27,7 @@ __all__ = [
     # File utilities
     'FileOperations',
     'MetadataHandler', 
+    'TrackedMetadata',
     'PathBuilder',
     'read_json',
     'write_json',
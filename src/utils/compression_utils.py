@@ -0,0 +1,214 @@
+"""
+Compression utilities for precompressed static output.
+Writes brotli (.br) and gzip (.gz) variants next to text files, so the web
+server can send them as they are instead of compressing every response.
+"""
+
+import concurrent.futures
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+from src.utils.logging_utils import get_module_logger
+from src.utils.progress_utils import track_concurrent_futures
+logger = get_module_logger(__name__)
+
+# Files that get compressed variants
+COMPRESSIBLE_SUFFIXES = (".html", ".json", ".css", ".js")
+
+# Files smaller than this fit into a few packets anyway
+MIN_COMPRESS_SIZE = 1024
+
+# A variant is only kept if it is at most this fraction of the original size
+MAX_COMPRESSION_RATIO = 0.9
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+COMPRESSED_SUFFIXES = (".br", ".gz")
+
+# Files whose variants don't all reach MAX_COMPRESSION_RATIO, with the hash of
+# their content, so that later builds don't compress them again
+DEFAULT_STATE_FILE = "data/build_cache/incompressible.json"
+
+
+def is_compressible(file_path: str) -> bool:
+    """Check whether a file type gets compressed variants."""
+    return str(file_path).endswith(COMPRESSIBLE_SUFFIXES)
+
+
+def expected_suffixes() -> Tuple[str, ...]:
+    """Suffixes of the variants this installation writes."""
+    return COMPRESSED_SUFFIXES if BROTLI_AVAILABLE else (".gz",)
+
+
+def write_compressed_variants(file_path: str, content: Optional[bytes] = None) -> int:
+    """
+    Write the .br and .gz variants of a file.
+
+    Variants of files below MIN_COMPRESS_SIZE, and variants that don't reach
+    MAX_COMPRESSION_RATIO, are not written (and removed if they exist from
+    an earlier build). Without the brotli package, only .gz is written.
+
+    Args:
+        file_path: Path of the file
+        content: Content of the file, read from file_path if not given
+
+    Returns:
+        Number of variants written
+    """
+    if content is None:
+        with open(file_path, "rb") as f:
+            content = f.read()
+
+    variants = {}
+    if len(content) >= MIN_COMPRESS_SIZE:
+        # mtime=0 keeps the output identical for identical content
+        variants[".gz"] = gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+        if BROTLI_AVAILABLE:
+            variants[".br"] = brotli.compress(content, quality=BROTLI_QUALITY)
+
+    written = 0
+    for suffix in COMPRESSED_SUFFIXES:
+        variant_path = f"{file_path}{suffix}"
+        data = variants.get(suffix)
+        if data is None or len(data) > len(content) * MAX_COMPRESSION_RATIO:
+            if os.path.exists(variant_path):
+                os.remove(variant_path)
+            continue
+        with open(variant_path, "wb") as f:
+            f.write(data)
+        written += 1
+    return written
+
+
+def _needs_compression(file_path: Path) -> bool:
+    """Check whether a file lacks variants that are at least as new as it is."""
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return False
+    if stat.st_size < MIN_COMPRESS_SIZE:
+        return False
+    for suffix in expected_suffixes():
+        variant = Path(f"{file_path}{suffix}")
+        try:
+            if variant.stat().st_mtime < stat.st_mtime:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def _content_hash(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _load_state(state_file: str) -> Dict[str, Dict[str, str]]:
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state_file: str, state: Dict[str, Dict[str, str]]) -> None:
+    try:
+        os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(state_file) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, state_file)
+    except OSError as e:
+        logger.warning(f"Could not write compression state {state_file}: {e}")
+
+
+def _compress_file(file_path: str) -> Tuple[str, Optional[int]]:
+    try:
+        return file_path, write_compressed_variants(file_path)
+    except OSError as e:
+        logger.warning(f"Could not compress {file_path}: {e}")
+        return file_path, None
+
+
+def compress_tree(
+    root_dir: str,
+    processing_mode: str = "concurrent",
+    max_workers: Optional[int] = None,
+    state_file: str = DEFAULT_STATE_FILE,
+) -> int:
+    """
+    Write compressed variants for all compressible files below a directory
+    that don't have up-to-date variants yet.
+
+    Files for which not all variants reach MAX_COMPRESSION_RATIO are
+    recorded in state_file with the hash of their content, and skipped as
+    long as their content doesn't change.
+
+    Args:
+        root_dir: Directory to compress
+        processing_mode: 'concurrent' or 'sequential'
+        max_workers: Maximum number of worker processes (for concurrent mode)
+        state_file: File recording the incompressible files
+
+    Returns:
+        Number of variants written
+    """
+    if not BROTLI_AVAILABLE:
+        logger.warning("brotli not available, writing only gzip variants")
+
+    root = Path(root_dir)
+    state = _load_state(state_file)
+    # Entries are only valid for the variants written by this installation
+    state_key = f"{''.join(expected_suffixes())} {root.resolve()}"
+    incompressible = state.get(state_key, {})
+    new_incompressible = {}
+    files = []
+    for path in root.rglob("*"):
+        if not (is_compressible(path.name) and path.is_file() and _needs_compression(path)):
+            continue
+        relative_path = path.relative_to(root).as_posix()
+        content_hash = incompressible.get(relative_path)
+        if content_hash is not None and content_hash == _content_hash(str(path)):
+            new_incompressible[relative_path] = content_hash
+            continue
+        files.append(str(path))
+
+    written = 0
+    results = []
+    if processing_mode == "concurrent" and len(files) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_compress_file, file_path) for file_path in files]
+            for future in track_concurrent_futures(
+                futures, desc=f"Compressing {len(files)} files", unit="files"
+            ):
+                results.append(future.result())
+    else:
+        results = [_compress_file(file_path) for file_path in files]
+
+    for file_path, count in results:
+        if count is None:
+            continue
+        written += count
+        if count < len(expected_suffixes()):
+            relative_path = Path(file_path).relative_to(root).as_posix()
+            new_incompressible[relative_path] = _content_hash(file_path)
+
+    if new_incompressible != incompressible:
+        state[state_key] = new_incompressible
+        _save_state(state_file, state)
+
+    if files:
+        logger.info(f"Wrote {written} compressed variants for {len(files)} files in {root_dir}")
+    return written
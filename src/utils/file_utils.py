@@ -8,11 +8,12 @@ License:
     https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
 """
 
+import hashlib
 import json
 import os
 import shutil
 from pathlib import Path
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Iterable, Optional, List, Tuple
 import arrow
 
 from src.logging_config import get_logger
@@ -23,6 +24,8 @@ from src.constants import DEFAULT_ENCODING
 
 logger = get_logger(__name__)
 
+SRC_DIR = Path(__file__).resolve().parent.parent
+
 
 class FileOperations:
     """Centralized file operations with consistent error handling."""
@@ -286,6 +289,67 @@ class MetadataHandler:
         )
 
 
+class TrackedMetadata:
+    """
+    Metadata dictionary that remembers whether it was modified.
+
+    A serialized snapshot is taken on load, so changes anywhere in the nested
+    structure are detected and unchanged files are never rewritten.
+    """
+    
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self._snapshot = self._serialize(data)
+    
+    @staticmethod
+    def _serialize(data: Dict[str, Any]) -> str:
+        return json.dumps(data, sort_keys=True, ensure_ascii=False)
+    
+    @classmethod
+    def load(cls, metadata_path: Path) -> "TrackedMetadata":
+        """
+        Load metadata from a JSON file and take a snapshot.
+        
+        Args:
+            metadata_path: Path to metadata file
+            
+        Returns:
+            Tracked metadata
+            
+        Raises:
+            MetadataException: If metadata cannot be loaded
+        """
+        return cls(MetadataHandler.load_metadata(Path(metadata_path)))
+    
+    def is_dirty(self) -> bool:
+        """
+        Check whether the metadata differs from the loaded snapshot.
+        
+        Returns:
+            True if any field was added, removed or changed
+        """
+        return self._serialize(self.data) != self._snapshot
+    
+    def save_if_changed(self, metadata_path: Path) -> bool:
+        """
+        Write the metadata back only if it was modified.
+        
+        Args:
+            metadata_path: Path to save metadata
+            
+        Returns:
+            True if the file was written
+            
+        Raises:
+            MetadataException: If metadata cannot be saved
+        """
+        if not self.is_dirty():
+            return False
+        MetadataHandler.save_metadata(Path(metadata_path), self.data)
+        self._snapshot = self._serialize(self.data)
+        return True
+
+
 class PathBuilder:
     """Build common file paths with consistent patterns."""
     
@@ -361,4 +425,36 @@ def write_json(file_path: Path, data: Dict[str, Any]) -> None:
 
 def ensure_directory(directory: Path) -> None:
     """Convenience function to ensure directory exists."""
-    FileOperations.ensure_directory(directory)
\ No newline at end of file
+    FileOperations.ensure_directory(directory)
+
+
+def fingerprint_sources(
+    sources: Iterable[Path], suffixes: Tuple[str, ...] = (".py",)
+) -> str:
+    """
+    Hash the contents of source files and directories, e.g. so that changing
+    the code that generates an output invalidates cached copies of it.
+
+    Args:
+        sources: Files, and directories whose files are hashed recursively
+        suffixes: Suffixes of the files to hash
+
+    Returns:
+        Hex digest over the paths (relative to src/) and contents of the files
+    """
+    hasher = hashlib.sha256()
+    for source in sources:
+        if not source.exists():
+            continue
+        paths = sorted(source.rglob("*")) if source.is_dir() else [source]
+        for path in paths:
+            if not path.is_file() or path.suffix not in suffixes:
+                continue
+            resolved = path.resolve()
+            try:
+                name = resolved.relative_to(SRC_DIR).as_posix()
+            except ValueError:
+                name = resolved.as_posix()
+            hasher.update(name.encode("utf-8") + b"\0")
+            hasher.update(path.read_bytes())
+    return hasher.hexdigest()
@@ -8,28 +8,165 @@ License:
     https://github.com/quadratecode/zhlaw/blob/main/LICENSE.md
 """
 
-from typing import List, Dict, Any, Optional, Callable, Union
+from typing import List, Dict, Any, Optional, Callable, Union, IO, NamedTuple
 from pathlib import Path
-from bs4 import BeautifulSoup, Tag, NavigableString
+from bs4 import BeautifulSoup, Tag, NavigableString, FeatureNotFound
 import re
 
 from src.logging_config import get_logger
 from src.constants import HTMLClasses, DataAttributes
+from src.config import ParserConfig
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+
+try:
+    import lxml.html
+
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
 
 logger = get_logger(__name__)
 
+# BeautifulSoup tree builders that can be used for whole documents. Each must
+# write the same pages as html.parser, see tests/test_parser_backends.py
+# (html5lib is not selectable: it inserts <tbody> into tables)
+PARSER_BACKENDS = ("html.parser", "lxml")
+
+# Backends for read-only scans, in order of preference for "auto"
+SCAN_BACKENDS = ("selectolax", "lxml", "html.parser")
+
+_parser_backend: Optional[str] = None
+
+
+def get_parser_backend() -> str:
+    """
+    Return the BeautifulSoup tree builder used for documents.
+
+    The backend is taken from ParserConfig.BACKEND (ZHLAW_HTML_PARSER) on first
+    use. Unknown or uninstalled backends fall back to "html.parser".
+    """
+    global _parser_backend
+    if _parser_backend is None:
+        set_parser_backend(ParserConfig.BACKEND)
+    return _parser_backend
+
+
+def set_parser_backend(backend: str) -> None:
+    """
+    Select the BeautifulSoup tree builder used for documents.
+
+    Args:
+        backend: One of PARSER_BACKENDS
+    """
+    global _parser_backend
+    if backend not in PARSER_BACKENDS:
+        logger.warning(f"Unsupported HTML parser backend '{backend}', using html.parser")
+        backend = "html.parser"
+    elif backend != "html.parser":
+        try:
+            BeautifulSoup("", backend)
+        except FeatureNotFound:
+            logger.warning(f"HTML parser backend '{backend}' not installed, using html.parser")
+            backend = "html.parser"
+    _parser_backend = backend
+
+
+class ScannedElement(NamedTuple):
+    """Element found by scan_elements()."""
+
+    name: str
+    attrs: Dict[str, str]
+    text: str
+
+
+def get_scan_backend() -> str:
+    """Return the backend used by scan_elements()."""
+    backend = ParserConfig.SCAN_BACKEND
+    if backend == "selectolax" and SELECTOLAX_AVAILABLE:
+        return backend
+    if backend == "lxml" and LXML_AVAILABLE:
+        return backend
+    if backend == "html.parser":
+        return backend
+    if SELECTOLAX_AVAILABLE:
+        return "selectolax"
+    if LXML_AVAILABLE:
+        return "lxml"
+    return "html.parser"
+
+
+def scan_elements(html_content: str, attributes: List[str]) -> List[ScannedElement]:
+    """
+    Collect all elements that carry any of the given attributes.
+
+    This is a read-only fast path for scans over rendered pages that do not
+    need a BeautifulSoup tree. It uses selectolax (lexbor) or lxml when
+    available and BeautifulSoup otherwise. Text is the concatenation of the
+    stripped text nodes, like get_text(strip=True).
+
+    Args:
+        html_content: HTML document
+        attributes: Attribute names to look for
+
+    Returns:
+        Matching elements in document order
+    """
+    backend = get_scan_backend()
+    if backend == "selectolax":
+        tree = LexborHTMLParser(html_content)
+        selector = ", ".join(f"[{attr}]" for attr in attributes)
+        return [
+            ScannedElement(
+                node.tag,
+                {k: v or "" for k, v in node.attributes.items()},
+                node.text(deep=True, separator="", strip=True),
+            )
+            for node in tree.css(selector)
+        ]
+    if backend == "lxml":
+        if not html_content.strip():
+            return []
+        root = lxml.html.document_fromstring(html_content)
+        return [
+            ScannedElement(
+                el.tag,
+                dict(el.attrib),
+                "".join(text.strip() for text in el.itertext()),
+            )
+            for el in root.iter()
+            if isinstance(el.tag, str) and any(attr in el.attrib for attr in attributes)
+        ]
+    soup = BeautifulSoup(html_content, "html.parser")
+    return [
+        ScannedElement(
+            tag.name,
+            {
+                k: " ".join(v) if isinstance(v, list) else v
+                for k, v in tag.attrs.items()
+            },
+            tag.get_text(strip=True),
+        )
+        for tag in soup.find_all(lambda t: any(attr in t.attrs for attr in attributes))
+    ]
+
 
 class HTMLProcessor:
     """Common HTML processing operations with BeautifulSoup."""
 
-    def __init__(self, parser: str = "html.parser"):
+    def __init__(self, parser: Optional[str] = None):
         """
         Initialize HTML processor.
 
         Args:
-            parser: BeautifulSoup parser to use
+            parser: BeautifulSoup parser to use, defaults to the configured backend
         """
-        self.parser = parser
+        self.parser = parser or get_parser_backend()
 
     def parse_html(self, html_content: str) -> BeautifulSoup:
         """
@@ -235,6 +372,211 @@ class HTMLProcessor:
         return soup
 
 
+class DocumentOrderIndex:
+    """
+    Position of every Tag of a document in document (pre-)order.
+
+    The index is built with a single traversal, so "is A before B" becomes an
+    integer comparison instead of a find_all_previous()/find_all_next() scan.
+    Tags are identified by identity, not by BeautifulSoup's structural
+    equality. The index is not updated when the tree is modified: moving or
+    removing tags keeps the relative order of all other indexed tags intact,
+    but tags created after the index was built are unknown to it.
+    """
+
+    def __init__(self, soup: Union[BeautifulSoup, Tag]):
+        """
+        Build the index for all tags below soup.
+
+        Args:
+            soup: BeautifulSoup object or Tag to index
+        """
+        # Keep references to the tags so their ids cannot be reused
+        self._tags: List[Tag] = soup.find_all(True)
+        self._positions: Dict[int, int] = {
+            id(tag): position for position, tag in enumerate(self._tags)
+        }
+
+    def __contains__(self, tag: Any) -> bool:
+        return id(tag) in self._positions
+
+    def __len__(self) -> int:
+        return len(self._tags)
+
+    def position(self, tag: Tag) -> int:
+        """
+        Get the document-order position of a tag.
+
+        Args:
+            tag: Indexed tag
+
+        Returns:
+            Ordinal of the tag
+
+        Raises:
+            KeyError: If the tag is not part of the index
+        """
+        return self._positions[id(tag)]
+
+    def is_before(self, first: Tag, second: Tag) -> bool:
+        """
+        Check whether first starts before second in document order.
+
+        Args:
+            first: Indexed tag
+            second: Indexed tag
+
+        Returns:
+            True if first precedes second
+        """
+        return self.position(first) < self.position(second)
+
+    def is_between(self, tag: Tag, start: Optional[Tag], end: Optional[Tag]) -> bool:
+        """
+        Check whether a tag lies strictly between two tags. A missing start
+        or end leaves that side of the region open.
+
+        Args:
+            tag: Indexed tag to check
+            start: Tag the region starts after, or None
+            end: Tag the region ends before, or None
+
+        Returns:
+            True if the tag lies inside the region
+        """
+        position = self.position(tag)
+        if start is not None and position <= self.position(start):
+            return False
+        if end is not None and position >= self.position(end):
+            return False
+        return True
+
+    def sort(self, tags: List[Tag]) -> List[Tag]:
+        """
+        Return the given tags sorted by document order.
+
+        Args:
+            tags: Indexed tags
+
+        Returns:
+            New list sorted by position
+        """
+        return sorted(tags, key=self.position)
+
+
+class MergeNode:
+    """A paragraph in the linked list walked by ParagraphMergeEngine."""
+
+    __slots__ = ("tag", "prev", "next")
+
+    def __init__(self, tag: Tag):
+        self.tag = tag
+        self.prev: Optional["MergeNode"] = None
+        self.next: Optional["MergeNode"] = None
+
+
+class ParagraphMergeEngine:
+    """
+    Single-pass merge engine over the paragraphs of a document.
+
+    The matching tags are collected once into a doubly linked list. A cursor
+    walks the list and applies a list of merge rules to each node. A rule is
+    called as rule(engine, node) and returns None if it did not merge,
+    otherwise the node at which the walk continues (or ParagraphMergeEngine.END
+    if nothing is left to check). Merged-away nodes are removed from the list,
+    so the tree never has to be queried again after a merge.
+    """
+
+    END = object()
+
+    def __init__(self, soup: BeautifulSoup, names: Union[str, List[str]] = "p"):
+        """
+        Build the paragraph list.
+
+        Args:
+            soup: BeautifulSoup object to process
+            names: Tag name(s) to walk, in document order
+        """
+        self.soup = soup
+        self.first: Optional[MergeNode] = None
+        previous: Optional[MergeNode] = None
+        for tag in soup.find_all(names):
+            node = MergeNode(tag)
+            if previous is None:
+                self.first = node
+            else:
+                previous.next = node
+                node.prev = previous
+            previous = node
+
+    def unlink(self, node: MergeNode) -> Optional[MergeNode]:
+        """
+        Remove a node from the list without touching its tag.
+
+        Args:
+            node: Node to remove
+
+        Returns:
+            The node that followed the removed node, if any
+        """
+        following = node.next
+        if node.prev is not None:
+            node.prev.next = following
+        else:
+            self.first = following
+        if following is not None:
+            following.prev = node.prev
+        node.prev = node.next = None
+        return following
+
+    def remove(self, node: MergeNode) -> Optional[MergeNode]:
+        """
+        Decompose a node's tag and remove the node from the list.
+
+        Args:
+            node: Node to remove
+
+        Returns:
+            The node that followed the removed node, if any
+        """
+        node.tag.decompose()
+        return self.unlink(node)
+
+    def run(
+        self, rules: List[Callable[["ParagraphMergeEngine", MergeNode], Any]]
+    ) -> BeautifulSoup:
+        """
+        Walk the paragraphs once and apply the merge rules.
+
+        Args:
+            rules: Merge rules, tried in order for every node
+
+        Returns:
+            The processed BeautifulSoup object
+        """
+        node = self.first
+        while node is not None:
+            # Skip paragraphs that were removed together with an ancestor
+            if node.tag.decomposed:
+                node = self.unlink(node)
+                continue
+
+            resume = None
+            for rule in rules:
+                resume = rule(self, node)
+                if resume is not None:
+                    break
+
+            if resume is None:
+                node = node.next
+            elif resume is self.END:
+                break
+            else:
+                node = resume
+
+        return self.soup
+
+
 class HTMLBuilder:
     """Builder for creating HTML documents."""
 
@@ -417,10 +759,42 @@ class LinkProcessor:
         return count
 
 
+class RawHTML(NavigableString):
+    """
+    Pre-rendered HTML in a tree, written out as is instead of being escaped.
+
+    prettify_html_soup() parses it into elements first, so pretty-printed pages
+    are indented as if the elements had been built in the tree.
+    """
+
+    def output_ready(self, formatter: Any = "minimal") -> str:
+        return str(self)
+
+
+def expand_raw_html(soup: BeautifulSoup) -> None:
+    """Replace the RawHTML strings of a tree with the elements they hold."""
+    raw_strings = [element for element in soup.descendants if isinstance(element, RawHTML)]
+    for raw in raw_strings:
+        fragment = BeautifulSoup(str(raw), "html.parser")
+        raw.replace_with(*fragment.contents)
+
+
 # Convenience functions
-def parse_html(html_content: str) -> BeautifulSoup:
-    """Convenience function to parse HTML."""
-    return HTMLProcessor().parse_html(html_content)
+def parse_html(html_content: Union[str, IO], parser: Optional[str] = None) -> BeautifulSoup:
+    """
+    Convenience function to parse an HTML document with the configured backend.
+
+    Fragments that are inserted into an existing tree should keep using
+    BeautifulSoup(fragment, "html.parser"): lxml wraps them in <html><body>.
+    """
+    return HTMLProcessor(parser).parse_html(html_content)
+
+
+def parse_html_file(
+    file_path: Union[str, Path], encoding: str = "utf-8", parser: Optional[str] = None
+) -> BeautifulSoup:
+    """Convenience function to parse an HTML file with the configured backend."""
+    return HTMLProcessor(parser).parse_html_file(file_path, encoding)
 
 
 def clean_html(html_content: str, remove_tags: Optional[List[str]] = None) -> str:
@@ -442,6 +816,8 @@ def prettify_html_soup(soup: BeautifulSoup, indent: int = 4) -> str:
     """
     Convert BeautifulSoup object to pretty-printed HTML string.
 
+    RawHTML strings of the tree are replaced with their elements first.
+
     Args:
         soup: BeautifulSoup object to prettify
         indent: Number of spaces for indentation (Note: BeautifulSoup uses fixed indentation)
@@ -449,6 +825,7 @@ def prettify_html_soup(soup: BeautifulSoup, indent: int = 4) -> str:
     Returns:
         Pretty-printed HTML string
     """
+    expand_raw_html(soup)
     return soup.prettify(formatter="minimal")
 
 
@@ -459,6 +836,7 @@ def write_html(
     add_doctype: bool = True,
     indent: int = 4,
     minify: bool = True,
+    compress: bool = False,
 ) -> None:
     """
     Write BeautifulSoup object to file as HTML (minified or pretty-printed).
@@ -470,6 +848,7 @@ def write_html(
         add_doctype: Whether to add DOCTYPE if missing
         indent: Number of spaces for indentation (only used when not minifying)
         minify: Whether to minify the HTML output
+        compress: Whether to also write .br and .gz variants of the file
     """
     from bs4 import Doctype
 
@@ -488,19 +867,23 @@ def write_html(
             html_content = "<!DOCTYPE html>\n" + html_content
         
         # Minify the HTML
-        minified_content = minify_html_content(html_content, minify_css=True, minify_js=True)
-        
-        with open(file_path, "w", encoding=encoding) as f:
-            f.write(minified_content)
+        html_content = minify_html_content(html_content, minify_css=True, minify_js=True)
     else:
         # Use pretty-printing for debugging/development
-        with open(file_path, "w", encoding=encoding) as f:
-            # Add DOCTYPE if requested and not present
-            if add_doctype and not has_doctype:
-                f.write("<!DOCTYPE html>\n")
-            
-            # Write pretty-printed HTML
-            f.write(prettify_html_soup(soup, indent))
+        html_content = prettify_html_soup(soup, indent)
+        
+        # Add DOCTYPE if requested and not present
+        if add_doctype and not has_doctype:
+            html_content = "<!DOCTYPE html>\n" + html_content
+
+    data = html_content.encode(encoding)
+    with open(file_path, "wb") as f:
+        f.write(data)
+
+    if compress:
+        from src.utils.compression_utils import write_compressed_variants
+
+        write_compressed_variants(file_path, data)
 
 
 def write_pretty_html(
@@ -0,0 +1,234 @@
+"""
+Zip utilities for archives assembled from already compressed members.
+zipfile can only add members it compresses itself, so RawZipWriter writes the
+local headers and the central directory of such archives on its own (following
+the PKWARE APPNOTE), and read_raw_member reads a member of an existing archive
+without decompressing it.
+"""
+
+import struct
+import zipfile
+from typing import BinaryIO, List, NamedTuple, Tuple
+
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+ZIP64_END_SIGNATURE = b"PK\x06\x06"
+ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+END_SIGNATURE = b"PK\x05\x06"
+
+LOCAL_HEADER_SIZE = 30
+ZIP64_EXTRA_ID = 0x0001
+
+# Flag bit marking UTF-8 encoded file names
+UTF8_FLAG = 0x800
+
+# Made by version 2.0 (4.5 with ZIP64) on Unix, so external_attr holds the mode
+CREATE_SYSTEM_UNIX = 3
+VERSION_DEFAULT = 20
+VERSION_ZIP64 = 45
+
+# Fields at these limits are stored in the ZIP64 records instead
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+
+
+class RawMember(NamedTuple):
+    """A member as written to the archive, for its central directory entry."""
+
+    filename: bytes
+    flags: int
+    compress_type: int
+    dos_time: int
+    dos_date: int
+    crc: int
+    compress_size: int
+    file_size: int
+    external_attr: int
+    header_offset: int
+
+
+def dos_date_time(date_time: Tuple[int, int, int, int, int, int]) -> Tuple[int, int]:
+    """Returns the MS-DOS (date, time) of a ZipInfo.date_time tuple."""
+    year, month, day, hour, minute, second = date_time
+    dos_date = (year - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | second // 2
+    return dos_date, dos_time
+
+
+def read_raw_member(fp: BinaryIO, info: zipfile.ZipInfo) -> bytes:
+    """
+    Read the compressed data of a member, as stored in the archive.
+
+    Args:
+        fp: Archive opened in binary mode
+        info: Member, from ZipFile.getinfo() or ZipFile.infolist()
+
+    Raises:
+        zipfile.BadZipFile: If the member has no valid local header
+    """
+    fp.seek(info.header_offset)
+    header = fp.read(LOCAL_HEADER_SIZE)
+    if len(header) != LOCAL_HEADER_SIZE or header[:4] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local header of member {info.filename}")
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    fp.seek(name_length + extra_length, 1)
+    data = fp.read(info.compress_size)
+    if len(data) != info.compress_size:
+        raise zipfile.BadZipFile(f"Truncated member {info.filename}")
+    return data
+
+
+class RawZipWriter:
+    """
+    Writes a zip archive from already compressed members.
+
+    Members are written in the order they are added. The central directory
+    is sorted by file name on close. ZIP64 records are written if the archive
+    has too many members or grows too large for the classic records. Members
+    themselves must be smaller than 4 GiB.
+    """
+
+    def __init__(self, fp: BinaryIO):
+        """
+        Args:
+            fp: File opened for writing in binary mode, closed by the caller
+        """
+        self.fp = fp
+        self.members: List[RawMember] = []
+
+    def add(self, zinfo: zipfile.ZipInfo, data: bytes) -> None:
+        """
+        Append a member.
+
+        Args:
+            zinfo: Name, date_time, compress_type, CRC, compress_size,
+                file_size and external_attr of the member
+            data: Compressed data of the member
+
+        Raises:
+            ValueError: If the member is too large or its sizes don't match
+        """
+        if len(data) != zinfo.compress_size:
+            raise ValueError(
+                f"{zinfo.filename}: {len(data)} bytes of data, "
+                f"compress_size is {zinfo.compress_size}"
+            )
+        if zinfo.compress_size >= ZIP64_LIMIT or zinfo.file_size >= ZIP64_LIMIT:
+            raise ValueError(f"{zinfo.filename}: members must be smaller than 4 GiB")
+        try:
+            filename = zinfo.filename.encode("ascii")
+            flags = 0
+        except UnicodeEncodeError:
+            filename = zinfo.filename.encode("utf-8")
+            flags = UTF8_FLAG
+        dos_date, dos_time = dos_date_time(zinfo.date_time)
+        member = RawMember(
+            filename,
+            flags,
+            zinfo.compress_type,
+            dos_time,
+            dos_date,
+            zinfo.CRC,
+            zinfo.compress_size,
+            zinfo.file_size,
+            zinfo.external_attr,
+            self.fp.tell(),
+        )
+        self.fp.write(
+            LOCAL_HEADER_SIGNATURE
+            + struct.pack(
+                "<HHHHHLLLHH",
+                VERSION_DEFAULT,
+                member.flags,
+                member.compress_type,
+                member.dos_time,
+                member.dos_date,
+                member.crc,
+                member.compress_size,
+                member.file_size,
+                len(filename),
+                0,
+            )
+            + filename
+        )
+        self.fp.write(data)
+        self.members.append(member)
+
+    def close(self) -> int:
+        """
+        Write the central directory and the end records.
+
+        Returns:
+            Number of members
+        """
+        members = sorted(self.members, key=lambda member: member.filename)
+        directory_offset = self.fp.tell()
+        for member in members:
+            extra = b""
+            header_offset = member.header_offset
+            version = VERSION_DEFAULT
+            if header_offset >= ZIP64_LIMIT:
+                extra = struct.pack("<HHQ", ZIP64_EXTRA_ID, 8, header_offset)
+                header_offset = ZIP64_LIMIT
+                version = VERSION_ZIP64
+            self.fp.write(
+                CENTRAL_HEADER_SIGNATURE
+                + struct.pack(
+                    "<HHHHHHLLLHHHHHLL",
+                    CREATE_SYSTEM_UNIX << 8 | version,
+                    version,
+                    member.flags,
+                    member.compress_type,
+                    member.dos_time,
+                    member.dos_date,
+                    member.crc,
+                    member.compress_size,
+                    member.file_size,
+                    len(member.filename),
+                    len(extra),
+                    0,
+                    0,
+                    0,
+                    member.external_attr,
+                    header_offset,
+                )
+                + member.filename
+                + extra
+            )
+        directory_size = self.fp.tell() - directory_offset
+
+        count = len(members)
+        if (
+            count >= ZIP64_COUNT_LIMIT
+            or directory_offset >= ZIP64_LIMIT
+            or directory_size >= ZIP64_LIMIT
+        ):
+            zip64_end_offset = self.fp.tell()
+            self.fp.write(
+                ZIP64_END_SIGNATURE
+                + struct.pack(
+                    "<QHHLLQQQQ",
+                    44,
+                    CREATE_SYSTEM_UNIX << 8 | VERSION_ZIP64,
+                    VERSION_ZIP64,
+                    0,
+                    0,
+                    count,
+                    count,
+                    directory_size,
+                    directory_offset,
+                )
+            )
+            self.fp.write(
+                ZIP64_LOCATOR_SIGNATURE + struct.pack("<LQL", 0, zip64_end_offset, 1)
+            )
+            count = min(count, ZIP64_COUNT_LIMIT)
+            directory_size = min(directory_size, ZIP64_LIMIT)
+            directory_offset = min(directory_offset, ZIP64_LIMIT)
+        self.fp.write(
+            END_SIGNATURE
+            + struct.pack(
+                "<HHHHLLH", 0, 0, count, count, directory_size, directory_offset, 0
+            )
+        )
+        return len(members)
@@ -0,0 +1,94 @@
+"""
+Golden-output check of the HTML parser backends: every backend in
+PARSER_BACKENDS must render the law pages in tests/fixtures/parser_backends
+exactly as html.parser does.
+
+The expected pages are regenerated with html.parser by running
+python tests/test_parser_backends.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.modules.site_generator_module import build_zhlaw
+from src.utils import html_utils
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures" / "parser_backends"
+EXPECTED_SUFFIX = ".expected.html"
+
+DOC_INFO = {
+    "erlasstitel": "Gemeindegesetz",
+    "kurztitel": "Gemeindegesetz",
+    "abkuerzung": "GG",
+    "ordnungsnummer": "131.1",
+    "nachtragsnummer": "100",
+    "in_force": True,
+    "erlassdatum": "20150420",
+    "inkraftsetzungsdatum": "20180101",
+    "publikationsdatum": "20150501",
+    "aufhebungsdatum": "",
+    "law_page_url": "https://www.zh.ch/de/politik-staat/gesetze-beschluesse/gesetzessammlung/zhlex-ls/erlass-131_1-2015_04_20-2018_01_01-100.html",
+    "zhlaw_url_dynamic": "https://www.zhlaw.ch/col-zh/131.1/latest",
+    "versions": {
+        "older_versions": [{"nachtragsnummer": "090", "in_force": False}],
+        "newer_versions": [],
+    },
+}
+
+FIXTURES = sorted(
+    path for path in FIXTURE_DIR.glob("*.html") if not path.name.endswith(EXPECTED_SUFFIX)
+)
+
+
+def expected_path(fixture: Path) -> Path:
+    return fixture.with_name(fixture.stem + EXPECTED_SUFFIX)
+
+
+def render_page(fixture: Path, backend: str, output_path: Path) -> bytes:
+    """Render a law page the way d1_build_site writes it, with the given backend."""
+    previous = html_utils.get_parser_backend()
+    html_utils.set_parser_backend(backend)
+    try:
+        soup = html_utils.parse_html_file(fixture)
+        soup = build_zhlaw.main(soup, str(fixture), dict(DOC_INFO), "new_html", "zh")
+        html_utils.write_html(soup, str(output_path), encoding="utf-8", add_doctype=True)
+    finally:
+        html_utils.set_parser_backend(previous)
+    return output_path.read_bytes()
+
+
+def backend_installed(backend: str) -> bool:
+    try:
+        html_utils.BeautifulSoup("", backend)
+    except html_utils.FeatureNotFound:
+        return False
+    return True
+
+
+@pytest.mark.parametrize("backend", html_utils.PARSER_BACKENDS)
+@pytest.mark.parametrize("fixture", FIXTURES, ids=lambda path: path.stem)
+def test_backend_matches_golden_output(fixture: Path, backend: str, tmp_path: Path):
+    pytest.importorskip("minify_html")
+    if not backend_installed(backend):
+        pytest.skip(f"{backend} not installed")
+    output = render_page(fixture, backend, tmp_path / fixture.name)
+    assert output == expected_path(fixture).read_bytes()
+
+
+def test_unsupported_backend_falls_back_to_html_parser():
+    previous = html_utils.get_parser_backend()
+    try:
+        html_utils.set_parser_backend("html5lib")
+        assert html_utils.get_parser_backend() == "html.parser"
+    finally:
+        html_utils.set_parser_backend(previous)
+
+
+if __name__ == "__main__":
+    for fixture in FIXTURES:
+        render_page(fixture, "html.parser", expected_path(fixture))
+        print(f"Wrote {expected_path(fixture)}")
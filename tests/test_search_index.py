@@ -0,0 +1,122 @@
+"""
+Incremental search index: after a cold build, rebuilding the index of a site
+where one page changed must only extract that page.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from src.exceptions import ConfigurationException
+from src.modules.site_generator_module import search_index
+
+requires_pagefind = pytest.mark.skipif(
+    not search_index.PAGEFIND_AVAILABLE or search_index.get_executable() is None,
+    reason='requires the "pagefind[bin]" package',
+)
+
+PAGE_COUNT = 300
+
+WORDS = (
+    "Gemeinde Kanton Aufsicht Steuer Verordnung Bewilligung Gesetz Behörde "
+    "Beschwerde Frist Verfahren Zuständigkeit Entscheid Rekurs Abgabe"
+).split()
+
+
+def law_page(number: int, revision: int = 0) -> str:
+    provisions = "".join(
+        f'<div class="provision-container"><p class="provision" id="seq-0-prov-{p}">'
+        f"§ {p}.</p><p>{' '.join(WORDS[(number + p + i) % len(WORDS)] for i in range(40))}"
+        f" {revision}</p></div>"
+        for p in range(1, 30)
+    )
+    return (
+        f'<!DOCTYPE html><html lang="de"><head><title>Gesetz {number}</title></head>'
+        f'<body><nav><a href="/">Startseite</a></nav><div data-pagefind-body>'
+        f'<h1>Gesetz {number}</h1><div data-pagefind-filter="Erlassart">Gesetz</div>'
+        f'<div id="source-text">{provisions}</div></div></body></html>'
+    )
+
+
+@pytest.fixture
+def site(tmp_path: Path) -> Path:
+    site_path = tmp_path / "public"
+    for number in range(PAGE_COUNT):
+        page = site_path / "col-zh" / f"{number}.html"
+        page.parent.mkdir(parents=True, exist_ok=True)
+        page.write_text(law_page(number), encoding="utf-8")
+    # Older versions are not indexed
+    (site_path / "col-zh" / "0-old.html").write_text(
+        "<!DOCTYPE html><html><body><p>Alte Fassung</p></body></html>", encoding="utf-8"
+    )
+    return site_path
+
+
+@pytest.fixture
+def extracted_pages(monkeypatch) -> list:
+    """Record the pages whose fragments are extracted."""
+    pages = []
+    extract_page_fragment = search_index.extract_page_fragment
+
+    def recording_extract_page_fragment(args):
+        pages.append(Path(args[0]).name)
+        return extract_page_fragment(args)
+
+    monkeypatch.setattr(
+        search_index, "extract_page_fragment", recording_extract_page_fragment
+    )
+    return pages
+
+
+def build(site_path: Path, store_dir: Path):
+    return search_index.main(
+        str(site_path), processing_mode="sequential", store_dir=str(store_dir)
+    )
+
+
+def fragment_count(store_dir: Path) -> int:
+    return len(list((store_dir / "fragments").glob("*/*.html")))
+
+
+@requires_pagefind
+def test_one_changed_page_is_indexed_incrementally(
+    site: Path, tmp_path: Path, extracted_pages: list
+):
+    store_dir = tmp_path / "search_index"
+
+    cold_stats = build(site, store_dir)
+    assert cold_stats["extracted"] == PAGE_COUNT
+    assert cold_stats["indexed"] == PAGE_COUNT
+    assert sorted(extracted_pages) == sorted(f"{n}.html" for n in range(PAGE_COUNT))
+    assert (site / search_index.PAGEFIND_DIR / "pagefind.js").exists()
+
+    extracted_pages.clear()
+    (site / "col-zh" / "7.html").write_text(law_page(7, revision=1), encoding="utf-8")
+    warm_stats = build(site, store_dir)
+    assert warm_stats["extracted"] == 1
+    assert warm_stats["indexed"] == PAGE_COUNT
+    assert extracted_pages == ["7.html"]
+
+    extracted_pages.clear()
+    unchanged_stats = build(site, store_dir)
+    assert unchanged_stats["extracted"] == 0
+    assert extracted_pages == []
+    assert (site / search_index.PAGEFIND_DIR / "pagefind.js").exists()
+
+
+@requires_pagefind
+def test_fragments_of_removed_pages_are_pruned(site: Path, tmp_path: Path):
+    store_dir = tmp_path / "search_index"
+    build(site, store_dir)
+
+    (site / "col-zh" / "7.html").write_text(law_page(7, revision=1), encoding="utf-8")
+    (site / "col-zh" / "8.html").unlink()
+    stats = build(site, store_dir)
+    assert stats["pruned"] == 2
+    assert fragment_count(store_dir) == PAGE_COUNT - 1
+
+
+def test_missing_pagefind_fails(site: Path, tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(search_index, "PAGEFIND_AVAILABLE", False)
+    with pytest.raises(ConfigurationException):
+        build(site, tmp_path / "search_index")
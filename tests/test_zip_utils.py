@@ -0,0 +1,88 @@
+"""
+RawZipWriter: archives written from already compressed members must read back
+with zipfile, including names outside ASCII and archives that need ZIP64
+records, and read_raw_member must copy members without recompressing them.
+"""
+
+import io
+import zipfile
+import zlib
+
+from src.utils.zip_utils import ZIP64_COUNT_LIMIT, RawZipWriter, read_raw_member
+
+DATE_TIME = (2024, 5, 17, 13, 45, 58)
+
+
+def deflated_member(filename: str, data: bytes) -> tuple:
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    zinfo = zipfile.ZipInfo(filename, DATE_TIME)
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.external_attr = 0o644 << 16
+    zinfo.CRC = zlib.crc32(data)
+    zinfo.file_size = len(data)
+    zinfo.compress_size = len(compressed)
+    return zinfo, compressed
+
+
+def stored_member(filename: str, data: bytes) -> tuple:
+    zinfo = zipfile.ZipInfo(filename, DATE_TIME)
+    zinfo.CRC = zlib.crc32(data)
+    zinfo.file_size = zinfo.compress_size = len(data)
+    return zinfo, data
+
+
+def write_archive(members) -> io.BytesIO:
+    buffer = io.BytesIO()
+    writer = RawZipWriter(buffer)
+    for zinfo, data in members:
+        writer.add(zinfo, data)
+    assert writer.close() == len(members)
+    buffer.seek(0)
+    return buffer
+
+
+def test_members_read_back():
+    contents = {
+        "b.md": b"# Gesetz\n\n" + b"Text " * 500,
+        "a.md": b"",
+        "übergangsrecht.md": "Übergangsbestimmungen".encode("utf-8"),
+    }
+    members = [deflated_member(name, data) for name, data in contents.items()]
+    members.append(stored_member("stored.txt", b"as is"))
+    buffer = write_archive(members)
+
+    with zipfile.ZipFile(buffer) as zipf:
+        assert zipf.testzip() is None
+        # The central directory is sorted by name
+        assert zipf.namelist() == sorted(list(contents) + ["stored.txt"])
+        for name, data in contents.items():
+            assert zipf.read(name) == data
+            info = zipf.getinfo(name)
+            assert info.date_time == DATE_TIME
+            assert info.external_attr == 0o644 << 16
+        assert zipf.getinfo("stored.txt").compress_type == zipfile.ZIP_STORED
+
+
+def test_raw_members_are_copied_unchanged():
+    members = [deflated_member(f"{n}.md", f"Paragraph {n}\n".encode() * 50) for n in range(3)]
+    source = write_archive(members)
+
+    with zipfile.ZipFile(source) as zipf:
+        infos = zipf.infolist()
+    copied = [(info, read_raw_member(source, info)) for info in infos]
+    assert [data for _, data in copied] == [data for _, data in members]
+
+    with zipfile.ZipFile(write_archive(copied)) as zipf:
+        assert zipf.testzip() is None
+        assert zipf.read("1.md") == b"Paragraph 1\n" * 50
+
+
+def test_many_members_use_zip64_records():
+    count = ZIP64_COUNT_LIMIT + 10
+    buffer = write_archive([stored_member(f"{n:06}.md", b"") for n in range(count)])
+
+    with zipfile.ZipFile(buffer) as zipf:
+        names = zipf.namelist()
+    assert len(names) == count
+    assert names[-1] == f"{count - 1:06}.md"